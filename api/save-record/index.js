@@ -19,6 +19,19 @@ const db = admin.firestore();
 
 // 常數定義
 const APP_ID = 'default-app-id-worldclock-history';
+const MAX_BATCH_SIZE = 100; // 批次上傳每次最多筆數
+const IDEMPOTENCY_KEY_PATTERN = /^[A-Za-z0-9_-]{8,128}$/;
+
+// 有冪等鍵時以鍵作為文件 ID，重送同一筆記錄只會覆寫同一份文件
+async function writeRecord(collectionPath, data, idempotencyKey) {
+    const collection = db.collection(collectionPath);
+    if (!idempotencyKey) {
+        return collection.add(data);
+    }
+    const docRef = collection.doc(idempotencyKey);
+    await docRef.set(data);
+    return docRef;
+}
 
 export default async function handler(req, res) {
     // 設定 CORS 標頭
@@ -37,6 +50,37 @@ export default async function handler(req, res) {
         });
     }
 
+    // 批次上傳：{ records: [...] }，每筆獨立回報結果
+    if (Array.isArray(req.body?.records)) {
+        const records = req.body.records;
+        if (records.length > MAX_BATCH_SIZE) {
+            return res.status(413).json({
+                success: false,
+                error: `每次最多 ${MAX_BATCH_SIZE} 筆記錄`
+            });
+        }
+
+        const results = await Promise.all(records.map(async (record) => {
+            const { status, body } = await saveRecord(record || {});
+            return {
+                idempotencyKey: record?.idempotencyKey || null,
+                success: body.success,
+                status,
+                error: body.error,
+                artifactsIds: body.artifactsIds
+            };
+        }));
+        return res.status(200).json({
+            success: results.every(result => result.success),
+            results
+        });
+    }
+
+    const { status, body } = await saveRecord(req.body || {});
+    return res.status(status).json(body);
+}
+
+async function saveRecord(record) {
     try {
         const {
             userDisplayName,
@@ -62,15 +106,29 @@ export default async function handler(req, res) {
             story,
             greeting,
             language,
-            languageCode
-        } = req.body;
+            languageCode,
+            idempotencyKey
+        } = record;
 
         // 驗證必要欄位
         if (!userDisplayName || !city || !country) {
-            return res.status(400).json({
-                success: false,
-                error: '缺少必要欄位：userDisplayName, city, country'
-            });
+            return {
+                status: 400,
+                body: {
+                    success: false,
+                    error: '缺少必要欄位：userDisplayName, city, country'
+                }
+            };
+        }
+
+        if (idempotencyKey !== undefined && !IDEMPOTENCY_KEY_PATTERN.test(String(idempotencyKey))) {
+            return {
+                status: 400,
+                body: {
+                    success: false,
+                    error: 'idempotencyKey 格式錯誤'
+                }
+            };
         }
 
         // 🔧 使用 Intl.DateTimeFormat 獲取用戶本地時區的當前日期字串
@@ -188,61 +246,70 @@ export default async function handler(req, res) {
         try {
             // 儲存到個人檔案結構（對應網頁版個人軌跡）
             const userProfilePath = `artifacts/${APP_ID}/userProfiles/${sanitizedDisplayName}/clockHistory`;
-            const userProfileDocRef = await db.collection(userProfilePath).add({
+            const userProfileDocRef = await writeRecord(userProfilePath, {
                 ...baseRecordData,
                 ...artifactsData
-            });
+            }, idempotencyKey);
             console.log('✅ 個人檔案記錄已儲存到 artifacts，文件 ID:', userProfileDocRef.id);
 
             // 儲存到公共資料結構（對應網頁版眾人地圖）
             const publicDataPath = `artifacts/${APP_ID}/publicData/allSharedEntries/dailyRecords`;
-            const publicDocRef = await db.collection(publicDataPath).add({
+            const publicDocRef = await writeRecord(publicDataPath, {
                 ...baseGlobalRecordData,
                 ...artifactsData
-            });
+            }, idempotencyKey);
             console.log('✅ 公共資料記錄已儲存到 artifacts，文件 ID:', publicDocRef.id);
 
             // === 棄用：為了向後兼容，暫時保留寫入到根層級 ===
             // 儲存到個人歷史記錄
-            const historyDocRef = await db.collection('userHistory').add(baseRecordData);
+            const historyDocRef = await writeRecord('userHistory', baseRecordData, idempotencyKey);
             console.log('⚠️ [棄用] 個人歷史記錄已儲存到根層級，文件 ID:', historyDocRef.id);
 
             // 儲存到全域每日記錄
-            const globalDocRef = await db.collection('globalDailyRecords').add(baseGlobalRecordData);
+            const globalDocRef = await writeRecord('globalDailyRecords', baseGlobalRecordData, idempotencyKey);
             console.log('⚠️ [棄用] 全域每日記錄已儲存到根層級，文件 ID:', globalDocRef.id);
 
-            return res.status(200).json({
-                success: true,
-                message: '記錄已成功儲存',
-                artifactsIds: {
-                    userProfileId: userProfileDocRef.id,
-                    publicDataId: publicDocRef.id
-                },
-                legacyIds: {  // 棄用
-                    historyId: historyDocRef.id,
-                    globalId: globalDocRef.id
-                },
-                recordData: {
-                    ...baseRecordData,
-                    recordedAt: now.toISOString()
+            return {
+                status: 200,
+                body: {
+                    success: true,
+                    message: '記錄已成功儲存',
+                    artifactsIds: {
+                        userProfileId: userProfileDocRef.id,
+                        publicDataId: publicDocRef.id
+                    },
+                    legacyIds: {  // 棄用
+                        historyId: historyDocRef.id,
+                        globalId: globalDocRef.id
+                    },
+                    recordData: {
+                        ...baseRecordData,
+                        recordedAt: now.toISOString()
+                    }
                 }
-            });
+            };
 
         } catch (error) {
             console.error('儲存記錄時發生錯誤:', error);
-            return res.status(500).json({
-                success: false,
-                error: '內部伺服器錯誤',
-                details: error.message
-            });
+            return {
+                status: 500,
+                body: {
+                    success: false,
+                    error: '內部伺服器錯誤',
+                    details: error.message
+                }
+            };
         }
 
     } catch (error) {
         console.error('處理請求時發生錯誤:', error);
-        return res.status(500).json({
-            success: false,
-            error: '內部伺服器錯誤',
-            details: error.message
-        });
+        return {
+            status: 500,
+            body: {
+                success: false,
+                error: '內部伺服器錯誤',
+                details: error.message
+            }
+        };
     }
 } 
\ No newline at end of file
@@ -37,6 +37,17 @@ let historyMarkersLayer = null; // 歷史點位圖層
 let currentState = 'waiting'; // waiting, loading, result, error
 window.currentState = currentState;
 
+// 🔔 給樹莓派等待的頁面信號（appReady、userLoaded、cityResolved、dayFailed、storyConsumed）
+// 每個信號記錄遞增序號，樹莓派以 execute_async_script 等待序號大於按鈕前的信號，取代固定等待
+window.piSignals = window.piSignals || {};
+window.piSignalSeq = window.piSignalSeq || 0;
+window.piSignal = function (name, detail = {}) {
+    const signal = { name, seq: ++window.piSignalSeq, time: performance.now(), detail };
+    window.piSignals[name] = signal;
+    window.dispatchEvent(new CustomEvent('piSignal', { detail: signal }));
+    console.log('🔔 頁面信號:', name, detail);
+};
+
 // 🎮 遊戲化系統整合
 let gameSystemReady = false;
 let gameStarted = false;
@@ -337,41 +348,71 @@ let cityNameEl, countryNameEl, greetingTextEl, coordinatesEl, errorMessageEl;
 // 故事相關元素
 let storyTextEl;
 
-// 🔧 日誌橋接函數：將前端日誌發送到後端日誌系統
-function logToBackend(level, message, data = null) {
+// 🔧 日誌環形緩衝：後端以 window.piDrainLogs 批次取走，每筆保留原始時間與級別
+const PI_LOG_CAPACITY = 500;
+window.piLogBuffer = window.piLogBuffer || { id: Date.now(), seq: 0, entries: [] };
+
+function pushPiLog(level, message, data = null, source = 'app') {
+    const buffer = window.piLogBuffer;
+    buffer.entries.push({ seq: ++buffer.seq, time: Date.now(), level, message, data, source });
+    if (buffer.entries.length > PI_LOG_CAPACITY) {
+        buffer.entries.splice(0, buffer.entries.length - PI_LOG_CAPACITY);
+    }
+}
+
+// 返回序號大於 after 的日誌（最多 limit 筆）；oldest 讓後端得知緩衝溢出時遺失了幾筆
+window.piDrainLogs = function (after, limit) {
+    const entries = window.piLogBuffer.entries;
+    let start = entries.length;
+    while (start > 0 && entries[start - 1].seq > after) start--;
+    return {
+        id: window.piLogBuffer.id,
+        seq: window.piLogBuffer.seq,
+        oldest: entries.length ? entries[0].seq : window.piLogBuffer.seq + 1,
+        entries: entries.slice(start, start + limit)
+    };
+};
+
+function formatLogData(data) {
+    if (data === null || data === undefined || data === '') return null;
+    if (typeof data === 'string') return data;
+    if (data instanceof Error) return data.stack || data.message;
     try {
-        // 確保在HTML文檔載入後才操作DOM
-        if (document.readyState === 'loading') {
-            document.addEventListener('DOMContentLoaded', () => logToBackend(level, message, data));
-            return;
-        }
+        return JSON.stringify(data, null, 2).substring(0, 500);
+    } catch (e) {
+        return String(data);
+    }
+}
 
-        // 創建或更新隱藏的日誌元素供後端讀取
-        let logElement = document.getElementById('frontend-log-bridge');
-        if (!logElement) {
-            logElement = document.createElement('div');
-            logElement.id = 'frontend-log-bridge';
-            logElement.style.cssText = 'display: none !important; position: absolute; left: -9999px;';
-            document.body.appendChild(logElement);
-            console.log('🔧 [日誌橋接] 創建日誌橋接元素');
+// 瀏覽器的警告、錯誤與未捕捉的例外也送到後端
+['warn', 'error'].forEach(method => {
+    const original = console[method].bind(console);
+    console[method] = (...args) => {
+        original(...args);
+        try {
+            const [first, ...rest] = args;
+            pushPiLog(method === 'warn' ? 'WARN' : 'ERROR', String(first),
+                rest.length ? rest.map(formatLogData).join(' ') : null, 'console');
+        } catch (e) {
+            // 日誌失敗不影響頁面
         }
+    };
+});
+window.addEventListener('error', (event) => {
+    pushPiLog('ERROR', `未捕捉的錯誤: ${event.message}`,
+        `${event.filename || ''}:${event.lineno || 0}`, 'runtime');
+});
+window.addEventListener('unhandledrejection', (event) => {
+    pushPiLog('ERROR', '未處理的 Promise 拒絕', formatLogData(event.reason), 'runtime');
+});
 
-        const timestamp = new Date().toISOString();
-        const logEntry = {
-            timestamp,
-            level,
-            message,
-            data: data ? (typeof data === 'string' ? data : JSON.stringify(data, null, 2).substring(0, 500)) : null
-        };
-
-        // 保存最新的日誌條目供後端讀取
-        logElement.textContent = JSON.stringify(logEntry);
-        logElement.setAttribute('data-timestamp', timestamp);
-        logElement.setAttribute('data-level', level);
+// 🔧 日誌橋接函數：將前端日誌發送到後端日誌系統
+function logToBackend(level, message, data = null) {
+    try {
+        pushPiLog(level, message, formatLogData(data));
 
         // 同時在瀏覽器console中顯示
         console.log(`🔗 [日誌橋接-${level}] ${message}`, data || '');
-
     } catch (error) {
         console.error('❌ 日誌橋接失敗:', error);
     }
@@ -760,6 +801,7 @@ window.addEventListener('piStoryReady', (event) => {
             // 🔧 修復：現在切換到結果狀態，因為故事已準備完成
             setState('result');
             console.log('✅ 故事已準備完成，切換到結果頁面');
+            window.piSignal('storyConsumed', { city: storyData.city || '' });
 
             // 🔧 縮短延遲，立即開始統一的地圖初始化
             setTimeout(() => {
@@ -850,6 +892,7 @@ window.addEventListener('piStoryReady', (event) => {
                 flag: storyData.countryCode ? `https://flagcdn.com/96x72/${storyData.countryCode.toLowerCase()}.png` : ''
             };
             updateResultData(resultData);
+            window.piSignal('storyConsumed', { city: storyData.city || '', error: error.message });
 
             // 🔧 恢復：錯誤情況下也嘗試更新Firebase記錄
             if (storyData.story || storyData.greeting) {
@@ -1361,6 +1404,7 @@ window.addEventListener('firebaseReady', async (event) => {
 
             setUserNameButton.textContent = '載入完成';
             console.log('✅ 使用者資料載入完成:', rawUserDisplayName);
+            window.piSignal('userLoaded', { user: rawUserDisplayName });
 
             setTimeout(() => {
                 if (setUserNameButton) {
@@ -1492,15 +1536,30 @@ window.addEventListener('firebaseReady', async (event) => {
                 requestBody.useLocalPosition = false;
             }
 
-            response = await fetch('/api/find-city-geonames', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(requestBody)
-            });
+            // 🚀 樹莓派已預取同一分鐘的城市（故事與語音已在準備中），直接使用
+            const preselected = window.piPreselectedCity;
+            window.piPreselectedCity = null;
+            const currentMinuteKey = `${userLocalDate.getFullYear()}-${String(userLocalDate.getMonth() + 1).padStart(2, '0')}-${String(userLocalDate.getDate()).padStart(2, '0')}T${String(userLocalDate.getHours()).padStart(2, '0')}:${String(userLocalDate.getMinutes()).padStart(2, '0')}`;
 
-            console.log('📡 API 回應狀態:', response.status);
-            const data = await response.json();
-            console.log('📡 API 回應資料:', data);
+            let data;
+            if (preselected && preselected.city && preselected.minuteKey === currentMinuteKey) {
+                console.log('🚀 使用樹莓派預取的城市:', preselected.city);
+                data = { success: true, city: preselected.city };
+            } else {
+                if (preselected) {
+                    console.log('⚠️ 預取城市已過期，改為呼叫 API:', preselected.minuteKey, currentMinuteKey);
+                }
+
+                response = await fetch('/api/find-city-geonames', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(requestBody)
+                });
+
+                console.log('📡 API 回應狀態:', response.status);
+                data = await response.json();
+                console.log('📡 API 回應資料:', data);
+            }
 
             if (data.success && data.city) {
                 console.log('🎉 API 成功回應，準備處理城市資料:', data.city);
@@ -1511,6 +1570,11 @@ window.addEventListener('firebaseReady', async (event) => {
                     timezone: data.city.timezone?.timeZoneId || data.city.timezone || 'UTC'
                 };
                 console.log('🔗 已設定 window.currentCityData 供後端提取:', window.currentCityData);
+                window.piSignal('cityResolved', {
+                    city: data.city.name || data.city.city || '',
+                    country: data.city.country || '',
+                    preselected: !!(preselected && preselected.city && preselected.minuteKey === currentMinuteKey)
+                });
 
                 // 🔧 數據上傳已移至後端 audio_manager，前端僅負責顯示
                 console.log('📊 Firebase 上傳已由後端 audio_manager 處理，前端等待故事內容');
@@ -1537,6 +1601,7 @@ window.addEventListener('firebaseReady', async (event) => {
             });
             setState('error', error.message || '發生未知錯誤');
             updateConnectionStatus(false);
+            window.piSignal('dayFailed', { error: error.message || '發生未知錯誤' });
 
             // 延長等待時間到10秒，讓用戶有時間看到錯誤
             setTimeout(() => {
@@ -2935,11 +3000,13 @@ window.addEventListener('firebaseReady', async (event) => {
         window.startTheDay = startTheDay;
         window.setState = setState;
         console.log('✅ 全域函數已設定');
+        window.piSignal('appReady', { user: rawUserDisplayName });
 
     } catch (error) {
         console.error('❌ Firebase 認證失敗:', error);
         updateConnectionStatus(false);
         setState('error', 'Firebase 初始化失敗');
+        window.piSignal('appFailed', { error: error.message });
     }
 
     console.log('🎉 Raspberry Pi 甦醒地圖初始化完成');
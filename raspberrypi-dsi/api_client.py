@@ -6,10 +6,13 @@ WakeUpMap - API客戶端模組 (DSI版本)
 
 import requests
 import json
+import time
 import logging
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any
-from config import API_ENDPOINTS, API_CONFIG
+from config import API_ENDPOINTS, API_CONFIG, CITY_INDEX_CONFIG
+from http_transport import get_http_session
+from city_index import is_local_time_window, target_latitude_from_minutes
 
 logger = logging.getLogger(__name__)
 
@@ -17,13 +20,8 @@ class APIClient:
     """API客戶端：與甦醒地圖後端通信"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'RaspberryPi-WakeUpMap-DSI/1.0',
-            'Accept': 'application/json',
-            'Content-Type': 'application/json'
-        })
-        self.session.timeout = API_CONFIG['timeout']
+        # 共用連線池（User-Agent 與逾時設定見 HTTP_CONFIG）
+        self.session = get_http_session()
     
     def calculate_target_latitude_from_time(self):
         """基於時間分鐘數計算目標緯度"""
@@ -32,13 +30,13 @@ class APIClient:
         minutes = now.minute
         
         # 檢查是否在7:50-8:10特例時間段
-        if (hours == 7 and minutes >= 50) or (hours == 8 and minutes <= 10):
+        if is_local_time_window(hours, minutes):
             logger.info(f"時間: {hours}:{minutes:02d} -> 特例時間段，將使用用戶當地位置")
             return 'local'  # 返回特殊標記，表示使用用戶當地位置
         
         # 修正後的線性映射：避免極地問題
         # 0分=北緯70度，30分≈赤道0度，59分=南緯70度
-        target_latitude = 70 - (minutes * 140 / 59)
+        target_latitude = target_latitude_from_minutes(minutes)
         
         logger.debug(f"時間: {hours}:{minutes:02d} -> 目標緯度: {target_latitude:.2f}度 (避免極地)")
         return target_latitude
@@ -83,42 +81,135 @@ class APIClient:
             logger.error(f"IP地理定位失敗: {e}")
             return None
     
+    def _build_city_search_params(self) -> Dict[str, Any]:
+        """計算城市搜尋參數（與 find-city API 的請求參數相同）"""
+        target_latitude = self.calculate_target_latitude_from_time()
+        utc_offset = self.get_current_utc_offset()
+        
+        # 準備API請求參數
+        params = {
+            'targetUTCOffset': utc_offset,
+            'latitudePreference': 'any',
+            'userLocalTime': datetime.now().isoformat()
+        }
+        
+        # 檢查是否為特例時間段
+        if target_latitude == 'local':
+            logger.info("特例時間段 (7:50-8:10)，正在獲取用戶地理位置...")
+            
+            # 獲取用戶位置
+            user_location = self.get_user_location_by_ip()
+            if user_location:
+                params['useLocalPosition'] = True
+                params['userLatitude'] = user_location['latitude']
+                params['userLongitude'] = user_location['longitude']
+                logger.info(f"使用用戶位置: {user_location['latitude']:.4f}, {user_location['longitude']:.4f}")
+            else:
+                logger.warning("無法獲取用戶位置，使用備用方案")
+                params['targetLatitude'] = 0  # 赤道附近
+                params['useLocalPosition'] = False
+        else:
+            # 正常時間段：使用計算的緯度
+            params['targetLatitude'] = target_latitude
+            params['useLocalPosition'] = False
+        
+        return params
+    
     def find_matching_city(self):
+        """尋找匹配城市（優先使用本機城市索引，API 作為備用）"""
+        try:
+            params = self._build_city_search_params()
+        except Exception as e:
+            logger.error(f"計算城市搜尋參數失敗: {e}")
+            return None
+        
+        if CITY_INDEX_CONFIG['enabled']:
+            data = self._find_city_locally(params)
+            if data is not None:
+                return self._parse_city_response(data)
+            
+            if not CITY_INDEX_CONFIG['http_fallback']:
+                logger.warning("本機城市索引不可用且已停用 API 備用，使用備用城市資料")
+                return self._get_fallback_city()
+            
+            logger.warning("本機城市索引不可用，改用 API 尋找城市")
+        
+        return self._find_city_via_api(params)
+    
+    def _find_city_locally(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """使用本機城市索引尋找城市，返回與 API 相同結構的回應；索引不可用時返回 None"""
+        try:
+            from city_index import get_city_index
+            
+            index = get_city_index()
+            if index is None:
+                return None
+            
+            start_time = time.perf_counter()
+            data = index.find_city(
+                target_offset=params.get('targetUTCOffset'),
+                target_latitude=params.get('targetLatitude'),
+                latitude_preference=params.get('latitudePreference', 'any'),
+                use_local_position=params.get('useLocalPosition', False),
+                user_latitude=params.get('userLatitude'),
+                user_longitude=params.get('userLongitude')
+            )
+            logger.info(f"本機城市索引搜尋完成 (耗時: {(time.perf_counter() - start_time) * 1000:.2f}ms)")
+            return data
+            
+        except Exception as e:
+            logger.error(f"本機城市索引搜尋失敗: {e}")
+            return None
+    
+    def _parse_city_response(self, data: Dict[str, Any]):
+        """解析 find-city 回應（API 或本機索引）為統一的城市資料格式"""
+        # 檢查是否有城市資料 - 修復 API 回應結構解析
+        if data.get('success') and data.get('city'):
+            city_data = data['city']  # 正確獲取城市資料物件
+            # 統一城市資料格式
+            result = {
+                'city': city_data.get('name') or city_data.get('city'),
+                'city_zh': city_data.get('name_zh') or city_data.get('city_zh') or city_data.get('name') or city_data.get('city'),
+                'country': city_data.get('country') or city_data.get('countryName'),
+                'country_zh': city_data.get('country_zh') or city_data.get('countryName_zh') or city_data.get('country'),
+                'country_code': city_data.get('country_iso_code') or city_data.get('country_code'),
+                'latitude': city_data.get('latitude') or city_data.get('lat') or 0,
+                'longitude': city_data.get('longitude') or city_data.get('lng') or 0,
+                'timezone': city_data.get('timezone', {}).get('timeZoneId') if isinstance(city_data.get('timezone'), dict) else city_data.get('timezone'),
+                'local_time': self._format_local_time(city_data),
+                'population': city_data.get('population'),
+                'source': city_data.get('source', 'api')
+            }
+            
+            logger.info(f"找到匹配城市: {result['city']}, {result['country']}")
+            return result
+        
+        elif data.get('isUniverseCase'):
+            # 宇宙模式
+            logger.info("觸發宇宙模式")
+            return {
+                'city': '宇宙',
+                'city_zh': '宇宙',
+                'country': '銀河系',
+                'country_zh': '銀河系',
+                'country_code': 'UNIVERSE',
+                'latitude': 0,
+                'longitude': 0,
+                'timezone': 'UTC',
+                'local_time': datetime.now().strftime('%H:%M:%S'),
+                'population': float('inf'),
+                'source': 'universe'
+            }
+        
+        else:
+            logger.warning("API回應中沒有找到匹配的城市")
+            return None
+    
+    def _find_city_via_api(self, params: Dict[str, Any]):
         """呼叫城市匹配API"""
         retries = 0
         while retries < API_CONFIG['max_retries']:
             try:
-                # 計算參數
-                target_latitude = self.calculate_target_latitude_from_time()
-                utc_offset = self.get_current_utc_offset()
-                
-                # 準備API請求參數
-                params = {
-                    'targetUTCOffset': utc_offset,
-                    'latitudePreference': 'any',
-                    'userLocalTime': datetime.now().isoformat()
-                }
-                
-                # 檢查是否為特例時間段
-                if target_latitude == 'local':
-                    logger.info("特例時間段 (7:50-8:10)，正在獲取用戶地理位置...")
-                    
-                    # 獲取用戶位置
-                    user_location = self.get_user_location_by_ip()
-                    if user_location:
-                        params['useLocalPosition'] = True
-                        params['userLatitude'] = user_location['latitude']
-                        params['userLongitude'] = user_location['longitude']
-                        logger.info(f"使用用戶位置: {user_location['latitude']:.4f}, {user_location['longitude']:.4f}")
-                    else:
-                        logger.warning("無法獲取用戶位置，使用備用方案")
-                        params['targetLatitude'] = 0  # 赤道附近
-                        params['useLocalPosition'] = False
-                else:
-                    # 正常時間段：使用計算的緯度
-                    params['targetLatitude'] = target_latitude
-                    params['useLocalPosition'] = False
-                
                 logger.info(f"正在尋找匹配城市，參數: {params}")
                 
                 # 發送API請求
@@ -129,55 +220,12 @@ class APIClient:
                 )
                 
                 response.raise_for_status()
-                data = response.json()
-                
-                # 檢查是否有城市資料 - 修復 API 回應結構解析
-                if data.get('success') and data.get('city'):
-                    city_data = data['city']  # 正確獲取城市資料物件
-                    # 統一城市資料格式
-                    result = {
-                        'city': city_data.get('name') or city_data.get('city'),
-                        'city_zh': city_data.get('name_zh') or city_data.get('city_zh') or city_data.get('name') or city_data.get('city'),
-                        'country': city_data.get('country') or city_data.get('countryName'),
-                        'country_zh': city_data.get('country_zh') or city_data.get('countryName_zh') or city_data.get('country'),
-                        'country_code': city_data.get('country_iso_code') or city_data.get('country_code'),
-                        'latitude': city_data.get('latitude') or city_data.get('lat') or 0,
-                        'longitude': city_data.get('longitude') or city_data.get('lng') or 0,
-                        'timezone': city_data.get('timezone', {}).get('timeZoneId') if isinstance(city_data.get('timezone'), dict) else city_data.get('timezone'),
-                        'local_time': self._format_local_time(city_data),
-                        'population': city_data.get('population'),
-                        'source': city_data.get('source', 'api')
-                    }
-                    
-                    logger.info(f"找到匹配城市: {result['city']}, {result['country']}")
-                    return result
-                
-                elif data.get('isUniverseCase'):
-                    # 宇宙模式
-                    logger.info("觸發宇宙模式")
-                    return {
-                        'city': '宇宙',
-                        'city_zh': '宇宙',
-                        'country': '銀河系',
-                        'country_zh': '銀河系',
-                        'country_code': 'UNIVERSE',
-                        'latitude': 0,
-                        'longitude': 0,
-                        'timezone': 'UTC',
-                        'local_time': datetime.now().strftime('%H:%M:%S'),
-                        'population': float('inf'),
-                        'source': 'universe'
-                    }
-                
-                else:
-                    logger.warning("API回應中沒有找到匹配的城市")
-                    return None
+                return self._parse_city_response(response.json())
                     
             except requests.exceptions.Timeout:
                 retries += 1
                 logger.warning(f"API請求超時，重試 {retries}/{API_CONFIG['max_retries']}")
                 if retries < API_CONFIG['max_retries']:
-                    import time
                     time.sleep(API_CONFIG['retry_delay'])
                 continue
                 
@@ -185,7 +233,6 @@ class APIClient:
                 retries += 1
                 logger.error(f"API請求失敗: {e}，重試 {retries}/{API_CONFIG['max_retries']}")
                 if retries < API_CONFIG['max_retries']:
-                    import time
                     time.sleep(API_CONFIG['retry_delay'])
                 continue
                 
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+前端靜態資源本機鏡像
+由本機磁碟提供 pi.html、pi-script.js、pi-style.css 等文件，開機後不必再從網路下載；/api/* 轉發到 API_BASE_URL
+
+頁面中的本機資源網址加上內容版本號（pi-script.js?v=<雜湊>），帶版本號的請求可長期快取，
+文件更新後版本號改變，瀏覽器自然取得新內容；頁面本身每次以 ETag 重新驗證。
+/api/config（頁面開頭同步載入的 Firebase 配置）先返回上次成功的內容，再於背景向伺服器更新。
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from config import BROWSER_CONFIG, API_BASE_URL, API_CONFIG
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.json': 'application/json; charset=utf-8',
+    '.png': 'image/png',
+    '.ico': 'image/x-icon',
+    '.svg': 'image/svg+xml',
+}
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+CONFIG_PATH = '/api/config'
+
+# 頁面中指向同目錄文件的 src/href（不含 / 與 :，即不是絕對路徑或外部網址）
+_LOCAL_REF = re.compile(r'''(\b(?:src|href)=["'])([\w.-]+\.(?:js|css|png|ico|svg|json))(["'])''')
+
+# 轉發 /api/* 時帶上的請求標頭（/api/config 依 User-Agent 與 Accept 決定返回 JavaScript 或 JSON）
+_FORWARD_HEADERS = ('Content-Type', 'Accept', 'User-Agent', 'Accept-Language')
+
+
+class AssetMirror:
+    """本機靜態資源鏡像（背景執行緒中的 HTTP 伺服器）"""
+
+    def __init__(self, root: str = None, api_base: str = None, host: str = None, port: int = None,
+                 cache_dir: str = None, http: Callable[[], Any] = None):
+        """
+        Args:
+            root: 靜態文件目錄（只提供此目錄下一層、已知類型的文件）
+            api_base: /api/* 轉發的目的地
+            host: 頁面網址使用的主機名稱（伺服器只監聽 127.0.0.1）
+            port: 埠號，0 表示自動選擇
+            cache_dir: 保存上次成功的 /api/config
+            http: 返回 HTTP 連線的函數，預設為 get_http_session
+        """
+        self.logger = logging.getLogger(__name__)
+        self.root = Path(root or BROWSER_CONFIG['mirror_root'])
+        self.api_base = (api_base or API_BASE_URL).rstrip('/')
+        self.host = host or BROWSER_CONFIG['mirror_host']
+        self.port = BROWSER_CONFIG['mirror_port'] if port is None else port
+        self.cache_dir = Path(cache_dir or BROWSER_CONFIG['mirror_cache_dir'])
+        self._http = http
+        self._versions: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._lock = threading.Lock()
+        self._config_refreshing = False
+        self._server = None
+        self._thread = None
+        self.stats = {'static': 0, 'not_modified': 0, 'api': 0, 'api_errors': 0, 'config_cached': 0}
+
+    def page_url(self, page: str = 'pi.html') -> str:
+        return f"http://{self.host}:{self.port}/{page}"
+
+    def available(self, page: str = 'pi.html') -> bool:
+        return (self.root / page).is_file()
+
+    def start(self) -> bool:
+        """啟動伺服器（埠號被占用時記錄錯誤並返回 False）"""
+        if self._server:
+            return True
+        handler = type('MirrorHandler', (_MirrorHandler,), {'mirror': self})
+        try:
+            self._server = ThreadingHTTPServer(('127.0.0.1', self.port), handler)
+        except OSError as e:
+            self.logger.error(f"🗂️ [鏡像] 無法啟動本機鏡像 127.0.0.1:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='asset-mirror', daemon=True)
+        self._thread.start()
+        self.logger.info(f"🗂️ [鏡像] 本機鏡像已啟動: {self.page_url()}（{self.root}）")
+        return True
+
+    def stop(self):
+        if not self._server:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5)
+        self._server = None
+        self._thread = None
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    # ------------------------------------------------------------------
+    # 靜態文件
+    # ------------------------------------------------------------------
+
+    def resolve(self, name: str) -> Optional[Path]:
+        """請求路徑對應的文件；不在根目錄下一層、隱藏文件或未知類型時返回 None"""
+        if not name or '/' in name or '\\' in name or name.startswith('.'):
+            return None
+        path = self.root / name
+        if path.suffix.lower() not in CONTENT_TYPES or not path.is_file():
+            return None
+        return path
+
+    def version(self, path: Path) -> str:
+        """文件內容的版本號（依修改時間與大小快取，文件改變時重新計算）"""
+        stat = path.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._versions.get(path.name)
+            if cached and cached[0] == key:
+                return cached[1]
+        digest = hashlib.sha1(path.read_bytes()).hexdigest()[:12]
+        with self._lock:
+            self._versions[path.name] = (key, digest)
+        return digest
+
+    def render_page(self, path: Path) -> bytes:
+        """頁面中的本機資源網址加上版本號"""
+        def add_version(match):
+            asset = self.resolve(match.group(2))
+            if asset is None:
+                return match.group(0)
+            return f"{match.group(1)}{match.group(2)}?v={self.version(asset)}{match.group(3)}"
+        return _LOCAL_REF.sub(add_version, path.read_text(encoding='utf-8')).encode('utf-8')
+
+    def static(self, name: str, query: str) -> Optional[Tuple[bytes, str, str, str]]:
+        """
+        Returns:
+            tuple: (內容, Content-Type, Cache-Control, ETag)；沒有此文件時返回 None
+        """
+        path = self.resolve(name)
+        if path is None:
+            return None
+        content_type = CONTENT_TYPES[path.suffix.lower()]
+        if path.suffix.lower() == '.html':
+            body = self.render_page(path)
+            return body, content_type, REVALIDATE, f'"{hashlib.sha1(body).hexdigest()[:12]}"'
+        version = self.version(path)
+        cache_control = IMMUTABLE if f'v={version}' in query.split('&') else REVALIDATE
+        return path.read_bytes(), content_type, cache_control, f'"{version}"'
+
+    # ------------------------------------------------------------------
+    # /api/* 轉發
+    # ------------------------------------------------------------------
+
+    def _session(self):
+        if self._http is None:
+            from http_transport import get_http_session
+            self._http = get_http_session
+        return self._http()
+
+    def _config_file(self) -> Path:
+        return self.cache_dir / 'api-config.js'
+
+    def forward(self, method: str, path: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, bytes, str]:
+        """轉發到 API 伺服器，返回 (狀態碼, 內容, Content-Type)"""
+        self._count('api')
+        try:
+            response = self._session().request(method, self.api_base + path, data=body or None, headers=headers,
+                                               timeout=API_CONFIG['timeout'])
+            return (response.status_code, response.content,
+                    response.headers.get('Content-Type', 'application/octet-stream'))
+        except Exception as e:
+            self._count('api_errors')
+            self.logger.warning(f"🗂️ [鏡像] 轉發 {method} {path} 失敗: {e}")
+            return 502, json.dumps({'error': str(e)}).encode('utf-8'), 'application/json'
+
+    def api_config(self, path: str, headers: Dict[str, str]) -> Tuple[int, bytes, str]:
+        """/api/config：有上次成功的內容時立即返回並在背景更新，否則同步轉發並保存"""
+        try:
+            cached = self._config_file().read_bytes()
+        except OSError:
+            return self._refresh_config(path, headers)
+        self._count('config_cached')
+        with self._lock:
+            refresh, self._config_refreshing = not self._config_refreshing, True
+        if refresh:
+            threading.Thread(target=self._refresh_config, args=(path, headers),
+                             name='asset-mirror-config', daemon=True).start()
+        return 200, cached, CONTENT_TYPES['.js']
+
+    def _refresh_config(self, path: str, headers: Dict[str, str]) -> Tuple[int, bytes, str]:
+        status, body, content_type = self.forward('GET', path, b'', headers)
+        if status == 200 and 'javascript' in content_type:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                temp = self._config_file().with_suffix('.tmp')
+                temp.write_bytes(body)
+                os.replace(temp, self._config_file())
+            except OSError as e:
+                self.logger.warning(f"🗂️ [鏡像] 無法保存 /api/config: {e}")
+        with self._lock:
+            self._config_refreshing = False
+        return status, body, content_type
+
+
+class _MirrorHandler(BaseHTTPRequestHandler):
+    mirror: AssetMirror = None
+    protocol_version = 'HTTP/1.1'  # keep-alive，頁面的多個資源共用連線
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        if path.startswith('/api/'):
+            self._api('GET')
+            return
+        result = self.mirror.static(path.lstrip('/') or 'pi.html', query)
+        if result is None:
+            self._send(404, b'not found', 'text/plain; charset=utf-8')
+            return
+        body, content_type, cache_control, etag = result
+        if self.headers.get('If-None-Match') == etag:
+            self.mirror._count('not_modified')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.mirror._count('static')
+        self._send(200, body, content_type, {'Cache-Control': cache_control, 'ETag': etag})
+
+    def do_POST(self):
+        if not self.path.startswith('/api/'):
+            self._send(404, b'not found', 'text/plain; charset=utf-8')
+            return
+        self._api('POST')
+
+    def _api(self, method: str):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        headers = {name: self.headers[name] for name in _FORWARD_HEADERS if self.headers.get(name)}
+        if method == 'GET' and self.path.partition('?')[0] == CONFIG_PATH:
+            status, content, content_type = self.mirror.api_config(self.path, headers)
+        else:
+            status, content, content_type = self.mirror.forward(method, self.path, body, headers)
+        self._send(status, content, content_type, {'Cache-Control': 'no-store'})
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"🗂️ [鏡像] {self.address_string()} {format % args}")
+
+
+# 測試程式：python3 asset_mirror.py，啟動鏡像並列出頁面引用的資源版本
+if __name__ == "__main__":
+    import time
+    from urllib.request import urlopen
+
+    logging.basicConfig(level=logging.INFO)
+
+    mirror = AssetMirror(port=0)
+    if not mirror.available():
+        print(f"❌ 找不到 {mirror.root / 'pi.html'}")
+    elif mirror.start():
+        start_time = time.perf_counter()
+        page = urlopen(mirror.page_url()).read().decode('utf-8')
+        print(f"📄 pi.html {len(page)} 字元，{(time.perf_counter() - start_time) * 1000:.1f} ms")
+        for match in re.finditer(r'(?:src|href)="([\w.-]+\?v=\w+)"', page):
+            print(f"   {match.group(1)}")
+        mirror.stop()
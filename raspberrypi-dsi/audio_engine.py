@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 常駐音頻引擎
+單一執行緒持有輸出設備，以佇列接收音頻片段（文件、記憶體中的音頻、PCM 串流），
+播放中預先載入下一段並以 pygame Channel.queue 無縫銜接，每段以 Future 通知完成；
+在 PlaybackSession 中排入的片段可一起取消（新的按鈕中斷上一次的故事）
+"""
+
+import io
+import sys
+import time
+import wave
+import queue
+import logging
+import threading
+import subprocess
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional, Dict, Any, Union, Iterable, List
+
+from config import AUDIO_CONFIG, AUDIO_ENGINE_CONFIG, TTS_CONFIG
+from tracing import current_trace
+
+try:
+    import pygame
+    PYGAME_AVAILABLE = True
+except ImportError:
+    PYGAME_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 沒有 pygame 時的播放器指令：文件路徑接在最後，'-' 表示從標準輸入讀取
+PLAYER_COMMANDS = {
+    'wav': ['aplay', '-q'],
+    'mp3': ['mpg123', '-q'],
+    'pcm': ['aplay', '-q', '-t', 'raw', '-f', 'S16_LE', '-c', '1', '-r', '{rate}'],
+}
+
+# 目前的播放工作階段（隨管線階段的 context 進入執行緒池）
+_current_session = contextvars.ContextVar('playback_session', default=None)
+
+
+def estimate_duration(audio_file: Union[str, Path]) -> float:
+    """
+    估計音頻文件長度（秒），作為等待播放完成的上限
+
+    WAV 讀取標頭；MP3 以 mp3_min_bitrate 估計（寧可估長），無法讀取時為 0
+    """
+    path = Path(audio_file)
+    try:
+        if path.suffix.lower() == '.wav':
+            with wave.open(str(path), 'rb') as wav:
+                return wav.getnframes() / float(wav.getframerate())
+        return path.stat().st_size * 8 / AUDIO_ENGINE_CONFIG['mp3_min_bitrate']
+    except (OSError, EOFError, ZeroDivisionError, wave.Error):
+        return 0.0
+
+
+class _Clip:
+    """佇列中的一個音頻片段"""
+
+    def __init__(self, kind: str, source, audio_format: Optional[str], sample_rate: int):
+        self.kind = kind                # file / bytes / pcm
+        self.source = source
+        self.audio_format = audio_format
+        self.sample_rate = sample_rate
+        self.future = Future()
+        self.segments = deque()         # 已解碼、等待播放的 Sound
+        self.loaded = False             # 所有片段都已解碼（或載入失敗）
+        self.feeding = False            # PCM 串流的解碼執行緒已啟動
+        self.playing = 0                # 在 Channel 上播放或排隊中的片段數
+        self.started = False
+        self.counted = False            # 已計入取消統計
+        self.queued_at = time.perf_counter()
+        self.trace = current_trace()    # 加入佇列時的按鈕追蹤，開始播放時記錄第一個音頻樣本
+
+
+class PlaybackSession:
+    """
+    一次按鈕的播放
+
+    在 activate() 之中（包括帶著此 context 的管線階段）排入引擎的片段都記在這裡；
+    cancel() 停止這些片段，之後再排入的片段直接返回已取消的 Future。
+    """
+
+    def __init__(self, engine: 'AudioEngine'):
+        self.engine = engine
+        self.cancelled = False
+        self._futures = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self):
+        token = _current_session.set(self)
+        try:
+            yield self
+        finally:
+            _current_session.reset(token)
+
+    def _track(self, future: Future) -> bool:
+        """記錄片段；工作階段已取消時返回 False"""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(future)
+            return True
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            futures, self._futures = self._futures, []
+        for future in futures:
+            if not future.done():
+                self.engine.cancel(future)
+
+
+class AudioEngine:
+    """常駐音頻引擎"""
+
+    def __init__(self, backend: str = None, commands: Dict[str, list] = None):
+        """
+        Args:
+            backend: 'pygame'、'subprocess' 或 'auto'（有 pygame 時使用 pygame）
+            commands: subprocess 模式的播放器指令（預設為 PLAYER_COMMANDS）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.backend = backend or AUDIO_ENGINE_CONFIG['backend']
+        self.commands = commands or PLAYER_COMMANDS
+        self.stats = {'clips': 0, 'completed': 0, 'cancelled': 0, 'failed': 0,
+                      'dispatched': 0, 'dispatch_ms_total': 0.0, 'dispatch_ms_max': 0.0, 'underruns': 0}
+
+        self._commands = queue.Queue()
+        self._pending = deque()       # 等待播放的片段
+        self._playing = []            # [(片段, Sound, 預計結束時間)]，最多兩個（播放中 + 排隊）
+        self._preloaded: Dict[Path, Any] = {}
+        self._channel = None
+        self._process = None
+        self._current = None
+        self._process_lock = threading.Lock()
+        self._thread = None
+        self._ready = threading.Event()
+        self._running = False
+
+    @property
+    def gapless(self) -> bool:
+        """是否支援無縫銜接與預先載入"""
+        return self.backend == 'pygame'
+
+    def start(self) -> bool:
+        """啟動引擎執行緒並等待輸出設備就緒"""
+        if self._thread and self._thread.is_alive():
+            return True
+
+        if self.backend == 'auto':
+            self.backend = 'pygame' if PYGAME_AVAILABLE else 'subprocess'
+
+        self._running = True
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name='audio-engine', daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=10)
+        self.logger.info(f"🔊 音頻引擎已啟動 ({self.backend})")
+        return self._running
+
+    def stop(self):
+        """停止播放並結束引擎執行緒"""
+        if not self._thread:
+            return
+        self.cancel()
+        self._running = False
+        self._commands.put(('stop', None))
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def play(self, source: Union[str, Path, bytes, Iterable[bytes]], audio_format: str = None,
+             sample_rate: int = None) -> Future:
+        """
+        加入播放佇列
+
+        Args:
+            source: 音頻文件路徑、記憶體中的 WAV/MP3 內容，或 16-bit 單聲道 PCM 區塊的迭代器
+            audio_format: 記憶體內容的格式（wav / mp3），文件依副檔名判斷
+            sample_rate: PCM 串流的採樣率（預設為 OpenAI TTS 的 24kHz）
+
+        Returns:
+            Future: 播放完成時結果為 True，失敗為 False；被取消時為 cancelled
+        """
+        if isinstance(source, (str, Path)):
+            source = Path(source)
+            clip = _Clip('file', source, audio_format or source.suffix[1:].lower(), 0)
+        elif isinstance(source, (bytes, bytearray)):
+            clip = _Clip('bytes', bytes(source), audio_format or 'wav', 0)
+        else:
+            clip = _Clip('pcm', source, 'pcm', sample_rate or TTS_CONFIG['openai_pcm_sample_rate'])
+
+        self.stats['clips'] += 1
+        session = _current_session.get()
+        if session is not None and not session._track(clip.future):
+            clip.future.cancel()
+            self.stats['cancelled'] += 1
+            return clip.future
+        if not self._running:
+            clip.future.set_result(False)
+            return clip.future
+        self._commands.put(('play', clip))
+        return clip.future
+
+    def wait(self, futures: List[Future], duration: float, margin: float = None) -> bool:
+        """
+        等待片段播放完成，最多等待片段長度加上 margin（播放器卡住時不會永遠等下去）
+
+        Args:
+            futures: play() 返回的 Future
+            duration: 片段總長度（秒，見 estimate_duration）
+            margin: 額外等待的秒數，預設為 AUDIO_ENGINE_CONFIG['wait_margin']
+
+        Returns:
+            bool: 全部播放成功
+
+        Raises:
+            CancelledError: 片段被取消（例如新的按鈕中斷）
+            TimeoutError: 逾時；這些片段已被取消並停止輸出
+        """
+        margin = AUDIO_ENGINE_CONFIG['wait_margin'] if margin is None else margin
+        deadline = time.monotonic() + duration + margin
+        try:
+            return all(future.result(timeout=max(0.0, deadline - time.monotonic())) for future in futures)
+        except FutureTimeoutError:
+            self.logger.error(f"⏰ 音頻播放逾時（預期 {duration:.1f} 秒），停止播放")
+            for future in futures:
+                if not future.done():
+                    future.cancel()
+                    self.cancel(future)
+            raise
+
+    def session(self) -> PlaybackSession:
+        """新的播放工作階段（以 activate() 指定之後排入的片段屬於它）"""
+        return PlaybackSession(self)
+
+    def preload(self, audio_file: Path) -> Future:
+        """預先解碼文件，之後播放同一文件時可立即開始（結果表示能否播放）"""
+        future = Future()
+        if self.gapless and self._running:
+            self._commands.put(('preload', (Path(audio_file), future)))
+        else:
+            future.set_result(Path(audio_file).exists())
+        return future
+
+    def cancel(self, future: Future = None):
+        """取消指定片段，未指定時取消所有片段"""
+        self._commands.put(('cancel', future))
+        if not self.gapless:
+            with self._process_lock:
+                if self._process and self._current and (future is None or self._current.future is future):
+                    self._current.future.cancel()
+                    self._process.kill()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """播放統計，包含平均與最大派送延遲（加入佇列到開始播放）"""
+        dispatched = max(1, self.stats['dispatched'])
+        return dict(self.stats, dispatch_ms_avg=self.stats['dispatch_ms_total'] / dispatched)
+
+    def _run(self):
+        if self.backend == 'pygame':
+            try:
+                self._init_pygame()
+            except Exception as e:
+                self.logger.warning(f"pygame 音頻初始化失敗，改用外部播放器: {e}")
+                self.backend = 'subprocess'
+        self._ready.set()
+
+        try:
+            if self.backend == 'pygame':
+                self._run_pygame()
+            else:
+                self._run_subprocess()
+        except Exception as e:
+            self.logger.error(f"音頻引擎停止: {e}")
+            self._running = False
+            self._cancel_all()
+
+    # ------------------------------------------------------------------
+    # pygame：單一 Channel，播放中的下一段以 Channel.queue 無縫銜接
+    # ------------------------------------------------------------------
+
+    def _init_pygame(self):
+        if not pygame.mixer.get_init():
+            pygame.mixer.pre_init(
+                frequency=AUDIO_CONFIG['sample_rate'],
+                size=-16,
+                channels=AUDIO_CONFIG['channels'],
+                buffer=AUDIO_ENGINE_CONFIG['buffer']
+            )
+            pygame.mixer.init()
+        pygame.mixer.set_reserved(1)
+        self._channel = pygame.mixer.Channel(0)
+
+    def _run_pygame(self):
+        while self._running:
+            try:
+                command = self._commands.get(timeout=self._wait_timeout())
+                while command:
+                    self._handle(command)
+                    command = self._commands.get_nowait()
+            except queue.Empty:
+                pass
+            if not self._running:
+                break
+
+            self._retire_finished()
+            self._drop_cancelled()
+            self._fill_channel()
+            self._preload_pending()
+
+        if self._channel:
+            self._channel.stop()
+        self._cancel_all()
+
+    def _wait_timeout(self) -> float:
+        """下一次需要檢查的時間：目前片段預計結束時"""
+        if self._playing:
+            return min(0.5, max(0.002, self._playing[0][2] - time.perf_counter()))
+        return 1.0
+
+    def _handle(self, command):
+        action, payload = command
+        if action == 'play':
+            self._pending.append(payload)
+        elif action == 'preload':
+            audio_file, future = payload
+            try:
+                self._preloaded[audio_file] = pygame.mixer.Sound(str(audio_file))
+                while len(self._preloaded) > AUDIO_ENGINE_CONFIG['preload_limit']:
+                    self._preloaded.pop(next(iter(self._preloaded)))
+                future.set_result(True)
+            except Exception as e:
+                self.logger.debug(f"預先載入失敗: {e}")
+                future.set_result(False)
+        elif action == 'cancel':
+            targets = [clip for clip in list(self._pending) + [entry[0] for entry in self._playing]
+                       if payload is None or clip.future is payload]
+            for clip in targets:
+                clip.future.cancel()
+        elif action == 'stop':
+            self._running = False
+
+    def _retire_finished(self):
+        """移除已播放完畢的片段"""
+        while self._playing:
+            clip, sound, _ = self._playing[0]
+            if self._channel.get_busy() and self._channel.get_sound() is sound:
+                break
+            self._playing.pop(0)
+            clip.playing -= 1
+            self._maybe_complete(clip)
+
+    def _drop_cancelled(self):
+        """移除被取消的片段；正在播放的被取消時停止 Channel，排隊中的未取消片段放回佇列"""
+        for clip in [clip for clip in self._pending if clip.future.cancelled()]:
+            self._pending.remove(clip)
+            self._count_cancelled(clip)
+
+        if self._playing and self._playing[0][0].future.cancelled():
+            self._channel.stop()
+            for clip, sound, _ in reversed(self._playing):
+                clip.playing -= 1
+                if clip.future.cancelled():
+                    self._count_cancelled(clip)
+                else:
+                    clip.segments.appendleft(sound)
+                    if clip not in self._pending:
+                        self._pending.appendleft(clip)
+            self._playing = []
+
+    def _count_cancelled(self, clip: _Clip):
+        if not clip.counted:
+            clip.counted = True
+            self.stats['cancelled'] += 1
+
+    def _fill_channel(self):
+        """Channel 空出位置時放入下一段（播放中時以 queue 無縫銜接）"""
+        while len(self._playing) < 2:
+            item = self._next_sound()
+            if not item:
+                return
+            clip, sound = item
+            now = time.perf_counter()
+            if not self._playing:
+                if clip.started:
+                    # 片段播放中途 Channel 已空（PCM 串流解碼跟不上播放），聽得到中斷
+                    self.stats['underruns'] += 1
+                self._channel.play(sound)
+                end_time = now + sound.get_length()
+            else:
+                self._channel.queue(sound)
+                end_time = self._playing[-1][2] + sound.get_length()
+
+            if not clip.started:
+                clip.started = True
+                self._record_dispatch(clip, now)
+            clip.playing += 1
+            self._playing.append((clip, sound, end_time))
+
+    def _next_sound(self):
+        while self._pending:
+            clip = self._pending[0]
+            if not clip.segments and not clip.loaded:
+                self._load(clip)
+            if clip.segments:
+                sound = clip.segments.popleft()
+                if clip.loaded and not clip.segments:
+                    self._pending.popleft()
+                return clip, sound
+            if not clip.loaded:
+                return None  # PCM 串流尚未解碼出下一段
+            self._pending.popleft()
+            self._maybe_complete(clip)
+        return None
+
+    def _preload_pending(self):
+        """播放中時先解碼佇列前面的片段"""
+        for clip in list(self._pending)[:AUDIO_ENGINE_CONFIG['preload_ahead']]:
+            if not clip.loaded and not clip.segments:
+                self._load(clip)
+
+    def _load(self, clip: _Clip):
+        if clip.kind == 'pcm':
+            if not clip.feeding:
+                clip.feeding = True
+                threading.Thread(target=self._feed_pcm, args=(clip,), name='audio-pcm', daemon=True).start()
+            return
+        try:
+            if clip.kind == 'file':
+                sound = self._preloaded.pop(clip.source, None) or pygame.mixer.Sound(str(clip.source))
+            else:
+                sound = pygame.mixer.Sound(file=io.BytesIO(clip.source))
+            clip.segments.append(sound)
+        except Exception as e:
+            self.logger.error(f"音頻載入失敗: {e}")
+        clip.loaded = True
+
+    def _feed_pcm(self, clip: _Clip):
+        """在背景將 PCM 串流切成固定長度的片段解碼，讓引擎依序排入 Channel"""
+        segment_bytes = int(clip.sample_rate * AUDIO_ENGINE_CONFIG['pcm_segment_seconds']) * 2
+        buffer = bytearray()
+        try:
+            for chunk in clip.source:
+                if clip.future.cancelled():
+                    break
+                buffer += chunk
+                while len(buffer) >= segment_bytes:
+                    clip.segments.append(self._pcm_sound(bytes(buffer[:segment_bytes]), clip.sample_rate))
+                    del buffer[:segment_bytes]
+                    self._commands.put(('wake', None))
+            if len(buffer) >= 2 and not clip.future.cancelled():
+                clip.segments.append(self._pcm_sound(bytes(buffer[:len(buffer) // 2 * 2]), clip.sample_rate))
+        except Exception as e:
+            self.logger.error(f"PCM 串流讀取失敗: {e}")
+        finally:
+            clip.loaded = True
+            self._commands.put(('wake', None))
+
+    def _pcm_sound(self, pcm: bytes, sample_rate: int):
+        """包裝成 WAV 交給 pygame 解碼（由 SDL 轉換到輸出設備的採樣率）"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(pcm)
+        buffer.seek(0)
+        return pygame.mixer.Sound(file=buffer)
+
+    def _record_dispatch(self, clip: _Clip, now: float):
+        """派送延遲：從加入佇列到交給輸出設備"""
+        dispatch_ms = (now - clip.queued_at) * 1000
+        self.stats['dispatched'] += 1
+        self.stats['dispatch_ms_total'] += dispatch_ms
+        self.stats['dispatch_ms_max'] = max(self.stats['dispatch_ms_max'], dispatch_ms)
+        if clip.trace:
+            clip.trace.event('audio.first_sample', once=True, backend=self.backend, dispatch_ms=round(dispatch_ms, 1))
+
+    def _maybe_complete(self, clip: _Clip):
+        if clip.loaded and not clip.segments and clip.playing == 0 and not clip.future.done():
+            if clip in self._pending:
+                self._pending.remove(clip)
+            clip.future.set_result(clip.started)
+            self.stats['completed' if clip.started else 'failed'] += 1
+
+    def _cancel_all(self):
+        for clip in list(self._pending) + [entry[0] for entry in self._playing]:
+            clip.future.cancel()
+        self._pending.clear()
+        self._playing = []
+        while True:
+            try:
+                action, payload = self._commands.get_nowait()
+            except queue.Empty:
+                break
+            if action == 'play':
+                payload.future.cancel()
+            elif action == 'preload':
+                payload[1].set_result(False)
+
+    # ------------------------------------------------------------------
+    # subprocess：沒有 pygame 時逐段交給外部播放器（無法無縫銜接）
+    # ------------------------------------------------------------------
+
+    def _run_subprocess(self):
+        while self._running:
+            action, payload = self._commands.get()
+            if action == 'play':
+                self._pending.append(payload)
+            elif action == 'cancel':
+                for clip in self._pending:
+                    if payload is None or clip.future is payload:
+                        clip.future.cancel()
+            elif action == 'stop':
+                break
+
+            while self._pending and self._commands.empty():
+                clip = self._pending.popleft()
+                if clip.future.cancelled():
+                    self._count_cancelled(clip)
+                    continue
+                self._play_subprocess(clip)
+        self._cancel_all()
+
+    def _play_subprocess(self, clip: _Clip):
+        command = [arg.format(rate=clip.sample_rate) for arg in self.commands.get(clip.audio_format, [])]
+        if not command:
+            self.logger.error(f"沒有可播放 {clip.audio_format} 的播放器")
+            clip.future.set_result(False)
+            self.stats['failed'] += 1
+            return
+
+        if clip.kind == 'file':
+            command.append(str(clip.source))
+        elif clip.kind == 'bytes':
+            command.append('-')
+
+        try:
+            with self._process_lock:
+                self._process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                self._current = clip
+            self._record_dispatch(clip, time.perf_counter())
+
+            try:
+                if clip.kind == 'bytes':
+                    self._process.stdin.write(clip.source)
+                elif clip.kind == 'pcm':
+                    for chunk in clip.source:
+                        if clip.future.cancelled():
+                            break
+                        self._process.stdin.write(chunk)
+                self._process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+            returncode = self._process.wait()
+        except Exception as e:
+            self.logger.error(f"播放器執行失敗: {e}")
+            returncode = -1
+        finally:
+            with self._process_lock:
+                self._process = None
+                self._current = None
+
+        if clip.future.cancelled():
+            self._count_cancelled(clip)
+        elif not clip.future.done():
+            clip.future.set_result(returncode == 0)
+            self.stats['completed' if returncode == 0 else 'failed'] += 1
+
+
+# 全域音頻引擎實例
+audio_engine = None
+_audio_engine_lock = threading.Lock()
+
+def get_audio_engine() -> AudioEngine:
+    """獲取已啟動的音頻引擎實例"""
+    global audio_engine
+    with _audio_engine_lock:
+        if audio_engine is None:
+            audio_engine = AudioEngine()
+        # 清理後再次取得時重新啟動
+        audio_engine.start()
+    return audio_engine
+
+
+# 測試程式
+if __name__ == "__main__":
+    import math
+    import struct
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    engine = get_audio_engine()
+    files = [Path(arg) for arg in sys.argv[1:]]
+    if files:
+        futures = [engine.play(audio_file) for audio_file in files]
+    else:
+        # 沒有指定文件時播放三段 0.3 秒的單音（記憶體中的 PCM 串流）
+        def tone(frequency, seconds=0.3, rate=24000):
+            yield b''.join(struct.pack('<h', int(8000 * math.sin(2 * math.pi * frequency * i / rate)))
+                           for i in range(int(seconds * rate)))
+        futures = [engine.play(tone(frequency)) for frequency in (523, 659, 784)]
+
+    results = [future.result() for future in futures]
+    stats = engine.get_stats()
+    print(f"播放結果: {results}")
+    print(f"派送延遲: 平均 {stats['dispatch_ms_avg']:.1f} ms, 最大 {stats['dispatch_ms_max']:.1f} ms ({engine.backend})")
+    engine.stop()
@@ -9,11 +9,14 @@ import os
 import time
 import threading
 import logging
-import hashlib
+import shutil
 import subprocess
 import struct
+import wave
+import importlib.util
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from typing import Optional, Dict, Any, Tuple, Iterable, BinaryIO
 
 # 自動載入 .env 檔案
 def load_env_file():
@@ -30,45 +33,78 @@ def load_env_file():
 # 載入環境變數
 load_env_file()
 
-try:
-    import pyttsx3
-    PYTTSX3_AVAILABLE = True
-except ImportError:
-    PYTTSX3_AVAILABLE = False
-
-try:
-    import pygame
-    PYGAME_AVAILABLE = True
-except ImportError:
-    PYGAME_AVAILABLE = False
-
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+# 只檢查是否安裝；openai 載入很慢，到初始化 TTS 時才載入
+PYTTSX3_AVAILABLE = importlib.util.find_spec('pyttsx3') is not None
+OPENAI_AVAILABLE = importlib.util.find_spec('openai') is not None
+openai = None
 
+from tts_pipeline import TTSPipeline
+from tts_cache import get_tts_cache, make_cache_key
+from greeting_corpus import GreetingCorpus
+from audio_engine import get_audio_engine, estimate_duration
+from http_transport import get_http_session
+from tracing import span, event, bind, traced
+from metrics import get_registry
 from config import (
     AUDIO_CONFIG, 
     TTS_CONFIG, 
     SPEAKER_CONFIG,
     MORNING_GREETINGS,
     TTS_LANGUAGE_MAP,
-    AUDIO_FILES
+    AUDIO_FILES,
+    API_ENDPOINTS
 )
 
+def write_pcm_wav(chunks: Iterable[bytes], f: BinaryIO, sample_rate: int = None) -> int:
+    """
+    將 OpenAI TTS 的 PCM 串流（16-bit 單聲道小端序）逐段寫成 WAV
+    
+    Args:
+        chunks: PCM 資料區塊（可在任意位元組切開）
+        f: 可 seek 的輸出文件（結束時回填 WAV 檔頭的長度）
+        sample_rate: 採樣率，預設為 TTS_CONFIG['openai_pcm_sample_rate']
+    
+    Returns:
+        int: 寫入的 PCM 位元組數
+    """
+    wav = wave.open(f, 'wb')
+    wav.setnchannels(1)
+    wav.setsampwidth(2)
+    wav.setframerate(sample_rate or TTS_CONFIG['openai_pcm_sample_rate'])
+    written = 0
+    for chunk in chunks:
+        wav.writeframesraw(chunk)
+        written += len(chunk)
+    wav.close()
+    return written
+
 class AudioManager:
     """音頻管理器"""
     
-    def __init__(self):
+    def __init__(self, defer_setup: bool = False):
+        """
+        Args:
+            defer_setup: 不在建構時執行較慢的設定（ALSA 檢查、amixer 設定音量、清理快取），
+                由呼叫端稍後呼叫 finish_setup()（啟動時在背景執行，不延誤按鈕就緒）
+        """
         self.logger = logging.getLogger(__name__)
         self.tts_engine = None
         self.audio_initialized = False
+        self.audio_engine = None
         self.current_volume = AUDIO_CONFIG['volume']
+        self._volume_control = None  # 上次設定成功的 amixer 控制名稱
         self.cache_dir = Path(TTS_CONFIG['cache_dir'])
         
+        # 延後到播放時才串流生成的音頻：音頻文件路徑 -> (文字, 語音)
+        self._pending_streams: Dict[Path, Tuple[str, str]] = {}
+        
         # 確保快取目錄存在
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.tts_cache = get_tts_cache()
+        
+        # 預先合成的離線問候語與通知音效（只檢查本地文件）
+        self.greeting_corpus = GreetingCorpus(self.tts_cache)
+        self.greeting_corpus.verify()
         
         # 初始化音頻系統
         self._initialize_audio()
@@ -76,9 +112,34 @@ class AudioManager:
         # 初始化 TTS 引擎
         self._initialize_tts()
         
-        # 清理過期快取
+        # 登錄執行時指標（快取與音頻引擎的統計在抓取時才讀取）
+        self._register_metrics()
+        
+        if not defer_setup:
+            self.finish_setup()
+    
+    def finish_setup(self):
+        """較慢的設定：沒有 pygame 時檢查 ALSA、設定音量並清理過期快取"""
+        if AUDIO_CONFIG['enabled']:
+            if not self.audio_initialized:
+                self._check_alsa_audio()
+            self.set_volume(self.current_volume)
         self._cleanup_cache()
     
+    def _register_metrics(self):
+        """登錄 TTS 快取、故事 API 與音頻引擎的指標"""
+        registry = get_registry()
+        cache = self.tts_cache
+        registry.counter('tts_cache_lookups_total', "TTS 快取查詢次數", ['result'],
+                         func=lambda: {('hit',): cache.hits, ('miss',): cache.misses})
+        registry.gauge('tts_cache_hit_ratio', "TTS 快取命中率",
+                       func=lambda: cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else None)
+        registry.gauge('tts_cache_bytes', "TTS 快取占用空間（位元組）", func=lambda: cache.total_bytes)
+        self.story_api_errors = registry.counter('story_api_errors_total', "故事生成 API 失敗次數", ['status'])
+        if self.audio_engine:
+            engine = self.audio_engine
+            registry.counter('audio_underruns_total', "音頻播放中途斷音次數", func=lambda: engine.stats['underruns'])
+    
     def _initialize_audio(self):
         """初始化音頻系統"""
         try:
@@ -86,27 +147,13 @@ class AudioManager:
                 self.logger.info("音頻功能已禁用")
                 return
             
-            # 嘗試初始化 pygame mixer
-            if PYGAME_AVAILABLE:
-                try:
-                    pygame.mixer.pre_init(
-                        frequency=AUDIO_CONFIG['sample_rate'],
-                        size=-16,
-                        channels=AUDIO_CONFIG['channels'],
-                        buffer=512
-                    )
-                    pygame.mixer.init()
-                    self.audio_initialized = True
-                    self.logger.info("Pygame 音頻系統初始化成功")
-                except Exception as e:
-                    self.logger.warning(f"Pygame 初始化失敗: {e}")
-            
-            # 如果 pygame 不可用，使用 ALSA
-            if not self.audio_initialized:
-                self._check_alsa_audio()
+            # 由常駐音頻引擎持有輸出設備（有 pygame 時在引擎執行緒中初始化 mixer）
+            self.audio_engine = get_audio_engine()
+            self.audio_initialized = self.audio_engine.gapless
+            if self.audio_initialized:
+                self.logger.info("Pygame 音頻系統初始化成功")
             
-            # 設置音量
-            self.set_volume(self.current_volume)
+            # 如果 pygame 不可用，在 finish_setup 檢查 ALSA
             
         except Exception as e:
             self.logger.error(f"音頻系統初始化失敗: {e}")
@@ -144,8 +191,12 @@ class AudioManager:
             
             # 初始化 OpenAI 客戶端
             try:
+                global openai
+                if openai is None:
+                    import openai
                 self.openai_client = openai.OpenAI(
-                    api_key=TTS_CONFIG['openai_api_key']
+                    api_key=TTS_CONFIG['openai_api_key'],
+                    base_url=TTS_CONFIG.get('openai_base_url')
                 )
                 self.logger.info("✨ OpenAI TTS 引擎初始化成功！")
                 self.logger.info(f"🎤 使用語音: {TTS_CONFIG['openai_voice']}")
@@ -205,8 +256,11 @@ class AudioManager:
                 
                 return self._play_integrated_nova_content(full_content, language_code)
             else:
-                # 備用方案：使用內建問候語
+                # 備用方案：使用內建問候語（優先使用預先合成的離線音頻）
                 self.logger.warning("ChatGPT API 失敗，使用備用問候語")
+                fallback_file = self.get_fallback_greeting_audio(country_code)
+                if fallback_file and self._play_audio_file(fallback_file):
+                    return True
                 greeting_text = self._get_greeting_text(country_code, city_name)
                 language_code = self._get_language_code(country_code)
                 return self._play_text_with_language(greeting_text, language_code)
@@ -279,15 +333,28 @@ class AudioManager:
             self.logger.error(f"準備問候語音頻失敗: {e}")
             return None
     
-    def prepare_greeting_audio_with_content(self, country_code: str, city_name: str = "", country_name: str = "", city_data: dict = None) -> Tuple[Optional[Path], Optional[Dict[str, Any]]]:
+    def prepare_greeting_audio_with_content(self, country_code: str, city_name: str = "", country_name: str = "", city_data: dict = None, stream: bool = False) -> Tuple[Optional[Path], Optional[Dict[str, Any]]]:
         """
-        準備完整問候語音頻並返回故事內容（用於網頁顯示）
+        準備完整問候語音頻並返回故事內容（用於網頁顯示），並上傳故事到Firebase
         
         Args:
             country_code: 國家代碼
             city_name: 城市名稱
             country_name: 國家名稱
             city_data: 完整城市數據，包含坐標信息
+            stream: 延後到播放時才串流生成音頻（邊下載邊播放）
+        
+        Returns:
+            Tuple[Path, Dict]: (音頻文件路徑, 故事內容字典)
+        """
+        audio_file, story_content = self.build_greeting_audio_with_content(country_code, city_name, country_name, city_data, stream)
+        if story_content:
+            self.upload_story_content(story_content, city_data)
+        return audio_file, story_content
+    
+    def build_greeting_audio_with_content(self, country_code: str, city_name: str = "", country_name: str = "", city_data: dict = None, stream: bool = False) -> Tuple[Optional[Path], Optional[Dict[str, Any]]]:
+        """
+        生成完整問候語音頻與故事內容，但不上傳（供預取使用）
         
         Returns:
             Tuple[Path, Dict]: (音頻文件路徑, 故事內容字典)
@@ -299,64 +366,99 @@ class AudioManager:
             
             self.logger.info("🎧 準備完整問候語音頻（同步模式）...")
             
-            # 📡 獲取完整問候語和故事
-            greeting_data = self._fetch_greeting_and_story_from_api(city_name, country_name, country_code)
-            
-            if greeting_data:
-                greeting_text = greeting_data['greeting']
-                language_code = greeting_data['languageCode']
-                story_text = greeting_data.get('chineseStory', '')
-                
-                self.logger.info(f"🔍 準備音頻 - 問候語資料: {greeting_data}")
-                self.logger.info(f"🔍 準備音頻 - story_text: '{story_text}'")
-                
-                # 創建完整的音頻內容：問候語 + 故事
-                full_content = f"{greeting_text}。{story_text}"
-                self.logger.info(f"完整音頻內容: {full_content}")
-                
-                # 🌟 準備 Nova 音頻
-                self.logger.info("🌟 準備 Nova 音頻：整合模式")
-                
-                # 生成音頻文件
-                audio_file = self._generate_audio_openai_direct(full_content, language_code, voice='nova')
-                
-                if audio_file and audio_file.exists():
-                    self.logger.info(f"✨ Nova 整合音頻生成成功: {audio_file.name}")
-                    
-                    # 準備返回的故事內容，包含城市和國家資訊
-                    story_content = {
-                        'greeting': greeting_text,
-                        'language': greeting_data.get('language', ''),
-                        'languageCode': language_code,
-                        'story': story_text,
-                        'fullContent': full_content,
-                        'city': city_name,
-                        'country': country_name,
-                        'countryCode': country_code,
-                        'latitude': city_data.get('latitude', 0) if city_data else 0,
-                        'longitude': city_data.get('longitude', 0) if city_data else 0
-                    }
-                    
-                    # 🔧 立即上傳故事到Firebase，確保數據持久化
-                    self.logger.info("🔥 故事生成成功，立即上傳到Firebase...")
-                    upload_success = self._upload_story_to_firebase(story_content, city_data)
-                    if upload_success:
-                        self.logger.info("✅ 故事已成功上傳到Firebase")
-                    else:
-                        self.logger.warning("⚠️ 故事上傳到Firebase失敗")
-                    
-                    return audio_file, story_content
-                else:
-                    self.logger.error("Nova 整合音頻生成失敗")
-                    return None, None
-            else:
-                self.logger.warning("ChatGPT API 失敗，無法準備音頻")
+            story_content = self.fetch_story_content(country_code, city_name, country_name, city_data)
+            if not story_content:
                 return None, None
+            
+            audio_file = self.render_story_audio(story_content, stream)
+            if audio_file:
+                return audio_file, story_content
+            return None, None
                 
         except Exception as e:
             self.logger.error(f"準備完整音頻失敗: {e}")
             return None, None
     
+    def fetch_story_content(self, country_code: str, city_name: str = "", country_name: str = "", city_data: dict = None) -> Optional[Dict[str, Any]]:
+        """
+        獲取問候語和故事（不生成音頻），讓上傳故事與生成音頻可以並行
+        
+        Returns:
+            Dict: 故事內容字典（包含城市、國家與坐標），失敗返回 None
+        """
+        # 📡 獲取完整問候語和故事
+        greeting_data = self._fetch_greeting_and_story_from_api(city_name, country_name, country_code)
+        if not greeting_data:
+            self.logger.warning("ChatGPT API 失敗，無法準備音頻")
+            return None
+        
+        greeting_text = greeting_data['greeting']
+        language_code = greeting_data['languageCode']
+        story_text = greeting_data.get('chineseStory', '')
+        
+        self.logger.info(f"🔍 準備音頻 - 問候語資料: {greeting_data}")
+        self.logger.info(f"🔍 準備音頻 - story_text: '{story_text}'")
+        
+        # 創建完整的音頻內容：問候語 + 故事
+        full_content = f"{greeting_text}。{story_text}"
+        self.logger.info(f"完整音頻內容: {full_content}")
+        
+        return {
+            'greeting': greeting_text,
+            'language': greeting_data.get('language', ''),
+            'languageCode': language_code,
+            'story': story_text,
+            'fullContent': full_content,
+            'city': city_name,
+            'country': country_name,
+            'countryCode': country_code,
+            'latitude': city_data.get('latitude', 0) if city_data else 0,
+            'longitude': city_data.get('longitude', 0) if city_data else 0
+        }
+    
+    def render_story_audio(self, story_content: Dict[str, Any], stream: bool = False) -> Optional[Path]:
+        """
+        為故事內容生成 Nova 音頻
+        
+        Args:
+            story_content: fetch_story_content 返回的故事內容
+            stream: 延後到播放時才串流生成音頻（邊下載邊播放）
+        
+        Returns:
+            Path: 音頻文件路徑，失敗返回 None
+        """
+        full_content = story_content['fullContent']
+        language_code = story_content['languageCode']
+        
+        # 🌟 準備 Nova 音頻
+        self.logger.info("🌟 準備 Nova 音頻：整合模式")
+        
+        # 生成音頻文件（串流模式只登記內容，播放時才向 OpenAI 取得音頻）
+        audio_file = None
+        if stream:
+            audio_file = self._defer_openai_audio(full_content, language_code, voice='nova')
+        if not audio_file and TTS_CONFIG.get('chunked_synthesis'):
+            audio_file = self._render_chunked_audio(full_content, language_code, voice='nova')
+        if not audio_file:
+            audio_file = self._generate_audio_openai_direct(full_content, language_code, voice='nova')
+        
+        if self.is_audio_ready(audio_file):
+            self.logger.info(f"✨ Nova 整合音頻生成成功: {audio_file.name}")
+            return audio_file
+        self.logger.error("Nova 整合音頻生成失敗")
+        return None
+    
+    def upload_story_content(self, story_content: Dict[str, Any], city_data: Optional[Dict[str, Any]]) -> bool:
+        """上傳故事到Firebase，確保數據持久化"""
+        self.logger.info("🔥 故事生成成功，立即上傳到Firebase...")
+        with span('firebase.upload'):
+            upload_success = self._upload_story_to_firebase(story_content, city_data)
+        if upload_success:
+            self.logger.info("✅ 故事已成功上傳到Firebase")
+        else:
+            self.logger.warning("⚠️ 故事上傳到Firebase失敗")
+        return upload_success
+    
     # 快速模式已移除 - 只使用完整 Nova 語音播放
     
     def _generate_integrated_audio(self, content: str) -> Optional[Path]:
@@ -397,6 +499,10 @@ class AudioManager:
             bool: 播放是否成功
         """
         try:
+            if audio_file in self._pending_streams:
+                text, voice = self._pending_streams.pop(audio_file)
+                return self._play_chunked(audio_file, text, voice)
+            
             if not audio_file or not audio_file.exists():
                 self.logger.error("音頻文件不存在")
                 return False
@@ -523,6 +629,7 @@ class AudioManager:
             self.logger.error(f"播放文字失敗: {e}")
             return False
 
+    @traced('story.api')
     def _fetch_greeting_and_story_from_api(self, city: str, country: str, country_code: str) -> Optional[Dict[str, Any]]:
         """
         從 ChatGPT API 獲取當地語言問候語和中文故事
@@ -536,11 +643,8 @@ class AudioManager:
             Dict: 問候語和故事資料，包含 greeting, language, languageCode, chineseStory 等
         """
         try:
-            import requests
-            import json
-            
             # API 端點 - 使用正確的 Pi 故事生成 API
-            api_url = 'https://morgan-orcin.vercel.app/api/generatePiStory'
+            api_url = API_ENDPOINTS['generate_story']
             
             # 清理城市名稱（移除冒號和空格）
             city = city.strip().rstrip(':').strip() if city else ''
@@ -560,8 +664,8 @@ class AudioManager:
             self.logger.info(f"調用故事生成 API: {api_url}")
             self.logger.info(f"請求資料: {request_data}")
             
-            # 發送請求
-            response = requests.post(
+            # 發送請求（共用連線池）
+            response = get_http_session().post(
                 api_url,
                 json=request_data,
                 headers={'Content-Type': 'application/json'},
@@ -580,10 +684,12 @@ class AudioManager:
                 return greeting_data
             else:
                 self.logger.error(f"API 請求失敗: {response.status_code} - {response.text}")
+                self.story_api_errors.inc(status=response.status_code)
                 return None
                 
         except Exception as e:
             self.logger.error(f"調用故事生成 API 時發生錯誤: {e}")
+            self.story_api_errors.inc(status=type(e).__name__)
             return None
     
     def _upload_story_to_firebase(self, story_content: Dict[str, Any], city_data: Optional[Dict[str, Any]]) -> bool:
@@ -597,9 +703,6 @@ class AudioManager:
             bool: 上傳是否成功
         """
         try:
-            import requests
-            import json
-            
             # 從環境變數獲取使用者名稱
             user_name = os.getenv('USER_NAME', 'unknown')
             
@@ -621,8 +724,8 @@ class AudioManager:
             self.logger.info(f"🔥 [Firebase上傳] 準備上傳數據: {api_data}")
             
             # 調用save-record API
-            api_url = 'https://morgan-orcin.vercel.app/api/save-record'
-            response = requests.post(
+            api_url = API_ENDPOINTS['save_record']
+            response = get_http_session().post(
                 api_url,
                 json=api_data,
                 headers={'Content-Type': 'application/json'},
@@ -694,17 +797,23 @@ class AudioManager:
         }
         return country_map.get(country_name, '')
     
-    def _get_greeting_text(self, country_code: str, city_name: str = "") -> str:
-        """獲取問候語文本"""
-        # 根據國家代碼確定語言
+    def _get_greeting_locale(self, country_code: str) -> str:
+        """根據國家代碼確定問候語的語言"""
         language_map = {
             'TW': 'zh-TW', 'CN': 'zh-CN', 'HK': 'zh-TW', 'MO': 'zh-TW',
             'JP': 'ja', 'KR': 'ko', 'US': 'en', 'GB': 'en', 'AU': 'en',
             'ES': 'es', 'FR': 'fr', 'DE': 'de', 'IT': 'it', 'PT': 'pt',
             'RU': 'ru', 'TH': 'th', 'VN': 'vi', 'IN': 'hi'
         }
-        
-        language = language_map.get(country_code.upper(), 'default')
+        return language_map.get((country_code or '').upper(), 'default')
+    
+    def get_fallback_greeting_audio(self, country_code: str) -> Optional[Path]:
+        """取得預先合成的內建問候語音頻（不連網），沒有時返回 None"""
+        return self.greeting_corpus.greeting_audio(self._get_greeting_locale(country_code))
+    
+    def _get_greeting_text(self, country_code: str, city_name: str = "") -> str:
+        """獲取問候語文本"""
+        language = self._get_greeting_locale(country_code)
         greeting = MORNING_GREETINGS.get(language, MORNING_GREETINGS['default'])
         
         # 如果有城市名稱，可以添加到問候語中
@@ -742,27 +851,24 @@ class AudioManager:
         if not TTS_CONFIG['cache_enabled']:
             return None
         
-        # 生成文本的哈希值作為文件名
-        text_hash = hashlib.md5(f"{text}_{language}".encode()).hexdigest()
-        audio_file = self.cache_dir / f"greeting_{language}_{text_hash}.wav"
-        
-        if audio_file.exists():
-            # 檢查文件是否過期
-            file_age = time.time() - audio_file.stat().st_mtime
-            if file_age < AUDIO_FILES['cache_timeout']:
-                self.logger.debug(f"使用快取音頻文件: {audio_file}")
-                return audio_file
-            else:
-                # 刪除過期文件
-                audio_file.unlink()
-        
-        return None
+        audio_file = self.tts_cache.get(self._engine_cache_key(text, language))
+        if audio_file:
+            self.logger.debug(f"使用快取音頻文件: {audio_file}")
+        return audio_file
+    
+    def _engine_cache_key(self, text: str, language: str) -> str:
+        """本地 TTS 引擎的快取鍵（引擎以語言選擇語音）"""
+        return make_cache_key(text, language, TTS_CONFIG['engine'], TTS_CONFIG['speed'], 'wav')
+    
+    def _openai_cache_key(self, text: str, voice: str, audio_format: str) -> str:
+        """OpenAI TTS 的快取鍵"""
+        return make_cache_key(text, voice, TTS_CONFIG['openai_model'], TTS_CONFIG['openai_speed'], audio_format)
     
     def _generate_audio(self, text: str, language: str) -> Optional[Path]:
-        """生成音頻文件，提供多重備用方案"""
+        """生成音頻文件，提供多重備用方案（本地引擎的結果以 _engine_cache_key 存入快取）"""
+        audio_file = None
         try:
-            text_hash = hashlib.md5(f"{text}_{language}".encode()).hexdigest()
-            audio_file = self.cache_dir / f"greeting_{language}_{text_hash}.wav"
+            audio_file = self.tts_cache.temp_path('.wav')
             
             # 主要引擎嘗試
             result_file = None
@@ -770,7 +876,8 @@ class AudioManager:
             # OpenAI TTS 優先（最高品質，支援所有語言）
             if TTS_CONFIG['engine'] == 'openai' and self.openai_client:
                 self.logger.info(f"🤖 使用 OpenAI TTS 生成 {language} 語音")
-                result_file = self._generate_audio_openai(text, audio_file)
+                # 直接取得 PCM 寫成 WAV 存入 TTS 快取，不需要 ffmpeg/sox 轉檔
+                result_file = self._generate_audio_openai_direct(text, language)
                 
                 # OpenAI 失敗時，根據語言選擇備用
                 if result_file is None:
@@ -782,6 +889,8 @@ class AudioManager:
                         result_file = self._generate_audio_festival(text, audio_file)
                         if result_file is None:
                             result_file = self._generate_audio_espeak(text, language, audio_file)
+                else:
+                    audio_file.unlink(missing_ok=True)  # 備用引擎的暫存檔用不到
             
             # 如果不是 OpenAI 引擎，中文、俄語等特定語言使用 espeak
             elif language in ['zh', 'zh-CN', 'zh-TW', 'ru']:
@@ -828,10 +937,15 @@ class AudioManager:
                 can_play = self._test_audio_playback(result_file)
                 
                 if is_valid and can_play:
+                    if result_file == audio_file:
+                        # 本地引擎寫在暫存檔：搬入快取，下次相同文字直接使用
+                        result_file = self.tts_cache.put_file(self._engine_cache_key(text, language),
+                                                              audio_file, 'wav', language, text)
                     self.logger.info(f"音頻文件生成成功: {result_file}")
                     return result_file
                 else:
                     self.logger.warning(f"音頻文件驗證失敗 - 格式: {is_valid}, 播放: {can_play}")
+                    audio_file.unlink(missing_ok=True)
             
             # 如果主要方法失敗，嘗試備用方案
             if result_file is None or not result_file.exists():
@@ -843,16 +957,23 @@ class AudioManager:
                         cmd = ['espeak', '-w', str(simple_audio_file), text]
                         result = subprocess.run(cmd, capture_output=True, timeout=30)
                         if result.returncode == 0 and simple_audio_file.exists():
-                            simple_audio_file.rename(audio_file)
-                            return audio_file
+                            simple_audio_file.replace(audio_file)
+                            return self.tts_cache.put_file(self._engine_cache_key(text, language),
+                                                           audio_file, 'wav', language, text)
                     except:
                         pass
+                    finally:
+                        simple_audio_file.unlink(missing_ok=True)
+                
+                audio_file.unlink(missing_ok=True)
                         
                 self.logger.error("所有音頻生成方法都失敗")
                 return None
                 
         except Exception as e:
             self.logger.error(f"生成音頻失敗: {e}")
+            if audio_file:
+                audio_file.unlink(missing_ok=True)
             return None
 
     def _generate_audio_openai_direct(self, text: str, language_code: str, voice: str = None) -> Optional[Path]:
@@ -868,16 +989,13 @@ class AudioManager:
             Path: 生成的音頻文件路徑，如果失敗則返回 None
         """
         try:
-            # 創建音頻文件路徑
-            import hashlib
             selected_voice = voice or TTS_CONFIG['openai_voice']
-            text_hash = hashlib.md5(f"{text}_{language_code}_{selected_voice}".encode()).hexdigest()
-            audio_file = self.cache_dir / f"openai_direct_{language_code}_{selected_voice}_{text_hash}.wav"
             
-            # 檢查是否已有快取
-            if audio_file.exists():
-                self.logger.info(f"使用快取的音頻文件: {audio_file}")
-                return audio_file
+            # 檢查是否已有快取（WAV 或串流播放時保存的 MP3）
+            cached_file = self._find_openai_cache(text, selected_voice)
+            if cached_file:
+                self.logger.info(f"使用快取的音頻文件: {cached_file}")
+                return cached_file
             
             # 調用 OpenAI TTS API
             if not self.openai_client:
@@ -886,146 +1004,157 @@ class AudioManager:
                 
             self.logger.info(f"🤖 使用 OpenAI TTS 生成音頻: {selected_voice}")
             
-            # 調用 OpenAI TTS API
-            response = self.openai_client.audio.speech.create(
-                model=TTS_CONFIG['openai_model'],
-                voice=selected_voice,
-                input=text,
-                speed=TTS_CONFIG['openai_speed']
-            )
-            
-            # OpenAI 返回 MP3，直接保存為 MP3 然後轉換
-            temp_mp3_file = audio_file.with_suffix('.mp3')
-            
-            # 將音頻數據寫入 MP3 文件
-            with open(temp_mp3_file, 'wb') as f:
-                for chunk in response.iter_bytes(1024):
-                    f.write(chunk)
-            
-            # 驗證 MP3 文件
-            if temp_mp3_file.exists() and temp_mp3_file.stat().st_size > 0:
-                self.logger.info(f"OpenAI MP3 文件生成成功: {temp_mp3_file.stat().st_size} bytes")
-                
-                # 轉換 MP3 到 WAV
-                try:
-                    import subprocess
-                    # 嘗試 ffmpeg
-                    convert_cmd = ['ffmpeg', '-i', str(temp_mp3_file), '-y', str(audio_file)]
-                    result = subprocess.run(convert_cmd, capture_output=True, timeout=30)
-                    
-                    if result.returncode == 0 and audio_file.exists():
-                        self.logger.info("ffmpeg 轉換成功")
-                        temp_mp3_file.unlink()  # 刪除臨時 MP3
-                    else:
-                        # ffmpeg 失敗，嘗試 sox
-                        self.logger.warning("ffmpeg 失敗，嘗試 sox")
-                        convert_cmd = ['sox', str(temp_mp3_file), str(audio_file)]
-                        result = subprocess.run(convert_cmd, capture_output=True, timeout=30)
-                        
-                        if result.returncode == 0 and audio_file.exists():
-                            self.logger.info("sox 轉換成功")
-                            temp_mp3_file.unlink()  # 刪除臨時 MP3
-                        else:
-                            # 兩個都失敗，直接用 MP3
-                            self.logger.warning("格式轉換失敗，直接使用 MP3")
-                            temp_mp3_file.rename(audio_file.with_suffix('.mp3'))
-                            audio_file = audio_file.with_suffix('.mp3')
-                            
-                except Exception as e:
-                    self.logger.warning(f"音頻格式轉換失敗: {e}")
-                    # 如果轉換失敗，使用原始 MP3
-                    temp_mp3_file.rename(audio_file.with_suffix('.mp3'))
-                    audio_file = audio_file.with_suffix('.mp3')
-                
-                # 最終驗證文件
-                if audio_file.exists() and audio_file.stat().st_size > 0:
-                    self.logger.info(f"✨ OpenAI TTS 音頻生成成功: {audio_file}")
-                    return audio_file
-                else:
-                    self.logger.error("音頻文件轉換後無效")
-                    return None
-            else:
-                self.logger.error("OpenAI MP3 文件生成失敗")
-                return None
+            # 直接要求 PCM，邊下載邊寫成 WAV，不需要 ffmpeg/sox 轉檔
+            # （PCM 邊下載邊包裝，轉檔時間包含在 tts.request 區段內）
+            key = self._openai_cache_key(text, selected_voice, 'wav')
+            with span('tts.request', format='pcm', chars=len(text)), \
+                    self.openai_client.audio.speech.with_streaming_response.create(
+                        model=TTS_CONFIG['openai_model'],
+                        voice=selected_voice,
+                        input=text,
+                        speed=TTS_CONFIG['openai_speed'],
+                        response_format='pcm'
+                    ) as response, self.tts_cache.writer(key, 'wav', selected_voice, text) as f:
+                write_pcm_wav(response.iter_bytes(4096), f)
+            
+            audio_file = self.tts_cache.path_for(key, 'wav')
+            self.logger.info(f"✨ OpenAI TTS 音頻生成成功: {audio_file} ({audio_file.stat().st_size} bytes)")
+            return audio_file
                 
         except Exception as e:
             self.logger.error(f"Nova 直接生成失敗: {e}")
             return None
     
-    def _generate_audio_openai(self, text: str, audio_file: Path) -> Optional[Path]:
-        """使用 OpenAI TTS 生成音頻"""
+    def _find_openai_cache(self, text: str, voice: str) -> Optional[Path]:
+        """尋找已存在的 WAV 或 MP3 快取"""
+        if not TTS_CONFIG['cache_enabled']:
+            return None
+        for audio_format in ('wav', 'mp3'):
+            cached_file = self.tts_cache.get(self._openai_cache_key(text, voice, audio_format))
+            if cached_file:
+                return cached_file
+        return None
+    
+    def _defer_openai_audio(self, text: str, language_code: str, voice: str = None) -> Optional[Path]:
+        """
+        登記串流播放的音頻，實際的 TTS 請求在播放時才送出
+        
+        Returns:
+            Path: 快取存在時為快取文件，否則為串流完成後保存的 MP3 路徑；無法串流時返回 None
+        """
+        selected_voice = voice or TTS_CONFIG['openai_voice']
+        cached_file = self._find_openai_cache(text, selected_voice)
+        if cached_file:
+            self.logger.info(f"使用快取的音頻文件: {cached_file}")
+            return cached_file
+        
+        if not self.openai_client:
+            self.logger.info("無法串流播放（缺少 OpenAI 客戶端），改為完整生成")
+            return None
+        if not TTS_CONFIG.get('chunked_synthesis'):
+            self.logger.info("播放時生成需要分句合成（chunked_synthesis），改為完整生成")
+            return None
+        
+        # 串流完成後保存的快取位置
+        audio_file = self.tts_cache.path_for(self._openai_cache_key(text, selected_voice, 'mp3'), 'mp3')
+        self._pending_streams[audio_file] = (text, selected_voice)
+        self.logger.info(f"🌊 音頻將於播放時串流生成: {audio_file.name}")
+        return audio_file
+    
+    def is_audio_ready(self, audio_file: Optional[Path]) -> bool:
+        """音頻文件已存在，或已登記為播放時串流生成"""
+        return bool(audio_file) and (audio_file in self._pending_streams or audio_file.exists())
+    
+    def discard_deferred_audio(self, audio_file: Optional[Path]):
+        """取消尚未播放的串流登記（流程在播放前被取消或失敗時呼叫；已開始播放時不做任何事）"""
+        if audio_file and self._pending_streams.pop(audio_file, None):
+            self.logger.info(f"🗑️ 取消未播放的串流音頻: {audio_file.name}")
+    
+    def _synthesize_chunk(self, text: str, voice: str, use_cache: bool = True) -> Optional[Path]:
+        """合成單一句子為 MP3（每個句子獨立快取，重複的問候語可直接重用）"""
+        key = self._openai_cache_key(text, voice, 'mp3')
+        if use_cache:
+            chunk_file = self.tts_cache.get(key)
+            if chunk_file:
+                return chunk_file
+        
         try:
-            if not self.openai_client:
-                self.logger.error("OpenAI 客戶端未初始化")
-                return None
-                
-            self.logger.info(f"🤖 使用 OpenAI TTS 生成音頻: {selected_voice}")
-            
-            # 調用 OpenAI TTS API
-            response = self.openai_client.audio.speech.create(
-                model=TTS_CONFIG['openai_model'],
-                voice=selected_voice,
-                input=text,
-                speed=TTS_CONFIG['openai_speed']
-            )
-            
-            # OpenAI 返回 MP3，直接保存為 MP3 然後轉換
-            temp_mp3_file = audio_file.with_suffix('.mp3')
-            
-            # 將音頻數據寫入 MP3 文件
-            with open(temp_mp3_file, 'wb') as f:
-                for chunk in response.iter_bytes(1024):
-                    f.write(chunk)
-            
-            # 驗證 MP3 文件
-            if temp_mp3_file.exists() and temp_mp3_file.stat().st_size > 0:
-                self.logger.info(f"OpenAI MP3 文件生成成功: {temp_mp3_file.stat().st_size} bytes")
-                
-                # 轉換 MP3 到 WAV
-                try:
-                    # 嘗試 ffmpeg
-                    convert_cmd = ['ffmpeg', '-i', str(temp_mp3_file), '-y', str(audio_file)]
-                    result = subprocess.run(convert_cmd, capture_output=True, timeout=30)
-                    
-                    if result.returncode == 0 and audio_file.exists():
-                        self.logger.info("ffmpeg 轉換成功")
-                        temp_mp3_file.unlink()  # 刪除臨時 MP3
-                    else:
-                        # ffmpeg 失敗，嘗試 sox
-                        self.logger.warning("ffmpeg 失敗，嘗試 sox")
-                        convert_cmd = ['sox', str(temp_mp3_file), str(audio_file)]
-                        result = subprocess.run(convert_cmd, capture_output=True, timeout=30)
-                        
-                        if result.returncode == 0 and audio_file.exists():
-                            self.logger.info("sox 轉換成功")
-                            temp_mp3_file.unlink()  # 刪除臨時 MP3
-                        else:
-                            # 兩個都失敗，直接用 MP3
-                            self.logger.warning("格式轉換失敗，直接使用 MP3")
-                            temp_mp3_file.rename(audio_file.with_suffix('.mp3'))
-                            audio_file = audio_file.with_suffix('.mp3')
-                            
-                except Exception as e:
-                    self.logger.warning(f"音頻格式轉換失敗: {e}")
-                    # 如果轉換失敗，使用原始 MP3
-                    temp_mp3_file.rename(audio_file.with_suffix('.mp3'))
-                    audio_file = audio_file.with_suffix('.mp3')
-                
-                # 最終驗證文件
-                if audio_file.exists() and audio_file.stat().st_size > 0:
-                    self.logger.info(f"✨ OpenAI TTS 音頻生成成功: {audio_file}")
-                    return audio_file
-                else:
-                    self.logger.error("音頻文件轉換後無效")
-                    return None
-            else:
-                self.logger.error("OpenAI TTS 生成的 MP3 文件無效")
-                return None
-                
+            with span('tts.request', format='mp3', chars=len(text)):
+                response = self.openai_client.audio.speech.create(
+                    model=TTS_CONFIG['openai_model'],
+                    voice=voice,
+                    input=text,
+                    speed=TTS_CONFIG['openai_speed'],
+                    response_format='mp3'
+                )
+                with self.tts_cache.writer(key, 'mp3', voice, text) as f:
+                    for chunk in response.iter_bytes(4096):
+                        f.write(chunk)
+            return self.tts_cache.path_for(key, 'mp3')
         except Exception as e:
-            self.logger.error(f"OpenAI TTS 音頻生成失敗: {e}")
+            self.logger.error(f"句子合成失敗: {e}")
             return None
-
+    
+    def _render_chunked_audio(self, text: str, language_code: str, voice: str = None) -> Optional[Path]:
+        """分句並行合成完整音頻（不播放），結果保存在 openai_direct 快取"""
+        if not self.openai_client:
+            return None
+        
+        selected_voice = voice or TTS_CONFIG['openai_voice']
+        cached_file = self._find_openai_cache(text, selected_voice)
+        if cached_file:
+            self.logger.info(f"使用快取的音頻文件: {cached_file}")
+            return cached_file
+        
+        start_time = time.time()
+        # 句子在 TTSPipeline 的執行緒池合成，綁定目前的追蹤讓各句的 tts.request 掛在這次按鈕下
+        pipeline = TTSPipeline(bind(lambda chunk: self._synthesize_chunk(chunk, selected_voice)))
+        temp_file = self.tts_cache.temp_path('.mp3')
+        result_file = None
+        if pipeline.render(text, temp_file):
+            result_file = self.tts_cache.put_file(self._openai_cache_key(text, selected_voice, 'mp3'),
+                                                  temp_file, 'mp3', selected_voice, text)
+        else:
+            temp_file.unlink(missing_ok=True)
+        if result_file:
+            self.logger.info(f"✨ 分句並行合成完成: {result_file.name} (耗時: {time.time() - start_time:.1f}秒)")
+        return result_file
+    
+    def _play_chunked(self, audio_file: Path, text: str, voice: str) -> bool:
+        """分句並行合成，第一句完成即開始播放，全部完成後合併保存到快取"""
+        pipeline = TTSPipeline(bind(lambda chunk: self._synthesize_chunk(chunk, voice)))
+        temp_file = self.tts_cache.temp_path('.mp3')
+        
+        if self.audio_engine:
+            # 每句完成就排入音頻引擎（pygame 無縫銜接，外部播放器依序播放），可被新的按鈕中斷
+            futures = []
+            duration = 0.0
+            
+            def enqueue(chunk_file: Path) -> bool:
+                nonlocal duration
+                future = self.audio_engine.play(chunk_file)
+                futures.append(future)
+                duration += estimate_duration(chunk_file)
+                return not future.cancelled()  # 被新的按鈕中斷時不再合成後面的句子
+            
+            result = pipeline.play(text, play_file=enqueue, output_file=temp_file)
+            try:
+                success = result['success'] and self.audio_engine.wait(futures, duration)
+            except CancelledError:
+                self.logger.info("分句播放已取消")
+                success = False
+            except FutureTimeoutError:
+                success = False
+        else:
+            result = pipeline.play(text, play_file=self._play_audio_file, output_file=temp_file)
+            success = result['success']
+        
+        if temp_file.stat().st_size > 0:
+            self.tts_cache.put_file(self._openai_cache_key(text, voice, 'mp3'), temp_file, 'mp3', voice, text)
+        else:
+            temp_file.unlink()
+        return success
+    
     # 已移除備用語音引擎生成函數
     # 現在只支援 OpenAI TTS
 
@@ -1098,32 +1227,16 @@ class AudioManager:
     def _test_audio_playback(self, audio_file: Path) -> bool:
         """測試音頻文件是否能正確播放（支援 WAV 和 MP3）"""
         try:
-            if not PYGAME_AVAILABLE:
+            if not self.audio_engine or not self.audio_engine.gapless:
                 return True  # 如果沒有 pygame，假設可以播放
             
-            # 嘗試用 pygame 載入文件
-            try:
-                pygame.mixer.music.load(str(audio_file))
+            # 由音頻引擎預先解碼，之後播放時不需要再次載入
+            if self.audio_engine.preload(audio_file).result(timeout=10):
                 return True
-            except pygame.error:
+            else:
                 # pygame 失敗，檢查是否有其他播放器
                 if audio_file.suffix.lower() == '.mp3':
-                    # 檢查是否有 MP3 播放器
-                    try:
-                        result = subprocess.run(['which', 'mpg123'], 
-                                              capture_output=True, timeout=5)
-                        if result.returncode == 0:
-                            return True
-                    except:
-                        pass
-                    
-                    try:
-                        result = subprocess.run(['which', 'ffplay'], 
-                                              capture_output=True, timeout=5)
-                        if result.returncode == 0:
-                            return True
-                    except:
-                        pass
+                    return bool(shutil.which('mpg123') or shutil.which('ffplay'))
                 
                 return False
             
@@ -1171,34 +1284,35 @@ class AudioManager:
     def _play_audio_file(self, audio_file: Path) -> bool:
         """播放音頻文件（支援 WAV 和 MP3）"""
         try:
-            if PYGAME_AVAILABLE and self.audio_initialized:
-                # 使用 pygame 播放
-                try:
-                    pygame.mixer.music.load(str(audio_file))
-                    pygame.mixer.music.play()
-                    
-                    # 等待播放完成
-                    while pygame.mixer.music.get_busy():
-                        time.sleep(0.1)
-                        
-                    self.logger.info(f"音頻播放完成（pygame）: {audio_file.suffix}")
+            if self.audio_engine:
+                # 交給常駐音頻引擎，等待完成通知（最多等到音頻長度加上餘裕）
+                future = self.audio_engine.play(audio_file)
+                if self.audio_engine.wait([future], estimate_duration(audio_file)):
+                    self.logger.info(f"音頻播放完成（{self.audio_engine.backend}）: {audio_file.suffix}")
                     return True
-                except pygame.error as e:
-                    self.logger.warning(f"pygame 播放失敗: {e}")
-                    # 如果是 MP3 播放失敗，嘗試其他播放器
-                    if audio_file.suffix.lower() == '.mp3':
-                        return self._play_with_alternative_player(audio_file)
-                    return False
+                
+                self.logger.warning(f"音頻引擎播放失敗: {audio_file.name}")
+                # 如果是 MP3 播放失敗，嘗試其他播放器
+                if audio_file.suffix.lower() == '.mp3':
+                    return self._play_with_alternative_player(audio_file)
+                return False
             else:
                 # 使用替代播放器
                 return self._play_with_alternative_player(audio_file)
                     
+        except CancelledError:
+            self.logger.info(f"音頻播放已取消: {audio_file.name}")
+            return False
+        except FutureTimeoutError:
+            return False
         except Exception as e:
             self.logger.error(f"音頻播放失敗: {e}")
             return False
     
     def _play_with_alternative_player(self, audio_file: Path) -> bool:
         """使用替代播放器播放音頻"""
+        # 外部播放器同步執行，只能以啟動播放器的時間近似第一個音頻樣本
+        event('audio.first_sample', once=True, backend='player', approximate=True)
         try:
             # 根據文件格式選擇播放器
             if audio_file.suffix.lower() == '.mp3':
@@ -1249,8 +1363,11 @@ class AudioManager:
         try:
             volume = max(0, min(100, volume))  # 限制範圍
             
-            # 嘗試不同的音量控制名稱
+            # 嘗試不同的音量控制名稱（上次成功的優先，通常只需呼叫一次 amixer）
             volume_controls = ['PCM', 'Master', 'Speaker', 'Headphone', 'HDMI']
+            if self._volume_control:
+                volume_controls.remove(self._volume_control)
+                volume_controls.insert(0, self._volume_control)
             
             for control in volume_controls:
                 try:
@@ -1261,6 +1378,7 @@ class AudioManager:
                     
                     if result.returncode == 0:
                         self.current_volume = volume
+                        self._volume_control = control
                         self.logger.info(f"音量設置為: {volume}% (使用 {control} 控制)")
                         return True
                     else:
@@ -1294,6 +1412,11 @@ class AudioManager:
                 self.logger.debug("音頻功能已禁用，跳過通知音效")
                 return True
             
+            # 優先使用預先合成的音效文件
+            tone_file = self.greeting_corpus.tone_audio(sound_type)
+            if tone_file and self._play_audio_file(tone_file):
+                return True
+            
             # 根據音效類型選擇不同的問候語
             if sound_type == 'success':
                 # 播放簡短的成功音效（使用嗶聲而不是完整問候語）
@@ -1379,30 +1502,13 @@ class AudioManager:
             return False
     
     def _cleanup_cache(self):
-        """清理過期的快取文件"""
+        """清理過期與超過容量的快取文件"""
         try:
             if not TTS_CONFIG['cache_enabled']:
                 return
             
-            current_time = time.time()
-            cache_files = list(self.cache_dir.glob("greeting_*.wav"))
-            
-            # 按修改時間排序
-            cache_files.sort(key=lambda f: f.stat().st_mtime, reverse=True)
-            
-            # 刪除過期文件
-            for audio_file in cache_files:
-                file_age = current_time - audio_file.stat().st_mtime
-                if file_age > AUDIO_FILES['cache_timeout']:
-                    audio_file.unlink()
-                    self.logger.debug(f"刪除過期快取文件: {audio_file}")
-            
-            # 限制快取文件數量
-            if len(cache_files) > AUDIO_FILES['max_cache_size']:
-                for audio_file in cache_files[AUDIO_FILES['max_cache_size']:]:
-                    if audio_file.exists():
-                        audio_file.unlink()
-                        self.logger.debug(f"刪除超量快取文件: {audio_file}")
+            self.tts_cache.purge_expired()
+            self.tts_cache.evict()
                         
         except Exception as e:
             self.logger.error(f"清理快取失敗: {e}")
@@ -1410,8 +1516,8 @@ class AudioManager:
     def cleanup(self):
         """清理資源"""
         try:
-            if PYGAME_AVAILABLE and self.audio_initialized:
-                pygame.mixer.quit()
+            if self.audio_engine:
+                self.audio_engine.stop()
             
             if self.tts_engine:
                 try:
@@ -1427,11 +1533,16 @@ class AudioManager:
 # 全域音頻管理器實例
 audio_manager = None
 
-def get_audio_manager() -> AudioManager:
-    """獲取音頻管理器實例"""
+def get_audio_manager(defer_setup: bool = False) -> AudioManager:
+    """
+    獲取音頻管理器實例
+    
+    Args:
+        defer_setup: 第一次建立時延後較慢的設定（見 AudioManager.finish_setup）
+    """
     global audio_manager
     if audio_manager is None:
-        audio_manager = AudioManager()
+        audio_manager = AudioManager(defer_setup=defer_setup)
     return audio_manager
 
 def cleanup_audio_manager():
@@ -1439,4 +1550,65 @@ def cleanup_audio_manager():
     global audio_manager
     if audio_manager:
         audio_manager.cleanup()
-        audio_manager = None 
\ No newline at end of file
+        audio_manager = None 
+
+def run_wav_benchmark(seconds: float = 8.0, rounds: int = 5) -> Dict[str, Any]:
+    """
+    比較每段語音的 WAV 產生成本：程式內包裝 PCM vs 舊流程的 ffmpeg MP3→WAV 轉檔
+    
+    Args:
+        seconds: 模擬語音長度（秒）
+        rounds: 重複次數
+    
+    Returns:
+        Dict: in_process_ms、ffmpeg_ms（未安裝 ffmpeg 時為 None）
+    """
+    import math
+    import tempfile
+    
+    sample_rate = TTS_CONFIG['openai_pcm_sample_rate']
+    pcm = b''.join(struct.pack('<h', int(8000 * math.sin(2 * math.pi * 440 * i / sample_rate)))
+                   for i in range(int(seconds * sample_rate)))
+    chunks = [pcm[i:i + 4096] for i in range(0, len(pcm), 4096)]
+    result = {'in_process_ms': None, 'ffmpeg_ms': None}
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        wav_file = Path(temp_dir) / 'speech.wav'
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            with open(wav_file, 'wb') as f:
+                write_pcm_wav(chunks, f, sample_rate)
+        result['in_process_ms'] = (time.perf_counter() - start_time) * 1000 / rounds
+        
+        if shutil.which('ffmpeg'):
+            pcm_file = Path(temp_dir) / 'speech.pcm'
+            mp3_file = Path(temp_dir) / 'speech.mp3'
+            pcm_file.write_bytes(pcm)
+            subprocess.run(['ffmpeg', '-f', 's16le', '-ar', str(sample_rate), '-ac', '1',
+                            '-i', str(pcm_file), '-y', str(mp3_file)], capture_output=True, timeout=60)
+            start_time = time.perf_counter()
+            for _ in range(rounds):
+                subprocess.run(['ffmpeg', '-i', str(mp3_file), '-y', str(wav_file)],
+                               capture_output=True, timeout=30)
+            result['ffmpeg_ms'] = (time.perf_counter() - start_time) * 1000 / rounds
+    
+    return result
+
+# 測試程式
+if __name__ == "__main__":
+    import sys
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 8.0
+    result = run_wav_benchmark(seconds)
+    print(f"{seconds:.0f} 秒語音產生 WAV 的平均耗時:")
+    print(f"  程式內包裝 PCM: {result['in_process_ms']:.1f} ms")
+    if result['ffmpeg_ms'] is None:
+        print("  ffmpeg 轉檔:     未安裝 ffmpeg，略過")
+    else:
+        print(f"  ffmpeg 轉檔:     {result['ffmpeg_ms']:.1f} ms "
+              f"(每段節省 {result['ffmpeg_ms'] - result['in_process_ms']:.1f} ms)")
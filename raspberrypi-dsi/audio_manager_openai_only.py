@@ -9,7 +9,6 @@ import os
 import time
 import threading
 import logging
-import hashlib
 import subprocess
 import struct
 from pathlib import Path
@@ -21,19 +20,17 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
-try:
-    import pygame
-    PYGAME_AVAILABLE = True
-except ImportError:
-    PYGAME_AVAILABLE = False
-
+from tts_cache import get_tts_cache, make_cache_key
+from audio_engine import get_audio_engine
+from http_transport import get_http_session
 from config import (
     AUDIO_CONFIG, 
     TTS_CONFIG, 
     SPEAKER_CONFIG,
     MORNING_GREETINGS,
     TTS_LANGUAGE_MAP,
-    AUDIO_FILES
+    AUDIO_FILES,
+    API_ENDPOINTS
 )
 
 class AudioManager:
@@ -43,11 +40,13 @@ class AudioManager:
         self.logger = logging.getLogger(__name__)
         self.openai_client = None
         self.audio_initialized = False
+        self.audio_engine = None
         self.current_volume = AUDIO_CONFIG['volume']
         self.cache_dir = Path(TTS_CONFIG['cache_dir'])
         
         # 確保快取目錄存在
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.tts_cache = get_tts_cache()
         
         # 初始化音頻系統
         self._initialize_audio()
@@ -61,19 +60,11 @@ class AudioManager:
             # 檢查音頻設備
             self._check_audio_devices()
             
-            # 初始化 Pygame 音頻
-            if PYGAME_AVAILABLE:
-                try:
-                    pygame.mixer.init(
-                        frequency=AUDIO_CONFIG['sample_rate'],
-                        size=-16,  # 16-bit
-                        channels=AUDIO_CONFIG['channels'],
-                        buffer=1024
-                    )
-                    self.audio_initialized = True
-                    self.logger.info("Pygame 音頻系統初始化成功")
-                except Exception as e:
-                    self.logger.warning(f"Pygame 初始化失敗: {e}")
+            # 由常駐音頻引擎持有輸出設備（有 pygame 時在引擎執行緒中初始化 mixer）
+            self.audio_engine = get_audio_engine()
+            self.audio_initialized = self.audio_engine.gapless
+            if self.audio_initialized:
+                self.logger.info("Pygame 音頻系統初始化成功")
             
             # 設置音量
             self.set_volume(self.current_volume)
@@ -199,8 +190,6 @@ class AudioManager:
     def _call_story_generation_api(self, country_code: str, city_name: str, country_name: str, city_data: dict = None) -> Optional[Dict[str, Any]]:
         """調用故事生成 API"""
         try:
-            import requests
-            
             # 準備 API 請求資料
             api_data = {
                 'country_code': country_code,
@@ -210,8 +199,8 @@ class AudioManager:
             }
             
             # 調用 API
-            response = requests.post(
-                TTS_CONFIG.get('story_api_url', 'https://morgan-orcin.vercel.app/api/generatePiStory'),
+            response = get_http_session().post(
+                TTS_CONFIG.get('story_api_url', API_ENDPOINTS['generate_story']),
                 json=api_data,
                 timeout=30
             )
@@ -277,11 +266,14 @@ class AudioManager:
             # 使用配置中的語音
             selected_voice = voice or TTS_CONFIG['openai_voice']
             
-            self.logger.info(f"🤖 使用 OpenAI TTS 生成音頻: {selected_voice}")
+            # 檢查快取
+            key = make_cache_key(text, selected_voice, TTS_CONFIG['openai_model'], TTS_CONFIG['openai_speed'], 'mp3')
+            cached_file = self.tts_cache.get(key)
+            if cached_file:
+                self.logger.info(f"使用快取的音頻文件: {cached_file}")
+                return cached_file
             
-            # 生成唯一的文件名
-            text_hash = hashlib.md5(f"{text}_{language_code}_{selected_voice}".encode()).hexdigest()
-            audio_file = self.cache_dir / f"nova_{language_code}_{text_hash}.mp3"
+            self.logger.info(f"🤖 使用 OpenAI TTS 生成音頻: {selected_voice}")
             
             # 調用 OpenAI TTS API
             response = self.openai_client.audio.speech.create(
@@ -291,17 +283,18 @@ class AudioManager:
                 speed=TTS_CONFIG['openai_speed']
             )
             
-            # 保存音頻文件
-            with open(audio_file, 'wb') as f:
+            # 保存音頻文件（寫入失敗或內容過小時 writer 會刪除暫存檔，不放入快取）
+            size = 0
+            with self.tts_cache.writer(key, 'mp3', selected_voice, text) as f:
                 for chunk in response.iter_bytes():
                     f.write(chunk)
+                    size += len(chunk)
+                if size <= 1000:
+                    raise ValueError(f"OpenAI MP3 文件生成失敗（{size} bytes）")
             
-            if audio_file.exists() and audio_file.stat().st_size > 1000:
-                self.logger.info(f"✨ OpenAI TTS 音頻生成成功: {audio_file}")
-                return audio_file
-            else:
-                self.logger.error("OpenAI MP3 文件生成失敗")
-                return None
+            audio_file = self.tts_cache.path_for(key, 'mp3')
+            self.logger.info(f"✨ OpenAI TTS 音頻生成成功: {audio_file}")
+            return audio_file
                 
         except Exception as e:
             self.logger.error(f"OpenAI TTS 音頻生成失敗: {e}")
@@ -314,21 +307,13 @@ class AudioManager:
                 self.logger.error(f"音頻文件不存在: {audio_file}")
                 return False
             
-            if PYGAME_AVAILABLE and self.audio_initialized:
-                # 使用 Pygame 播放
-                try:
-                    pygame.mixer.music.load(str(audio_file))
-                    pygame.mixer.music.play()
-                    
-                    # 等待播放完成
-                    while pygame.mixer.music.get_busy():
-                        time.sleep(0.1)
-                    
-                    self.logger.info("✅ Pygame 音頻播放完成")
+            if self.audio_engine:
+                # 交給常駐音頻引擎，等待完成通知
+                if self.audio_engine.play(audio_file).result():
+                    self.logger.info(f"✅ 音頻播放完成（{self.audio_engine.backend}）")
                     return True
-                except Exception as e:
-                    self.logger.warning(f"Pygame 播放失敗: {e}")
-                    return self._play_with_alternative_player(audio_file)
+                self.logger.warning("音頻引擎播放失敗")
+                return self._play_with_alternative_player(audio_file)
             else:
                 # 使用替代播放器
                 return self._play_with_alternative_player(audio_file)
@@ -393,8 +378,8 @@ class AudioManager:
     def cleanup(self):
         """清理資源"""
         try:
-            if PYGAME_AVAILABLE and self.audio_initialized:
-                pygame.mixer.quit()
+            if self.audio_engine:
+                self.audio_engine.stop()
             
             # 清理快取
             self._cleanup_cache()
@@ -407,15 +392,9 @@ class AudioManager:
     def _cleanup_cache(self):
         """清理音頻快取"""
         try:
-            if not self.cache_dir.exists():
-                return
-            
-            # 刪除超過 24 小時的快取文件
-            current_time = time.time()
-            for audio_file in self.cache_dir.glob("*.mp3"):
-                if current_time - audio_file.stat().st_mtime > 86400:  # 24小時
-                    audio_file.unlink()
-                    self.logger.debug(f"刪除過期快取文件: {audio_file}")
+            # 刪除超過 24 小時未使用的快取文件，並限制快取容量
+            self.tts_cache.purge_expired(86400)
+            self.tts_cache.evict()
                     
         except Exception as e:
             self.logger.error(f"清理快取失敗: {e}")
@@ -0,0 +1 @@
+"""基準測試：本機模擬伺服器與延遲、吞吐量量測（python3 -m benchmarks.run_benchmarks）"""
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+基準測試用的本機模擬伺服器
+在 127.0.0.1 同一個埠提供 find-city、generatePiStory、save-record 與 OpenAI audio/speech，
+可設定延遲、抖動與錯誤率；音頻以串流方式分段送出，不需要網路
+"""
+
+import json
+import time
+import random
+import struct
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+PCM_SAMPLE_RATE = 24000        # 與 OpenAI TTS 的 PCM 輸出相同（16-bit 單聲道）
+SPEECH_CHARS_PER_SECOND = 6    # 模擬語音長度：每秒約念 6 個字
+STREAM_CHUNK_BYTES = 4096
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, 單聲道的靜音幀（每幀 417 位元組、約 26 ms）
+MP3_FRAME = b'\xff\xfb\x90\xc4' + b'\x00' * 413
+MP3_FRAME_SECONDS = 1152 / 44100
+
+CITIES = [
+    {'name': 'Tokyo', 'name_zh': '東京', 'country': 'Japan', 'country_zh': '日本', 'country_iso_code': 'JP',
+     'latitude': 35.68, 'longitude': 139.69, 'timezone': {'timeZoneId': 'Asia/Tokyo'}, 'population': 13960000},
+    {'name': 'Nairobi', 'name_zh': '奈洛比', 'country': 'Kenya', 'country_zh': '肯亞', 'country_iso_code': 'KE',
+     'latitude': -1.29, 'longitude': 36.82, 'timezone': {'timeZoneId': 'Africa/Nairobi'}, 'population': 4397000},
+    {'name': 'Lima', 'name_zh': '利馬', 'country': 'Peru', 'country_zh': '秘魯', 'country_iso_code': 'PE',
+     'latitude': -12.05, 'longitude': -77.04, 'timezone': {'timeZoneId': 'America/Lima'}, 'population': 9752000},
+]
+
+
+class FakeBackend:
+    """
+    本機模擬後端
+
+    每個請求先等待 latency ± jitter 秒，之後以 error_rate 的機率返回 HTTP 500；
+    route_latency 可個別指定路徑的延遲（例如故事生成比找城市慢）。
+    音頻串流的第一個區塊在延遲後送出，之後每個區塊間隔 stream_interval 秒。
+    """
+
+    def __init__(self, latency: float = 0.02, jitter: float = 0.005, error_rate: float = 0.0,
+                 route_latency: Dict[str, float] = None, stream_interval: float = 0.002,
+                 seed: int = 0, host: str = '127.0.0.1', port: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.route_latency = route_latency or {}
+        self.stream_interval = stream_interval
+        self.host = host
+        self.port = port
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._story_count = 0
+        self.requests: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.saved_records = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> 'FakeBackend':
+        backend = self
+        handler = type('FakeHandler', (_FakeHandler,), {'backend': backend})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-backend', daemon=True)
+        self._thread.start()
+        logger.info(f"🧪 模擬後端已啟動: {self.base_url}")
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join(timeout=5)
+            self._server = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'requests': dict(self.requests), 'errors': dict(self.errors), 'saved_records': self.saved_records}
+
+    def _begin(self, route: str) -> bool:
+        """記錄請求並等待模擬延遲；返回 False 表示這次要模擬伺服器錯誤"""
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+            delay = self.route_latency.get(route, self.latency) + self._random.uniform(-self.jitter, self.jitter)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors[route] = self.errors.get(route, 0) + 1
+        time.sleep(max(0.0, delay))
+        return not failed
+
+    # ------------------------------------------------------------------
+    # 各 API 的回應內容
+    # ------------------------------------------------------------------
+
+    def find_city(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            city = dict(self._random.choice(CITIES))
+        return {'success': True, 'city': city, 'params': params}
+
+    def generate_story(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._story_count += 1
+            count = self._story_count
+        # 每次故事內容不同，TTS 不會命中快取
+        story = (f"今天是第 {count} 次在{params.get('city', '')}醒來。街角的麵包店剛出爐，"
+                 f"空氣裡有咖啡和雨後的味道。祝你有美好的一天，記得抬頭看看天空。")
+        return {'greeting': 'Good morning!', 'language': 'English', 'languageCode': 'en-US',
+                'story': story, 'chineseStory': story, 'trivia': story}
+
+    def save_record(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        records = body.get('records')
+        with self._lock:
+            self.saved_records += len(records) if records is not None else 1
+        if records is None:
+            return {'success': True, 'id': body.get('idempotencyKey') or 'fake-id'}
+        return {'success': True, 'results': [{'idempotencyKey': r.get('idempotencyKey'), 'success': True,
+                                              'id': r.get('idempotencyKey')} for r in records]}
+
+    def speech(self, text: str, audio_format: str) -> bytes:
+        """與文字長度成比例的靜音音頻"""
+        seconds = max(0.5, len(text) / SPEECH_CHARS_PER_SECOND)
+        if audio_format == 'pcm':
+            return b'\x00\x00' * int(PCM_SAMPLE_RATE * seconds)
+        if audio_format == 'wav':
+            pcm = b'\x00\x00' * int(PCM_SAMPLE_RATE * seconds)
+            header = b'RIFF' + struct.pack('<I', 36 + len(pcm)) + b'WAVEfmt ' + struct.pack(
+                '<IHHIIHH', 16, 1, 1, PCM_SAMPLE_RATE, PCM_SAMPLE_RATE * 2, 2, 16) + b'data' + struct.pack('<I', len(pcm))
+            return header + pcm
+        return MP3_FRAME * max(1, int(seconds / MP3_FRAME_SECONDS))
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    backend: FakeBackend = None
+    protocol_version = 'HTTP/1.1'  # keep-alive，與真實伺服器一樣重用連線
+
+    ROUTES = {
+        '/api/find-city-geonames': 'find_city',
+        '/api/generatePiStory': 'generate_story',
+        '/api/save-record': 'save_record',
+        '/v1/audio/speech': 'speech',
+    }
+
+    def do_POST(self):
+        route = self.ROUTES.get(self.path.split('?')[0])
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            body = {}
+        if not route:
+            self._send_json(404, {'error': 'not found'})
+            return
+        if not self.backend._begin(route):
+            self._send_json(500, {'error': 'simulated failure'})
+            return
+
+        if route == 'speech':
+            self._stream_audio(body)
+        elif route == 'find_city':
+            self._send_json(200, self.backend.find_city(body))
+        elif route == 'generate_story':
+            self._send_json(200, self.backend.generate_story(body))
+        else:
+            self._send_json(200, self.backend.save_record(body))
+
+    def _send_json(self, status: int, data: Dict[str, Any]):
+        payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream_audio(self, body: Dict[str, Any]):
+        audio_format = body.get('response_format', 'mp3')
+        audio = self.backend.speech(body.get('input', ''), audio_format)
+        content_type = {'pcm': 'audio/pcm', 'wav': 'audio/wav'}.get(audio_format, 'audio/mpeg')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for start in range(0, len(audio), STREAM_CHUNK_BYTES):
+            chunk = audio[start:start + STREAM_CHUNK_BYTES]
+            self.wfile.write(f"{len(chunk):x}\r\n".encode('ascii') + chunk + b"\r\n")
+            self.wfile.flush()
+            if self.backend.stream_interval:
+                time.sleep(self.backend.stream_interval)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        logger.debug(f"🧪 {self.address_string()} {format % args}")
+
+
+# 單獨啟動：python3 -m benchmarks.fake_servers [埠號]
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    backend = FakeBackend(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8787).start()
+    print(f"WAKEUPMAP_API_BASE={backend.base_url}")
+    print(f"OPENAI_BASE_URL={backend.base_url}/v1")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        backend.stop()
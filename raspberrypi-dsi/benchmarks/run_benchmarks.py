@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+延遲與吞吐量基準測試
+以真實的 APIClient、AudioManager、FirebaseSync、LocalStorage 程式碼對本機模擬伺服器（fake_servers.py）執行，
+不需要網路；輸出每個階段的 p50/p95/p99、吞吐量與記憶體的 JSON 報告，並可與先前保存的基準比較
+
+用法（在 raspberrypi-dsi 目錄下）：
+    python3 -m benchmarks.run_benchmarks --output baseline.json
+    python3 -m benchmarks.run_benchmarks --compare baseline.json --threshold 0.2
+    python3 -m benchmarks.run_benchmarks --latency 0.3 --jitter 0.1 --error-rate 0.05 --stages story_api,tts_pcm
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import resource
+import tempfile
+import itertools
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+from benchmarks.fake_servers import FakeBackend
+
+logger = logging.getLogger(__name__)
+
+STAGES = ['city_api', 'city_local', 'story_api', 'tts_pcm', 'tts_chunked', 'tts_cache_hit',
+          'storage_write', 'sync_batch']
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """線性內插的百分位數（p 為 0–100）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(durations: List[float], errors: int, items: int = 1) -> Dict[str, Any]:
+    """
+    一個階段的統計
+
+    Args:
+        durations: 每次執行的耗時（秒）
+        errors: 失敗次數
+        items: 每次執行處理的項目數（例如一次同步上傳的記錄數），用於吞吐量
+    """
+    total = sum(durations)
+    ms = [d * 1000 for d in durations]
+    return {
+        'count': len(durations),
+        'errors': errors,
+        'p50_ms': percentile(ms, 50),
+        'p95_ms': percentile(ms, 95),
+        'p99_ms': percentile(ms, 99),
+        'mean_ms': total * 1000 / len(durations) if durations else None,
+        'max_ms': max(ms) if ms else None,
+        'throughput_per_s': len(durations) * items / total if total else None,
+    }
+
+
+def measure(func: Callable[[int], Any], iterations: int, warmup: int = 1, items: int = 1) -> Dict[str, Any]:
+    """執行 warmup + iterations 次，func 以執行序號呼叫；返回值為假或拋出例外都算失敗"""
+    durations, errors = [], 0
+    for i in range(warmup + iterations):
+        start_time = time.perf_counter()
+        try:
+            ok = bool(func(i))
+        except Exception as e:
+            logger.debug(f"執行失敗: {e}")
+            ok = False
+        elapsed = time.perf_counter() - start_time
+        if i >= warmup:
+            durations.append(elapsed)
+            errors += not ok
+    return summarize(durations, errors, items)
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    與基準報告比較各階段的 p50/p95
+
+    Returns:
+        List: 每個階段一項 {stage, p50_change, p95_change, regressed}；變化為比例（0.1 表示慢 10%）
+    """
+    rows = []
+    for stage, current in report['stages'].items():
+        base = baseline.get('stages', {}).get(stage)
+        if not base or current.get('skipped') or base.get('skipped'):
+            continue
+        row = {'stage': stage}
+        for key in ('p50_ms', 'p95_ms'):
+            if current.get(key) is None or not base.get(key):
+                row[key.replace('_ms', '_change')] = None
+            else:
+                row[key.replace('_ms', '_change')] = current[key] / base[key] - 1
+        row['regressed'] = row['p95_change'] is not None and row['p95_change'] > threshold
+        rows.append(row)
+    return rows
+
+
+def current_rss() -> Optional[int]:
+    try:
+        with open('/proc/self/status', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class BenchmarkRunner:
+    """啟動模擬後端、把設定指向它，並依序執行各階段"""
+
+    def __init__(self, backend: FakeBackend, work_dir: str, iterations: int = 20, sync_records: int = 200):
+        self.logger = logging.getLogger(__name__)
+        self.backend = backend
+        self.work_dir = work_dir
+        self.iterations = iterations
+        self.sync_records = sync_records
+        self._audio_manager = None
+
+    def configure(self):
+        """把 API、OpenAI、快取與儲存位置指向模擬後端與暫存目錄（必須在建立各元件之前）"""
+        os.environ['WAKEUPMAP_API_BASE'] = self.backend.base_url
+        os.environ['OPENAI_BASE_URL'] = f"{self.backend.base_url}/v1"
+        os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+        from config import API_ENDPOINTS, API_BASE_URL, TTS_CONFIG, AUDIO_CONFIG, PREFETCH_CONFIG, SYNC_CONFIG
+        for name, url in API_ENDPOINTS.items():
+            API_ENDPOINTS[name] = self.backend.base_url + url[len(API_BASE_URL):]
+        TTS_CONFIG['openai_base_url'] = os.environ['OPENAI_BASE_URL']
+        TTS_CONFIG['openai_api_key'] = os.environ['OPENAI_API_KEY']
+        TTS_CONFIG['cache_dir'] = os.path.join(self.work_dir, 'tts_cache')
+        AUDIO_CONFIG['enabled'] = False       # 不佔用音頻設備，只測生成
+        PREFETCH_CONFIG['enabled'] = False
+        SYNC_CONFIG['rate_per_second'] = 1000  # 測上傳本身，不受權杖桶限速
+
+    def audio_manager(self):
+        if self._audio_manager is None:
+            from audio_manager import AudioManager
+            self._audio_manager = AudioManager()
+            if not self._audio_manager.openai_client:
+                raise RuntimeError("OpenAI 客戶端無法建立（需要 pip install openai）")
+        return self._audio_manager
+
+    def run(self, stages: List[str]) -> Dict[str, Any]:
+        report = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'machine': platform.machine(),
+                'iterations': self.iterations,
+                'fake_backend': {'latency': self.backend.latency, 'jitter': self.backend.jitter,
+                                 'error_rate': self.backend.error_rate,
+                                 'stream_interval': self.backend.stream_interval},
+            },
+            'stages': {},
+        }
+        for stage in stages:
+            self.logger.info(f"⏱️ 執行階段 {stage}...")
+            try:
+                report['stages'][stage] = getattr(self, f'bench_{stage}')()
+            except Exception as e:
+                # 缺少依賴（例如未安裝 requests、openai）或元件無法建立時只略過該階段
+                self.logger.warning(f"略過階段 {stage}: {e}")
+                report['stages'][stage] = {'skipped': str(e)}
+        report['rss'] = {
+            'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            'current_rss_bytes': current_rss(),
+        }
+        report['fake_backend'] = self.backend.get_stats()
+        return report
+
+    # ------------------------------------------------------------------
+    # 各階段
+    # ------------------------------------------------------------------
+
+    CITY_PARAMS = {'targetUTCOffset': 9, 'latitudePreference': 'any', 'targetLatitude': 35,
+                   'useLocalPosition': False, 'userLocalTime': '2024-01-01T07:00:00'}
+
+    def bench_city_api(self) -> Dict[str, Any]:
+        from api_client import APIClient
+        client = APIClient()
+        return measure(lambda i: client._find_city_via_api(dict(self.CITY_PARAMS)), self.iterations)
+
+    def bench_city_local(self) -> Dict[str, Any]:
+        from api_client import APIClient
+        client = APIClient()
+        return measure(lambda i: client._find_city_locally(dict(self.CITY_PARAMS)), self.iterations)
+
+    def bench_story_api(self) -> Dict[str, Any]:
+        manager = self.audio_manager()
+        return measure(lambda i: manager._fetch_greeting_and_story_from_api('Tokyo', 'Japan', 'JP'), self.iterations)
+
+    def _unique_text(self, i: int) -> str:
+        return (f"Good morning! 第 {i} 則測試故事：{time.time_ns()}。街角的麵包店剛出爐，"
+                f"空氣裡有咖啡和雨後的味道。祝你有美好的一天，記得抬頭看看天空。")
+
+    def bench_tts_pcm(self) -> Dict[str, Any]:
+        manager = self.audio_manager()
+        return measure(lambda i: manager._generate_audio_openai_direct(self._unique_text(i), 'en-US', 'nova'),
+                       self.iterations)
+
+    def bench_tts_chunked(self) -> Dict[str, Any]:
+        manager = self.audio_manager()
+        counter = itertools.count()
+        # 每次都用新的句子，避免分句快取命中
+        return measure(lambda i: manager._render_chunked_audio(
+            self._unique_text(i).replace('。', f"{next(counter)}。"), 'en-US', 'nova'), self.iterations)
+
+    def bench_tts_cache_hit(self) -> Dict[str, Any]:
+        manager = self.audio_manager()
+        text = self._unique_text(-1)
+        return measure(lambda i: manager._generate_audio_openai_direct(text, 'en-US', 'nova'), self.iterations)
+
+    def _record(self, i: int) -> Dict[str, Any]:
+        return {'city': 'Tokyo', 'city_zh': '東京', 'country': 'Japan', 'country_zh': '日本',
+                'countryCode': 'JP', 'latitude': 35.68, 'longitude': 139.69, 'timezone': 'Asia/Tokyo',
+                'greeting': 'Good morning!', 'story': f"測試故事 {i}"}
+
+    def bench_storage_write(self) -> Dict[str, Any]:
+        from local_storage import LocalStorage
+        storage = LocalStorage(os.path.join(self.work_dir, 'storage_write'))
+        try:
+            return measure(lambda i: storage.save_wakeup_record(self._record(i)), self.iterations)
+        finally:
+            storage.close()
+
+    def bench_sync_batch(self) -> Dict[str, Any]:
+        """每次重新上傳 sync_records 筆記錄（force=True），吞吐量為每秒上傳的記錄數"""
+        from local_storage import LocalStorage
+        from firebase_sync import FirebaseSync
+        storage = LocalStorage(os.path.join(self.work_dir, 'sync'))
+        for i in range(self.sync_records):
+            storage.save_wakeup_record(self._record(i))
+        sync = FirebaseSync(storage)
+        try:
+            return measure(lambda i: sync.sync_all_records(force=True).get('success'),
+                           max(1, self.iterations // 4), items=self.sync_records)
+        finally:
+            sync.stop()
+            storage.close()
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{'階段':<14} {'次數':>5} {'失敗':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'每秒':>9}"]
+    for stage, stats in report['stages'].items():
+        if stats.get('skipped'):
+            lines.append(f"{stage:<14} 略過：{stats['skipped']}")
+            continue
+        lines.append(f"{stage:<14} {stats['count']:>5} {stats['errors']:>5} {stats['p50_ms']:>9.1f} "
+                     f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['throughput_per_s']:>9.1f}")
+    rss = report['rss']
+    lines.append(f"記憶體：最大 {rss['max_rss_bytes'] / 1024 / 1024:.1f} MB"
+                 + (f"，目前 {rss['current_rss_bytes'] / 1024 / 1024:.1f} MB" if rss['current_rss_bytes'] else ''))
+    return '\n'.join(lines)
+
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    def pct(value):
+        return '     -' if value is None else f"{value * 100:+6.1f}%"
+    lines = [f"{'階段':<14} {'p50':>8} {'p95':>8}"]
+    for row in rows:
+        mark = '  ⚠️ 退步' if row['regressed'] else ''
+        lines.append(f"{row['stage']:<14} {pct(row['p50_change']):>8} {pct(row['p95_change']):>8}{mark}")
+    return '\n'.join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="甦醒地圖基準測試（本機模擬伺服器，不需要網路）")
+    parser.add_argument('--iterations', type=int, default=20, help="每個階段的執行次數")
+    parser.add_argument('--stages', default=','.join(STAGES), help="要執行的階段（逗號分隔）")
+    parser.add_argument('--latency', type=float, default=0.02, help="模擬伺服器延遲（秒）")
+    parser.add_argument('--jitter', type=float, default=0.005, help="延遲抖動（秒，均勻分布）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="模擬伺服器錯誤率（0–1）")
+    parser.add_argument('--stream-interval', type=float, default=0.002, help="音頻串流區塊間隔（秒）")
+    parser.add_argument('--sync-records', type=int, default=200, help="同步階段每次上傳的記錄數")
+    parser.add_argument('--seed', type=int, default=0, help="延遲與錯誤的亂數種子")
+    parser.add_argument('--output', help="報告 JSON 輸出位置")
+    parser.add_argument('--compare', help="與此基準報告比較，p95 退步超過門檻時返回 1")
+    parser.add_argument('--threshold', type=float, default=0.2, help="p95 退步門檻（比例）")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"未知的階段: {', '.join(unknown)}（可用: {', '.join(STAGES)}）")
+
+    backend = FakeBackend(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          stream_interval=args.stream_interval, seed=args.seed).start()
+    work_dir = tempfile.mkdtemp(prefix='wakeupmap-bench-')
+    try:
+        runner = BenchmarkRunner(backend, work_dir, args.iterations, args.sync_records)
+        runner.configure()
+        report = runner.run(stages)
+    finally:
+        backend.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n📊 報告已保存: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print(f"\n與基準比較（{baseline['meta']['timestamp']}，門檻 {args.threshold * 100:.0f}%）")
+        print(format_comparison(rows))
+        if any(row['regressed'] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+冷啟動流程
+重量級模組（selenium、openai、pygame、pigpio）延後到各子系統啟動時才載入，以甦醒流程管線並行啟動
+按鈕、瀏覽器與音頻，讓按鈕儘早就緒；啟動過程記錄為名為 boot 的追蹤（模組載入與各子系統區段、
+里程碑事件），與按鈕追蹤一起保存，可用 python3 tracing.py 匯出
+"""
+
+import os
+import re
+import sys
+import logging
+import importlib
+import threading
+import subprocess
+from typing import Callable, Dict, Any, List, Optional, Iterable
+
+from config import BOOT_CONFIG
+from tracing import Tracer, get_tracer, now, span, current_trace
+from wakeup_pipeline import PipelineRunner, PipelineRun, Stage, STAGE_DONE
+from metrics import get_registry
+
+logger = logging.getLogger(__name__)
+
+# 沒有追蹤時完成的模組載入，開始啟動追蹤時補上
+_pending_imports: List[Dict[str, Any]] = []
+_imports_lock = threading.Lock()
+
+# python -X importtime 的輸出：import time: self [us] | cumulative | 縮排表示巢狀的模組名稱
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+
+def process_start_time() -> float:
+    """本行程的啟動時間（Unix 時間，讀取 /proc；無法讀取時返回現在）"""
+    try:
+        with open('/proc/self/stat', encoding='utf-8') as f:
+            # 行程名稱可能含空白，從最後一個右括號之後開始數欄位（第 22 欄為啟動時的 clock tick）
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat', encoding='utf-8') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return min(boot_time + start_ticks / os.sysconf('SC_CLK_TCK'), now())
+    except (OSError, ValueError, IndexError, StopIteration):
+        return now()
+
+
+def lazy_import(name: str):
+    """
+    載入模組並將載入時間記錄為 import.<模組> 區段（在目前的追蹤中；沒有追蹤時留給下一次啟動追蹤）
+
+    已載入的模組直接返回，不記錄。
+    """
+    if name in sys.modules:
+        return importlib.import_module(name)
+    trace = current_trace()
+    if trace is None:
+        start, loaded = now(), len(sys.modules)
+        module = importlib.import_module(name)
+        with _imports_lock:
+            _pending_imports.append({'name': name, 'start': start, 'end': now(),
+                                     'modules': len(sys.modules) - loaded})
+        return module
+    with trace.span(f'import.{name}') as record:
+        loaded = len(sys.modules)
+        module = importlib.import_module(name)
+        record['args']['modules'] = len(sys.modules) - loaded
+    return module
+
+
+class BootSequence:
+    """啟動流程：以管線並行啟動各子系統，記錄啟動追蹤與里程碑（例如按鈕就緒）"""
+
+    def __init__(self, runner: PipelineRunner, tracer: Tracer = None, budgets: Dict[str, float] = None):
+        """
+        Args:
+            runner: 執行啟動階段的管線（與按鈕流程共用）
+            tracer: 保存啟動追蹤的追蹤器
+            budgets: {里程碑: 目標秒數}，預設為 BOOT_CONFIG['budgets']
+        """
+        self.logger = logging.getLogger(__name__)
+        self.runner = runner
+        self.tracer = tracer or get_tracer()
+        self.budgets = BOOT_CONFIG['budgets'] if budgets is None else budgets
+        self.trace = None
+        self.pipeline_run: Optional[PipelineRun] = None
+        self.milestones: Dict[str, float] = {}
+        self._events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._milestone_gauge = get_registry().gauge('boot_milestone_seconds', "行程啟動到各啟動里程碑的時間",
+                                                     ['milestone'])
+
+    def start(self, stages: Iterable[Stage], milestones: Dict[str, str] = None) -> PipelineRun:
+        """
+        開始啟動（不阻塞）
+
+        Args:
+            stages: 各子系統的啟動階段（一般函數），互不相依的階段並行
+            milestones: {階段名稱: 里程碑名稱}，階段完成時記錄里程碑；全部階段結束時記錄 ready
+
+        Returns:
+            PipelineRun: 可用 result() 等待全部階段
+        """
+        start = process_start_time()
+        self.trace = self.tracer.start_trace('boot', start=start, pid=os.getpid())
+        # 行程啟動到這裡：直譯器啟動與主程式頂層的模組載入
+        self.trace.add_span('boot.interpreter', start, now())
+        with _imports_lock:
+            pending, _pending_imports[:] = list(_pending_imports), []
+        for record in pending:
+            self.trace.add_span(f"import.{record['name']}", record['start'], record['end'], modules=record['modules'])
+
+        milestones = milestones or {}
+        wrapped = []
+        for stage in stages:
+            if not stage.blocking:
+                raise ValueError(f"啟動階段 {stage.name} 須為一般函數")
+            wrapped.append(Stage(stage.name, self._wrap(stage, milestones.get(stage.name)), stage.deps, stage.always))
+
+        with self.trace.activate():
+            self.pipeline_run = self.runner.run('boot', wrapped)
+        self.pipeline_run.future.add_done_callback(self._finish)
+        return self.pipeline_run
+
+    def _wrap(self, stage: Stage, milestone: Optional[str]) -> Callable[[Dict[str, Any]], Any]:
+        def run_stage(results):
+            with span(f'boot.{stage.name}'):
+                result = stage.func(results)
+            if milestone:
+                self.mark(milestone)
+            return result
+        return run_stage
+
+    def mark(self, name: str):
+        """記錄里程碑：啟動追蹤中的 boot.<名稱> 事件與 boot_milestone_seconds 指標"""
+        self._record(name).set()
+
+    def _record(self, name: str) -> threading.Event:
+        elapsed = now() - self.trace.start
+        with self._lock:
+            self.milestones[name] = elapsed
+            ready = self._events.setdefault(name, threading.Event())
+        self.trace.event(f'boot.{name}')
+        self._milestone_gauge.set(elapsed, milestone=name)
+        budget = self.budgets.get(name)
+        if budget and elapsed > budget:
+            self.logger.warning(f"⚠️ 啟動里程碑 {name}: 行程啟動後 {elapsed:.2f}s，超過目標 {budget}s")
+        else:
+            self.logger.info(f"🚦 啟動里程碑 {name}: 行程啟動後 {elapsed:.2f}s")
+        return ready
+
+    def wait(self, name: str, timeout: float = None) -> bool:
+        """等待里程碑，返回是否已達成"""
+        with self._lock:
+            ready = self._events.setdefault(name, threading.Event())
+        return ready.wait(timeout)
+
+    def reached(self, name: str) -> bool:
+        with self._lock:
+            return name in self.milestones
+
+    def _finish(self, future):
+        run = self.pipeline_run
+        failed = [name for name, record in run.records.items() if record['status'] != STAGE_DONE]
+        # 啟動追蹤保存後才通知等待 ready 的一方
+        ready = self._record('ready')
+        self.tracer.finish(self.trace, success=not failed and not future.cancelled(), failed=failed,
+                           critical_path=run.critical_path(),
+                           milestones={name: round(seconds, 3) for name, seconds in self.milestones.items()})
+        ready.set()
+
+
+def measure_imports(module: str = 'main_web_dsi', cwd: str = None) -> List[Dict[str, Any]]:
+    """
+    以 python -X importtime 在子行程載入模組
+
+    Returns:
+        list: 依載入順序的 {'module', 'self_us', 'cumulative_us', 'depth'}
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, timeout=120,
+                            cwd=cwd or os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(f"載入 {module} 失敗: {lines[-1] if lines else result.returncode}")
+    records = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            records.append({'module': match.group(4), 'self_us': int(match.group(1)),
+                            'cumulative_us': int(match.group(2)), 'depth': (len(match.group(3)) - 1) // 2})
+    return records
+
+
+def deferred_violations(records: List[Dict[str, Any]], deferred: Iterable[str] = None) -> List[str]:
+    """應延後載入卻已在載入時出現的模組（比對頂層套件名稱）"""
+    deferred = set(BOOT_CONFIG['deferred_modules'] if deferred is None else deferred)
+    return sorted({record['module'].split('.')[0] for record in records} & deferred)
+
+
+def format_imports(records: List[Dict[str, Any]], top: int = 15) -> str:
+    """模組載入時間轉為文字（依累計時間排序）"""
+    total = sum(record['cumulative_us'] for record in records if record['depth'] == 0)
+    lines = [f"📦 共載入 {len(records)} 個模組，累計 {total / 1000:.0f} ms"]
+    for record in sorted(records, key=lambda r: r['cumulative_us'], reverse=True)[:top]:
+        lines.append(f"   {record['module']:<40} {record['cumulative_us'] / 1000:>8.1f} ms"
+                     f"  (自身 {record['self_us'] / 1000:.1f} ms)")
+    return '\n'.join(lines)
+
+
+# 檢查工具：python3 boot.py [模組] [顯示幾個]
+# 列出載入最慢的模組；應延後的模組出現時返回 1，可放進部署前檢查
+if __name__ == "__main__":
+    from tracing import load_traces, format_summary
+    from config import TRACING_CONFIG
+
+    module = sys.argv[1] if len(sys.argv) > 1 else 'main_web_dsi'
+    records = measure_imports(module)
+    print(format_imports(records, int(sys.argv[2]) if len(sys.argv) > 2 else 15))
+
+    boots = [trace for trace in load_traces(TRACING_CONFIG['jsonl_file']) if trace['name'] == 'boot']
+    if boots:
+        print()
+        print(format_summary(boots[-1]))
+
+    violations = deferred_violations(records)
+    if violations:
+        print(f"\n❌ 載入 {module} 時就載入了應延後的模組: {', '.join(violations)}")
+        sys.exit(1)
+    print(f"\n✅ 載入 {module} 時沒有載入應延後的模組")
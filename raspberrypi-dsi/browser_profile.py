@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+持久的 Chrome 設定檔
+設定檔放在不會於重開機時清空的目錄，HTTP 快取（Firebase SDK、Leaflet、字型、地圖圖磚）在開機後仍可使用；
+啟動前清除上次異常關機留下的鎖定文件與「還原分頁」提示，並限制快取大小
+"""
+
+import os
+import json
+import shutil
+import logging
+from pathlib import Path
+from typing import Dict, Any, List
+
+from config import BROWSER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 可隨時刪除、Chrome 會重建的快取目錄
+CACHE_DIRS = ('Default/Cache', 'Default/Code Cache', 'Default/GPUCache', 'GrShaderCache', 'ShaderCache')
+LOCK_FILES = ('SingletonLock', 'SingletonSocket', 'SingletonCookie')
+
+
+def directory_size(path: Path) -> int:
+    """目錄內所有文件的大小總和（位元組，不跟隨符號連結）"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+class ChromeProfile:
+    """Chrome 設定檔目錄的管理"""
+
+    def __init__(self, path: str = None, max_bytes: int = None, disk_cache_size: int = None):
+        """
+        Args:
+            path: 設定檔目錄，預設為 BROWSER_CONFIG['profile_dir']
+            max_bytes: 啟動前超過此大小時清除快取目錄
+            disk_cache_size: Chrome HTTP 快取上限（位元組）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path or BROWSER_CONFIG['profile_dir'])
+        self.max_bytes = BROWSER_CONFIG['profile_max_bytes'] if max_bytes is None else max_bytes
+        self.disk_cache_size = BROWSER_CONFIG['disk_cache_size'] if disk_cache_size is None else disk_cache_size
+
+    def chrome_arguments(self) -> List[str]:
+        return [
+            f'--user-data-dir={self.path}',
+            f'--disk-cache-size={self.disk_cache_size}',
+            '--hide-crash-restore-bubble',
+        ]
+
+    def is_warm(self) -> bool:
+        """HTTP 快取中是否已有內容"""
+        cache = self.path / 'Default' / 'Cache'
+        return cache.is_dir() and any(cache.rglob('*'))
+
+    def prepare(self) -> Dict[str, Any]:
+        """
+        啟動 Chrome 前的準備：建立目錄、清除過期的鎖定文件、標記上次正常關閉、超過上限時清除快取
+
+        Returns:
+            dict: {'warm': 是否已有快取, 'size_bytes': 設定檔大小, 'cleared_bytes': 這次清除的快取大小}
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._remove_stale_locks()
+        self._mark_clean_exit()
+
+        size = directory_size(self.path)
+        cleared = 0
+        if self.max_bytes and size > self.max_bytes:
+            cleared = self.clear_cache()
+            self.logger.warning(f"🧹 Chrome 設定檔 {size / 1048576:.0f} MB 超過上限 "
+                                f"{self.max_bytes / 1048576:.0f} MB，已清除快取 {cleared / 1048576:.0f} MB")
+            size -= cleared
+
+        warm = self.is_warm()
+        if warm:
+            self.logger.info(f"🔥 使用已有快取的 Chrome 設定檔 {self.path}（{size / 1048576:.1f} MB）")
+        else:
+            self.logger.info(f"❄️ 新的 Chrome 設定檔 {self.path}，這次需要從網路下載所有資源")
+        return {'warm': warm, 'size_bytes': size, 'cleared_bytes': cleared}
+
+    def clear_cache(self) -> int:
+        """刪除快取目錄（保留 Cookie 與 localStorage 等登入狀態），返回釋放的位元組數"""
+        freed = 0
+        for relative in CACHE_DIRS:
+            cache = self.path / relative
+            if cache.is_dir():
+                freed += directory_size(cache)
+                shutil.rmtree(cache, ignore_errors=True)
+        return freed
+
+    def _remove_stale_locks(self):
+        """
+        刪除上次異常關機留下的 Singleton* 文件
+
+        SingletonLock 是指向「主機名稱-PID」的符號連結；該行程仍在執行時表示設定檔使用中，不刪除。
+        """
+        lock = self.path / 'SingletonLock'
+        try:
+            pid = os.readlink(lock).rsplit('-', 1)[-1]
+        except OSError:
+            pid = None
+        if pid and pid.isdigit() and os.path.exists(f'/proc/{pid}'):
+            self.logger.warning(f"⚠️ Chrome 設定檔正由行程 {pid} 使用中")
+            return
+        for name in LOCK_FILES:
+            path = self.path / name
+            if os.path.lexists(path):
+                try:
+                    path.unlink()
+                except OSError as e:
+                    self.logger.warning(f"無法刪除 {path}: {e}")
+
+    def _mark_clean_exit(self):
+        """將上次關閉標記為正常，避免斷電後出現「還原分頁」提示遮住頁面"""
+        preferences = self.path / 'Default' / 'Preferences'
+        try:
+            data = json.loads(preferences.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        profile = data.setdefault('profile', {})
+        if profile.get('exit_type') == 'Normal' and profile.get('exited_cleanly', True):
+            return
+        profile['exit_type'] = 'Normal'
+        profile['exited_cleanly'] = True
+        try:
+            preferences.write_text(json.dumps(data), encoding='utf-8')
+        except OSError as e:
+            self.logger.warning(f"無法更新 Chrome 偏好設定: {e}")
+
+
+# 管理工具：python3 browser_profile.py [status|clear|warm]
+# warm 以目前的設定啟動一次瀏覽器並載入頁面，讓第一次開機也有快取（例如安裝後執行）
+if __name__ == "__main__":
+    import sys
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+
+    profile = ChromeProfile()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    if command == 'clear':
+        print(f"🧹 已清除快取 {profile.clear_cache() / 1048576:.1f} MB")
+    elif command == 'warm':
+        from web_controller_dsi import WebControllerDSI
+
+        controller = WebControllerDSI()
+        if controller.start_browser():
+            try:
+                controller.driver.get(controller.website_url)
+                time.sleep(5)  # 讓地圖圖磚與延後載入的資源也進入快取
+                print(controller.page_timing())
+            finally:
+                controller.stop()
+    print(f"📁 {profile.path}: {directory_size(profile.path) / 1048576:.1f} MB，"
+          f"{'已有快取' if profile.is_warm() else '沒有快取'}")
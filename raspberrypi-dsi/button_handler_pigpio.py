@@ -11,6 +11,7 @@ import threading
 import logging
 from typing import Callable, Optional
 from config import BUTTON_CONFIG, LED_CONFIG
+from tracing import get_tracer, now as trace_now
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +30,7 @@ class ButtonHandlerPigpio:
         
         # 按鈕狀態
         self.last_press_time = 0
+        self.last_edge_time = 0  # 最近一次邊緣的時間（延遲追蹤的起點）
         self.press_start_time = 0
         self.is_pressed = False
         self.long_press_triggered = False
@@ -85,6 +87,7 @@ class ButtonHandlerPigpio:
     
     def _button_edge_callback(self, gpio, level, tick):
         """統一的邊緣檢測回調 - pigpio版本"""
+        self.last_edge_time = trace_now()
         try:
             if BUTTON_CONFIG['pull_up']:
                 # 上拉電阻：LOW = 按下，HIGH = 釋放
@@ -159,10 +162,13 @@ class ButtonHandlerPigpio:
         if self.led_pin:
             self._led_flash(times=1, duration=0.1)
         
-        # 執行短按回調
+        # 執行短按回調（這次按鈕的追蹤從釋放邊緣開始）
         if self.on_short_press:
+            trace = get_tracer().start_trace('button_press', start=self.last_edge_time)
+            trace.add_span('button.edge_to_callback', self.last_edge_time, trace_now())
             try:
-                self.on_short_press()
+                with trace.activate():
+                    self.on_short_press()
             except Exception as e:
                 logger.error(f"短按回調執行失敗: {e}")
     
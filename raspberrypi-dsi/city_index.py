@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 本機城市空間索引
+在裝置上重現 /api/find-city-geonames 的城市搜尋規則，避免每次按鈕都呼叫 API
+"""
+
+import json
+import math
+import random
+import time
+import logging
+import threading
+from pathlib import Path
+from collections.abc import Sequence
+from typing import Optional, Dict, Any, List, Tuple
+
+from config import CITY_INDEX_CONFIG
+
+# NumPy 為可選依賴：用於整天的批次城市搜尋
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 與伺服器 searchCities 相同的漸進式搜尋範圍
+LONGITUDE_RANGES = [7, 15, 30, 45]   # 經度範圍：±7°, ±15°, ±30°, ±45°
+LATITUDE_RANGES = [5, 10, 20, 30]    # 緯度範圍：±5°, ±10°, ±20°, ±30°
+MAX_CANDIDATES = 20                  # 伺服器只返回前 20 個城市
+MAX_NEARBY_CITIES = 50               # 用戶位置模式返回最近的 50 個城市
+BATCH_CHUNK_SIZE = 64                # 批次搜尋每次處理的查詢數（限制記憶體用量）
+
+LATITUDE_CATEGORY_NAMES = {
+    'high': '高緯度',
+    'mid-high': '中高緯度',
+    'mid': '中緯度',
+    'low': '低緯度'
+}
+
+
+def js_round(value: float) -> int:
+    """與 JavaScript Math.round 相同的四捨五入（.5 一律向上）"""
+    return int(math.floor(value + 0.5))
+
+
+def get_latitude_category(latitude: float) -> str:
+    """根據緯度分類（對應伺服器 getLatitudeCategory）"""
+    abs_lat = abs(latitude)
+    if abs_lat >= 60:
+        return 'high'
+    if abs_lat >= 45:
+        return 'mid-high'
+    if abs_lat >= 30:
+        return 'mid'
+    return 'low'
+
+
+def calculate_timezone_offset(longitude: float) -> int:
+    """根據經度粗估時區偏移（對應伺服器 calculateTimezoneOffset）"""
+    return js_round(longitude / 15)
+
+
+def calculate_longitude_difference(lng1: float, lng2: float) -> float:
+    """計算經度差異，處理跨越 180 度經線的情況"""
+    diff = abs(lng1 - lng2)
+    if diff > 180:
+        diff = 360 - diff
+    return diff
+
+
+def target_longitude_from_offset(target_offset: float) -> float:
+    """由 UTC 偏移計算目標經度，並正規化到 -180~180"""
+    target_longitude = target_offset * 15
+    while target_longitude > 180:
+        target_longitude -= 360
+    while target_longitude < -180:
+        target_longitude += 360
+    return target_longitude
+
+
+def calculate_geographic_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine 公式計算地理距離（公里）"""
+    r = 6371
+    d_lat = (lat2 - lat1) * math.pi / 180
+    d_lon = (lon2 - lon1) * math.pi / 180
+    a = (math.sin(d_lat / 2) * math.sin(d_lat / 2) +
+         math.cos(lat1 * math.pi / 180) * math.cos(lat2 * math.pi / 180) *
+         math.sin(d_lon / 2) * math.sin(d_lon / 2))
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return r * c
+
+
+def is_local_time_window(hours: int, minutes: int) -> bool:
+    """7:50-8:10 特例時間段（使用用戶當地位置）"""
+    return (hours == 7 and minutes >= 50) or (hours == 8 and minutes <= 10)
+
+
+def target_latitude_from_minutes(minutes: int) -> float:
+    """線性映射避免極地：0分=北緯70度，30分≈赤道0度，59分=南緯70度"""
+    return 70 - (minutes * 140 / 59)
+
+
+def matches_latitude_preference(latitude: float, latitude_preference: str) -> bool:
+    """檢查城市是否符合緯度偏好（保留伺服器的字串切割行為）"""
+    if latitude_preference == 'any':
+        return True
+
+    category = get_latitude_category(latitude)
+    hemisphere = 'north' if latitude >= 0 else 'south'
+
+    if '-' in latitude_preference:
+        parts = latitude_preference.split('-')
+        return category == parts[0] and hemisphere == parts[1]
+    return category == latitude_preference
+
+
+class CityIndex:
+    """城市空間索引：以經緯度網格加速伺服器的漸進式城市搜尋"""
+
+    def __init__(self, cities: Sequence, cell_size: float = 5.0,
+                 latitudes: List[float] = None, longitudes: List[float] = None):
+        """
+        Args:
+            cities: 城市資料序列（cities_data.json 的內容或 CityTable，順序需保持不變）
+            cell_size: 網格大小（度）
+            latitudes: 預先取出的緯度列表（可選，避免逐列解碼）
+            longitudes: 預先取出的經度列表（可選）
+        """
+        self.cities = cities
+        self.cell_size = cell_size
+        self._lon_cells = int(math.ceil(360 / cell_size))
+        self._lat_cells = int(math.ceil(180 / cell_size))
+        self._latitudes = latitudes if latitudes is not None else [float(city['latitude']) for city in cities]
+        self._longitudes = longitudes if longitudes is not None else [float(city['longitude']) for city in cities]
+
+        # 網格：(緯度格, 經度格) -> 城市索引列表（依原始順序）
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        for i, (lat, lon) in enumerate(zip(self._latitudes, self._longitudes)):
+            self._grid.setdefault(self._cell_of(lat, lon), []).append(i)
+
+    @classmethod
+    def from_json(cls, data_file: str = None) -> 'CityIndex':
+        """從 cities_data.json 建立索引"""
+        data_file = Path(data_file or CITY_INDEX_CONFIG['data_file'])
+        start_time = time.time()
+        with open(data_file, 'r', encoding='utf-8') as f:
+            cities = json.load(f)
+        index = cls(cities)
+        logger.info(f"本機城市索引載入完成: {len(cities)} 個城市 (耗時: {(time.time() - start_time) * 1000:.0f}ms)")
+        return index
+
+    @classmethod
+    def from_table(cls, table_file: str = None) -> 'CityIndex':
+        """從 mmap 二進位城市資料表建立索引（城市資料在取用時才解碼）"""
+        from city_table import CityTable
+
+        start_time = time.time()
+        table = CityTable(table_file)
+        index = cls(table, latitudes=table.latitudes(), longitudes=table.longitudes())
+        logger.info(f"本機城市索引載入完成 (資料表): {len(table)} 個城市 (耗時: {(time.time() - start_time) * 1000:.0f}ms)")
+        return index
+
+    @classmethod
+    def load(cls) -> 'CityIndex':
+        """優先載入二進位資料表，資料表不存在或過期時改讀 JSON"""
+        from city_table import is_table_fresh
+
+        if is_table_fresh():
+            try:
+                return cls.from_table()
+            except Exception as e:
+                logger.warning(f"城市資料表載入失敗，改用 JSON: {e}")
+        else:
+            logger.info("城市資料表不存在或已過期，使用 JSON（可執行 python3 city_table.py build 建立）")
+        return cls.from_json()
+
+    def __len__(self) -> int:
+        return len(self.cities)
+
+    def _cell_of(self, lat: float, lon: float) -> Tuple[int, int]:
+        """計算座標所屬的網格"""
+        lat_cell = min(max(int(math.floor((lat + 90) / self.cell_size)), 0), self._lat_cells - 1)
+        lon_cell = min(max(int(math.floor((lon + 180) / self.cell_size)), 0), self._lon_cells - 1)
+        return lat_cell, lon_cell
+
+    def _candidate_indices(self, target_longitude: float, longitude_range: float,
+                           target_latitude: Optional[float], latitude_range: float) -> List[int]:
+        """取出可能落在搜尋窗口內的城市索引（前後各多取一格避免邊界誤差）"""
+        if target_latitude is None:
+            lat_rows = range(self._lat_cells)
+        else:
+            first = int(math.floor((target_latitude - latitude_range + 90) / self.cell_size)) - 1
+            last = int(math.floor((target_latitude + latitude_range + 90) / self.cell_size)) + 1
+            lat_rows = range(max(first, 0), min(last, self._lat_cells - 1) + 1)
+
+        if longitude_range * 2 >= 360:
+            lon_cols = range(self._lon_cells)
+        else:
+            first = int(math.floor((target_longitude - longitude_range + 180) / self.cell_size)) - 1
+            last = int(math.floor((target_longitude + longitude_range + 180) / self.cell_size)) + 1
+            lon_cols = sorted({col % self._lon_cells for col in range(first, last + 1)})
+
+        indices = []
+        for lat_cell in lat_rows:
+            for lon_cell in lon_cols:
+                indices.extend(self._grid.get((lat_cell, lon_cell), ()))
+        return indices
+
+    def search_cities(self, target_offset: float, target_latitude: Optional[float] = None,
+                      latitude_preference: str = 'any') -> List[Dict[str, Any]]:
+        """
+        漸進式搜尋城市（與伺服器 searchCities 結果一致）
+
+        Args:
+            target_offset: 目標 UTC 偏移
+            target_latitude: 目標緯度，None 表示不限制緯度
+            latitude_preference: 緯度偏好 ('any', 'low', 'mid-north' ...)
+
+        Returns:
+            List[Dict]: 最多 20 個候選城市，依緯度差距排序
+        """
+        return [self.cities[i] for i in self.search_city_indices(target_offset, target_latitude, latitude_preference)]
+
+    def search_city_indices(self, target_offset: float, target_latitude: Optional[float] = None,
+                            latitude_preference: str = 'any') -> List[int]:
+        """與 search_cities 相同，但返回城市在資料表中的索引"""
+        target_longitude = target_longitude_from_offset(target_offset)
+        latitudes = self._latitudes
+        longitudes = self._longitudes
+
+        for longitude_range, latitude_range in zip(LONGITUDE_RANGES, LATITUDE_RANGES):
+            candidates = []
+            for i in self._candidate_indices(target_longitude, longitude_range, target_latitude, latitude_range):
+                if calculate_longitude_difference(longitudes[i], target_longitude) > longitude_range:
+                    continue
+                if target_latitude is not None and abs(latitudes[i] - target_latitude) > latitude_range:
+                    continue
+                if not matches_latitude_preference(latitudes[i], latitude_preference):
+                    continue
+                candidates.append(i)
+
+            if candidates:
+                # 恢復資料檔中的原始順序，確保排序穩定性與伺服器一致
+                candidates.sort()
+                if target_latitude is not None:
+                    candidates.sort(key=lambda i: abs(latitudes[i] - target_latitude))
+                logger.debug(f"範圍 ±{longitude_range}°/±{latitude_range}° 找到 {len(candidates)} 個城市")
+                return candidates[:MAX_CANDIDATES]
+
+        logger.debug("所有搜尋範圍都沒有找到城市")
+        return []
+
+    def find_city_indices_batch(self, times, utc_offset: Optional[float] = None,
+                                latitude_preference: str = 'any') -> List[Optional[List[int]]]:
+        """
+        批次計算多個時間點的候選城市（例如一天 1440 分鐘）
+
+        時間→緯度的規則與 APIClient.calculate_target_latitude_from_time 相同，
+        目標經度由 UTC 偏移計算；相同的 (緯度, 偏移) 查詢只計算一次。
+
+        Args:
+            times: 時間點序列（datetime 為當地時間，數字為 Unix 秒數）
+            utc_offset: 裝置 UTC 偏移（小時），預設為目前系統時區
+            latitude_preference: 緯度偏好
+
+        Returns:
+            List: 每個時間點的候選城市索引列表；7:50-8:10 特例時間段為 None
+        """
+        if utc_offset is None:
+            utc_offset = time.localtime().tm_gmtoff / 3600
+
+        # 每個時間點對應的目標緯度（特例時間段為 None）
+        targets = []
+        for moment in times:
+            if hasattr(moment, 'hour'):
+                hours, minutes = moment.hour, moment.minute
+            else:
+                minute_of_day = int(math.floor((float(moment) + utc_offset * 3600) / 60)) % 1440
+                hours, minutes = divmod(minute_of_day, 60)
+            targets.append(None if is_local_time_window(hours, minutes) else target_latitude_from_minutes(minutes))
+
+        unique_latitudes = sorted({latitude for latitude in targets if latitude is not None})
+        if NUMPY_AVAILABLE:
+            results = self._search_batch_numpy(unique_latitudes, utc_offset, latitude_preference)
+        else:
+            results = [self.search_city_indices(utc_offset, latitude, latitude_preference)
+                       for latitude in unique_latitudes]
+
+        by_latitude = dict(zip(unique_latitudes, results))
+        return [None if latitude is None else by_latitude[latitude] for latitude in targets]
+
+    def find_cities_batch(self, times, utc_offset: Optional[float] = None,
+                          latitude_preference: str = 'any') -> List[Optional[List[Dict[str, Any]]]]:
+        """與 find_city_indices_batch 相同，但返回城市資料（相同查詢共用同一個列表）"""
+        decoded = {}
+        results = []
+        for indices in self.find_city_indices_batch(times, utc_offset, latitude_preference):
+            if indices is None:
+                results.append(None)
+                continue
+            key = tuple(indices)
+            if key not in decoded:
+                decoded[key] = [self.cities[i] for i in indices]
+            results.append(decoded[key])
+        return results
+
+    def _search_batch_numpy(self, target_latitudes: List[float], target_offset: float,
+                            latitude_preference: str) -> List[List[int]]:
+        """以 NumPy 一次計算多個目標緯度的漸進式搜尋（結果與 search_city_indices 一致）"""
+        if not target_latitudes:
+            return []
+
+        if getattr(self, '_np_latitudes', None) is None:
+            self._np_latitudes = np.asarray(self._latitudes, dtype=np.float64)
+            self._np_longitudes = np.asarray(self._longitudes, dtype=np.float64)
+        latitudes = self._np_latitudes
+
+        # 經度差異與目標緯度無關，所有查詢共用
+        target_longitude = target_longitude_from_offset(target_offset)
+        longitude_diff = np.abs(self._np_longitudes - target_longitude)
+        longitude_diff = np.where(longitude_diff > 180, 360 - longitude_diff, longitude_diff)
+
+        if latitude_preference == 'any':
+            preference_mask = np.ones(len(latitudes), dtype=bool)
+        else:
+            preference_mask = np.fromiter(
+                (matches_latitude_preference(latitude, latitude_preference) for latitude in self._latitudes),
+                dtype=bool, count=len(self._latitudes))
+
+        # 只保留最大搜尋範圍內的城市，之後的矩陣運算都在這個子集上進行
+        subset = np.flatnonzero((longitude_diff <= LONGITUDE_RANGES[-1]) & preference_mask)
+        latitudes = latitudes[subset]
+        window_masks = [longitude_diff[subset] <= longitude_range for longitude_range in LONGITUDE_RANGES]
+
+        results = []
+        for start in range(0, len(target_latitudes), BATCH_CHUNK_SIZE):
+            chunk = np.asarray(target_latitudes[start:start + BATCH_CHUNK_SIZE], dtype=np.float64)
+            latitude_diff = np.abs(latitudes[np.newaxis, :] - chunk[:, np.newaxis])
+
+            # 每個查詢使用第一個有城市的搜尋範圍
+            key = np.full(latitude_diff.shape, np.inf)
+            resolved = np.zeros(len(chunk), dtype=bool)
+            for window_mask, latitude_range in zip(window_masks, LATITUDE_RANGES):
+                mask = window_mask[np.newaxis, :] & (latitude_diff <= latitude_range) & ~resolved[:, np.newaxis]
+                key = np.where(mask, latitude_diff, key)
+                resolved |= mask.any(axis=1)
+
+            # 只排序命中的城市：依 (查詢, 緯度差距, 原始順序) 排序，與伺服器的穩定排序一致
+            rows, columns = np.nonzero(np.isfinite(key))
+            order = np.lexsort((columns, key[rows, columns], rows))
+            rows, columns = rows[order], columns[order]
+            bounds = np.searchsorted(rows, np.arange(len(chunk) + 1))
+            for first, last in zip(bounds[:-1], bounds[1:]):
+                results.append(subset[columns[first:min(last, first + MAX_CANDIDATES)]].tolist())
+        return results
+
+    def search_cities_by_location(self, user_latitude: float, user_longitude: float) -> List[Dict[str, Any]]:
+        """根據用戶位置搜尋最接近的 50 個城市（與伺服器 searchCitiesByLocation 一致）"""
+        distances = [
+            (calculate_geographic_distance(user_latitude, user_longitude, lat, lon), i)
+            for i, (lat, lon) in enumerate(zip(self._latitudes, self._longitudes))
+        ]
+        distances.sort(key=lambda item: item[0])
+        return [dict(self.cities[i], distance=distance) for distance, i in distances[:MAX_NEARBY_CITIES]]
+
+    def find_city(self, target_offset: Optional[float] = None, target_latitude: Optional[float] = None,
+                  latitude_preference: str = 'any', use_local_position: bool = False,
+                  user_latitude: Optional[float] = None, user_longitude: Optional[float] = None,
+                  city_visit_stats: Optional[Dict[str, int]] = None,
+                  rng: Optional[random.Random] = None) -> Dict[str, Any]:
+        """
+        選擇甦醒城市，返回與 /api/find-city-geonames 相同結構的回應
+
+        Returns:
+            Dict: {'success': True, 'city': {...}} 或 {'isUniverseCase': True, ...}
+        """
+        rng = rng or random
+        latitude_preference = latitude_preference or 'any'
+
+        if use_local_position:
+            candidates = self.search_cities_by_location(user_latitude, user_longitude)
+        else:
+            candidates = self.search_cities(target_offset, target_latitude, latitude_preference)
+
+        if not candidates:
+            return {
+                'isUniverseCase': True,
+                'message': '沒有找到符合目標時區的地球城市',
+                'targetUTCOffset': None if use_local_position else target_offset
+            }
+
+        if city_visit_stats:
+            # 在訪問次數最少的城市中隨機選擇
+            visit_counts = [city_visit_stats.get(city['city'], 0) for city in candidates]
+            min_visit_count = min(visit_counts)
+            least_visited = [city for city, count in zip(candidates, visit_counts) if count == min_visit_count]
+            selected = least_visited[int(math.floor(rng.random() * len(least_visited)))]
+        else:
+            selected = candidates[int(math.floor(rng.random() * len(candidates)))]
+
+        return {'success': True, 'city': self._format_city(selected, latitude_preference)}
+
+    def _format_city(self, city: Dict[str, Any], latitude_preference: str) -> Dict[str, Any]:
+        """轉換為伺服器回應中的城市資料格式（缺少的欄位與 JSON 序列化後一樣省略）"""
+        timezone_offset = calculate_timezone_offset(city['longitude'])
+        city_data = {
+            'name': city['city'],
+            'name_zh': city.get('city_zh'),
+            'city': city['city'],
+            'city_zh': city.get('city_zh'),
+            'country': city.get('country'),
+            'country_zh': city.get('country_zh'),
+            'country_iso_code': city.get('country_iso_code'),
+            'lat': city['latitude'],
+            'lng': city['longitude'],
+            'latitude': city['latitude'],
+            'longitude': city['longitude'],
+            'population': city.get('population'),
+            'timezoneOffset': timezone_offset,
+            'timezone': {
+                'timeZoneId': city.get('timezone') or 'UTC',
+                'dstOffset': 0,
+                'gmtOffset': timezone_offset * 3600,
+                'countryCode': city.get('country_iso_code') or '',
+                'countryName': city.get('country'),
+                'countryName_zh': city.get('country_zh')
+            },
+            'source': 'local_index',
+            'latitudeCategory': LATITUDE_CATEGORY_NAMES[get_latitude_category(city['latitude'])],
+            'latitudePreference': latitude_preference
+        }
+        return {key: value for key, value in city_data.items() if value is not None}
+
+
+# 全域城市索引實例
+city_index = None
+_city_index_lock = threading.Lock()
+
+def get_city_index() -> Optional[CityIndex]:
+    """獲取城市索引實例（第一次呼叫時載入），載入失敗返回 None"""
+    global city_index
+    if city_index is None:
+        with _city_index_lock:
+            if city_index is None:
+                try:
+                    city_index = CityIndex.load()
+                except Exception as e:
+                    logger.error(f"本機城市索引載入失敗: {e}")
+                    return None
+    return city_index
+
+
+# 測試程式
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    print("本機城市索引測試程式")
+    index = get_city_index()
+    if not index:
+        print("✗ 城市索引載入失敗")
+        exit(1)
+
+    queries = [(offset, 70 - (minute * 140 / 59)) for offset in range(-12, 15) for minute in range(60)]
+    start = time.perf_counter()
+    for offset, latitude in queries:
+        index.search_city_indices(offset, latitude)
+    elapsed = time.perf_counter() - start
+    print(f"✓ {len(queries)} 次搜尋，平均 {elapsed / len(queries) * 1000:.3f}ms")
+
+    day_start = time.mktime(time.strptime('2025-01-01', '%Y-%m-%d'))
+    times = [day_start + minute * 60 for minute in range(1440)]
+    start = time.perf_counter()
+    batch = index.find_city_indices_batch(times, utc_offset=8)
+    elapsed = time.perf_counter() - start
+    print(f"✓ 批次搜尋一天 {len(times)} 分鐘，耗時 {elapsed * 1000:.1f}ms (NumPy: {NUMPY_AVAILABLE})")
+
+    result = index.find_city(target_offset=8, target_latitude=25)
+    print(f"✓ 範例結果: {result['city']['city']}, {result['city']['country']}")
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 二進位城市資料表
+將 cities_data.json 轉換為欄位式二進位檔，執行時以 mmap 載入，按需解碼每一列
+
+檔案格式（little-endian，每個區段對齊 8 bytes）：
+    header          magic, 版本, 城市數, 字串數, 座標倍率, 各區段位移
+    latitude        int32[n]   緯度 × 100000（原始資料為 5 位小數，定點數可無損還原）
+    longitude       int32[n]   經度 × 100000
+    utc_offset      int16[n]   預先計算的時區偏移 Math.round(經度 / 15)
+    population      int32[n]   人口，-1 表示缺少
+    city ... timezone  uint32[n]  字串表索引，0xFFFFFFFF 表示缺少
+    string_offsets  uint32[字串數 + 1]
+    string_data     UTF-8 字串內容（重複字串只存一次）
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import array
+import struct
+import logging
+import tempfile
+from pathlib import Path
+from collections.abc import Sequence
+from typing import Optional, Dict, Any, List
+
+from config import CITY_INDEX_CONFIG
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'WUMCITY\x01'
+FORMAT_VERSION = 1
+COORD_SCALE = 100000
+MISSING_STRING = 0xFFFFFFFF
+MISSING_POPULATION = -1
+
+# 字串欄位（依原始 JSON 欄位順序）
+STRING_COLUMNS = ['city', 'city_zh', 'country', 'country_zh', 'country_iso_code', 'timezone']
+
+# 區段名稱與 array 型別碼
+SECTIONS = [
+    ('latitude', 'i'),
+    ('longitude', 'i'),
+    ('utc_offset', 'h'),
+    ('population', 'i'),
+] + [(column, 'I') for column in STRING_COLUMNS] + [
+    ('string_offsets', 'I'),
+    ('string_data', 'B'),
+]
+
+HEADER_FORMAT = '<8sIIII' + 'Q' * len(SECTIONS)
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+
+def _align(offset: int, alignment: int = 8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _to_fixed(value: float) -> int:
+    return int(round(value * COORD_SCALE))
+
+
+def build_city_table(json_file: str = None, table_file: str = None) -> Path:
+    """
+    將 cities_data.json 轉換為二進位城市資料表
+
+    Args:
+        json_file: 來源 JSON 檔案
+        table_file: 輸出的二進位檔案
+
+    Returns:
+        Path: 輸出的檔案路徑
+    """
+    from city_index import calculate_timezone_offset
+
+    json_file = Path(json_file or CITY_INDEX_CONFIG['data_file'])
+    table_file = Path(table_file or CITY_INDEX_CONFIG['table_file'])
+
+    with open(json_file, 'r', encoding='utf-8') as f:
+        cities = json.load(f)
+
+    count = len(cities)
+    columns = {name: array.array(typecode) for name, typecode in SECTIONS}
+
+    # 字串表：相同字串只存一次
+    string_ids: Dict[str, int] = {}
+    string_data = bytearray()
+    columns['string_offsets'].append(0)
+
+    for city in cities:
+        latitude = _to_fixed(city['latitude'])
+        longitude = _to_fixed(city['longitude'])
+        if latitude / COORD_SCALE != city['latitude'] or longitude / COORD_SCALE != city['longitude']:
+            raise ValueError(f"座標超過 5 位小數，無法無損轉換: {city['city']}")
+
+        columns['latitude'].append(latitude)
+        columns['longitude'].append(longitude)
+        columns['utc_offset'].append(calculate_timezone_offset(city['longitude']))
+        population = city.get('population')
+        columns['population'].append(MISSING_POPULATION if population is None else int(population))
+
+        for column in STRING_COLUMNS:
+            value = city.get(column)
+            if value is None:
+                columns[column].append(MISSING_STRING)
+                continue
+            if value not in string_ids:
+                string_ids[value] = len(string_ids)
+                string_data.extend(value.encode('utf-8'))
+                columns['string_offsets'].append(len(string_data))
+            columns[column].append(string_ids[value])
+
+    columns['string_data'] = array.array('B', bytes(string_data))
+
+    # 計算各區段位移
+    offsets = []
+    position = _align(HEADER_SIZE)
+    for name, _ in SECTIONS:
+        offsets.append(position)
+        position = _align(position + len(columns[name]) * columns[name].itemsize)
+
+    header = struct.pack(HEADER_FORMAT, MAGIC, FORMAT_VERSION, count, len(string_ids), COORD_SCALE, *offsets)
+
+    # 先寫入暫存檔再原子替換，避免讀取到寫到一半的資料表
+    table_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=str(table_file.parent), prefix='.cities_', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            for (name, _), offset in zip(SECTIONS, offsets):
+                f.write(b'\0' * (offset - f.tell()))
+                data = columns[name]
+                if sys.byteorder != 'little':
+                    data = array.array(data.typecode, data)
+                    data.byteswap()
+                f.write(data.tobytes())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, table_file)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    logger.info(f"城市資料表已建立: {table_file} ({count} 個城市, {len(string_ids)} 個字串, "
+                f"{table_file.stat().st_size / 1024:.0f} KB)")
+    return table_file
+
+
+class CityTable(Sequence):
+    """以 mmap 載入的唯讀城市資料表，每一列在存取時才解碼"""
+
+    def __init__(self, table_file: str = None):
+        self.table_file = Path(table_file or CITY_INDEX_CONFIG['table_file'])
+        self._file = open(self.table_file, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, version, count, string_count, coord_scale, *offsets = struct.unpack_from(HEADER_FORMAT, self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"無效的城市資料表格式: {self.table_file}")
+
+        self.count = count
+        self.string_count = string_count
+        self.coord_scale = coord_scale
+
+        lengths = {'string_offsets': string_count + 1}
+        self._columns = {}
+        for (name, typecode), offset in zip(SECTIONS, offsets):
+            if name == 'string_data':
+                self._columns[name] = self._view[offset:]
+                continue
+            length = lengths.get(name, count)
+            self._columns[name] = self._column(offset, length, typecode)
+
+        self._strings: Dict[int, str] = {}
+
+    def _column(self, offset: int, length: int, typecode: str):
+        """取得欄位：little-endian 平台直接映射檔案內容（零複製），否則轉換位元組順序"""
+        itemsize = array.array(typecode).itemsize
+        raw = self._view[offset:offset + length * itemsize]
+        if sys.byteorder == 'little':
+            return raw.cast(typecode)
+        data = array.array(typecode, raw.tobytes())
+        data.byteswap()
+        return data
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        """解碼一列城市資料（與 cities_data.json 中的城市物件相同）"""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('city index out of range')
+
+        city = {}
+        for column in STRING_COLUMNS:
+            value = self.string(self._columns[column][index])
+            if value is not None:
+                city[column] = value
+        city['latitude'] = self.latitude(index)
+        city['longitude'] = self.longitude(index)
+        population = self._columns['population'][index]
+        if population != MISSING_POPULATION:
+            city['population'] = population
+        return city
+
+    def string(self, string_id: int) -> Optional[str]:
+        """從字串表解碼字串（解碼結果會快取）"""
+        if string_id == MISSING_STRING:
+            return None
+        value = self._strings.get(string_id)
+        if value is None:
+            offsets = self._columns['string_offsets']
+            value = bytes(self._columns['string_data'][offsets[string_id]:offsets[string_id + 1]]).decode('utf-8')
+            self._strings[string_id] = value
+        return value
+
+    def latitude(self, index: int) -> float:
+        return self._columns['latitude'][index] / self.coord_scale
+
+    def longitude(self, index: int) -> float:
+        return self._columns['longitude'][index] / self.coord_scale
+
+    def utc_offset(self, index: int) -> int:
+        return self._columns['utc_offset'][index]
+
+    def latitudes(self) -> List[float]:
+        """所有城市緯度（浮點數）"""
+        scale = self.coord_scale
+        return [value / scale for value in self._columns['latitude']]
+
+    def longitudes(self) -> List[float]:
+        """所有城市經度（浮點數）"""
+        scale = self.coord_scale
+        return [value / scale for value in self._columns['longitude']]
+
+    def column(self, name: str):
+        """取得原始欄位（memoryview 或 array），可直接交給 numpy.frombuffer"""
+        return self._columns[name]
+
+    def close(self):
+        """釋放 mmap 資源"""
+        try:
+            if getattr(self, '_columns', None):
+                for column in self._columns.values():
+                    if isinstance(column, memoryview):
+                        column.release()
+                self._columns = {}
+            if getattr(self, '_view', None) is not None:
+                self._view.release()
+                self._view = None
+            if getattr(self, '_mmap', None) is not None:
+                self._mmap.close()
+                self._mmap = None
+        finally:
+            if getattr(self, '_file', None) is not None:
+                self._file.close()
+                self._file = None
+
+
+def is_table_fresh(json_file: str = None, table_file: str = None) -> bool:
+    """檢查二進位資料表是否存在且不比 JSON 舊"""
+    json_file = Path(json_file or CITY_INDEX_CONFIG['data_file'])
+    table_file = Path(table_file or CITY_INDEX_CONFIG['table_file'])
+    if not table_file.exists():
+        return False
+    if not json_file.exists():
+        return True
+    return table_file.stat().st_mtime >= json_file.stat().st_mtime
+
+
+_BENCHMARK_SCRIPT = r'''
+import resource, sys, time, json
+sys.path.insert(0, {module_dir!r})
+from city_table import CityTable
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if {mode!r} == 'json':
+    with open({json_file!r}, 'r', encoding='utf-8') as f:
+        cities = json.load(f)
+    sample = cities[len(cities) // 2]['city']
+else:
+    cities = CityTable({table_file!r})
+    sample = cities[len(cities) // 2]['city']
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'seconds': elapsed, 'rss_kb': peak - baseline}}))
+'''
+
+
+def run_benchmark(rounds: int = 5) -> Dict[str, Dict[str, float]]:
+    """
+    比較 json.load 與 mmap 資料表的載入時間和記憶體用量（每輪使用獨立子程序）
+
+    Returns:
+        Dict: {'json': {...}, 'table': {...}}，時間為秒，記憶體為 KB 中位數
+    """
+    import subprocess
+    import statistics
+
+    json_file = CITY_INDEX_CONFIG['data_file']
+    table_file = CITY_INDEX_CONFIG['table_file']
+    if not is_table_fresh(json_file, table_file):
+        build_city_table(json_file, table_file)
+
+    results = {}
+    for mode in ('json', 'table'):
+        samples = []
+        script = _BENCHMARK_SCRIPT.format(
+            module_dir=str(Path(__file__).parent), mode=mode,
+            json_file=str(json_file), table_file=str(table_file)
+        )
+        for _ in range(rounds):
+            output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+            samples.append(json.loads(output.stdout))
+        results[mode] = {
+            'seconds': statistics.median(sample['seconds'] for sample in samples),
+            'rss_kb': statistics.median(sample['rss_kb'] for sample in samples)
+        }
+    return results
+
+
+# 建置與測試程式
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+
+    if command == 'build':
+        build_city_table()
+    elif command == 'bench':
+        results = run_benchmark()
+        print(f"{'載入方式':<10}{'時間 (ms)':>12}{'RSS 增量 (KB)':>16}")
+        for mode, label in (('json', 'json.load'), ('table', 'mmap 資料表')):
+            print(f"{label:<10}{results[mode]['seconds'] * 1000:>12.1f}{results[mode]['rss_kb']:>16.0f}")
+    else:
+        print("用法: python3 city_table.py [build|bench]")
+        sys.exit(1)
@@ -48,6 +48,17 @@ AUDIO_CONFIG = {
     'channels': 2,  # 聲道數 (1=單聲道, 2=立體聲)
 }
 
+# 常駐音頻引擎配置
+AUDIO_ENGINE_CONFIG = {
+    'backend': 'auto',            # 'pygame'、'subprocess' 或 'auto'（有 pygame 時使用 pygame）
+    'buffer': 512,                # pygame mixer 緩衝區（樣本數）
+    'preload_ahead': 2,           # 播放中預先解碼佇列前面的片段數
+    'preload_limit': 4,           # preload() 保留的已解碼文件數
+    'pcm_segment_seconds': 0.5,   # PCM 串流每段解碼長度
+    'wait_margin': 15.0,          # 等待播放完成的上限：音頻長度加上這個秒數（含佇列中前面的片段）
+    'mp3_min_bitrate': 32000,     # 估計 MP3 長度時假設的最低位元率（bps，寧可估長）
+}
+
 # GF1002 喇叭配置
 SPEAKER_CONFIG = {
     'connection': '3.5mm',  # 連接方式：'3.5mm' 或 'gpio'
@@ -64,13 +75,19 @@ TTS_CONFIG = {
     'voice_id': 'nova',  # OpenAI 女性聲音
     'voice_name': 'nova',  # OpenAI 聲音名稱
     'cache_enabled': True,  # 啟用音頻快取
-    'cache_dir': '/tmp/wakeupmap_audio_cache',
+    # 持久目錄：離線問候語（固定在快取中）在重開機後仍可使用，/tmp 每次開機都會清空
+    'cache_dir': os.path.expanduser(os.getenv('WAKEUPMAP_TTS_CACHE', '~/.cache/wakeupmap/tts')),
+    'cache_max_bytes': 200 * 1024 * 1024,  # 音頻快取容量上限，超過時淘汰最久未使用的項目
     
     # OpenAI TTS 配置
     'openai_api_key': os.getenv('OPENAI_API_KEY', ''),  # 從環境變數讀取 OpenAI API 金鑰
+    'openai_base_url': os.getenv('OPENAI_BASE_URL') or None,  # 自訂 API 位址（例如基準測試的本機模擬伺服器），None 為官方 API
     'openai_model': 'tts-1-hd',  # 高品質模型
     'openai_voice': 'nova',  # 使用 Nova 語音（最自然的女性聲音）
     'openai_speed': 1.0,  # 0.25 到 4.0
+    'openai_pcm_sample_rate': 24000,  # OpenAI TTS 的 PCM 輸出固定為 24kHz 16-bit 單聲道
+    'streaming_playback': True,  # 播放時才分句合成，第一句完成即開始播放（需要 chunked_synthesis）
+    'chunked_synthesis': True,   # 分句並行合成（見 TTS_PIPELINE_CONFIG）
     
     # Nova 整合模式
     'nova_integrated_mode': True,  # 使用 Nova 整合播放當地問候+中文故事
@@ -85,6 +102,13 @@ TTS_CONFIG = {
     'require_openai': True,  # 強制要求 OpenAI API
 }
 
+# 分句並行 TTS 管線配置
+TTS_PIPELINE_CONFIG = {
+    'max_workers': 3,    # 同時進行的 TTS 請求數
+    'min_chars': 12,     # 短於此長度的句子併入下一句
+    'max_chars': 120,    # 長於此長度的句子以逗號再切分
+}
+
 # =============================================================================
 # 顯示配置
 # =============================================================================
@@ -121,12 +145,16 @@ ANIMATION_CONFIG = {
 # API配置
 # =============================================================================
 
+# API 伺服器（可用環境變數改為其他部署或本機代理）
+API_BASE_URL = os.getenv('WAKEUPMAP_API_BASE', 'https://morgan-orcin.vercel.app').rstrip('/')
+
 # API端點
 API_ENDPOINTS = {
-    'find_city': 'https://morgan-orcin.vercel.app/api/find-city-geonames',
-    'translate': 'https://morgan-orcin.vercel.app/api/translate-location',
-    'generate_story': 'https://morgan-orcin.vercel.app/api/generatePiStory',  # 使用 Pi 專用的故事生成 API
-    'save_record': 'https://morgan-orcin.vercel.app/api/save-record'
+    'find_city': f'{API_BASE_URL}/api/find-city-geonames',
+    'translate': f'{API_BASE_URL}/api/translate-location',
+    'generate_story': f'{API_BASE_URL}/api/generatePiStory',  # 使用 Pi 專用的故事生成 API
+    'save_record': f'{API_BASE_URL}/api/save-record',
+    'firebase_config': f'{API_BASE_URL}/api/config',
 }
 
 # 使用者設定
@@ -144,6 +172,100 @@ API_CONFIG = {
     'retry_delay': 2,     # 重試延遲（秒）
 }
 
+# HTTP 連線配置（所有對外請求共用同一個連線池）
+HTTP_CONFIG = {
+    'pool_connections': 4,    # 保留連線池的主機數
+    'pool_maxsize': 4,        # 每台主機保持的 keep-alive 連線數
+    'connect_timeout': 5,     # 建立連線逾時（秒）；讀取逾時由各呼叫指定，預設 API_CONFIG['timeout']
+    'connect_retries': 2,     # 連線失敗（請求尚未送出）時自動重試次數
+    'http2': False,           # 使用 HTTP/2（需要 pip install httpx[http2]）
+    'dns_cache_ttl': 300,     # DNS 查詢結果快取秒數；0 表示停用
+    'user_agent': 'RaspberryPi-WakeUpMap-DSI/1.0',
+}
+
+# Firebase 同步配置（本地記錄的上傳佇列）
+SYNC_CONFIG = {
+    'batch_size': 100,        # 每次批次上傳的記錄數（save-record API 上限 100）
+    'max_concurrency': 2,     # 同時進行的批次請求數
+    'state_file': 'sync_outbox.json',  # 同步進度檔（存放在本地儲存目錄）
+    'rate_per_second': 1.0,   # 對 save-record 的平均請求速率上限
+    'burst': 3,               # 權杖桶容量（允許的連續請求數）
+    'backoff_base': 2,        # 失敗後第一次重試的等待秒數（之後每次加倍）
+    'backoff_max': 300,       # 退避等待上限（秒）
+    'max_attempts': 10,       # 同一筆記錄失敗幾次後不再重送（0 表示不限；伺服器返回 4xx 時立即停止）
+    'job_max_attempts': 20,   # 同步工作連續失敗幾次後放棄，下次按鈕時重新送入（0 表示不限）
+}
+
+# 本機城市索引配置（取代每次按鈕都呼叫 find-city API）
+CITY_INDEX_CONFIG = {
+    'enabled': True,        # 優先使用本機城市索引
+    'http_fallback': True,  # 本機索引無法使用時改呼叫 API
+    'data_file': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cities_data.json'),
+    'table_file': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cities_data.bin'),  # 由 city_table.py build 產生
+}
+
+# 甦醒預取配置（背景預先選城市、取得故事並生成音頻）
+PREFETCH_CONFIG = {
+    'enabled': True,
+    'lookahead_minutes': 1,   # 除了目前這一分鐘，再預取接下來幾分鐘
+    'interval': 5,            # 背景檢查間隔（秒）
+    'wait_timeout': 30,       # 按下按鈕時等待生成中的預取音頻（秒）
+    'active_hours': (6, 10),  # 只在起床時段預取（每分鐘都會呼叫故事 API 與 TTS）；None 表示整天
+}
+
+# 甦醒流程管線配置
+PIPELINE_CONFIG = {
+    'max_workers': 4,          # 阻塞階段（網頁操作、API、TTS）的執行緒數
+    'city_timeout': 10,        # 等待網頁顯示城市資料的上限（秒）
+    'city_poll_interval': 0.1, # 檢查城市資料的間隔（秒）
+}
+
+# 前端日誌橋接配置
+FRONTEND_LOG_CONFIG = {
+    'enabled': True,
+    'min_interval': 0.5,   # 有新日誌時的取回間隔（秒）
+    'max_interval': 5,     # 閒置時取回間隔倍增的上限（秒）
+    'batch_size': 200,     # 每次最多取回的筆數
+}
+
+# 按鈕延遲追蹤配置（python3 tracing.py 匯出為 Chrome trace-event 格式）
+TRACING_CONFIG = {
+    'enabled': True,
+    'ring_size': 50,                                  # 記憶體中保留最近幾次按鈕
+    'jsonl_file': '/var/log/wakeupmap-traces.jsonl',  # 完成的追蹤追加寫入此文件，空字串表示不寫入
+}
+
+# 執行時指標配置（http://<裝置>:<port>/metrics，Prometheus 文字格式）
+METRICS_CONFIG = {
+    'enabled': True,
+    'host': '0.0.0.0',       # 集中抓取需要對外開放；只在本機查看時改為 127.0.0.1
+    'port': 9108,
+    'namespace': 'wakeupmap',
+    'latency_buckets': (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30),  # 延遲直方圖的分桶（秒）
+}
+
+# 瀏覽器暖啟動配置（python3 browser_profile.py 查看、清除或預熱設定檔）
+BROWSER_CONFIG = {
+    # 持久的 Chrome 設定檔：重開機後保留 HTTP 快取（Firebase SDK、Leaflet、字型、地圖圖磚）
+    'profile_dir': os.path.expanduser(os.getenv('WAKEUPMAP_CHROME_PROFILE', '~/.cache/wakeupmap/chrome-profile')),
+    'disk_cache_size': 96 * 1024 * 1024,      # Chrome HTTP 快取上限（位元組，--disk-cache-size）
+    'profile_max_bytes': 384 * 1024 * 1024,   # 啟動前設定檔超過此大小時清除快取目錄
+    # 由本機提供 pi.html 與靜態資源（加上內容版本號，可長期快取），/api/* 轉發到 API_BASE_URL
+    'local_mirror': True,
+    'mirror_root': os.path.dirname(os.path.dirname(os.path.abspath(__file__))),  # 專案根目錄（pi.html 所在）
+    'mirror_host': 'localhost',   # Firebase 預設授權的網域
+    'mirror_port': 8765,
+    'mirror_cache_dir': os.path.expanduser('~/.cache/wakeupmap/mirror'),  # 保存上次成功的 /api/config
+}
+
+# 冷啟動配置（python3 boot.py 以 -X importtime 檢查主程式的模組載入）
+BOOT_CONFIG = {
+    # 從行程啟動到各里程碑的目標（秒），超過時記錄警告
+    'budgets': {'button_ready': 3, 'web_ready': 30, 'ready': 40},
+    # 主程式載入時不應出現的重量級模組，延後到各子系統啟動時才載入
+    'deferred_modules': ('selenium', 'openai', 'pygame', 'pigpio', 'numpy', 'requests'),
+}
+
 # =============================================================================
 # 系統配置
 # =============================================================================
@@ -173,6 +295,13 @@ SCREENSAVER_CONFIG = {
     'dim_brightness': 20, # 螢幕保護時的亮度百分比
 }
 
+# 本地儲存配置（甦醒記錄與 Day 計數）
+STORAGE_CONFIG = {
+    'engine': 'journal',              # 'journal'（只追加日誌）、'sqlite'（WAL 模式，可依日期/國家查詢）或 'json'（舊版，每次重寫整個檔案）
+    'fsync': True,                    # 每筆記錄寫入後 fsync，斷電也不遺失
+    'compact_bytes': 1024 * 1024,     # 日誌超過此大小時在背景合併到快照
+}
+
 # =============================================================================
 # 多語言早安問候語
 # =============================================================================
@@ -7,11 +7,19 @@ Firebase 同步模組
 import json
 import logging
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 
-from config import USER_CONFIG, API_CONFIG
+from config import USER_CONFIG, API_CONFIG, API_ENDPOINTS, SYNC_CONFIG
+from http_transport import get_http_session
+from sync_outbox import SyncOutbox, SYNC_SYNCED, SYNC_DEAD, is_permanent_failure
+from sync_scheduler import SyncScheduler, TokenBucket, PRIORITY_LATEST, PRIORITY_BACKLOG
+from metrics import get_registry
+
+# 舊版 save-record 不認得 {records: [...]}：找不到路徑、不允許的方法，或當成缺少欄位的單筆記錄
+BATCH_UNSUPPORTED_STATUS = (400, 404, 405)
 
 class FirebaseSync:
     def __init__(self, local_storage):
@@ -30,44 +38,27 @@ class FirebaseSync:
         self.group_name = USER_CONFIG['group_name']
         
         # Firebase 配置 API 端點
-        self.firebase_config_url = "https://morgan-orcin.vercel.app/api/config"
-        self.save_record_url = "https://morgan-orcin.vercel.app/api/save-record"
+        self.firebase_config_url = API_ENDPOINTS['firebase_config']
+        self.save_record_url = API_ENDPOINTS['save_record']
         
-        self.logger.info(f"Firebase 同步器初始化完成 - 用戶: {self.user_id}, 群組: {self.group_name}")
-    
-    def sync_all_records(self) -> bool:
-        """
-        同步所有本地記錄到 Firebase
+        # 共用連線池（批次請求並行時重用 TCP/TLS 連線）
+        self.session = get_http_session()
         
-        Returns:
-            bool: 同步是否成功
-        """
-        try:
-            records = self.local_storage.get_all_records()
-            if not records:
-                self.logger.info("沒有本地記錄需要同步")
-                return True
-            
-            success_count = 0
-            total_count = len(records)
-            
-            self.logger.info(f"開始同步 {total_count} 筆記錄到 Firebase...")
-            
-            for i, record in enumerate(records, 1):
-                if self._sync_single_record(record):
-                    success_count += 1
-                    self.logger.info(f"記錄 {i}/{total_count} 同步成功")
-                else:
-                    self.logger.warning(f"記錄 {i}/{total_count} 同步失敗")
-            
-            sync_ratio = success_count / total_count
-            self.logger.info(f"同步完成: {success_count}/{total_count} 成功 ({sync_ratio:.1%})")
-            
-            return sync_ratio > 0.8  # 80% 以上成功率視為同步成功
-            
-        except Exception as e:
-            self.logger.error(f"同步所有記錄失敗: {e}")
-            return False
+        # 同步佇列：記錄哪些記錄已上傳，重新啟動後從上次的位置繼續
+        self.outbox = SyncOutbox(Path(local_storage.storage_dir) / SYNC_CONFIG['state_file'], self.user_id)
+        
+        # 常駐同步工作執行緒與 save-record 限速
+        self.scheduler = SyncScheduler(name='firebase-sync')
+        self.rate_limiter = TokenBucket(SYNC_CONFIG['rate_per_second'], SYNC_CONFIG['burst'])
+        
+        # 同步佇列深度與待上傳記錄數（抓取指標時才讀取）
+        registry = get_registry()
+        registry.gauge('sync_queue_depth', "同步排程器佇列中的工作數",
+                       func=lambda: self.scheduler.get_stats()['queue_depth'])
+        registry.gauge('sync_pending_records', "尚未上傳到 Firebase 的本地記錄數",
+                       func=lambda: self.outbox.get_stats(self.local_storage.get_records_count())['pending'])
+        
+        self.logger.info(f"Firebase 同步器初始化完成 - 用戶: {self.user_id}, 群組: {self.group_name}")
     
     def sync_latest_record(self) -> bool:
         """
@@ -77,33 +68,53 @@ class FirebaseSync:
             bool: 同步是否成功
         """
         try:
-            latest_record = self.local_storage.get_latest_record()
-            if not latest_record:
+            records = self.local_storage.get_all_records()
+            if not records:
                 self.logger.warning("沒有最新記錄可同步")
                 return False
             
-            return self._sync_single_record(latest_record)
+            latest_record = records[-1]
+            key = self.outbox.key_for(latest_record)
+            self.outbox.reconcile(records)
+            state = self.outbox.state_of(len(records) - 1, latest_record)
+            if state == SYNC_SYNCED:
+                self.logger.info("最新記錄已同步過")
+                return True
+            if state == SYNC_DEAD:
+                self.logger.info("最新記錄已被伺服器拒絕，不再重送")
+                return False
+            
+            failure = self._sync_single_record(latest_record, key)
+            if failure is None:
+                self.outbox.mark_synced(records, [key])
+                return True
+            error, status_code = failure
+            self.outbox.mark_failed([key], error, permanent=is_permanent_failure(status_code))
+            return False
             
         except Exception as e:
             self.logger.error(f"同步最新記錄失敗: {e}")
             return False
     
-    def _sync_single_record(self, record: Dict[str, Any]) -> bool:
+    def _sync_single_record(self, record: Dict[str, Any], idempotency_key: str = None) -> Optional[Tuple[str, Optional[int]]]:
         """
         同步單筆記錄到 Firebase
         
         Args:
             record: 本地記錄資料
+            idempotency_key: 冪等鍵（重送時伺服器覆寫同一份文件）
             
         Returns:
-            bool: 同步是否成功
+            tuple: 失敗時為 (錯誤訊息, HTTP 狀態碼)，連線失敗時狀態碼為 None；成功返回 None
         """
         try:
             # 準備 Firebase 格式的資料
             firebase_record = self._convert_to_firebase_format(record)
+            firebase_record['idempotencyKey'] = idempotency_key or self.outbox.key_for(record)
             
             # 發送到 Firebase
-            response = requests.post(
+            self.rate_limiter.acquire()
+            response = self.session.post(
                 self.save_record_url,
                 json=firebase_record,
                 timeout=API_CONFIG['timeout']
@@ -113,22 +124,71 @@ class FirebaseSync:
                 result = response.json()
                 if result.get('success'):
                     self.logger.info(f"✅ 記錄同步成功: Day {record.get('day')}, 城市: {record.get('city')}")
-                    return True
+                    return None
                 else:
                     self.logger.warning(f"❌ 記錄同步失敗: {result.get('error', 'Unknown error')}")
-                    return False
+                    return result.get('error', 'Unknown error'), response.status_code
             else:
                 self.logger.warning(f"❌ 記錄同步請求失敗: HTTP {response.status_code}")
+                error = f"HTTP {response.status_code}"
                 try:
                     error_details = response.json()
                     self.logger.warning(f"錯誤詳情: {error_details}")
+                    error = f"{error}: {error_details.get('error', error_details)}"
                 except:
                     self.logger.warning(f"響應內容: {response.text}")
-                return False
+                return error, response.status_code
                 
         except Exception as e:
             self.logger.error(f"同步單筆記錄失敗: {e}")
-            return False
+            return str(e), None
+    
+    def _sync_batch(self, batch: List[Tuple[int, str, Dict[str, Any]]]) -> Dict[str, Optional[Tuple[str, Optional[int]]]]:
+        """
+        以一次請求上傳一批記錄
+        
+        Args:
+            batch: [(索引, 冪等鍵, 記錄)]
+            
+        Returns:
+            Dict: 冪等鍵 -> (錯誤訊息, HTTP 狀態碼)，成功為 None
+        """
+        payload = []
+        for _, key, record in batch:
+            firebase_record = self._convert_to_firebase_format(record)
+            firebase_record['idempotencyKey'] = key
+            payload.append(firebase_record)
+        
+        try:
+            self.rate_limiter.acquire()
+            response = self.session.post(
+                self.save_record_url,
+                json={'records': payload},
+                timeout=API_CONFIG['timeout']
+            )
+            if response.status_code in BATCH_UNSUPPORTED_STATUS:
+                results = None
+            elif response.status_code == 200:
+                results = response.json().get('results')
+            else:
+                # 伺服器錯誤或限速：整批失敗，由同步排程器退避後重試（不改為逐筆上傳而放大請求數）
+                self.logger.warning(f"批次上傳失敗: HTTP {response.status_code}")
+                return {key: (f"HTTP {response.status_code}", None) for _, key, _ in batch}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.logger.warning(f"批次上傳失敗: {e}")
+            return {key: (str(e), None) for _, key, _ in batch}
+        
+        if results is None:
+            # 伺服器不支援批次上傳（舊版 API），改為逐筆上傳
+            self.logger.warning(f"批次上傳不可用（HTTP {response.status_code}），改為逐筆上傳")
+            return {key: self._sync_single_record(record, key) for _, key, record in batch}
+        
+        outcome = {key: ('伺服器未回報結果', None) for _, key, _ in batch}
+        for result in results:
+            if result.get('idempotencyKey') in outcome:
+                outcome[result['idempotencyKey']] = (None if result.get('success')
+                                                     else (result.get('error', 'Unknown error'), result.get('status')))
+        return outcome
     
     def _convert_to_firebase_format(self, record: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -197,7 +257,7 @@ class FirebaseSync:
         try:
             self.logger.info("測試 Firebase 連接...")
             
-            response = requests.get(
+            response = self.session.get(
                 self.firebase_config_url,
                 headers={'Accept': 'application/json'},
                 timeout=API_CONFIG['timeout']
@@ -248,74 +308,102 @@ class FirebaseSync:
             'local_records_count': local_count,
             'current_day': current_day,
             'firebase_connection': self.test_firebase_connection(),
-            'last_sync_attempt': None  # 可以後續添加
+            'outbox': self.outbox.get_stats(local_count),
+            'scheduler': self.scheduler.get_stats()
         }
     
     def auto_sync_background(self) -> bool:
         """
         背景自動同步（非阻塞）
         
+        最新記錄優先上傳，之後再補傳離線期間累積的記錄；
+        失敗時由同步排程器退避重試，網路恢復後自動補傳。
+        
         Returns:
-            bool: 同步任務是否啟動成功
+            bool: 同步任務是否加入佇列
         """
         try:
-            import threading
-            
-            def sync_worker():
-                try:
-                    self.logger.info("🌐 開始背景同步...")
-                    success = self.sync_latest_record()
-                    if success:
-                        self.logger.info("✅ 背景同步成功")
-                    else:
-                        self.logger.warning("⚠️ 背景同步失敗")
-                except Exception as e:
-                    self.logger.error(f"❌ 背景同步過程中發生錯誤: {e}")
+            self.scheduler.start()
+            self.scheduler.submit('latest', self._sync_latest, PRIORITY_LATEST)
+            self.scheduler.submit('backlog', self._sync_backlog, PRIORITY_BACKLOG)
             
-            sync_thread = threading.Thread(target=sync_worker, daemon=True)
-            sync_thread.start()
-            
-            self.logger.info("🚀 背景同步任務已啟動")
+            stats = self.scheduler.get_stats()
+            self.logger.info(f"🚀 背景同步已排入佇列（佇列深度: {stats['queue_depth']}）")
             return True
             
         except Exception as e:
             self.logger.error(f"啟動背景同步失敗: {e}")
             return False
     
-    def sync_all_records(self) -> Dict[str, Any]:
+    def _sync_latest(self) -> bool:
+        """排程器工作：上傳最新記錄（沒有記錄、或最新記錄被伺服器拒絕不再重送時視為完成）"""
+        if self.local_storage.get_records_count() == 0 or self.sync_latest_record():
+            return True
+        records = self.local_storage.get_all_records()
+        return self.outbox.state_of(len(records) - 1, records[-1]) == SYNC_DEAD
+    
+    def _sync_backlog(self) -> bool:
+        """排程器工作：補傳所有尚未同步的記錄，全部成功（或被伺服器拒絕、不再重送）才算完成"""
+        result = self.sync_all_records()
+        return bool(result.get('success')) and not result.get('failed')
+    
+    def stop(self):
+        """停止背景同步工作執行緒"""
+        self.scheduler.stop()
+    
+    def sync_all_records(self, force: bool = False) -> Dict[str, Any]:
         """
-        同步所有本地記錄到 Firebase
+        同步尚未上傳的本地記錄到 Firebase（分批、並行，完成一批就推進同步游標）
+        
+        Args:
+            force: 清除同步進度並重送所有記錄（伺服器依冪等鍵覆寫，不會產生重複）
         
         Returns:
             Dict: 同步結果統計
         """
         try:
+            if force:
+                self.outbox.reset()
+            
             all_records = self.local_storage.get_all_records()
-            if not all_records:
+            pending = self.outbox.pending(all_records)
+            if not pending:
                 self.logger.info("沒有本地記錄需要同步")
-                return {'success': True, 'total': 0, 'synced': 0, 'failed': 0}
+                return {'success': True, 'total': 0, 'synced': 0, 'failed': 0, 'dead': 0}
+            
+            batch_size = SYNC_CONFIG['batch_size']
+            batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            self.logger.info(f"開始同步 {len(pending)} 筆本地記錄（{len(batches)} 批）...")
             
             synced_count = 0
             failed_count = 0
-            
-            self.logger.info(f"開始同步 {len(all_records)} 筆本地記錄...")
-            
-            for record in all_records:
-                if self._sync_single_record(record):
-                    synced_count += 1
-                else:
-                    failed_count += 1
+            dead_count = 0
+            with ThreadPoolExecutor(max_workers=SYNC_CONFIG['max_concurrency']) as executor:
+                for outcome in executor.map(self._sync_batch, batches):
+                    synced = [key for key, failure in outcome.items() if failure is None]
+                    self.outbox.mark_synced(all_records, synced)
+                    synced_count += len(synced)
+                    for permanent in (False, True):
+                        failed = [key for key, failure in outcome.items()
+                                  if failure is not None and is_permanent_failure(failure[1]) == permanent]
+                        if failed:
+                            dead = self.outbox.mark_failed(failed, outcome[failed[0]][0], permanent=permanent)
+                            dead_count += len(dead)
+                            failed_count += len(failed) - len(dead)
             
             result = {
                 'success': True,
-                'total': len(all_records),
+                'total': len(pending),
                 'synced': synced_count,
-                'failed': failed_count
+                'failed': failed_count,
+                'dead': dead_count,
+                'requests': len(batches)
             }
             
-            self.logger.info(f"📊 同步完成 - 總計: {len(all_records)}, 成功: {synced_count}, 失敗: {failed_count}")
+            self.logger.info(f"📊 同步完成 - 總計: {len(pending)}, 成功: {synced_count}, 失敗: {failed_count}, "
+                             f"不再重送: {dead_count}")
             return result
             
         except Exception as e:
             self.logger.error(f"同步所有記錄失敗: {e}")
-            return {'success': False, 'error': str(e)} 
\ No newline at end of file
+            return {'success': False, 'error': str(e)}
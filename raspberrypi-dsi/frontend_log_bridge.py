@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+前端日誌橋接
+批次取走頁面日誌環形緩衝（pi-script.js 的 window.piDrainLogs），以原始時間與級別寫入 Python 日誌
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, Any
+
+from config import FRONTEND_LOG_CONFIG
+
+logger = logging.getLogger(__name__)
+
+DRAIN_LOGS_JS = "return window.piDrainLogs ? window.piDrainLogs(arguments[0], arguments[1]) : null;"
+
+LEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'LOG': logging.INFO,
+    'WARN': logging.WARNING,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+}
+
+
+class FrontendLogBridge:
+    """
+    前端日誌橋接
+
+    一次 execute_script 取回游標之後的所有日誌，中間的日誌不會遺失；
+    沒有新日誌時輪詢間隔倍增到 max_interval，有日誌時回到 min_interval，閒置時幾乎沒有負擔。
+    """
+
+    def __init__(self, driver_getter: Callable[[], Any], logger_name: str = 'frontend',
+                 min_interval: float = None, max_interval: float = None, batch_size: int = None):
+        """
+        Args:
+            driver_getter: 返回目前 WebDriver 的函數（瀏覽器重新啟動後仍可取得新的 driver）
+            logger_name: 前端日誌寫入的 logger 名稱
+            min_interval: 有日誌時的輪詢間隔（秒）
+            max_interval: 閒置時的輪詢間隔上限（秒）
+            batch_size: 每次最多取回的筆數
+        """
+        self.logger = logging.getLogger(__name__)
+        self.frontend_logger = logging.getLogger(logger_name)
+        self.driver_getter = driver_getter
+        self.min_interval = min_interval if min_interval is not None else FRONTEND_LOG_CONFIG['min_interval']
+        self.max_interval = max_interval if max_interval is not None else FRONTEND_LOG_CONFIG['max_interval']
+        self.batch_size = batch_size or FRONTEND_LOG_CONFIG['batch_size']
+
+        self.cursor = 0
+        self.page_id = None
+        self.interval = self.min_interval
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.stats = {'drains': 0, 'delivered': 0, 'dropped': 0, 'errors': 0}
+
+    def start(self):
+        """啟動背景取回執行緒（已啟動時不重複啟動）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='frontend-log-bridge', daemon=True)
+        self._thread.start()
+        self.logger.info("🔧 [日誌橋接] 前端日誌監控已啟動")
+
+    def stop(self, timeout: float = 5):
+        """停止背景執行緒，並取回剩下的日誌"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.drain()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            delivered = self.drain()
+            if delivered >= self.batch_size:
+                continue  # 還有更多日誌，立即再取
+            if delivered:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 2, self.max_interval)
+            self._stop_event.wait(self.interval)
+
+    def drain(self) -> int:
+        """
+        取回並輸出游標之後的日誌
+
+        Returns:
+            int: 輸出的日誌筆數
+        """
+        with self._lock:
+            driver = self.driver_getter()
+            if not driver:
+                return 0
+            try:
+                batch = driver.execute_script(DRAIN_LOGS_JS, self.cursor, self.batch_size)
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.debug(f"🔧 [日誌橋接] 取回前端日誌失敗: {e}")
+                return 0
+            self.stats['drains'] += 1
+            if not batch:
+                return 0
+
+            if batch.get('id') != self.page_id:
+                # 頁面重新載入，序號從頭開始
+                self.page_id = batch.get('id')
+                if self.cursor:
+                    self.cursor = 0
+                    try:
+                        batch = driver.execute_script(DRAIN_LOGS_JS, 0, self.batch_size)
+                    except Exception as e:
+                        self.stats['errors'] += 1
+                        self.logger.debug(f"🔧 [日誌橋接] 取回前端日誌失敗: {e}")
+                        return 0
+                    if not batch:
+                        return 0
+            dropped = batch['oldest'] - self.cursor - 1
+            if dropped > 0:
+                self.stats['dropped'] += dropped
+                self.frontend_logger.warning(f"[前端] 日誌緩衝已滿，遺失 {dropped} 筆")
+
+            entries = batch['entries']
+            for entry in entries:
+                self._emit(entry)
+            if entries:
+                self.cursor = entries[-1]['seq']
+            self.stats['delivered'] += len(entries)
+            return len(entries)
+
+    def _emit(self, entry: Dict[str, Any]):
+        """以前端的時間與級別建立日誌記錄"""
+        level = LEVELS.get(str(entry.get('level', 'INFO')).upper(), logging.INFO)
+        if not self.frontend_logger.isEnabledFor(level):
+            return
+        message = f"[前端] {entry.get('message', '')}"
+        if entry.get('data'):
+            message += f" {entry['data']}"
+        record = self.frontend_logger.makeRecord(
+            self.frontend_logger.name, level, 'pi-script.js', 0, message, None, None)
+        if entry.get('time'):
+            record.created = entry['time'] / 1000
+            record.msecs = entry['time'] % 1000
+        self.frontend_logger.handle(record)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, cursor=self.cursor, interval=self.interval)
+
+
+# 測試程式
+if __name__ == "__main__":
+    import time
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    class PageBuffer:
+        """模擬頁面的日誌環形緩衝"""
+
+        def __init__(self):
+            self.seq = 0
+            self.entries = []
+
+        def log(self, level, message):
+            self.seq += 1
+            self.entries.append({'seq': self.seq, 'time': time.time() * 1000, 'level': level, 'message': message})
+
+        def execute_script(self, script, after, limit):
+            entries = [e for e in self.entries if e['seq'] > after][:limit]
+            return {'id': 1, 'seq': self.seq, 'oldest': self.entries[0]['seq'] if self.entries else self.seq + 1,
+                    'entries': entries}
+
+    page = PageBuffer()
+    bridge = FrontendLogBridge(lambda: page, min_interval=0.1, max_interval=1)
+    bridge.start()
+    for i in range(5):
+        page.log('INFO' if i % 2 else 'WARN', f"測試日誌 {i}")
+    time.sleep(0.5)
+    bridge.stop()
+    print(f"📊 {bridge.get_stats()}")
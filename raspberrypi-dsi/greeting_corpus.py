@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 預先合成的問候語語料
+將所有內建問候語與通知音效預先放入 TTS 快取（固定，不會被淘汰），
+並以清單記錄；啟動時只比對本地文件，故事 API 或 OpenAI 無法使用時可立即離線播放
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import wave
+import struct
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+from config import TTS_CONFIG, MORNING_GREETINGS
+from tts_cache import TTSCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'corpus_manifest.json'
+
+# 通知音效：類型 -> (頻率 Hz, 長度 秒)，與 play_notification_sound 的嗶聲相同
+NOTIFICATION_TONES = {
+    'success': (880, 0.1),
+    'error': (440, 0.2),
+    'click': (800, 0.1),
+}
+TONE_SAMPLE_RATE = 24000
+
+
+def greeting_phrases() -> Dict[str, str]:
+    """所有內建問候語：語料 ID -> 文字"""
+    return {f"greeting:{locale}": text for locale, text in MORNING_GREETINGS.items()}
+
+
+def tone_cache_key(name: str) -> str:
+    """通知音效的快取鍵"""
+    frequency, duration = NOTIFICATION_TONES[name]
+    return make_cache_key(f"{frequency}Hz {duration}s", 'tone', 'sine', 1.0, 'wav')
+
+
+def render_tone(frequency: int, duration: float, f, sample_rate: int = TONE_SAMPLE_RATE):
+    """在程式內產生單音 WAV（頭尾 5ms 淡入淡出，避免爆音）"""
+    total = int(duration * sample_rate)
+    fade = int(0.005 * sample_rate)
+    frames = bytearray()
+    for i in range(total):
+        envelope = min(1.0, i / fade, (total - i) / fade)
+        frames += struct.pack('<h', int(12000 * envelope * math.sin(2 * math.pi * frequency * i / sample_rate)))
+
+    wav = wave.open(f, 'wb')
+    wav.setnchannels(1)
+    wav.setsampwidth(2)
+    wav.setframerate(sample_rate)
+    wav.writeframes(bytes(frames))
+    wav.close()
+
+
+class GreetingCorpus:
+    """預先合成的問候語與通知音效"""
+
+    def __init__(self, tts_cache: TTSCache):
+        """
+        Args:
+            tts_cache: 存放語料的 TTS 快取
+        """
+        self.logger = logging.getLogger(__name__)
+        self.tts_cache = tts_cache
+        self.manifest_file = tts_cache.cache_dir / MANIFEST_FILE
+        self.entries: Dict[str, Path] = {}
+
+    def voice_settings(self) -> Dict[str, Any]:
+        """語料對應的語音設定，設定改變後需要重新合成"""
+        return {
+            'voice': TTS_CONFIG['openai_voice'],
+            'model': TTS_CONFIG['openai_model'],
+            'speed': TTS_CONFIG['openai_speed'],
+        }
+
+    def verify(self) -> Dict[str, int]:
+        """
+        檢查清單中的每個文件仍在快取中且大小相符（只讀本地文件，不連網）
+
+        Returns:
+            Dict: available, missing
+        """
+        self.entries = {}
+        try:
+            manifest = json.loads(self.manifest_file.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            self.logger.info("ℹ️ 尚未建立離線問候語，可執行 python3 greeting_corpus.py warm-cache")
+            return {'available': 0, 'missing': 0}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"⚠️ 離線問候語清單無法讀取: {e}")
+            return {'available': 0, 'missing': 0}
+
+        if manifest.get('settings') != self.voice_settings():
+            self.logger.warning("⚠️ 語音設定已變更，離線問候語需要重新執行 warm-cache")
+            manifest['entries'] = {
+                corpus_id: entry for corpus_id, entry in manifest.get('entries', {}).items()
+                if corpus_id.startswith('tone:')
+            }
+
+        missing = 0
+        for corpus_id, entry in manifest.get('entries', {}).items():
+            path = self.tts_cache.path_for(entry['key'], entry['format'])
+            try:
+                intact = path.stat().st_size == entry['size']
+            except OSError:
+                intact = False
+            # pin 同時確認索引中仍有此項目
+            if intact and self.tts_cache.pin(entry['key']):
+                self.entries[corpus_id] = path
+            else:
+                missing += 1
+
+        if missing:
+            self.logger.warning(f"⚠️ 離線問候語缺少 {missing} 個文件，請重新執行 warm-cache")
+        self.logger.info(f"📦 離線問候語: {len(self.entries)} 個可用")
+        return {'available': len(self.entries), 'missing': missing}
+
+    def greeting_audio(self, locale: str) -> Optional[Path]:
+        """取得指定語言的內建問候語音頻"""
+        return self.entries.get(f"greeting:{locale}") or self.entries.get('greeting:default')
+
+    def tone_audio(self, name: str) -> Optional[Path]:
+        """取得通知音效"""
+        return self.entries.get(f"tone:{name}")
+
+    def warm(self, audio_manager, force: bool = False) -> Dict[str, Any]:
+        """
+        合成所有內建問候語與通知音效並寫入清單
+
+        Args:
+            audio_manager: 用來呼叫 OpenAI TTS 的音頻管理器
+            force: 忽略既有快取重新合成
+
+        Returns:
+            Dict: rendered, cached, failed
+        """
+        settings = self.voice_settings()
+        result = {'rendered': 0, 'cached': 0, 'failed': []}
+        entries = {}
+
+        for corpus_id, text in greeting_phrases().items():
+            cached_file = None if force else audio_manager._find_openai_cache(text, settings['voice'])
+            audio_file = cached_file or audio_manager._generate_audio_openai_direct(
+                text, corpus_id.split(':', 1)[1], voice=settings['voice']
+            )
+            if not audio_file:
+                result['failed'].append(corpus_id)
+                continue
+            result['cached' if cached_file else 'rendered'] += 1
+            # 快取文件名稱即為「鍵.格式」
+            entries[corpus_id] = self._pin_entry(audio_file.stem, audio_file.suffix[1:], text)
+
+        for name, (frequency, duration) in NOTIFICATION_TONES.items():
+            key = tone_cache_key(name)
+            if force or not self.tts_cache.get(key):
+                with self.tts_cache.writer(key, 'wav', 'tone', name) as f:
+                    render_tone(frequency, duration, f)
+                result['rendered'] += 1
+            else:
+                result['cached'] += 1
+            entries[f"tone:{name}"] = self._pin_entry(key, 'wav', name)
+
+        manifest = {'created': time.time(), 'settings': settings, 'entries': entries}
+        temp_file = self.manifest_file.with_suffix('.part')
+        temp_file.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(str(temp_file), str(self.manifest_file))
+
+        self.verify()
+        return result
+
+    def _pin_entry(self, key: str, audio_format: str, text: str) -> Dict[str, Any]:
+        self.tts_cache.pin(key)
+        return {
+            'key': key,
+            'format': audio_format,
+            'size': self.tts_cache.path_for(key, audio_format).stat().st_size,
+            'text': text,
+        }
+
+
+# 測試程式
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    if command == 'warm-cache':
+        from audio_manager import get_audio_manager
+        audio_manager = get_audio_manager()
+        result = audio_manager.greeting_corpus.warm(audio_manager, force='--force' in sys.argv)
+        print(f"✓ 合成 {result['rendered']} 個，沿用快取 {result['cached']} 個")
+        if result['failed']:
+            print(f"✗ 合成失敗: {', '.join(result['failed'])}")
+            sys.exit(1)
+    else:
+        from tts_cache import get_tts_cache
+        corpus = GreetingCorpus(get_tts_cache())
+        status = corpus.verify()
+        print(f"離線問候語: {status['available']} 個可用，{status['missing']} 個缺少")
+        sys.exit(1 if status['missing'] or not status['available'] else 0)
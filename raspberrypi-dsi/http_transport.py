@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+共用 HTTP 連線
+所有對外請求共用 keep-alive 連線池，避免甦醒流程的每一步都重新做 TCP+TLS 握手
+"""
+
+import time
+import socket
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple, Union
+
+from config import HTTP_CONFIG, API_CONFIG
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+
+try:
+    import httpx
+    import h2  # noqa: F401  httpx 的 HTTP/2 支援需要 h2
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class DNSCache:
+    """
+    socket.getaddrinfo 的結果快取
+
+    成功的查詢保留 ttl 秒；查詢失敗時若有過期的結果則沿用（Wi-Fi 不穩時 DNS 常先失敗）
+    """
+
+    def __init__(self, resolver, ttl: float):
+        self.resolver = resolver
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0}
+
+    def __call__(self, host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self.stats['hits'] += 1
+                return entry[1]
+            self.stats['misses'] += 1
+
+        try:
+            result = self.resolver(host, port, family, type, proto, flags)
+        except socket.gaierror:
+            if entry:
+                with self._lock:
+                    self.stats['stale'] += 1
+                logger.warning(f"DNS 查詢失敗，沿用快取結果: {host}")
+                return entry[1]
+            raise
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_dns_cache = None
+
+def install_dns_cache(ttl: float = None) -> Optional[DNSCache]:
+    """為整個程序啟用 DNS 快取（只安裝一次）"""
+    global _dns_cache
+    ttl = HTTP_CONFIG['dns_cache_ttl'] if ttl is None else ttl
+    if _dns_cache is None and ttl > 0:
+        _dns_cache = DNSCache(socket.getaddrinfo, ttl)
+        socket.getaddrinfo = _dns_cache
+    return _dns_cache
+
+
+def normalize_timeout(timeout: Union[None, float, Tuple[float, float]]) -> Tuple[float, float]:
+    """統一逾時設定為 (連線, 讀取)；只給一個數字時視為讀取逾時"""
+    if timeout is None:
+        return (HTTP_CONFIG['connect_timeout'], API_CONFIG['timeout'])
+    if isinstance(timeout, (tuple, list)):
+        return tuple(timeout)
+    return (min(HTTP_CONFIG['connect_timeout'], timeout), timeout)
+
+
+class _HTTPXResponse:
+    """讓 httpx 回應與 requests 回應有相同的介面（status_code、json()、raise_for_status() 等）"""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self) -> bytes:
+        return self._response.content
+
+    @property
+    def text(self) -> str:
+        return self._response.text
+
+    def json(self):
+        return self._response.json()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"HTTP {self.status_code}: {self.url}", response=self)
+
+
+class HTTPTransport:
+    """
+    共用的 HTTP 連線（介面與 requests.Session 的 get/post/request 相同）
+
+    預設使用 requests 的連線池；HTTP_CONFIG['http2'] 開啟且已安裝 httpx[http2] 時改用 HTTP/2，
+    例外一律轉換成 requests.exceptions，呼叫端不需區分。
+    """
+
+    def __init__(self, http2: bool = None):
+        if not REQUESTS_AVAILABLE:
+            raise RuntimeError("需要安裝 requests")
+        self.logger = logging.getLogger(__name__)
+        self.http2 = (HTTP_CONFIG['http2'] if http2 is None else http2) and HTTPX_AVAILABLE
+        self.headers = {
+            'User-Agent': HTTP_CONFIG['user_agent'],
+            'Accept': 'application/json',
+        }
+        self.stats = {'requests': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+        if self.http2:
+            self._client = httpx.Client(
+                http2=True,
+                headers=self.headers,
+                limits=httpx.Limits(max_keepalive_connections=HTTP_CONFIG['pool_maxsize']),
+                transport=httpx.HTTPTransport(http2=True, retries=HTTP_CONFIG['connect_retries']),
+            )
+        else:
+            self._client = requests.Session()
+            self._client.headers.update(self.headers)
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_CONFIG['pool_connections'],
+                pool_maxsize=HTTP_CONFIG['pool_maxsize'],
+                # 只重試連線錯誤（請求尚未送出），POST 不會重複送出
+                max_retries=Retry(total=HTTP_CONFIG['connect_retries'], connect=HTTP_CONFIG['connect_retries'],
+                                  read=0, status=0, redirect=3),
+            )
+            self._client.mount('https://', adapter)
+            self._client.mount('http://', adapter)
+
+        if HTTP_CONFIG['http2'] and not self.http2:
+            self.logger.info("未安裝 httpx[http2]，使用 HTTP/1.1 keep-alive 連線")
+
+    def request(self, method: str, url: str, timeout=None, **kwargs):
+        """
+        發送請求
+
+        Args:
+            method: HTTP 方法
+            url: 網址
+            timeout: 讀取逾時秒數或 (連線, 讀取)；預設 (connect_timeout, API_CONFIG['timeout'])
+            **kwargs: json、data、params、headers 等，與 requests 相同
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+        connect_timeout, read_timeout = normalize_timeout(timeout)
+        try:
+            if not self.http2:
+                return self._client.request(method, url, timeout=(connect_timeout, read_timeout), **kwargs)
+            response = self._client.request(
+                method, url,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                **kwargs)
+            return _HTTPXResponse(response)
+        except Exception as e:
+            with self._lock:
+                self.stats['errors'] += 1
+            if self.http2 and isinstance(e, httpx.TimeoutException):
+                raise requests.exceptions.Timeout(str(e)) from e
+            if self.http2 and isinstance(e, httpx.HTTPError):
+                raise requests.exceptions.ConnectionError(str(e)) from e
+            raise
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats, http2=self.http2)
+        if _dns_cache:
+            stats['dns'] = dict(_dns_cache.stats)
+        return stats
+
+    def close(self):
+        self._client.close()
+
+
+# 全域共用連線
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session() -> HTTPTransport:
+    """獲取全域共用的 HTTP 連線（第一次呼叫時一併啟用 DNS 快取）"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            install_dns_cache()
+            _http_session = HTTPTransport()
+        return _http_session
+
+
+# 測試程式
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from config import API_ENDPOINTS
+
+    url = sys.argv[1] if len(sys.argv) > 1 else API_ENDPOINTS['firebase_config']
+    session = get_http_session()
+    for i in range(3):
+        start_time = time.perf_counter()
+        try:
+            response = session.get(url, timeout=10)
+            print(f"第 {i + 1} 次: HTTP {response.status_code}，{(time.perf_counter() - start_time) * 1000:.0f} ms")
+        except requests.exceptions.RequestException as e:
+            print(f"第 {i + 1} 次失敗: {e}")
+    print(f"📊 {session.get_stats()}")
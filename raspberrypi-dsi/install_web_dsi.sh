@@ -203,6 +203,7 @@ install_audio() {
         "espeak"
         "espeak-data"
         "sox"
+        "mpg123"
         "libsox-fmt-all"
         "portaudio19-dev"
     )
@@ -266,7 +267,10 @@ install_python_deps() {
     if [ -f requirements.txt ]; then
         pip install -r requirements.txt
     fi
-    
+
+    # 產生二進位城市資料表（本機城市索引使用）
+    python3 city_table.py build || log_warning "城市資料表建立失敗，將改用 cities_data.json"
+
     log_info "Python依賴安裝完成"
 }
 
@@ -395,6 +399,7 @@ show_post_install_info() {
     echo "   cd $(pwd)"
     echo "   source venv/bin/activate"
     echo "   python3 main_web_dsi.py"
+    echo "   python3 greeting_corpus.py warm-cache  # 預先合成離線問候語（需要 OPENAI_API_KEY）"
     echo
     echo "4. 啟用自動啟動："
     echo "   sudo systemctl enable wakeupmap-dsi-web"
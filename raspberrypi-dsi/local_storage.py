@@ -4,20 +4,24 @@
 用於管理 Day 計數和甦醒記錄的本地儲存
 """
 
-import json
 import os
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 import logging
 
+from config import STORAGE_CONFIG
+from storage_engines import create_storage_engine
+
 class LocalStorage:
-    def __init__(self, storage_dir: str = None):
+    def __init__(self, storage_dir: str = None, engine: str = None):
         """
         初始化本地儲存管理器
         
         Args:
             storage_dir: 儲存目錄，預設為 ~/.wakeup_data
+            engine: 儲存引擎（'journal'、'sqlite' 或 'json'），預設依 STORAGE_CONFIG
         """
         self.logger = logging.getLogger(__name__)
         
@@ -28,50 +32,54 @@ class LocalStorage:
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(exist_ok=True)
         
-        # 儲存檔案路徑
-        self.records_file = self.storage_dir / "wakeup_records.json"
-        self.day_counter_file = self.storage_dir / "day_counter.json"
+        # 儲存引擎（記錄與 Day 計數）
+        self.engine = create_storage_engine(engine or STORAGE_CONFIG['engine'], self.storage_dir)
         
-        # 初始化檔案
-        self._init_files()
+        # 記憶體快取（寫入時同步更新；按鈕與同步執行緒共用，以鎖保護）
+        self._lock = threading.RLock()
+        self._cache = {}
+        self._signature = None
+        self._changes = 0
         
-        self.logger.info(f"本地儲存初始化完成，儲存目錄: {self.storage_dir}")
+        self.logger.info(f"本地儲存初始化完成，儲存目錄: {self.storage_dir}，引擎: {self.engine.name}")
     
-    def _init_files(self):
-        """初始化儲存檔案"""
-        # 初始化記錄檔案
-        if not self.records_file.exists():
-            self._save_json(self.records_file, [])
-            self.logger.info("建立新的記錄檔案")
-        
-        # 初始化 Day 計數檔案
-        if not self.day_counter_file.exists():
-            day_data = {
-                "current_day": 0,
-                "last_updated": None,
-                "total_records": 0
-            }
-            self._save_json(self.day_counter_file, day_data)
-            self.logger.info("建立新的 Day 計數檔案")
+    def _file_signature(self) -> tuple:
+        """引擎檔案的 (名稱, 修改時間, 大小)，用來偵測外部修改"""
+        signature = []
+        for path in self.engine.files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            signature.append((path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
     
-    def _load_json(self, file_path: Path) -> Any:
-        """載入 JSON 檔案"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            self.logger.error(f"載入 JSON 檔案失敗 {file_path}: {e}")
-            return None
+    def _remember_files(self):
+        """記下目前的檔案狀態（本行程寫入後呼叫，之後的比對不會把自己的寫入當成外部修改）"""
+        self._signature = self._file_signature()
+        self._changes = self.engine.changes
     
-    def _save_json(self, file_path: Path, data: Any) -> bool:
-        """儲存 JSON 檔案"""
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            self.logger.error(f"儲存 JSON 檔案失敗 {file_path}: {e}")
-            return False
+    def _cached(self, name: str, loader):
+        """從記憶體快取讀取；檔案被外部修改時先重新載入"""
+        with self._lock:
+            signature = self._file_signature()
+            if signature != self._signature:
+                if self._signature is None:
+                    self._cache.clear()
+                elif self.engine.changes == self._changes:
+                    self.logger.info("偵測到儲存檔案被外部修改，重新載入")
+                    self.engine.reload()
+                    signature = self._file_signature()
+                    self._cache.clear()
+                # 否則是本行程的背景壓縮或 SQLite WAL 寫入，內容與快取一致
+                self._signature = signature
+                self._changes = self.engine.changes
+            if name not in self._cache:
+                self._cache[name] = loader()
+            return self._cache[name]
+    
+    def _counters(self) -> Dict[str, Any]:
+        return dict(self._cached('counters', self.engine.load_counters))
     
     def get_next_day_number(self) -> int:
         """
@@ -80,11 +88,7 @@ class LocalStorage:
         Returns:
             int: 下一個 Day 編號
         """
-        day_data = self._load_json(self.day_counter_file)
-        if day_data is None:
-            self.logger.warning("無法載入 Day 計數，使用預設值 1")
-            return 1
-        
+        day_data = self._counters()
         next_day = day_data.get("current_day", 0) + 1
         self.logger.info(f"下一個 Day 編號: {next_day}")
         return next_day
@@ -96,11 +100,7 @@ class LocalStorage:
         Returns:
             int: 當前 Day 編號
         """
-        day_data = self._load_json(self.day_counter_file)
-        if day_data is None:
-            return 0
-        
-        return day_data.get("current_day", 0)
+        return self._counters().get("current_day", 0)
     
     def increment_day_counter(self) -> int:
         """
@@ -109,23 +109,24 @@ class LocalStorage:
         Returns:
             int: 新的 Day 編號
         """
-        day_data = self._load_json(self.day_counter_file)
-        if day_data is None:
-            day_data = {"current_day": 0, "last_updated": None, "total_records": 0}
-        
-        # 增加計數
-        day_data["current_day"] += 1
-        day_data["last_updated"] = datetime.now().isoformat()
-        day_data["total_records"] = day_data["current_day"]
-        
-        # 儲存更新
-        if self._save_json(self.day_counter_file, day_data):
-            new_day = day_data["current_day"]
-            self.logger.info(f"Day 計數已更新為: {new_day}")
-            return new_day
-        else:
-            self.logger.error("Day 計數更新失敗")
-            return day_data.get("current_day", 1)
+        with self._lock:
+            day_data = self._counters()
+            
+            # 增加計數
+            day_data["current_day"] += 1
+            day_data["last_updated"] = datetime.now().isoformat()
+            day_data["total_records"] = day_data["current_day"]
+            
+            # 儲存更新（寫入成功才更新快取）
+            if self.engine.save_counters(day_data):
+                self._cache['counters'] = day_data
+                self._remember_files()
+                new_day = day_data["current_day"]
+                self.logger.info(f"Day 計數已更新為: {new_day}")
+                return new_day
+            else:
+                self.logger.error("Day 計數更新失敗")
+                return day_data.get("current_day", 1)
     
     def save_wakeup_record(self, record_data: Dict[str, Any]) -> bool:
         """
@@ -138,24 +139,24 @@ class LocalStorage:
             bool: 儲存是否成功
         """
         try:
-            # 載入現有記錄
-            records = self._load_json(self.records_file)
-            if records is None:
-                records = []
-            
-            # 添加時間戳記
-            record_data["timestamp"] = datetime.now().isoformat()
-            record_data["day"] = self.get_current_day_number()
-            
-            # 添加到記錄列表
-            records.append(record_data)
-            
-            # 儲存記錄
-            if self._save_json(self.records_file, records):
+            with self._lock:
+                # 添加時間戳記
+                record_data["timestamp"] = datetime.now().isoformat()
+                record_data["day"] = self.get_current_day_number()
+                
+                # 追加記錄
+                if not self.engine.append_record(record_data):
+                    return False
+                
+                if 'records' in self._cache:
+                    self._cache['records'].append(dict(record_data))
+                if 'count' in self._cache:
+                    self._cache['count'] += 1
+                self._cache['latest'] = dict(record_data)
+                self._remember_files()
+                
                 self.logger.info(f"甦醒記錄已儲存: Day {record_data['day']}, 城市: {record_data.get('city', 'Unknown')}")
                 return True
-            else:
-                return False
                 
         except Exception as e:
             self.logger.error(f"儲存甦醒記錄失敗: {e}")
@@ -168,11 +169,7 @@ class LocalStorage:
         Returns:
             List[Dict]: 所有記錄列表
         """
-        records = self._load_json(self.records_file)
-        if records is None:
-            return []
-        
-        return records
+        return [dict(record) for record in self._cached('records', self.engine.load_records)]
     
     def get_records_count(self) -> int:
         """
@@ -181,8 +178,10 @@ class LocalStorage:
         Returns:
             int: 記錄總數
         """
-        records = self.get_all_records()
-        return len(records)
+        with self._lock:
+            # 已載入全部記錄時直接取長度，不必再讓引擎計算
+            return self._cached('count', lambda: len(self._cache['records']) if 'records' in self._cache
+                                else self.engine.count_records())
     
     def get_latest_record(self) -> Optional[Dict[str, Any]]:
         """
@@ -191,12 +190,55 @@ class LocalStorage:
         Returns:
             Dict: 最新記錄，如果沒有記錄則返回 None
         """
-        records = self.get_all_records()
-        if not records:
-            return None
-        
-        return records[-1]
-    
+        latest = self._cached('latest', self.engine.latest_record)
+        return dict(latest) if latest else None
+
+    def get_latest_records(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        獲取最新的幾筆記錄
+
+        Args:
+            limit: 筆數
+
+        Returns:
+            List[Dict]: 記錄列表（新到舊）
+        """
+        return self.engine.latest_records(limit)
+
+    def get_records_between(self, start: str = None, end: str = None) -> List[Dict[str, Any]]:
+        """
+        依日期範圍查詢記錄
+
+        Args:
+            start: 起始時間（ISO 格式，包含），例如 '2025-01-01'
+            end: 結束時間（ISO 格式，不包含），例如 '2025-02-01'
+
+        Returns:
+            List[Dict]: 時間範圍內的記錄
+        """
+        return self.engine.records_between(start, end)
+
+    def get_records_by_country(self, country_code: str) -> List[Dict[str, Any]]:
+        """
+        依國家代碼查詢記錄
+
+        Args:
+            country_code: ISO 國家代碼，例如 'JP'
+
+        Returns:
+            List[Dict]: 該國家的記錄
+        """
+        return self.engine.records_by_country(country_code)
+
+    def get_visited_cities(self) -> List[Dict[str, Any]]:
+        """
+        獲取去過的城市（不重複）
+
+        Returns:
+            List[Dict]: 城市、國家、國家代碼、造訪次數與第一次造訪的 Day
+        """
+        return self.engine.visited_cities()
+
     def clear_all_data(self) -> bool:
         """
         清除所有本地資料（僅用於測試）
@@ -205,13 +247,11 @@ class LocalStorage:
             bool: 清除是否成功
         """
         try:
-            self._save_json(self.records_file, [])
-            day_data = {
-                "current_day": 0,
-                "last_updated": None,
-                "total_records": 0
-            }
-            self._save_json(self.day_counter_file, day_data)
+            with self._lock:
+                if not self.engine.clear():
+                    return False
+                self._cache.clear()
+                self._remember_files()
             self.logger.info("所有本地資料已清除")
             return True
         except Exception as e:
@@ -225,14 +265,18 @@ class LocalStorage:
         Returns:
             Dict: 儲存統計資訊
         """
-        day_data = self._load_json(self.day_counter_file)
+        day_data = self._counters()
         records_count = self.get_records_count()
         
         return {
             "storage_dir": str(self.storage_dir),
-            "current_day": day_data.get("current_day", 0) if day_data else 0,
+            "engine": self.engine.name,
+            "current_day": day_data.get("current_day", 0),
             "total_records": records_count,
-            "last_updated": day_data.get("last_updated") if day_data else None,
-            "records_file_exists": self.records_file.exists(),
-            "day_counter_file_exists": self.day_counter_file.exists()
-        } 
\ No newline at end of file
+            "last_updated": day_data.get("last_updated"),
+            "files": {path.name: path.stat().st_size for path in self.engine.files() if path.exists()}
+        }
+    
+    def close(self):
+        """關閉儲存引擎（等待背景壓縮完成）"""
+        self.engine.close() 
\ No newline at end of file
@@ -11,6 +11,7 @@ import logging
 import threading
 import time
 from typing import Optional
+from contextlib import nullcontext
 from pathlib import Path
 
 # 自動載入 .env 檔案
@@ -35,35 +36,42 @@ load_env_file()
 # 導入自定義模組
 from config import (
     LOGGING_CONFIG, DEBUG_MODE, AUTOSTART_CONFIG, BUTTON_CONFIG,
-    SCREENSAVER_CONFIG, ERROR_MESSAGES, USER_CONFIG
+    SCREENSAVER_CONFIG, ERROR_MESSAGES, USER_CONFIG, PREFETCH_CONFIG, TTS_CONFIG,
+    PIPELINE_CONFIG, FRONTEND_LOG_CONFIG
 )
 # 🔧 已停用本地儲存，統一使用前端Firebase直寫
 # from local_storage import LocalStorage  
 # from firebase_sync import FirebaseSync
 
-# 確保模組可以被導入
+# 確保模組可以被導入（selenium、openai、pygame、pigpio 等重量級模組延後到各子系統啟動時才載入）
 try:
-    from web_controller_dsi import WebControllerDSI
-    from audio_manager import get_audio_manager, cleanup_audio_manager
+    from wakeup_pipeline import PipelineRunner, Stage, STAGE_DONE
+    from frontend_log_bridge import FrontendLogBridge
+    from tracing import get_tracer, traced
+    from metrics import get_registry, start_metrics_server, stop_metrics_server
+    from boot import BootSequence, lazy_import
 except ImportError as e:
     print(f"模組導入失敗: {e}")
     print("請確保所有必要的檔案都在正確的位置")
     sys.exit(1)
 
-# 按鈕處理器導入（優先使用 pigpio，更穩定）
-ButtonHandler = None
-try:
-    from button_handler_pigpio import ButtonHandlerPigpio as ButtonHandler
-    button_handler_type = "pigpiod"
-except ImportError:
+logger = logging.getLogger(__name__)
+
+def load_button_handler():
+    """
+    載入按鈕處理器（優先使用 pigpio，更穩定）
+    
+    Returns:
+        tuple: (處理器類別, 類型名稱)，都無法使用時為 (None, None)
+    """
     try:
-        from button_handler import ButtonHandler
-        button_handler_type = "RPi.GPIO"
+        return lazy_import('button_handler_pigpio').ButtonHandlerPigpio, "pigpiod"
     except ImportError:
-        print("警告：無法導入任何按鈕處理器模組")
-        button_handler_type = None
-
-logger = logging.getLogger(__name__)
+        try:
+            return lazy_import('button_handler').ButtonHandler, "RPi.GPIO"
+        except ImportError:
+            logger.warning("警告：無法導入任何按鈕處理器模組")
+            return None, None
 
 # 全域應用程式實例
 app = None
@@ -116,6 +124,22 @@ class WakeUpMapWebApp:
         # 音訊管理
         self.audio_manager = None
         
+        # 甦醒城市與故事預取
+        self.prefetcher = None
+        
+        # 甦醒流程管線（每次按鈕一次執行）
+        self.pipeline = PipelineRunner()
+        self.current_run = None
+        self.playback = None  # 目前這次按鈕的播放工作階段（新的按鈕會中斷它）
+        self.tracer = get_tracer()
+        self.boot = None
+        
+        # 執行時指標（/metrics）
+        registry = get_registry()
+        self.press_counter = registry.counter('button_presses_total', "短按次數", ['outcome'])
+        self.stage_latency = registry.histogram('stage_duration_seconds', "甦醒流程各階段耗時", ['stage'])
+        self.press_latency = registry.histogram('press_to_audio_seconds', "按鈕邊緣到第一個音頻樣本")
+        
         # 本地儲存管理
         self.local_storage = None
         
@@ -130,6 +154,9 @@ class WakeUpMapWebApp:
         self.running = False
         self._stop_event = threading.Event()
         
+        # 網頁 Loading 遮罩是否顯示中
+        self.loading_overlay_shown = False
+        
         # 防止重複觸發
         self.last_button_action_time = 0
         self.is_processing_button = False
@@ -138,35 +165,35 @@ class WakeUpMapWebApp:
         self._initialize()
     
     def _initialize(self):
-        """初始化應用程式組件"""
+        """初始化應用程式組件：按鈕、瀏覽器與音頻並行啟動，等待全部完成"""
         try:
             self.logger.info("甦醒地圖網頁模式初始化")
             
-            # 初始化網頁控制器
-            self.logger.info("初始化網頁控制器...")
-            self.web_controller = WebControllerDSI()
-            
             # 🔧 統一使用前端Firebase直寫，停用本地儲存
             self.logger.info("已停用本地儲存，採用前端Firebase直寫模式")
             self.local_storage = None
             self.firebase_sync = None
             
-            # 🔧 前端日誌監控標誌
-            self.frontend_log_monitoring_started = False
-            
-            # 初始化音訊管理器
-            self.logger.info("初始化音訊管理器...")
-            try:
-                self.audio_manager = get_audio_manager()
-            except Exception as e:
-                self.logger.warning(f"音訊管理器初始化失敗：{e}")
-                self.audio_manager = None
-            
-            # 初始化按鈕處理器
-            self._initialize_button_handler()
-            
-            # 初始化網頁
-            self._initialize_web()
+            # 🔧 前端日誌橋接
+            self.log_bridge = None
+            
+            # 🚀 互不相依的子系統並行啟動；按鈕最先就緒，網頁就緒前的按鈕會被忽略
+            self.boot = BootSequence(self.pipeline, self.tracer)
+            run = self.boot.start([
+                Stage('button', lambda results: self._initialize_button_handler()),
+                Stage('metrics', lambda results: start_metrics_server()),
+                Stage('browser', lambda results: self._initialize_browser()),
+                Stage('audio', lambda results: self._initialize_audio()),
+                Stage('page', lambda results: self._initialize_web(), deps=['browser']),
+                Stage('log_bridge', lambda results: self._initialize_log_bridge(), deps=['page']),
+                Stage('audio_setup', lambda results: self._finish_audio_setup(), deps=['audio']),
+                Stage('prefetch', lambda results: self._initialize_prefetcher(), deps=['audio']),
+            ], milestones={'button': 'button_ready', 'page': 'web_ready'})
+            run.result()
+            
+            if run.records['page']['status'] != STAGE_DONE:
+                error = run.records['browser']['error'] or run.records['page']['error'] or run.records['page']['status']
+                raise RuntimeError(f"網頁初始化失敗：{error}")
             
             self.logger.info("應用程式初始化完成")
             
@@ -174,18 +201,19 @@ class WakeUpMapWebApp:
             self.logger.error(f"初始化失敗：{e}")
             raise
     
+    def _initialize_browser(self):
+        """初始化網頁控制器並啟動瀏覽器"""
+        self.logger.info("初始化網頁控制器...")
+        web_controller = lazy_import('web_controller_dsi').WebControllerDSI()
+        self.web_controller = web_controller
+        web_controller.start_browser()
+    
     def _initialize_web(self):
         """初始化網頁"""
         try:
             self.logger.info("正在初始化網頁...")
             
-            # 啟動瀏覽器並自動設定
-            self.web_controller.start_browser()
-            
-            # 等待頁面載入完成
-            time.sleep(3)
-            
-            # 自動填入使用者名稱並載入資料
+            # 自動填入使用者名稱並載入資料（等待頁面信號，不再固定等待）
             self.web_controller.load_website()
             
             self.logger.info("網頁初始化完成，系統就緒")
@@ -194,6 +222,39 @@ class WakeUpMapWebApp:
             self.logger.error(f"網頁初始化失敗：{e}")
             raise
     
+    def _initialize_log_bridge(self):
+        """啟動前端日誌橋接"""
+        if FRONTEND_LOG_CONFIG['enabled']:
+            self.log_bridge = FrontendLogBridge(lambda: self.web_controller.driver)
+            self.log_bridge.start()
+    
+    def _initialize_audio(self):
+        """初始化音訊管理器（較慢的音量設定與快取清理由 _finish_audio_setup 接著執行）"""
+        self.logger.info("初始化音訊管理器...")
+        try:
+            self.audio_manager = lazy_import('audio_manager').get_audio_manager(defer_setup=True)
+        except Exception as e:
+            self.logger.warning(f"音訊管理器初始化失敗：{e}")
+            self.audio_manager = None
+    
+    def _finish_audio_setup(self):
+        if self.audio_manager:
+            self.audio_manager.finish_setup()
+    
+    def _initialize_prefetcher(self):
+        """初始化甦醒預取（需要音訊管理器與本機城市索引）"""
+        if not PREFETCH_CONFIG['enabled'] or not self.audio_manager:
+            return
+        
+        city_index = lazy_import('city_index').get_city_index()
+        if not city_index:
+            self.logger.warning("本機城市索引無法使用，停用甦醒預取")
+            return
+        
+        self.prefetcher = lazy_import('prefetcher').WakeupPrefetcher(
+            self.audio_manager, city_index, self._guess_country_code)
+        self.prefetcher.start()
+    
     def _setup_screensaver(self):
         """設定螢幕保護程式"""
         if SCREENSAVER_CONFIG['enabled']:
@@ -227,42 +288,66 @@ class WakeUpMapWebApp:
         import time
         current_time = time.time()
         
+        # 啟動中網頁尚未就緒
+        if not self.boot.reached('web_ready'):
+            self.logger.warning("系統啟動中，網頁尚未就緒，忽略此次按鈕")
+            self.press_counter.inc(outcome='ignored')
+            return
+        
         # 防止重複觸發檢查
         if self.is_processing_button:
             self.logger.warning("按鈕事件正在處理中，忽略重複觸發")
+            self.press_counter.inc(outcome='ignored')
             return
         
         if current_time - self.last_button_action_time < 2.0:  # 2秒內不允許重複操作
             self.logger.warning(f"按鈕操作間隔過短 ({current_time - self.last_button_action_time:.2f}s)，忽略此次操作")
+            self.press_counter.inc(outcome='ignored')
             return
         
+        self.press_counter.inc(outcome='accepted')
         self.is_processing_button = True
         self.last_button_action_time = current_time
         
+        # 按鈕處理器已開始這次按鈕的追蹤（邊緣 → 回調）；沒有的話從這裡開始
+        trace = self.tracer.current_trace() or self.tracer.start_trace('button_press')
+        handed_off = False
+        
         try:
-            self.logger.info("處理短按事件：點擊開始按鈕")
-            
-            # 處理螢幕保護器
-            self._deactivate_screensaver()
-            self._reset_screensaver_timer()
-            
-            result = self.web_controller.click_start_button()
-            
-            if result and result.get('success'):
-                self.logger.info("開始按鈕點擊成功")
+            with trace.activate():
+                self.logger.info(f"處理短按事件：點擊開始按鈕 [追蹤 {trace.trace_id}]")
                 
-                # 🔧 Day計數由前端Firebase決定，不再使用本地計數
-                self.logger.info("📊 Day計數將由前端Firebase查詢決定")
+                # 處理螢幕保護器
+                self._deactivate_screensaver()
+                self._reset_screensaver_timer()
                 
-                # 從網頁提取城市資料並播放問候語
-                self._extract_city_data_and_play_greeting()
+                # 🚀 取得這一分鐘的預取結果，讓網頁直接使用預先選好的城市
+                prefetched = self.prefetcher.claim() if self.prefetcher else None
+                preselect = (prefetched['minute_key'], prefetched['city']) if prefetched else None
                 
-            else:
-                self.logger.error("開始按鈕點擊失敗")
+                # 指定預取城市、觸發甦醒並取回城市資料，合併在同一次 WebDriver 呼叫
+                round_trips_start = self.web_controller.rpc.round_trips
+                result = self.web_controller.click_start_button(preselect)
+                
+                if result and result.get('success'):
+                    self.logger.info("開始按鈕點擊成功")
+                    
+                    # 🔧 Day計數由前端Firebase決定，不再使用本地計數
+                    self.logger.info("📊 Day計數將由前端Firebase查詢決定")
+                    
+                    # 從網頁提取城市資料並播放問候語（管線完成時結束追蹤）
+                    handed_off = self._extract_city_data_and_play_greeting(
+                        prefetched, result.get('city_data'), round_trips_start)
+                    
+                else:
+                    self.logger.error("開始按鈕點擊失敗")
                 
         except Exception as e:
             self.logger.error(f"短按事件處理失敗：{e}")
         finally:
+            if not handed_off:
+                self.tracer.finish(trace, success=False)
+            
             # 延遲重置處理狀態，避免太快重複觸發
             def reset_processing_state():
                 time.sleep(1)
@@ -296,108 +381,169 @@ class WakeUpMapWebApp:
         # 不再進行本地儲存，由前端統一處理
         return True
 
-    def _extract_city_data_and_play_greeting(self):
-        """從網頁提取城市資料並播放問候語和故事（優化版：視聽同步）"""
+    def _extract_city_data_and_play_greeting(self, prefetched: dict = None, page_city_data: dict = None,
+                                             round_trips_start: int = None):
+        """
+        從網頁提取城市資料並播放問候語和故事（以管線並行準備，視聽同步）
+        
+        Args:
+            prefetched: 這一分鐘的預取結果
+            page_city_data: 按鈕呼叫時一併取回的城市資料，有的話不必再向網頁查詢
+            round_trips_start: 按鈕開始時的 WebDriver 往返計數，用於統計本次按鈕的往返次數
+        
+        Returns:
+            bool: 已開始管線（管線完成時結束目前的追蹤）
+        """
         if not self.audio_manager:
             self.logger.warning("音頻管理器未初始化，跳過音頻播放")
-            return
-        
-        def synchronized_loading_and_play():
-            try:
-                # 🎵 跳過提示音，直接進入 loading 模式
-                self.logger.info("🎵 跳過提示音，開始 loading")
-                
-                # 🔧 移除語音生成 Loading 狀態，保持 LOCATING 畫面
-                self.logger.info("📺 跳過語音 Loading 狀態，保持原有 LOCATING 畫面")
-                # self._set_loading_state(True) # 已移除
-                
-                # 等待網頁處理完成
-                import time
-                time.sleep(2)
-                
-                # 從網頁提取城市資料
-                city_data = self._extract_city_data_from_web()
-                
-                if city_data:
-                    self.logger.info(f"📍 從網頁提取到城市資料: {city_data}")
-                    
-                    # 💾 保存甦醒記錄到本地並同步到 Firebase（包含故事內容）
-                    # 注意：這裡我們還沒有故事內容，需要在音頻準備完成後再保存
-                    self._save_basic_record(city_data)
-                    
-                    # 🎧 在背景準備完整音頻（不播放）
-                    country_code = city_data.get('countryCode') or city_data.get('country_code', 'US')
-                    city_name = city_data.get('city', '')
-                    country_name = city_data.get('country', '')
-                    
-                    # 如果沒有國家代碼，嘗試根據國家名稱推測
-                    if not country_code and country_name:
-                        country_code = self._guess_country_code(country_name)
-                    
-                    self.logger.info(f"🎧 Loading 模式：準備完整音頻 - 城市: {city_name}, 國家: {country_name} ({country_code})")
-                    
-                    # 🚀 準備完整音頻但不立即播放
-                    audio_file = self._prepare_complete_audio(country_code, city_name, country_name, city_data)
-                    
-                    if audio_file:
-                        # ✨ 音頻準備完成，同步顯示畫面和播放聲音
-                        self.logger.info("✨ 音頻準備完成，啟動同步播放...")
-                        self._synchronized_reveal_and_play(audio_file)
-                    else:
-                        # 音頻準備失敗，顯示畫面並播放備用音效
-                        self.logger.warning("⚠️ 音頻準備失敗，顯示畫面")
-                        # self._set_loading_state(False) # 已移除，不再需要語音 loading
-                        self.audio_manager.play_notification_sound('error')
-                        
-                else:
-                    self.logger.warning("⚠️ 無法從網頁提取城市資料")
-                    # self._set_loading_state(False) # 已移除，不再需要語音 loading
+            return False
+        
+        # 新的按鈕取代上一次尚未完成的流程
+        if self.current_run and not self.current_run.done():
+            self.logger.info("⏹️ 取消上一次尚未完成的甦醒流程")
+            self.current_run.cancel()
+        # 已在執行緒池中播放的階段不會因取消而停止，直接停止上一次排入音頻引擎的片段
+        self._stop_playback()
+        engine = self.audio_manager.audio_engine
+        self.playback = engine.session() if engine else None
+        
+        stream = TTS_CONFIG.get('streaming_playback', False)  # 播放時才串流生成音頻
+        # 這次登記的串流音頻；流程結束時若還沒播放就取消登記，以免 is_audio_ready 一直認為它可用
+        deferred = {'audio': None, 'finished': False}
+        deferred_lock = threading.Lock()
+        
+        @traced('stage.city')
+        def city_stage(results):
+            city_data = self._clean_city_data(page_city_data, require_new=True) if page_city_data else None
+            city_data = city_data or self._wait_for_city_data()
+            if not city_data:
+                raise RuntimeError("無法從網頁提取城市資料")
+            self.logger.info(f"📍 從網頁提取到城市資料: {city_data}")
+            self._save_basic_record(city_data)
+            return city_data
+        
+        @traced('stage.story')
+        def story_stage(results):
+            city_data = results['city']
+            # 優先使用預取的故事與音頻
+            if prefetched and self.prefetcher:
+                with self.tracer.span('prefetch.wait'):
+                    audio_file, story_content = self.prefetcher.wait_for_audio(prefetched, city_data)
+                if story_content:
+                    self.logger.info("🚀 使用預取的故事與音頻")
+                    return {'story': story_content, 'audio': audio_file}
+            
+            country_code, city_name, country_name = self._city_fields(city_data)
+            self.logger.info(f"🎧 準備完整音頻 - 城市: {city_name}, 國家: {country_name} ({country_code})")
+            story_content = self.audio_manager.fetch_story_content(country_code, city_name, country_name, city_data)
+            if not story_content:
+                raise RuntimeError("故事內容準備失敗")
+            return {'story': story_content, 'audio': None}
+        
+        @traced('stage.upload')
+        def upload_stage(results):
+            if not self.audio_manager.upload_story_content(results['story']['story'], results['city']):
+                raise RuntimeError("故事上傳到Firebase失敗")
+            return True
+        
+        @traced('stage.audio')
+        def audio_stage(results):
+            audio_file = results['story']['audio']
+            if not self.audio_manager.is_audio_ready(audio_file):
+                audio_file = self.audio_manager.render_story_audio(results['story']['story'], stream)
+            if not audio_file:
+                raise RuntimeError("音頻生成失敗")
+            with deferred_lock:
+                if deferred['finished']:
+                    # 流程已被取消（執行緒池中的階段仍會跑完）
+                    self.audio_manager.discard_deferred_audio(audio_file)
+                    raise RuntimeError("甦醒流程已結束")
+                deferred['audio'] = audio_file
+            return audio_file
+        
+        @traced('stage.inject')
+        def inject_stage(results):
+            # 前端從Firebase讀取故事，上傳完成後才觸發前端事件
+            self._send_story_to_web(results['story']['story'])
+            return True
+        
+        @traced('stage.play')
+        def play_stage(results):
+            audio_file = results.get('audio')
+            if not audio_file:
+                # 音頻準備失敗，播放預先合成的當地問候語（沒有時播放備用音效）
+                self.logger.warning("⚠️ 音頻準備失敗，顯示畫面")
+                country_code = self._city_fields(results['city'])[0] if 'city' in results else None
+                audio_file = self.audio_manager.get_fallback_greeting_audio(country_code) if country_code else None
+                if not audio_file:
                     self.audio_manager.play_notification_sound('error')
-                    
-            except Exception as e:
-                self.logger.error(f"同步loading處理失敗: {e}")
-                # self._set_loading_state(False) # 已移除，不再需要語音 loading
-                self.audio_manager.play_notification_sound('error')
-        
-        # 在背景執行緒中執行
-        threading.Thread(target=synchronized_loading_and_play, daemon=True).start()
+                    return False
+                self.logger.info(f"📦 使用離線問候語: {audio_file.name}")
+            # ✨ 音頻準備完成，同步顯示畫面和播放聲音
+            return self._synchronized_reveal_and_play(audio_file)
+        
+        with self.playback.activate() if self.playback else nullcontext():
+            self.current_run = self.pipeline.run('wakeup', [
+                Stage('city', city_stage),
+                Stage('story', story_stage, deps=['city']),
+                Stage('upload', upload_stage, deps=['city', 'story']),
+                Stage('audio', audio_stage, deps=['story']),
+                Stage('inject', inject_stage, deps=['story', 'upload']),
+                Stage('play', play_stage, deps=['city', 'audio', 'inject'], always=True),
+            ])
+        
+        if round_trips_start is not None:
+            rpc = self.web_controller.rpc
+            self.current_run.future.add_done_callback(
+                lambda future: self.logger.info(f"🔁 本次按鈕 WebDriver 往返 {rpc.round_trips - round_trips_start} 次"))
+        
+        def release_deferred_audio(future):
+            with deferred_lock:
+                deferred['finished'] = True
+                audio_file = deferred['audio']
+            self.audio_manager.discard_deferred_audio(audio_file)
+        
+        run = self.current_run
+        trace = self.tracer.current_trace()
+        run.future.add_done_callback(release_deferred_audio)
+        run.future.add_done_callback(lambda future: self._finish_press(future, run, trace))
+        return True
     
-    def _start_parallel_audio_generation(self, country_code: str, city_name: str, country_name: str):
-        """並行啟動音頻生成，減少等待時間"""
-        def generate_and_play_audio():
-            try:
-                start_time = time.time()
-                self.logger.info("🚀 開始並行音頻生成...")
-                
-                # 立即開始音頻生成
-                success = self.audio_manager.play_greeting(
-                    country_code=country_code,
-                    city_name=city_name,
-                    country_name=country_name
-                )
-                
-                end_time = time.time()
-                duration = end_time - start_time
-                
-                if success:
-                    self.logger.info(f"✅ 音頻生成並播放成功 (耗時: {duration:.1f}秒)")
-                else:
-                    self.logger.warning(f"⚠️ 音頻生成失敗 (耗時: {duration:.1f}秒)")
-                    # 備用音效
-                    self.audio_manager.play_notification_sound('error')
-                    
-            except Exception as e:
-                self.logger.error(f"並行音頻生成失敗: {e}")
-                # 備用音效
-                try:
-                    self.audio_manager.play_notification_sound('error')
-                except:
-                    pass
-        
-        # 在獨立執行緒中進行音頻生成，避免阻塞主流程
-        import threading
-        import time
-        threading.Thread(target=generate_and_play_audio, daemon=True).start()
+    def _stop_playback(self):
+        """停止上一次按鈕排入音頻引擎的片段（包括之後才排入的句子）"""
+        if self.playback and not self.playback.cancelled:
+            self.playback.cancel()
+    
+    def _finish_press(self, future, run, trace):
+        """管線完成：記錄各階段耗時與按鈕到出聲的延遲，並結束這次按鈕的追蹤"""
+        for stage, record in run.records.items():
+            if record['start'] is not None and record['end'] is not None:
+                self.stage_latency.observe((record['end'] - record['start']) / 1000, stage=stage)
+        if not trace:
+            return
+        first_sample = next((e['time'] for e in trace.events if e['name'] == 'audio.first_sample'), None)
+        if first_sample is not None:
+            self.press_latency.observe(first_sample - trace.start)
+        success = not future.cancelled() and future.exception() is None and bool(future.result().get('play'))
+        self.tracer.finish(trace, success=success, critical_path=run.critical_path())
+    
+    def _city_fields(self, city_data: dict):
+        """城市資料中的 (國家代碼, 城市, 國家)；沒有國家代碼時根據國家名稱推測"""
+        country_code = city_data.get('countryCode') or city_data.get('country_code', '')
+        city_name = city_data.get('city', '')
+        country_name = city_data.get('country', '')
+        if not country_code and country_name:
+            country_code = self._guess_country_code(country_name)
+        return country_code or 'US', city_name, country_name
+    
+    def _wait_for_city_data(self) -> Optional[dict]:
+        """等待網頁顯示這次的城市資料（取代固定等待，資料一出現就返回）"""
+        deadline = time.monotonic() + PIPELINE_CONFIG['city_timeout']
+        while True:
+            city_data = self._extract_city_data_from_web(require_new=True)
+            if city_data or time.monotonic() >= deadline:
+                return city_data
+            time.sleep(PIPELINE_CONFIG['city_poll_interval'])
     
     def _set_loading_state(self, loading: bool):
         """設定網頁 Loading 狀態"""
@@ -406,7 +552,15 @@ class WakeUpMapWebApp:
                 self.logger.warning("網頁控制器未初始化，無法設定Loading狀態")
                 return
             
-            # 使用 JavaScript 控制 loading 狀態
+            # 沒有顯示遮罩時不需要移除，省下一次 WebDriver 往返
+            if not loading:
+                if self.loading_overlay_shown:
+                    self.web_controller.rpc.query('removeOverlay', 'wakeup-loading-overlay')
+                    self.loading_overlay_shown = False
+                    self.logger.info("📺 Loading 狀態設定: 隱藏")
+                return
+            
+            # 使用 JavaScript 顯示 loading 遮罩
             if loading:
                 loading_js = """
                 // 顯示 Loading 遮罩
@@ -436,251 +590,105 @@ class WakeUpMapWebApp:
                 `;
                 document.body.appendChild(loadingOverlay);
                 """
-            else:
-                loading_js = """
-                // 移除 Loading 遮罩
-                var loadingOverlay = document.getElementById('wakeup-loading-overlay');
-                if (loadingOverlay) {
-                    loadingOverlay.remove();
-                }
-                """
             
             self.web_controller.driver.execute_script(loading_js)
-            self.logger.info(f"📺 Loading 狀態設定: {'顯示' if loading else '隱藏'}")
+            self.loading_overlay_shown = True
+            self.logger.info("📺 Loading 狀態設定: 顯示")
             
         except Exception as e:
             self.logger.error(f"設定Loading狀態失敗: {e}")
     
-    def _prepare_complete_audio(self, country_code: str, city_name: str, country_name: str, city_data: dict = None) -> Optional[Path]:
-        """準備完整音頻但不播放，並將內容傳給網頁"""
+    def _send_story_to_web(self, story_content: dict) -> bool:
+        """將故事內容傳給網頁端用於打字機效果，並等頁面切換到結果畫面（同一次 WebDriver 呼叫）"""
         try:
-            import time
-            from pathlib import Path
-            start_time = time.time()
-            
-            self.logger.info("🎧 開始準備完整音頻...")
-            
-            # 1. 先生成音頻內容並獲取故事文本
-            audio_file, story_content = self.audio_manager.prepare_greeting_audio_with_content(
-                country_code=country_code,
-                city_name=city_name,
-                country_name=country_name,
-                city_data=city_data  # 🔧 傳遞完整城市數據，包含坐標信息
-            )
-            
-            end_time = time.time()
-            duration = end_time - start_time
-            
-            # 🔧 改進：確保Firebase上傳完成後才觸發前端事件
-            if story_content:
-                self.logger.info("📖 發現故事內容，檢查Firebase上傳狀態...")
-                
-                # 🕐 等待一下讓Firebase有時間同步（audio_manager已經上傳）
-                import time
-                time.sleep(2)  # 等待2秒讓Firebase同步
-                
-                self.logger.info("🔥 Firebase同步等待完成，現在傳送故事給前端顯示")
-                self._send_story_to_web(story_content)
-                
-                if audio_file and audio_file.exists():
-                    self.logger.info(f"✅ 完整音頻準備成功 (耗時: {duration:.1f}秒): {audio_file.name}")
-                    self.logger.info("📊 故事資料已由 audio_manager 上傳到 Firebase，前端事件已觸發")
-                    return audio_file
-                else:
-                    self.logger.warning(f"⚠️ 音頻生成失敗，但故事內容已傳送給前端 (耗時: {duration:.1f}秒)")
-                    return None
-            else:
-                self.logger.error(f"❌ 完整音頻和故事內容準備失敗 (耗時: {duration:.1f}秒)")
-                return None
-                
-        except Exception as e:
-            self.logger.error(f"準備完整音頻時發生錯誤: {e}")
-            return None
-
-    def _send_story_to_web(self, story_content: dict):
-        """將故事內容傳給網頁端用於打字機效果"""
-        try:
-            import json
-            
             if not self.web_controller or not self.web_controller.driver:
                 self.logger.warning("網頁控制器未初始化，無法傳送故事內容")
-                return
-            
-            # 獲取當前 Day 編號
-            current_day = self._get_current_day_number()
-            
-            # 將故事內容注入到網頁中，包含本地 Day 計數
-            story_js = f"""
-            // 設定樹莓派生成的故事內容（包含城市和國家資訊以及本地Day計數）
-            window.piGeneratedStory = {{
-                greeting: {json.dumps(story_content.get('greeting', ''), ensure_ascii=False)},
-                language: {json.dumps(story_content.get('language', ''), ensure_ascii=False)},
-                languageCode: {json.dumps(story_content.get('languageCode', ''), ensure_ascii=False)},
-                story: {json.dumps(story_content.get('story', ''), ensure_ascii=False)},
-                fullContent: {json.dumps(story_content.get('fullContent', ''), ensure_ascii=False)},
-                city: {json.dumps(story_content.get('city', ''), ensure_ascii=False)},
-                country: {json.dumps(story_content.get('country', ''), ensure_ascii=False)},
-                countryCode: {json.dumps(story_content.get('countryCode', ''), ensure_ascii=False)},
-                day: {current_day}
-            }};
-            
-            // 通知網頁端故事內容已準備好
-            window.dispatchEvent(new CustomEvent('piStoryReady', {{ 
-                detail: window.piGeneratedStory 
-            }}));
-            
-            console.log('🎵 樹莓派故事內容已準備完成:', window.piGeneratedStory);
-            console.log('🎵 即將觸發 piStoryReady 事件，Day: {current_day}');
-            """
-            
-            self.web_controller.driver.execute_script(story_js)
+                return False
+            
+            # 故事內容（包含城市和國家資訊以及本地Day計數）
+            story = {key: story_content.get(key, '') for key in
+                     ('greeting', 'language', 'languageCode', 'story', 'fullContent', 'city', 'country', 'countryCode')}
+            story['day'] = self._get_current_day_number()
+            
+            # 觸發 piStoryReady，等頁面處理完故事後再播放，畫面與聲音同步
+            with self.tracer.span('web.inject_story'):
+                _, signal, _ = self.web_controller.rpc.run_and_wait(
+                    [('injectStory', story)], ['storyConsumed'],
+                    lazy_import('web_controller_dsi').SIGNAL_TIMEOUTS['story'])
             self.logger.info("✅ 故事內容已傳送給網頁端")
-            
-            # 🔧 啟動前端日誌監控
-            self._start_frontend_log_monitoring()
+            if not signal:
+                self.logger.warning("⚠️ 等待頁面顯示故事逾時")
+            return bool(signal)
             
         except Exception as e:
             self.logger.error(f"傳送故事內容失敗: {e}")
+            return False
     
-    def _start_frontend_log_monitoring(self):
-        """啟動前端日誌監控，定期讀取前端日誌並輸出到後端日誌"""
-        if self.frontend_log_monitoring_started:
-            return  # 避免重複啟動
-            
-        import threading
-        import time
-        
-        def monitor_frontend_logs():
-            try:
-                last_timestamp = None
-                element_found = False
-                
-                # 給前端足夠時間初始化
-                time.sleep(2)
-                
-                while True:
-                    try:
-                        if not self.web_controller or not self.web_controller.driver:
-                            break
-                            
-                        # 讀取前端日誌橋接元素
-                        log_element = self.web_controller.driver.find_element("id", "frontend-log-bridge")
-                        
-                        if not element_found:
-                            self.logger.info("🔧 [日誌橋接] 找到前端日誌橋接元素")
-                            element_found = True
-                        
-                        current_timestamp = log_element.get_attribute("data-timestamp")
-                        
-                        # 如果有新的日誌條目
-                        if current_timestamp and current_timestamp != last_timestamp:
-                            log_content = log_element.text
-                            if log_content:
-                                try:
-                                    import json
-                                    log_entry = json.loads(log_content)
-                                    level = log_entry.get('level', 'INFO')
-                                    message = log_entry.get('message', '')
-                                    data = log_entry.get('data', '')
-                                    
-                                    # 根據日誌級別輸出到對應的後端日誌
-                                    if level == 'ERROR':
-                                        self.logger.error(f"[前端] {message} {data}")
-                                    elif level == 'WARN':
-                                        self.logger.warning(f"[前端] {message} {data}")
-                                    else:
-                                        self.logger.info(f"[前端] {message} {data}")
-                                    
-                                    last_timestamp = current_timestamp
-                                    
-                                except json.JSONDecodeError as e:
-                                    self.logger.warning(f"🔧 [日誌橋接] JSON解析失敗: {e}, 內容: {log_content[:100]}")
-                                    
-                    except Exception as e:
-                        if not element_found:
-                            # 只在第一次找不到元素時報告
-                            self.logger.warning(f"🔧 [日誌橋接] 尚未找到前端日誌元素: {e}")
-                            element_found = None  # 標記為已報告
-                    
-                    time.sleep(1)  # 每秒檢查一次
-                    
-            except Exception as e:
-                self.logger.error(f"前端日誌監控失敗: {e}")
-        
-        # 在後台執行緒中啟動監控
-        monitor_thread = threading.Thread(target=monitor_frontend_logs, daemon=True)
-        monitor_thread.start()
-        self.frontend_log_monitoring_started = True
-        self.logger.info("🔧 [日誌橋接] 前端日誌監控已啟動")
-    
-    def _synchronized_reveal_and_play(self, audio_file: Path):
-        """同步顯示畫面和播放音頻"""
+    def _synchronized_reveal_and_play(self, audio_file: Path) -> bool:
+        """同步顯示畫面並播放音頻（播放完成才返回）"""
         try:
             self.logger.info("🎬 啟動同步視聽體驗...")
             
             # 1. 移除 Loading 狀態
             self._set_loading_state(False)
             
-            # 2. 立即播放音頻
-            import threading
-            def play_audio():
-                success = self.audio_manager.play_audio_file_direct(audio_file)
-                if success:
-                    self.logger.info("🎵 同步音頻播放成功")
-                else:
-                    self.logger.warning("⚠️ 同步音頻播放失敗")
-            
-            # 在獨立執行緒中播放音頻，避免阻塞
-            threading.Thread(target=play_audio, daemon=True).start()
-            
-            self.logger.info("✨ 同步視聽體驗啟動完成")
+            # 2. 立即播放音頻（在管線的執行緒中執行，播放結束時管線才完成）
+            success = self.audio_manager.play_audio_file_direct(audio_file)
+            if success:
+                self.logger.info("🎵 同步音頻播放成功")
+            else:
+                self.logger.warning("⚠️ 同步音頻播放失敗")
+            return success
             
         except Exception as e:
             self.logger.error(f"同步視聽啟動失敗: {e}")
             # 備用：移除loading並播放錯誤音效
             self._set_loading_state(False)
             self.audio_manager.play_notification_sound('error')
+            return False
 
-    def _extract_city_data_from_web(self):
-        """從網頁提取城市資料"""
+    def _extract_city_data_from_web(self, require_new: bool = False):
+        """
+        從網頁提取城市資料
+        
+        Args:
+            require_new: 只接受這次按鈕之後才出現的城市資料（輪詢時不記錄警告）
+        """
         try:
             if not self.web_controller or not self.web_controller.driver:
                 self.logger.error("網頁控制器或瀏覽器未初始化")
                 return None
             
-            # 提取城市資料的 JavaScript
-            city_data_js = """
-            return {
-                city: document.getElementById('cityName') ? document.getElementById('cityName').textContent : '',
-                country: document.getElementById('countryName') ? document.getElementById('countryName').textContent : '',
-                countryCode: window.currentCityData ? window.currentCityData.country_iso_code : '',
-                latitude: window.currentCityData ? window.currentCityData.latitude : null,
-                longitude: window.currentCityData ? window.currentCityData.longitude : null,
-                timezone: window.currentCityData ? window.currentCityData.timezone : ''
-            };
-            """
-            
-            city_data = self.web_controller.driver.execute_script(city_data_js)
-            
-            if city_data and city_data.get('city'):
-                # 清理城市名稱（移除冒號和空格）
-                city_data['city'] = city_data['city'].strip().rstrip(':').strip() if city_data['city'] else ''
-                city_data['country'] = city_data['country'].strip() if city_data['country'] else ''
-                
-                # 如果沒有國家代碼，嘗試從國家名稱獲取
-                if not city_data.get('countryCode') and city_data.get('country'):
-                    city_data['countryCode'] = self._guess_country_code(city_data['country'])
-                
-                self.logger.info(f"清理後的城市資料: {city_data}")
-                return city_data
-            else:
-                self.logger.warning(f"未能提取到有效的城市資料: {city_data}")
-                return None
+            return self._clean_city_data(self.web_controller.rpc.query('cityData'), require_new)
                 
         except Exception as e:
             self.logger.error(f"從網頁提取城市資料失敗: {e}")
             return None
 
+    def _clean_city_data(self, city_data: Optional[dict], require_new: bool = False) -> Optional[dict]:
+        """清理網頁的城市資料；require_new 時只接受這次按鈕之後才出現的城市"""
+        city_data = dict(city_data) if city_data else None
+        if city_data and require_new and not city_data.pop('isNew', False):
+            return None
+        if city_data:
+            city_data.pop('isNew', None)
+        
+        if city_data and city_data.get('city'):
+            # 清理城市名稱（移除冒號和空格）
+            city_data['city'] = city_data['city'].strip().rstrip(':').strip() if city_data['city'] else ''
+            city_data['country'] = city_data['country'].strip() if city_data['country'] else ''
+            
+            # 如果沒有國家代碼，嘗試從國家名稱獲取
+            if not city_data.get('countryCode') and city_data.get('country'):
+                city_data['countryCode'] = self._guess_country_code(city_data['country'])
+            
+            self.logger.info(f"清理後的城市資料: {city_data}")
+            return city_data
+        
+        if not require_new:
+            self.logger.warning(f"未能提取到有效的城市資料: {city_data}")
+        return None
+
     def _guess_country_code(self, country_name: str) -> str:
         """根據國家名稱推測國家代碼"""
         country_name = country_name.lower().strip()
@@ -763,6 +771,7 @@ class WakeUpMapWebApp:
     
     def _initialize_button_handler(self):
         """初始化按鈕處理器"""
+        ButtonHandler, button_handler_type = load_button_handler()
         if ButtonHandler is None:
             self.logger.warning("按鈕處理器模組未可用，跳過按鈕初始化")
             return
@@ -822,6 +831,16 @@ class WakeUpMapWebApp:
         if self.screensaver_timer:
             self.screensaver_timer.cancel()
         
+        # 取消進行中的甦醒流程並停止管線
+        if self.current_run:
+            self.current_run.cancel()
+        self._stop_playback()
+        self.pipeline.stop()
+        
+        # 停止背景預取
+        if self.prefetcher:
+            self.prefetcher.stop()
+        
         # 關閉按鈕處理器
         if self.button_handler and hasattr(self.button_handler, 'cleanup'):
             try:
@@ -829,6 +848,13 @@ class WakeUpMapWebApp:
             except Exception as e:
                 self.logger.error(f"關閉按鈕處理器失敗：{e}")
         
+        # 停止指標伺服器
+        stop_metrics_server()
+        
+        # 取回剩下的前端日誌
+        if self.log_bridge:
+            self.log_bridge.stop()
+        
         # 關閉網頁控制器
         if self.web_controller:
             try:
@@ -836,8 +862,9 @@ class WakeUpMapWebApp:
             except Exception as e:
                 self.logger.error(f"關閉網頁控制器失敗：{e}")
         
-        # 清理音訊管理器
-        cleanup_audio_manager()
+        # 清理音訊管理器（沒有載入過就不需要）
+        if 'audio_manager' in sys.modules:
+            sys.modules['audio_manager'].cleanup_audio_manager()
         
         self.logger.info("應用程式已關閉")
 
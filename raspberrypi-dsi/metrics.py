@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+執行時指標
+計數器、量表與直方圖的登錄表，以內嵌 HTTP 伺服器在 /metrics 提供 Prometheus 文字格式，讓多台裝置集中抓取
+
+記錄指標只是加鎖更新數值；由統計資料換算的指標（快取命中、佇列深度、瀏覽器記憶體）以回調登錄，
+在抓取時才計算，不影響按鈕流程。
+"""
+
+import os
+import math
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple, Union
+
+from config import METRICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 回調返回單一數值，或 {標籤值 tuple: 數值}
+Callback = Callable[[], Union[float, Dict[Tuple[str, ...], float], None]]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Dict[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in (extra or {}).items()]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """指標共用部分：名稱、說明、標籤與回調"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), func: Callback = None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.func = func
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指標 {self.name} 的標籤應為 {self.labelnames}，收到 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        """(後綴, 標籤文字, 數值)"""
+        if self.func is not None:
+            try:
+                value = self.func()
+            except Exception as e:
+                logger.debug(f"指標 {self.name} 回調失敗: {e}")
+                return []
+            if value is None:
+                return []
+            values = value if isinstance(value, dict) else {(): value}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [('', _format_labels(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """只增不減的計數器"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("計數器不能減少")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """可增可減的量表"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """累積分桶的直方圖（_bucket、_sum、_count）"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = None):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets or METRICS_CONFIG['latency_buckets'])) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        samples = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append(('_bucket', _format_labels(self.labelnames, key, {'le': _format_value(bound)}),
+                                cumulative))
+            samples.append(('_sum', _format_labels(self.labelnames, key), total))
+            samples.append(('_count', _format_labels(self.labelnames, key), cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """指標登錄表：同名指標只建立一次，回調指標重新登錄時更新回調"""
+
+    def __init__(self, namespace: str = None):
+        self.namespace = METRICS_CONFIG['namespace'] if namespace is None else namespace
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, help_text: str, labelnames: Sequence[str], func: Callback = None, **kwargs):
+        full_name = f"{self.namespace}_{name}" if self.namespace else name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = cls(full_name, help_text, labelnames, **kwargs)
+                self._metrics[full_name] = metric
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"指標 {full_name} 已以不同的類型或標籤登錄")
+            if func is not None:
+                metric.func = func
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = (), func: Callback = None) -> Counter:
+        """
+        登錄計數器
+
+        Args:
+            func: 抓取時才呼叫的回調（例如既有統計中的累計值），設定後忽略 inc()
+        """
+        return self._register(Counter, name, help_text, labelnames, func)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = (), func: Callback = None) -> Gauge:
+        """登錄量表（func 同 counter）"""
+        return self._register(Gauge, name, help_text, labelnames, func)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = None) -> Histogram:
+        """登錄直方圖（預設為 METRICS_CONFIG['latency_buckets'] 秒）"""
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Prometheus 文字格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"📈 [指標] {self.address_string()} {format % args}")
+
+
+class MetricsServer:
+    """在背景執行緒提供 /metrics"""
+
+    def __init__(self, registry: MetricsRegistry = None, host: str = None, port: int = None):
+        self.logger = logging.getLogger(__name__)
+        self.registry = registry or get_registry()
+        self.host = METRICS_CONFIG['host'] if host is None else host
+        self.port = METRICS_CONFIG['port'] if port is None else port
+        self._server = None
+        self._thread = None
+
+    def start(self) -> bool:
+        """啟動伺服器（埠號被占用時記錄錯誤並返回 False）"""
+        if self._server:
+            return True
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': self.registry})
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        except OSError as e:
+            self.logger.error(f"📈 [指標] 無法啟動指標伺服器 {self.host}:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+        self.logger.info(f"📈 [指標] 指標伺服器已啟動: http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if not self._server:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5)
+        self._server = None
+        self._thread = None
+
+
+def process_tree_rss(root_pid: int) -> Optional[int]:
+    """
+    行程及其所有子孫行程的常駐記憶體總和（位元組，讀取 /proc；無法讀取時返回 None）
+
+    用於瀏覽器：chromedriver 啟動的 Chrome 由多個行程組成。
+    """
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    try:
+        pids = [int(name) for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return None
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status', encoding='utf-8') as f:
+                fields = dict(line.split(':', 1) for line in f if ':' in line)
+        except (OSError, ValueError):
+            continue
+        children.setdefault(int(fields.get('PPid', '0').strip() or 0), []).append(pid)
+        # 核心執行緒沒有 VmRSS
+        rss[pid] = int(fields['VmRSS'].split()[0]) * 1024 if 'VmRSS' in fields else 0
+    if root_pid not in rss:
+        return None
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+
+# 全域指標登錄表與伺服器
+registry = None
+metrics_server = None
+_metrics_lock = threading.Lock()
+
+def get_registry() -> MetricsRegistry:
+    """獲取指標登錄表實例"""
+    global registry
+    with _metrics_lock:
+        if registry is None:
+            registry = MetricsRegistry()
+        return registry
+
+def start_metrics_server() -> Optional[MetricsServer]:
+    """依 METRICS_CONFIG 啟動指標伺服器（已啟動時返回同一個實例，停用時返回 None）"""
+    global metrics_server
+    if not METRICS_CONFIG['enabled']:
+        return None
+    registry = get_registry()
+    with _metrics_lock:
+        if metrics_server is None:
+            metrics_server = MetricsServer(registry)
+        server = metrics_server
+    return server if server.start() else None
+
+def stop_metrics_server():
+    global metrics_server
+    with _metrics_lock:
+        server, metrics_server = metrics_server, None
+    if server:
+        server.stop()
+
+
+# 測試程式
+if __name__ == "__main__":
+    import time
+    import random
+    from urllib.request import urlopen
+
+    logging.basicConfig(level=logging.INFO)
+
+    registry = get_registry()
+    presses = registry.counter('demo_presses_total', "示範計數器")
+    latency = registry.histogram('demo_latency_seconds', "示範延遲", ['stage'])
+    registry.gauge('demo_self_rss_bytes', "本行程常駐記憶體", func=lambda: process_tree_rss(os.getpid()))
+    for _ in range(20):
+        presses.inc()
+        latency.observe(random.uniform(0, 3), stage='story')
+
+    server = MetricsServer(registry, host='127.0.0.1', port=0)
+    server.start()
+    start_time = time.perf_counter()
+    text = urlopen(f"http://127.0.0.1:{server.port}/metrics").read().decode('utf-8')
+    print(text)
+    print(f"抓取耗時 {(time.perf_counter() - start_time) * 1000:.1f} ms")
+    server.stop()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+網頁批次呼叫
+在頁面安裝一次 window.piRpc，之後把多個具名查詢與命令合併成一次 execute_script，減少與 chromedriver 的往返
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+RPC_VERSION = 1
+
+# 頁面端的具名操作；每個操作獨立執行，一個失敗不影響其他操作
+PAGE_RPC_SOURCE = """
+(function () {
+    const text = (id) => {
+        const el = document.getElementById(id);
+        return el ? el.textContent : '';
+    };
+    const handlers = {
+        signalSeq: () => window.piSignalSeq || 0,
+        debugStatus: () => window.debugStartTheDay || 'UNKNOWN',
+        state: () => window.currentState || 'unknown',
+        text: text,
+        cityData: () => {
+            const data = window.currentCityData;
+            return {
+                city: text('cityName') || (data ? data.name || data.city || '' : ''),
+                country: text('countryName') || (data ? data.country || '' : ''),
+                countryCode: data ? data.country_iso_code : '',
+                latitude: data ? data.latitude : null,
+                longitude: data ? data.longitude : null,
+                timezone: data ? data.timezone : '',
+                isNew: !!data && data !== window.__piPreviousCityData
+            };
+        },
+        markCityData: () => {
+            window.__piPreviousCityData = window.currentCityData || null;
+            return true;
+        },
+        preselectCity: (minuteKey, city) => {
+            window.piPreselectedCity = { minuteKey: minuteKey, city: city };
+            return true;
+        },
+        startTheDay: () => {
+            window.debugStartTheDay = 'NOT_STARTED';
+            if (typeof window.startTheDay !== 'function') return 'startTheDay 函數未找到';
+            Promise.resolve(window.startTheDay()).catch(error => {
+                window.debugStartTheDay = 'ERROR: ' + error.message;
+                if (window.piSignal) window.piSignal('dayFailed', { error: error.message });
+            });
+            return 'JavaScript 函數已執行';
+        },
+        injectStory: (story) => {
+            window.piGeneratedStory = story;
+            window.dispatchEvent(new CustomEvent('piStoryReady', { detail: story }));
+            console.log('🎵 樹莓派故事內容已準備完成:', story);
+            return true;
+        },
+        removeOverlay: (id) => {
+            const el = document.getElementById(id);
+            if (el) el.remove();
+            return !!el;
+        }
+    };
+    const run = (ops) => (ops || []).map(([name, ...args]) => {
+        try {
+            if (!handlers[name]) throw new Error('未知的操作: ' + name);
+            return { ok: true, value: handlers[name](...args) };
+        } catch (error) {
+            return { ok: false, error: String(error && error.message || error) };
+        }
+    });
+    // 等待任一頁面信號（pi-script.js 的 window.piSignal）的序號大於 after；逾時得到 null
+    const waitFor = (names, after, timeoutMs) => new Promise(resolve => {
+        const check = () => {
+            const signals = window.piSignals || {};
+            for (const name of names) {
+                const signal = signals[name];
+                if (signal && signal.seq > after) return signal;
+            }
+            return null;
+        };
+        const found = check();
+        if (found || !names.length) return resolve(found);
+        let timer = null;
+        const handler = () => {
+            const signal = check();
+            if (signal) {
+                clearTimeout(timer);
+                window.removeEventListener('piSignal', handler);
+                resolve(signal);
+            }
+        };
+        timer = setTimeout(() => {
+            window.removeEventListener('piSignal', handler);
+            resolve(null);
+        }, timeoutMs);
+        window.addEventListener('piSignal', handler);
+    });
+    window.piRpc = { version: %(version)d, handlers: handlers, run: run, waitFor: waitFor };
+})();
+""" % {'version': RPC_VERSION}
+
+_MISSING_CHECK = f"if (!window.piRpc || window.piRpc.version !== {RPC_VERSION}) return %s;"
+
+RUN_JS = _MISSING_CHECK % "{ missing: true }" + """
+return { results: window.piRpc.run(arguments[0]) };
+"""
+
+RUN_AND_WAIT_JS = """
+const [ops, names, after, timeoutMs, thenOps, done] = arguments;
+""" + _MISSING_CHECK % "done({ missing: true })" + """
+const since = after === null ? (window.piSignalSeq || 0) : after;
+const results = window.piRpc.run(ops);
+window.piRpc.waitFor(names, since, timeoutMs).then(signal => {
+    done({ results: results, signal: signal, then: window.piRpc.run(thenOps) });
+});
+"""
+
+Op = Tuple[Any, ...]
+
+
+class PageRPCError(Exception):
+    """頁面呼叫失敗（瀏覽器未啟動或腳本執行錯誤）"""
+
+
+class PageRPC:
+    """
+    網頁批次呼叫
+
+    操作以 (名稱, 參數...) 表示，例如 ('preselectCity', minute_key, city)；
+    頁面重新載入後第一次呼叫會發現 piRpc 不存在，連同安裝腳本重送一次。
+    """
+
+    def __init__(self, driver_getter: Callable[[], Any]):
+        """
+        Args:
+            driver_getter: 返回目前 WebDriver 的函數
+        """
+        self.logger = logging.getLogger(__name__)
+        self.driver_getter = driver_getter
+        self._lock = threading.Lock()
+        self.stats = {'round_trips': 0, 'operations': 0, 'installs': 0, 'errors': 0}
+
+    @property
+    def round_trips(self) -> int:
+        """累計的 WebDriver 往返次數"""
+        return self.stats['round_trips']
+
+    def _execute(self, script: str, args: list, async_script: bool = False, timeout: float = None):
+        driver = self.driver_getter()
+        if not driver:
+            raise PageRPCError("瀏覽器未啟動")
+        with self._lock:
+            self.stats['round_trips'] += 1
+        try:
+            if not async_script:
+                return driver.execute_script(script, *args)
+            driver.set_script_timeout(timeout + 5)
+            return driver.execute_async_script(script, *args)
+        except Exception as e:
+            with self._lock:
+                self.stats['errors'] += 1
+            raise PageRPCError(str(e)) from e
+
+    def _call(self, script: str, args: list, async_script: bool = False, timeout: float = None) -> Dict[str, Any]:
+        reply = self._execute(script, args, async_script, timeout)
+        if reply and reply.get('missing'):
+            with self._lock:
+                self.stats['installs'] += 1
+            reply = self._execute(PAGE_RPC_SOURCE + script, args, async_script, timeout)
+        if not reply or reply.get('missing'):
+            raise PageRPCError("頁面呼叫輔助程式安裝失敗")
+        return reply
+
+    def _unpack(self, ops: Sequence[Op], results: List[Dict[str, Any]]) -> List[Any]:
+        values = []
+        for op, result in zip(ops, results):
+            if result.get('ok'):
+                values.append(result.get('value'))
+            else:
+                self.logger.warning(f"頁面操作 {op[0]} 失敗: {result.get('error')}")
+                values.append(None)
+        return values
+
+    def batch(self, *ops: Op) -> List[Any]:
+        """
+        一次往返執行多個操作
+
+        Returns:
+            List: 依序為各操作的返回值（失敗的操作為 None 並記錄警告）
+        """
+        ops = [list(op) for op in ops]
+        with self._lock:
+            self.stats['operations'] += len(ops)
+        reply = self._call(RUN_JS, [ops])
+        return self._unpack(ops, reply['results'])
+
+    def query(self, name: str, *args) -> Any:
+        """執行單一操作並返回結果"""
+        return self.batch((name,) + args)[0]
+
+    def run_and_wait(self, ops: Sequence[Op], signals: Sequence[str], timeout: float,
+                     then: Sequence[Op] = (), after: Optional[int] = None) -> Tuple[List[Any], Optional[Dict[str, Any]], List[Any]]:
+        """
+        一次往返：執行操作、等待頁面信號，信號出現後再執行 then 中的操作
+
+        Args:
+            ops: 先執行的操作
+            signals: 等待的信號名稱，任一出現即返回
+            timeout: 等待逾時（秒）
+            then: 信號出現（或逾時）後執行的操作，例如取回城市資料
+            after: 只接受序號大於此值的信號；None 表示執行 ops 之前的序號
+
+        Returns:
+            Tuple: (ops 的返回值, 信號或 None, then 的返回值)
+        """
+        ops = [list(op) for op in ops]
+        then = [list(op) for op in then]
+        with self._lock:
+            self.stats['operations'] += len(ops) + len(then)
+        reply = self._call(RUN_AND_WAIT_JS, [ops, list(signals), after, int(timeout * 1000), then],
+                           async_script=True, timeout=timeout)
+        return self._unpack(ops, reply['results']), reply.get('signal'), self._unpack(then, reply['then'])
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats)
+
+
+# 測試程式
+if __name__ == "__main__":
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        from web_controller_dsi import WebControllerDSI
+    except ImportError as e:
+        print(f"需要 selenium: {e}")
+        raise SystemExit(1)
+
+    controller = WebControllerDSI()
+    if controller.start_browser() and controller.load_website():
+        rpc = controller.rpc
+        start_time = time.perf_counter()
+        print(rpc.batch(('signalSeq',), ('state',), ('debugStatus',), ('text', 'cityName')))
+        print(f"批次查詢 {(time.perf_counter() - start_time) * 1000:.0f} ms，📊 {rpc.get_stats()}")
+    controller.stop()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 甦醒城市與故事預取
+每分鐘的目標緯度是固定的，因此在背景預先選好目前與下一分鐘的城市，
+並先取得故事、生成 Nova 音頻；按下按鈕時直接使用預取結果
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, Callable, Set
+
+from config import PREFETCH_CONFIG
+from city_index import is_local_time_window, target_latitude_from_minutes
+
+logger = logging.getLogger(__name__)
+
+
+def minute_key(moment: datetime) -> str:
+    """分鐘識別碼（當地時間，與網頁端 piPreselectedCity.minuteKey 格式相同）"""
+    return moment.strftime('%Y-%m-%dT%H:%M')
+
+
+def page_search_params(moment: datetime) -> Dict[str, float]:
+    """
+    計算網頁 startTheDay 會送出的搜尋參數
+
+    網頁以「當地時間早上 8 點」換算目標 UTC 偏移，特例時間段改用赤道附近
+    """
+    utc_moment = moment.astimezone(timezone.utc)
+    target_offset = 8 - (utc_moment.hour + utc_moment.minute / 60)
+    while target_offset > 14:
+        target_offset -= 24
+    while target_offset < -12:
+        target_offset += 24
+
+    if is_local_time_window(moment.hour, moment.minute):
+        target_latitude = 0
+    else:
+        target_latitude = target_latitude_from_minutes(moment.minute)
+    return {'targetUTCOffset': target_offset, 'targetLatitude': target_latitude}
+
+
+class WakeupPrefetcher:
+    """背景預取甦醒城市、故事與音頻"""
+
+    def __init__(self, audio_manager, city_index,
+                 guess_country_code: Optional[Callable[[str], str]] = None):
+        """
+        Args:
+            audio_manager: 音頻管理器（使用 build_greeting_audio_with_content）
+            city_index: 本機城市索引
+            guess_country_code: 缺少國家代碼時的推測函數
+        """
+        self.logger = logging.getLogger(__name__)
+        self.audio_manager = audio_manager
+        self.city_index = city_index
+        self.guess_country_code = guess_country_code
+
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._claimed: Set[str] = set()  # 已被按鈕取走的分鐘，不再重新預取
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.stats = {'hits': 0, 'waited': 0, 'misses': 0, 'stale': 0, 'expired': 0}
+
+    def start(self):
+        """啟動背景預取執行緒"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='WakeupPrefetcher', daemon=True)
+        self._thread.start()
+        self.logger.info("🚀 甦醒預取已啟動")
+
+    def stop(self):
+        """停止背景預取並清除未使用的音頻"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        with self._lock:
+            for entry in self._entries.values():
+                self._discard_audio(entry)
+            self._entries.clear()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._tick(datetime.now().astimezone())
+            except Exception as e:
+                self.logger.error(f"預取失敗: {e}")
+            self._stop_event.wait(PREFETCH_CONFIG['interval'])
+
+    def _tick(self, now: datetime):
+        """丟棄已過期的預取，並依序預取目前與接下來幾分鐘"""
+        current_key = minute_key(now)
+        with self._lock:
+            for key in [key for key in self._entries if key < current_key]:
+                self._discard_audio(self._entries.pop(key))
+                self.stats['expired'] += 1
+            self._claimed = {key for key in self._claimed if key >= current_key}
+
+        if not self._within_active_hours(now):
+            return
+
+        for offset in range(PREFETCH_CONFIG['lookahead_minutes'] + 1):
+            if self._stop_event.is_set():
+                return
+            moment = now + timedelta(minutes=offset)
+            with self._lock:
+                if minute_key(moment) in self._entries or minute_key(moment) in self._claimed:
+                    continue
+                entry = self._select_city(moment)
+                if not entry:
+                    continue
+                self._entries[entry['minute_key']] = entry
+            self._build(entry)
+
+    def _within_active_hours(self, now: datetime) -> bool:
+        active_hours = PREFETCH_CONFIG.get('active_hours')
+        if not active_hours:
+            return True
+        start_hour, end_hour = active_hours
+        return start_hour <= now.hour < end_hour
+
+    def _select_city(self, moment: datetime) -> Optional[Dict[str, Any]]:
+        """以網頁相同的搜尋參數在本機索引選出城市"""
+        params = page_search_params(moment)
+        response = self.city_index.find_city(
+            target_offset=params['targetUTCOffset'],
+            target_latitude=params['targetLatitude']
+        )
+        if not response.get('success'):
+            return None
+
+        city = response['city']
+        country_code = city.get('country_iso_code')
+        if not country_code and self.guess_country_code and city.get('country'):
+            country_code = self.guess_country_code(city['country'])
+
+        return {
+            'minute_key': minute_key(moment),
+            'city': city,
+            # 與 _extract_city_data_from_web 從網頁取得的欄位相同
+            'city_data': {
+                'city': city.get('name') or city.get('city'),
+                'country': city.get('country', ''),
+                'countryCode': country_code or 'US',
+                'latitude': city.get('latitude'),
+                'longitude': city.get('longitude'),
+                'timezone': city['timezone']['timeZoneId']
+            },
+            'ready': threading.Event(),
+            'audio_file': None,
+            'story_content': None,
+            'claimed': False
+        }
+
+    def _build(self, entry: Dict[str, Any]):
+        """取得故事並生成音頻（不上傳，等實際使用時才上傳）"""
+        city_data = entry['city_data']
+        start_time = time.time()
+        try:
+            audio_file, story_content = self.audio_manager.build_greeting_audio_with_content(
+                country_code=city_data['countryCode'],
+                city_name=city_data['city'],
+                country_name=city_data['country'],
+                city_data=city_data
+            )
+            entry['audio_file'] = audio_file
+            entry['story_content'] = story_content
+            self.logger.info(f"✅ 已預取 {entry['minute_key']}: {city_data['city']}, {city_data['country']} "
+                             f"(耗時: {time.time() - start_time:.1f}秒)")
+        except Exception as e:
+            self.logger.error(f"預取 {entry['minute_key']} 失敗: {e}")
+        finally:
+            entry['ready'].set()
+
+        # 生成期間已過期，或被取走後又放棄（城市不符、等待逾時），立即清除音頻
+        with self._lock:
+            if not entry['claimed'] and self._entries.get(entry['minute_key']) is not entry:
+                self._discard_audio(entry)
+
+    def claim(self, now: datetime = None) -> Optional[Dict[str, Any]]:
+        """
+        取得目前這一分鐘的預取結果（城市已選定，音頻可能仍在生成）
+
+        Returns:
+            Dict: 預取項目，沒有時返回 None
+        """
+        now = now or datetime.now().astimezone()
+        with self._lock:
+            key = minute_key(now)
+            entry = self._entries.pop(key, None)
+            self._claimed.add(key)
+            if entry:
+                entry['claimed'] = True
+        if not entry:
+            self._record('misses')
+        return entry
+
+    def wait_for_audio(self, entry: Dict[str, Any], city_data: Dict[str, Any]):
+        """
+        等待預取的音頻完成，並確認網頁實際顯示的是預取的城市
+
+        Args:
+            entry: claim() 取得的預取項目
+            city_data: 從網頁提取的城市資料
+
+        Returns:
+            Tuple[Path, Dict]: (音頻文件, 故事內容)，無法使用時為 (None, None)
+        """
+        if not self._same_city(entry['city_data'], city_data):
+            self.logger.info(f"網頁城市與預取不同（{city_data.get('city')} / {entry['city_data']['city']}），改為即時生成")
+            self._release(entry)
+            self._record('stale')
+            return None, None
+
+        was_ready = entry['ready'].is_set()
+        if not entry['ready'].wait(PREFETCH_CONFIG['wait_timeout']):
+            self.logger.warning("等待預取音頻逾時，改為即時生成")
+            self._release(entry)
+            self._record('misses')
+            return None, None
+
+        audio_file, story_content = entry['audio_file'], entry['story_content']
+        if not audio_file or not audio_file.exists() or not story_content:
+            self._record('misses')
+            return None, None
+
+        self._record('hits' if was_ready else 'waited')
+        return audio_file, story_content
+
+    def _release(self, entry: Dict[str, Any]):
+        """放棄取走的預取：音頻已生成時立即清除，仍在生成時由 _build 完成後清除"""
+        with self._lock:
+            entry['claimed'] = False
+            self._discard_audio(entry)
+
+    def _same_city(self, expected: Dict[str, Any], actual: Dict[str, Any]) -> bool:
+        try:
+            return (expected['city'] == actual.get('city') and
+                    abs(float(expected['latitude']) - float(actual.get('latitude'))) < 1e-6 and
+                    abs(float(expected['longitude']) - float(actual.get('longitude'))) < 1e-6)
+        except (TypeError, ValueError):
+            return False
+
+    def _record(self, outcome: str):
+        """記錄命中率"""
+        with self._lock:
+            self.stats[outcome] += 1
+            total = self.stats['hits'] + self.stats['waited'] + self.stats['misses'] + self.stats['stale']
+            served = self.stats['hits'] + self.stats['waited']
+        self.logger.info(f"📊 預取命中率: {served}/{total} ({served / total * 100:.0f}%) - "
+                         f"命中 {self.stats['hits']}, 等待中命中 {self.stats['waited']}, "
+                         f"未命中 {self.stats['misses']}, 城市不符 {self.stats['stale']}, 過期丟棄 {self.stats['expired']}")
+
+    def _discard_audio(self, entry: Dict[str, Any]):
+        """從 TTS 快取移除未使用的預取音頻（快取文件名即快取鍵，一併更新索引與容量統計）"""
+        audio_file = entry.get('audio_file')
+        if audio_file:
+            self.audio_manager.tts_cache.discard(audio_file.stem)
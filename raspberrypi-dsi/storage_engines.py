@@ -0,0 +1,789 @@
+#!/usr/bin/env python3
+"""
+本地儲存引擎
+LocalStorage 的底層實作：甦醒記錄只會追加，Day 計數等計數器需要原子更新
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import threading
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+from config import STORAGE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COUNTERS = {
+    "current_day": 0,
+    "last_updated": None,
+    "total_records": 0
+}
+
+
+def _fsync_dir(directory: Path):
+    """確保目錄中的改名與新檔案寫入磁碟"""
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_atomic(file_path: Path, data: bytes, fsync: bool = True):
+    """寫入暫存檔後改名，讀取者只會看到完整的舊檔或新檔"""
+    fd, temp_name = tempfile.mkstemp(dir=str(file_path.parent), prefix=f".{file_path.name}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(temp_name, str(file_path))
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+    if fsync:
+        _fsync_dir(file_path.parent)
+
+
+def read_legacy_json(storage_dir: Path):
+    """
+    讀取舊版 wakeup_records.json / day_counter.json（供新引擎第一次開啟時匯入）
+
+    Returns:
+        (記錄清單, 計數器或 None)；沒有舊檔或無法讀取時返回 None
+    """
+    records_file = Path(storage_dir) / "wakeup_records.json"
+    day_counter_file = Path(storage_dir) / "day_counter.json"
+    if not records_file.exists():
+        return None
+    try:
+        records = json.loads(records_file.read_text(encoding='utf-8')) or []
+        counters = json.loads(day_counter_file.read_text(encoding='utf-8')) if day_counter_file.exists() else None
+    except (OSError, ValueError) as e:
+        logger.error(f"讀取舊版 JSON 檔案失敗，略過匯入: {e}")
+        return None
+    return records, counters
+
+
+class StorageEngine(ABC):
+    """儲存引擎介面（子類別必須實作記錄追加與載入、計數器讀寫、清除）"""
+
+    name = 'base'
+
+    def __init__(self, storage_dir: Path):
+        self.logger = logging.getLogger(__name__)
+        self.storage_dir = Path(storage_dir)
+        self.storage_dir.mkdir(parents=True, exist_ok=True)
+        # 本行程寫入檔案的次數（含背景壓縮），LocalStorage 以此分辨自己的修改與外部修改
+        self.changes = 0
+
+    @abstractmethod
+    def append_record(self, record: Dict[str, Any]) -> bool:
+        """追加一筆記錄"""
+
+    @abstractmethod
+    def load_records(self) -> List[Dict[str, Any]]:
+        """依寫入順序載入所有記錄"""
+
+    def count_records(self) -> int:
+        return len(self.load_records())
+
+    def latest_record(self) -> Optional[Dict[str, Any]]:
+        records = self.load_records()
+        return records[-1] if records else None
+
+    def latest_records(self, limit: int) -> List[Dict[str, Any]]:
+        """最新的 limit 筆記錄（新到舊）"""
+        return self.load_records()[::-1][:limit]
+
+    def records_between(self, start: str = None, end: str = None) -> List[Dict[str, Any]]:
+        """時間戳記在 [start, end) 之間的記錄（ISO 格式字串比較）"""
+        return [record for record in self.load_records()
+                if (start is None or record.get('timestamp', '') >= start)
+                and (end is None or record.get('timestamp', '') < end)]
+
+    def records_by_country(self, country_code: str) -> List[Dict[str, Any]]:
+        """指定國家代碼的記錄"""
+        return [record for record in self.load_records()
+                if (record.get('countryCode') or '').upper() == country_code.upper()]
+
+    def visited_cities(self) -> List[Dict[str, Any]]:
+        """去過的城市（依第一次造訪排序），含造訪次數"""
+        cities = {}
+        for record in self.load_records():
+            key = (record.get('city', ''), (record.get('countryCode') or '').upper())
+            if key not in cities:
+                cities[key] = {'city': key[0], 'country': record.get('country', ''),
+                               'countryCode': key[1], 'visits': 0, 'first_day': record.get('day')}
+            cities[key]['visits'] += 1
+        return list(cities.values())
+
+    @abstractmethod
+    def load_counters(self) -> Dict[str, Any]:
+        """載入計數器（Day 編號等）"""
+
+    @abstractmethod
+    def save_counters(self, counters: Dict[str, Any]) -> bool:
+        """原子更新計數器"""
+
+    @abstractmethod
+    def clear(self) -> bool:
+        """清除所有記錄與計數器"""
+
+    def files(self) -> List[Path]:
+        """引擎使用的檔案（LocalStorage 以其大小與修改時間偵測外部修改）"""
+        return []
+
+    def _changed(self) -> bool:
+        """記錄一次本行程的寫入（寫入成功後呼叫）"""
+        self.changes += 1
+        return True
+
+    def reload(self):
+        """檔案被外部修改後重新載入引擎內部狀態"""
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonFileEngine(StorageEngine):
+    """舊版格式：wakeup_records.json 整個清單，每次寫入重寫整個檔案"""
+
+    name = 'json'
+
+    def __init__(self, storage_dir: Path):
+        super().__init__(storage_dir)
+        self.records_file = self.storage_dir / "wakeup_records.json"
+        self.day_counter_file = self.storage_dir / "day_counter.json"
+
+        if not self.records_file.exists():
+            self._save_json(self.records_file, [])
+            self.logger.info("建立新的記錄檔案")
+        if not self.day_counter_file.exists():
+            self._save_json(self.day_counter_file, DEFAULT_COUNTERS)
+            self.logger.info("建立新的 Day 計數檔案")
+
+    def _load_json(self, file_path: Path) -> Any:
+        """載入 JSON 檔案"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"載入 JSON 檔案失敗 {file_path}: {e}")
+            return None
+
+    def _save_json(self, file_path: Path, data: Any) -> bool:
+        """儲存 JSON 檔案"""
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            return True
+        except Exception as e:
+            self.logger.error(f"儲存 JSON 檔案失敗 {file_path}: {e}")
+            return False
+
+    def append_record(self, record: Dict[str, Any]) -> bool:
+        records = self._load_json(self.records_file) or []
+        records.append(record)
+        return self._save_json(self.records_file, records) and self._changed()
+
+    def load_records(self) -> List[Dict[str, Any]]:
+        return self._load_json(self.records_file) or []
+
+    def load_counters(self) -> Dict[str, Any]:
+        return self._load_json(self.day_counter_file) or dict(DEFAULT_COUNTERS)
+
+    def save_counters(self, counters: Dict[str, Any]) -> bool:
+        return self._save_json(self.day_counter_file, counters) and self._changed()
+
+    def clear(self) -> bool:
+        cleared = self._save_json(self.records_file, []) and self._save_json(self.day_counter_file, DEFAULT_COUNTERS)
+        return cleared and self._changed()
+
+    def files(self) -> List[Path]:
+        return [self.records_file, self.day_counter_file]
+
+
+class JournalEngine(StorageEngine):
+    """
+    只追加的 JSON Lines 日誌
+
+    - records.journal.<代>.jsonl：每筆記錄一行，寫入後 fsync，追加為 O(1)
+    - records.snapshot.<代>.jsonl：壓縮後的歷史記錄
+    - checkpoint.json：計數器與日誌狀態（代數、已確認的日誌位移、記錄數、最新記錄）
+
+    啟動時只重播檢查點之後的日誌尾端；最後一行不完整（寫到一半斷電）時截斷。
+    日誌超過 compact_bytes 時在背景把日誌併入新一代快照，寫入新的檢查點即為提交。
+    """
+
+    name = 'journal'
+    CHECKPOINT_FILE = 'checkpoint.json'
+
+    def __init__(self, storage_dir: Path, fsync: bool = None, compact_bytes: int = None):
+        """
+        Args:
+            storage_dir: 儲存目錄
+            fsync: 每筆記錄寫入後 fsync（預設依 STORAGE_CONFIG）
+            compact_bytes: 日誌超過此大小時在背景壓縮
+        """
+        super().__init__(storage_dir)
+        self.fsync = STORAGE_CONFIG['fsync'] if fsync is None else fsync
+        self.compact_bytes = compact_bytes or STORAGE_CONFIG['compact_bytes']
+        self.checkpoint_file = self.storage_dir / self.CHECKPOINT_FILE
+
+        self._lock = threading.RLock()
+        self._compactor = None
+        self._state = self._load_checkpoint()
+        self._remove_stale_generations()
+        self._recover()
+        self._journal = open(self._journal_path(), 'ab')
+
+    def _snapshot_path(self, generation: int = None) -> Path:
+        generation = self._state['generation'] if generation is None else generation
+        return self.storage_dir / f"records.snapshot.{generation}.jsonl"
+
+    def _journal_path(self, generation: int = None) -> Path:
+        generation = self._state['generation'] if generation is None else generation
+        return self.storage_dir / f"records.journal.{generation}.jsonl"
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.checkpoint_file.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            state = {
+                'generation': 0,
+                'counters': dict(DEFAULT_COUNTERS),
+                'snapshot_records': 0,
+                'journal_offset': 0,
+                'journal_records': 0,
+                'latest': None,
+            }
+            self._migrate_legacy(state)
+            self._write_checkpoint(state)
+            return state
+
+    def _write_checkpoint(self, state: Dict[str, Any]):
+        write_atomic(self.checkpoint_file, json.dumps(state, ensure_ascii=False).encode('utf-8'), self.fsync)
+
+    def _migrate_legacy(self, state: Dict[str, Any]):
+        """第一次使用日誌時匯入舊版 JSON 檔案（舊檔保留不動）"""
+        legacy = read_legacy_json(self.storage_dir)
+        if legacy is None:
+            return
+        records, counters = legacy
+
+        write_atomic(self._snapshot_path(0), b''.join(self._encode(record) for record in records), self.fsync)
+        state['snapshot_records'] = len(records)
+        state['latest'] = records[-1] if records else None
+        if counters:
+            state['counters'] = counters
+        self.logger.info(f"已從舊版 JSON 匯入 {len(records)} 筆記錄")
+
+    def _remove_stale_generations(self):
+        """移除中斷的壓縮留下的其他代檔案"""
+        current = {self._snapshot_path().name, self._journal_path().name}
+        for pattern in ('records.snapshot.*.jsonl', 'records.journal.*.jsonl'):
+            for path in self.storage_dir.glob(pattern):
+                if path.name not in current:
+                    path.unlink(missing_ok=True)
+
+    def _recover(self):
+        """從檢查點重播日誌尾端，截斷最後不完整的一行"""
+        journal_path = self._journal_path()
+        journal_path.touch(exist_ok=True)
+        size = journal_path.stat().st_size
+
+        offset = self._state['journal_offset']
+        records = self._state['journal_records']
+        latest = self._state['latest']
+        if offset > size:
+            # 檢查點比日誌新（日誌被外部改動），從頭重新計算
+            self.logger.warning("日誌比檢查點短，重新掃描整個日誌")
+            offset, records = 0, 0
+            latest = self._last_line(self._snapshot_path())
+
+        replayed = 0
+        with open(journal_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                offset += len(line)
+                records += 1
+                replayed += 1
+                latest = record
+
+        if size > offset:
+            self.logger.warning(f"日誌結尾有 {size - offset} 位元組不完整的寫入，已截斷")
+            with open(journal_path, 'r+b') as f:
+                f.truncate(offset)
+                f.flush()
+                os.fsync(f.fileno())
+        if replayed:
+            self.logger.info(f"已重播 {replayed} 筆日誌記錄")
+
+        self._offset = offset
+        self._journal_records = records
+        self._latest = latest
+
+    def _last_line(self, path: Path) -> Optional[Dict[str, Any]]:
+        records = self._read_records(path)
+        return records[-1] if records else None
+
+    @staticmethod
+    def _encode(record: Dict[str, Any]) -> bytes:
+        return (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+    @staticmethod
+    def _read_records(path: Path, limit: int = None) -> List[Dict[str, Any]]:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read() if limit is None else f.read(limit)
+        except FileNotFoundError:
+            return []
+        return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+    def append_record(self, record: Dict[str, Any]) -> bool:
+        line = self._encode(record)
+        with self._lock:
+            try:
+                self._journal.write(line)
+                self._journal.flush()
+                if self.fsync:
+                    os.fsync(self._journal.fileno())
+            except OSError as e:
+                self.logger.error(f"寫入日誌失敗: {e}")
+                # 移除可能寫了一半的內容，下一筆才能接在完整的行之後
+                try:
+                    os.ftruncate(self._journal.fileno(), self._offset)
+                except OSError:
+                    pass
+                return False
+
+            self._offset += len(line)
+            self._journal_records += 1
+            self._latest = record
+            self._changed()
+            needs_compaction = self._offset >= self.compact_bytes
+        if needs_compaction:
+            self.compact()
+        return True
+
+    def load_records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._read_records(self._snapshot_path()) + \
+                self._read_records(self._journal_path(), self._offset)
+
+    def count_records(self) -> int:
+        with self._lock:
+            return self._state['snapshot_records'] + self._journal_records
+
+    def latest_record(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return dict(self._latest) if self._latest else None
+
+    def load_counters(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._state['counters'])
+
+    def save_counters(self, counters: Dict[str, Any]) -> bool:
+        with self._lock:
+            state = dict(self._state, counters=dict(counters), journal_offset=self._offset,
+                         journal_records=self._journal_records, latest=self._latest)
+            try:
+                self._write_checkpoint(state)
+            except OSError as e:
+                self.logger.error(f"寫入檢查點失敗: {e}")
+                return False
+            self._state = state
+            return self._changed()
+
+    def compact(self, wait: bool = False):
+        """在背景把日誌併入新一代快照（已在壓縮時不重複啟動）"""
+        with self._lock:
+            if not (self._compactor and self._compactor.is_alive()):
+                self._compactor = threading.Thread(target=self._compact, name='journal-compact', daemon=True)
+                self._compactor.start()
+            compactor = self._compactor
+        if wait:
+            compactor.join()
+
+    def _compact(self):
+        try:
+            with self._lock:
+                generation = self._state['generation']
+                sealed_offset = self._offset
+                sealed_records = self._journal_records
+            new_generation = generation + 1
+            new_snapshot = self._snapshot_path(new_generation)
+
+            # 複製舊快照與已封存的日誌（不持鎖，期間仍可追加）
+            with open(new_snapshot, 'wb') as out:
+                if self._snapshot_path(generation).exists():
+                    with open(self._snapshot_path(generation), 'rb') as f:
+                        while True:
+                            block = f.read(1024 * 1024)
+                            if not block:
+                                break
+                            out.write(block)
+                with open(self._journal_path(generation), 'rb') as f:
+                    remaining = sealed_offset
+                    while remaining:
+                        block = f.read(min(remaining, 1024 * 1024))
+                        out.write(block)
+                        remaining -= len(block)
+                out.flush()
+                os.fsync(out.fileno())
+
+            with self._lock:
+                # 壓縮期間新增的記錄搬到新一代日誌
+                with open(self._journal_path(generation), 'rb') as f:
+                    f.seek(sealed_offset)
+                    tail = f.read(self._offset - sealed_offset)
+                new_journal = self._journal_path(new_generation)
+                with open(new_journal, 'wb') as out:
+                    out.write(tail)
+                    out.flush()
+                    os.fsync(out.fileno())
+
+                state = dict(self._state, generation=new_generation,
+                             snapshot_records=self._state['snapshot_records'] + sealed_records,
+                             journal_offset=len(tail), journal_records=self._journal_records - sealed_records,
+                             latest=self._latest)
+                self._write_checkpoint(state)  # 提交點
+
+                self._journal.close()
+                self._journal = open(new_journal, 'ab')
+                self._state = state
+                self._offset = len(tail)
+                self._journal_records = state['journal_records']
+                self._snapshot_path(generation).unlink(missing_ok=True)
+                self._journal_path(generation).unlink(missing_ok=True)
+                self._changed()
+            self.logger.info(f"日誌壓縮完成：第 {new_generation} 代，共 {self.count_records()} 筆記錄")
+        except Exception as e:
+            self.logger.error(f"日誌壓縮失敗: {e}")
+            self._snapshot_path(self._state['generation'] + 1).unlink(missing_ok=True)
+            self._journal_path(self._state['generation'] + 1).unlink(missing_ok=True)
+
+    def clear(self) -> bool:
+        # 壓縮執行緒提交時需要鎖，先在鎖外等它結束
+        while True:
+            with self._lock:
+                compactor = self._compactor
+                if not (compactor and compactor.is_alive()):
+                    return self._clear_locked()
+            compactor.join()
+
+    def _clear_locked(self) -> bool:
+        with self._lock:
+            generation = self._state['generation']
+            state = {
+                'generation': generation + 1,
+                'counters': dict(DEFAULT_COUNTERS),
+                'snapshot_records': 0,
+                'journal_offset': 0,
+                'journal_records': 0,
+                'latest': None,
+            }
+            self._journal_path(generation + 1).touch()
+            try:
+                self._write_checkpoint(state)
+            except OSError as e:
+                self.logger.error(f"清除日誌失敗: {e}")
+                return False
+            self._journal.close()
+            self._state = state
+            self._journal = open(self._journal_path(), 'ab')
+            self._offset = 0
+            self._journal_records = 0
+            self._latest = None
+            self._remove_stale_generations()
+            return self._changed()
+
+    def files(self) -> List[Path]:
+        return [self.checkpoint_file, self._snapshot_path(), self._journal_path()]
+
+    def reload(self):
+        with self._lock:
+            compactor = self._compactor
+        if compactor:
+            compactor.join()
+        with self._lock:
+            self._journal.close()
+            self._state = self._load_checkpoint()
+            self._remove_stale_generations()
+            self._recover()
+            self._journal = open(self._journal_path(), 'ab')
+
+    def close(self):
+        with self._lock:
+            compactor = self._compactor
+        if compactor:
+            compactor.join()
+        with self._lock:
+            self._journal.close()
+
+
+class SqliteEngine(StorageEngine):
+    """
+    SQLite（WAL 模式）儲存
+
+    記錄完整內容以 JSON 存在 data 欄，時間戳記、Day、城市與國家代碼另存成有索引的欄位；
+    記錄數由觸發器維護在 counters 表，count 與 latest 不需要掃描整個歷史。
+    """
+
+    name = 'sqlite'
+    DB_FILE = 'wakeup.sqlite3'
+
+    def __init__(self, storage_dir: Path, fsync: bool = None):
+        """
+        Args:
+            storage_dir: 儲存目錄
+            fsync: 每次交易都同步到磁碟（synchronous=FULL，預設依 STORAGE_CONFIG）
+        """
+        super().__init__(storage_dir)
+        fsync = STORAGE_CONFIG['fsync'] if fsync is None else fsync
+        self.db_file = self.storage_dir / self.DB_FILE
+        is_new_db = not self.db_file.exists()
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.db_file), check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(f"PRAGMA synchronous={'FULL' if fsync else 'NORMAL'}")
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                day INTEGER,
+                city TEXT,
+                country TEXT,
+                country_code TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS records_timestamp ON records (timestamp);
+            CREATE INDEX IF NOT EXISTS records_day ON records (day);
+            CREATE INDEX IF NOT EXISTS records_city ON records (city, country_code);
+            CREATE INDEX IF NOT EXISTS records_country_code ON records (country_code);
+
+            CREATE TABLE IF NOT EXISTS counters (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                current_day INTEGER NOT NULL DEFAULT 0,
+                last_updated TEXT,
+                total_records INTEGER NOT NULL DEFAULT 0,
+                record_count INTEGER NOT NULL DEFAULT 0
+            );
+            INSERT OR IGNORE INTO counters (id) VALUES (1);
+
+            CREATE TRIGGER IF NOT EXISTS records_insert AFTER INSERT ON records
+            BEGIN UPDATE counters SET record_count = record_count + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS records_delete AFTER DELETE ON records
+            BEGIN UPDATE counters SET record_count = record_count - 1 WHERE id = 1; END;
+        ''')
+
+        if is_new_db:
+            self._migrate_legacy()
+
+    def _migrate_legacy(self):
+        """第一次建立資料庫時匯入舊版 JSON 檔案（舊檔保留不動）"""
+        legacy = read_legacy_json(self.storage_dir)
+        if legacy is None:
+            return
+        records, counters = legacy
+        with self._lock:
+            self._db.execute('BEGIN')
+            self._db.executemany(
+                'INSERT INTO records (timestamp, day, city, country, country_code, data) VALUES (?, ?, ?, ?, ?, ?)',
+                [self._row(record) for record in records])
+            if counters:
+                self._write_counters(counters)
+            self._db.execute('COMMIT')
+        self.logger.info(f"已從舊版 JSON 匯入 {len(records)} 筆記錄")
+
+    @staticmethod
+    def _row(record: Dict[str, Any]):
+        country_code = record.get('countryCode') or ''
+        return (record.get('timestamp'), record.get('day'), record.get('city'), record.get('country'),
+                country_code.upper(), json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+
+    def _query(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _write_counters(self, counters: Dict[str, Any]):
+        self._db.execute(
+            'UPDATE counters SET current_day = ?, last_updated = ?, total_records = ? WHERE id = 1',
+            (counters.get('current_day', 0), counters.get('last_updated'), counters.get('total_records', 0)))
+
+    def append_record(self, record: Dict[str, Any]) -> bool:
+        try:
+            with self._lock:
+                self._db.execute(
+                    'INSERT INTO records (timestamp, day, city, country, country_code, data) VALUES (?, ?, ?, ?, ?, ?)',
+                    self._row(record))
+                return self._changed()
+        except sqlite3.Error as e:
+            self.logger.error(f"寫入記錄失敗: {e}")
+            return False
+
+    def load_records(self) -> List[Dict[str, Any]]:
+        return self._query('SELECT data FROM records ORDER BY id')
+
+    def count_records(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT record_count FROM counters WHERE id = 1').fetchone()[0]
+
+    def latest_record(self) -> Optional[Dict[str, Any]]:
+        records = self.latest_records(1)
+        return records[0] if records else None
+
+    def latest_records(self, limit: int) -> List[Dict[str, Any]]:
+        return self._query('SELECT data FROM records ORDER BY id DESC LIMIT ?', (limit,))
+
+    def records_between(self, start: str = None, end: str = None) -> List[Dict[str, Any]]:
+        return self._query(
+            'SELECT data FROM records WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp, id',
+            (start or '', end or '\uffff'))
+
+    def records_by_country(self, country_code: str) -> List[Dict[str, Any]]:
+        return self._query('SELECT data FROM records WHERE country_code = ? ORDER BY id', (country_code.upper(),))
+
+    def visited_cities(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute('''
+                SELECT city, country, country_code, COUNT(*), MIN(day), MIN(id) AS first_id
+                FROM records GROUP BY city, country_code ORDER BY first_id
+            ''').fetchall()
+        return [{'city': city or '', 'country': country or '', 'countryCode': country_code,
+                 'visits': visits, 'first_day': first_day}
+                for city, country, country_code, visits, first_day, _ in rows]
+
+    def load_counters(self) -> Dict[str, Any]:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT current_day, last_updated, total_records FROM counters WHERE id = 1').fetchone()
+        return {'current_day': row[0], 'last_updated': row[1], 'total_records': row[2]}
+
+    def save_counters(self, counters: Dict[str, Any]) -> bool:
+        try:
+            with self._lock:
+                self._write_counters(counters)
+                return self._changed()
+        except sqlite3.Error as e:
+            self.logger.error(f"寫入計數器失敗: {e}")
+            return False
+
+    def clear(self) -> bool:
+        try:
+            with self._lock:
+                self._db.execute('BEGIN')
+                self._db.execute('DELETE FROM records')
+                self._write_counters(DEFAULT_COUNTERS)
+                self._db.execute('COMMIT')
+                return self._changed()
+        except sqlite3.Error as e:
+            self.logger.error(f"清除資料庫失敗: {e}")
+            return False
+
+    def files(self) -> List[Path]:
+        return [self.db_file, self.db_file.with_name(self.db_file.name + '-wal')]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+STORAGE_ENGINES = {
+    JsonFileEngine.name: JsonFileEngine,
+    JournalEngine.name: JournalEngine,
+    SqliteEngine.name: SqliteEngine,
+}
+
+def create_storage_engine(name: str, storage_dir: Path) -> StorageEngine:
+    """依名稱建立儲存引擎"""
+    if name not in STORAGE_ENGINES:
+        raise ValueError(f"未知的儲存引擎: {name}（可用: {', '.join(STORAGE_ENGINES)}）")
+    return STORAGE_ENGINES[name](storage_dir)
+
+
+def run_benchmark(sizes: List[int], appends: int = 50) -> List[Dict[str, Any]]:
+    """
+    比較各引擎在已有 N 筆歷史記錄時，每次追加一筆與開啟的耗時
+
+    Args:
+        sizes: 歷史記錄筆數
+        appends: 每個情境量測的追加次數
+    """
+    record = {
+        'city': 'Reykjavík', 'country': 'Iceland', 'countryCode': 'IS',
+        'latitude': 64.1466, 'longitude': -21.9426, 'timezone': 'Atlantic/Reykjavik',
+        'story': '早安！今天你在冰島的雷克雅維克醒來，港口的海鷗正在迎接清晨。',
+    }
+    results = []
+    for size in sizes:
+        history = [dict(record, day=day, timestamp=f"2025-01-01T08:00:{day % 60:02d}") for day in range(size)]
+        for name in STORAGE_ENGINES:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                storage_dir = Path(temp_dir)
+                # 直接寫入歷史資料，不計入量測
+                if name == 'json':
+                    (storage_dir / "wakeup_records.json").write_text(
+                        json.dumps(history, ensure_ascii=False, indent=2), encoding='utf-8')
+                elif name == 'sqlite':
+                    (storage_dir / "wakeup_records.json").write_text(json.dumps(history), encoding='utf-8')
+                    create_storage_engine(name, storage_dir).close()
+                else:
+                    (storage_dir / "records.snapshot.0.jsonl").write_bytes(
+                        b''.join(JournalEngine._encode(item) for item in history))
+                    (storage_dir / JournalEngine.CHECKPOINT_FILE).write_text(json.dumps({
+                        'generation': 0, 'counters': dict(DEFAULT_COUNTERS), 'snapshot_records': size,
+                        'journal_offset': 0, 'journal_records': 0, 'latest': history[-1] if history else None,
+                    }))
+
+                start_time = time.perf_counter()
+                engine = create_storage_engine(name, storage_dir)
+                open_ms = (time.perf_counter() - start_time) * 1000
+
+                start_time = time.perf_counter()
+                for i in range(appends):
+                    engine.append_record(dict(record, day=size + i))
+                    engine.count_records()
+                append_ms = (time.perf_counter() - start_time) * 1000 / appends
+                assert engine.count_records() == size + appends
+                engine.close()
+
+            results.append({'engine': name, 'records': size, 'open_ms': open_ms, 'append_ms': append_ms})
+    return results
+
+
+# 測試程式
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    print(f"本地儲存引擎基準測試（fsync={'開' if STORAGE_CONFIG['fsync'] else '關'}）")
+    print(f"{'引擎':<10}{'歷史筆數':>10}{'開啟 (ms)':>12}{'每次追加 (ms)':>16}")
+    for result in run_benchmark(sizes):
+        print(f"{result['engine']:<10}{result['records']:>10}{result['open_ms']:>12.1f}{result['append_ms']:>16.2f}")
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+同步佇列（outbox）
+記錄每筆本地記錄是否已上傳 Firebase，重新啟動後從上次的位置繼續
+"""
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Tuple, Optional
+
+from config import SYNC_CONFIG
+from storage_engines import write_atomic
+
+logger = logging.getLogger(__name__)
+
+SYNC_PENDING = 'pending'
+SYNC_SYNCED = 'synced'
+SYNC_FAILED = 'failed'
+SYNC_DEAD = 'dead'
+
+# 伺服器暫時拒絕（逾時、限速）的 4xx，仍會重送
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+
+def is_permanent_failure(status_code: Optional[int]) -> bool:
+    """HTTP 4xx 表示伺服器不會接受這筆記錄（例如缺少城市、冪等鍵格式錯誤），重送也不會成功"""
+    return status_code is not None and 400 <= status_code < 500 and status_code not in RETRYABLE_CLIENT_ERRORS
+
+
+def record_key(record: Dict[str, Any], user_id: str) -> str:
+    """
+    記錄的冪等鍵：由使用者、Day 與時間戳記計算，重送同一筆記錄時伺服器會覆寫同一份文件
+    """
+    payload = json.dumps([user_id, record.get('day'), record.get('timestamp'), record.get('city')],
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class SyncOutbox:
+    """
+    記錄的同步狀態
+
+    本地記錄只會追加，因此以游標表示「前 cursor 筆都已同步」；
+    游標之後已完成的記錄（並行批次或只同步最新一筆時）記在 synced_ahead，
+    前面的空缺補齊後併入游標。失敗的記錄記錄嘗試次數，下次同步時重送；
+    伺服器拒絕（4xx）或嘗試次數達上限的記錄移到 dead，與已同步的記錄一樣由游標略過，不再重送。
+
+    游標只是位置，因此同時記下游標前最後一筆的冪等鍵（anchor）與當時的記錄數（seen）；
+    本地資料被清除後記錄變少或 anchor 對不上，整份進度作廢，避免新記錄被當成已同步。
+    """
+
+    def __init__(self, state_file: Path, user_id: str, max_attempts: int = None):
+        """
+        Args:
+            state_file: 同步進度檔
+            user_id: 用於計算冪等鍵的使用者識別碼
+            max_attempts: 失敗幾次後不再重送，0 表示不限，預設為 SYNC_CONFIG['max_attempts']
+        """
+        self.logger = logging.getLogger(__name__)
+        self.state_file = Path(state_file)
+        self.user_id = user_id
+        self.max_attempts = SYNC_CONFIG['max_attempts'] if max_attempts is None else max_attempts
+        self._lock = threading.Lock()
+        self._state = self._load()
+
+    @staticmethod
+    def _empty_state() -> Dict[str, Any]:
+        return {'cursor': 0, 'anchor': None, 'seen': 0, 'synced_ahead': [], 'failed': {}, 'dead': {},
+                'last_sync': None}
+
+    def _load(self) -> Dict[str, Any]:
+        state = self._empty_state()
+        try:
+            state.update(json.loads(self.state_file.read_text(encoding='utf-8')))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"同步進度檔無法讀取，從頭開始: {e}")
+        return state
+
+    def _save(self):
+        write_atomic(self.state_file, json.dumps(self._state, ensure_ascii=False).encode('utf-8'))
+
+    def key_for(self, record: Dict[str, Any]) -> str:
+        return record_key(record, self.user_id)
+
+    def _check_records(self, records: List[Dict[str, Any]]):
+        """本地記錄被清除或改寫時作廢同步進度（需持有鎖）"""
+        cursor = self._state['cursor']
+        anchor = self._state.get('anchor')
+        if cursor and anchor is None and cursor <= len(records):
+            # 舊版進度檔沒有 anchor：以目前的記錄補上
+            self._state['anchor'] = self.key_for(records[cursor - 1])
+            self._state['seen'] = max(self._state.get('seen', 0), cursor)
+            return
+        if len(records) >= self._state.get('seen', 0) and (
+                not cursor or (cursor <= len(records) and self.key_for(records[cursor - 1]) == anchor)):
+            return
+        self.logger.warning(f"⚠️ 本地記錄已被清除或改寫（{len(records)} 筆，上次 {self._state.get('seen', 0)} 筆），"
+                            f"同步進度重新開始")
+        self._state = self._empty_state()
+        self._save()
+
+    def reconcile(self, records: List[Dict[str, Any]]):
+        """確認同步進度仍對應目前的本地記錄（本地資料被清除後重設），在 state_of 之前呼叫"""
+        with self._lock:
+            self._check_records(records)
+
+    def pending(self, records: List[Dict[str, Any]]) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """
+        尚未同步的記錄
+
+        Args:
+            records: LocalStorage 的全部記錄（依寫入順序）
+
+        Returns:
+            List[(索引, 冪等鍵, 記錄)]
+        """
+        with self._lock:
+            self._check_records(records)
+            cursor = self._state['cursor']
+            synced_ahead = set(self._state['synced_ahead'])
+        result = []
+        for index in range(cursor, len(records)):
+            key = self.key_for(records[index])
+            if key not in synced_ahead:
+                result.append((index, key, records[index]))
+        return result
+
+    def state_of(self, index: int, record: Dict[str, Any]) -> str:
+        """單筆記錄的同步狀態（pending / synced / failed / dead）"""
+        key = self.key_for(record)
+        with self._lock:
+            if key in self._state['dead']:
+                return SYNC_DEAD
+            if index < self._state['cursor'] or key in self._state['synced_ahead']:
+                return SYNC_SYNCED
+            if key in self._state['failed']:
+                return SYNC_FAILED
+            return SYNC_PENDING
+
+    def mark_synced(self, records: List[Dict[str, Any]], keys: Iterable[str]):
+        """
+        標記為已同步並推進游標（立即寫入進度檔）
+
+        Args:
+            records: LocalStorage 的全部記錄，用來判斷游標能前進到哪裡
+            keys: 已同步的冪等鍵
+        """
+        keys = set(keys)
+        if not keys:
+            return
+        with self._lock:
+            self._check_records(records)
+            synced_ahead = set(self._state['synced_ahead']) | keys
+            for key in keys:
+                self._state['failed'].pop(key, None)
+                self._state['dead'].pop(key, None)
+
+            cursor = self._state['cursor']
+            while cursor < len(records):
+                key = self.key_for(records[cursor])
+                if key not in synced_ahead:
+                    break
+                synced_ahead.discard(key)
+                cursor += 1
+
+            self._state['cursor'] = cursor
+            self._state['anchor'] = self.key_for(records[cursor - 1]) if cursor else None
+            self._state['seen'] = len(records)
+            self._state['synced_ahead'] = sorted(synced_ahead)
+            self._state['last_sync'] = time.time()
+            self._save()
+
+    def mark_failed(self, keys: Iterable[str], error: str = None, permanent: bool = False) -> List[str]:
+        """
+        記錄失敗次數，下次同步時重送
+
+        Args:
+            keys: 失敗的冪等鍵
+            error: 錯誤訊息
+            permanent: 伺服器拒絕這些記錄（4xx），直接移到 dead
+
+        Returns:
+            List: 這次移到 dead、不再重送的冪等鍵
+        """
+        dead = []
+        with self._lock:
+            synced_ahead = set(self._state['synced_ahead'])
+            for key in keys:
+                entry = self._state['failed'].setdefault(key, {'attempts': 0})
+                entry['attempts'] += 1
+                entry['error'] = error
+                if permanent or (self.max_attempts and entry['attempts'] >= self.max_attempts):
+                    # 視為已處理：游標可越過，pending() 不再返回
+                    self._state['dead'][key] = self._state['failed'].pop(key)
+                    synced_ahead.add(key)
+                    dead.append(key)
+            self._state['synced_ahead'] = sorted(synced_ahead)
+            self._save()
+        for key in dead:
+            self.logger.warning(f"⚠️ 記錄 {key} 無法上傳（{error}），不再重送")
+        return dead
+
+    def reset(self):
+        """清除同步進度（下次同步會重送所有記錄；伺服器依冪等鍵覆寫，不會重複）"""
+        with self._lock:
+            self._state = self._empty_state()
+            self._save()
+
+    def get_stats(self, total_records: int) -> Dict[str, Any]:
+        with self._lock:
+            # 游標與 synced_ahead 也包含不再重送的記錄
+            done = min(self._state['cursor'], total_records) + len(self._state['synced_ahead'])
+            dead = len(self._state['dead'])
+            return {
+                'synced': max(done - dead, 0),
+                'pending': max(total_records - done, 0),
+                'failed': len(self._state['failed']),
+                'dead': dead,
+                'cursor': self._state['cursor'],
+                'last_sync': self._state['last_sync'],
+            }
+
+
+# 測試程式
+if __name__ == "__main__":
+    from config import SYNC_CONFIG, USER_CONFIG
+    from local_storage import LocalStorage
+
+    logging.basicConfig(level=logging.INFO)
+
+    storage = LocalStorage()
+    outbox = SyncOutbox(storage.storage_dir / SYNC_CONFIG['state_file'], USER_CONFIG['identifier'])
+    records = storage.get_all_records()
+    print(f"同步狀態: {outbox.get_stats(len(records))}")
+    for index, key, record in outbox.pending(records)[:10]:
+        print(f"  待同步 #{index} Day {record.get('day')} {record.get('city')} ({key})")
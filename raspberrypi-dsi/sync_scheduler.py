@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+背景同步排程器
+單一常駐工作執行緒依優先順序執行同步工作，失敗時以指數退避加隨機抖動重試
+"""
+
+import time
+import heapq
+import random
+import logging
+import threading
+from typing import Callable, Dict, Any, Optional
+
+from config import SYNC_CONFIG
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_LATEST = 0     # 剛產生的記錄
+PRIORITY_BACKLOG = 10   # 離線期間累積的記錄
+
+
+class TokenBucket:
+    """權杖桶限速：平均每秒 rate 次，最多連續 burst 次"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        取得一個權杖，不足時等待
+
+        Args:
+            timeout: 最長等待秒數（None 表示一直等）
+
+        Returns:
+            bool: 是否取得權杖
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+class SyncScheduler:
+    """
+    同步工作佇列
+
+    - 以鍵識別工作：佇列中已有相同鍵的工作時合併（保留較高的優先順序）
+    - 工作返回 False 或拋出例外時退避重試：base * 2^(次數-1)，上限 backoff_max，
+      實際等待取其一半再加上 0 到一半之間的隨機值，避免多台裝置同時重試
+    - 退避中的工作不會擋住其他已可執行的工作
+    - 連續失敗 max_attempts 次的工作放棄並記錄在 abandoned_jobs，之後再送入同鍵工作時重新計算
+    """
+
+    def __init__(self, backoff_base: float = None, backoff_max: float = None, name: str = 'sync-scheduler',
+                 max_attempts: int = None):
+        """
+        Args:
+            backoff_base: 第一次重試前的等待秒數
+            backoff_max: 退避等待上限（秒）
+            name: 工作執行緒名稱
+            max_attempts: 同一工作最多執行幾次（0 表示不限）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.backoff_base = backoff_base if backoff_base is not None else SYNC_CONFIG['backoff_base']
+        self.backoff_max = backoff_max if backoff_max is not None else SYNC_CONFIG['backoff_max']
+        self.max_attempts = max_attempts if max_attempts is not None else SYNC_CONFIG['job_max_attempts']
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._jobs = {}       # 鍵 -> 工作
+        self._ready = []      # (優先順序, 序號, 鍵)
+        self._delayed = []    # (可執行時間, 序號, 鍵)
+        self._seq = 0
+        self._thread = None
+        self._running = False
+        self._current = None
+        self._abandoned = {}  # 鍵 -> 放棄時的嘗試次數、錯誤與時間
+        self.stats = {
+            'submitted': 0,
+            'coalesced': 0,
+            'succeeded': 0,
+            'retries': 0,
+            'abandoned': 0,
+            'last_success': None,
+            'last_error': None,
+        }
+
+    def start(self):
+        """啟動工作執行緒（已啟動時不重複啟動）"""
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        """停止工作執行緒（正在執行的工作會先完成）"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+            thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+    def submit(self, key: str, task: Callable[[], bool], priority: int = PRIORITY_BACKLOG) -> bool:
+        """
+        加入同步工作（不阻塞）
+
+        Args:
+            key: 工作鍵，相同鍵的工作合併
+            task: 執行同步的函數，成功返回 True
+            priority: 數字越小越優先
+
+        Returns:
+            bool: 是否為新工作（False 表示已合併到佇列中的同鍵工作）
+        """
+        with self._cond:
+            self.stats['submitted'] += 1
+            job = self._jobs.get(key)
+            if job:
+                self.stats['coalesced'] += 1
+                job['task'] = task
+                if priority < job['priority']:
+                    job['priority'] = priority
+                    if job['not_before'] <= time.monotonic():
+                        self._push_ready(job)
+                return False
+
+            job = {'key': key, 'task': task, 'priority': priority, 'attempts': 0,
+                   'not_before': 0, 'entry': None}
+            self._jobs[key] = job
+            self._push_ready(job)
+            self._cond.notify_all()
+            return True
+
+    def _push_ready(self, job: Dict[str, Any]):
+        # 舊的佇列項目不刪除，取出時以 entry 比對略過
+        self._seq += 1
+        job['entry'] = (job['priority'], self._seq, job['key'])
+        heapq.heappush(self._ready, job['entry'])
+
+    def _push_delayed(self, job: Dict[str, Any]):
+        self._seq += 1
+        job['entry'] = (job['not_before'], self._seq, job['key'])
+        heapq.heappush(self._delayed, job['entry'])
+
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        """取出下一個可執行的工作；沒有時等待（持有鎖時呼叫）"""
+        while self._running:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                entry = heapq.heappop(self._delayed)
+                job = self._jobs.get(entry[2])
+                if job and job['entry'] is entry:
+                    self._push_ready(job)
+
+            while self._ready:
+                entry = heapq.heappop(self._ready)
+                job = self._jobs.get(entry[2])
+                if job and job['entry'] is entry:
+                    del self._jobs[job['key']]
+                    return job
+
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            self._cond.wait(timeout)
+        return None
+
+    def _run(self):
+        self.logger.info("🔄 同步排程器已啟動")
+        while True:
+            with self._cond:
+                job = self._next_job()
+                if job is None:
+                    break
+                self._current = job['key']
+
+            try:
+                ok = bool(job['task']())
+                error = None if ok else '同步失敗'
+            except Exception as e:
+                ok = False
+                error = str(e)
+
+            with self._cond:
+                self._current = None
+                if ok:
+                    self.stats['succeeded'] += 1
+                    self.stats['last_success'] = time.time()
+                    self._abandoned.pop(job['key'], None)
+                    continue
+
+                self.stats['last_error'] = error
+                pending = self._jobs.get(job['key'])
+                if self.max_attempts and job['attempts'] + 1 >= self.max_attempts:
+                    # 放棄這個工作；執行期間又送入的同鍵工作照常執行
+                    self.stats['abandoned'] += 1
+                    self._abandoned[job['key']] = {'attempts': job['attempts'] + 1, 'error': error, 'time': time.time()}
+                    self.logger.error(f"❌ 同步工作 {job['key']} 已失敗 {job['attempts'] + 1} 次，放棄：{error}")
+                    continue
+
+                self.stats['retries'] += 1
+                if pending:
+                    # 執行期間又送入同鍵工作：沿用新工作，但遵守退避
+                    pending['attempts'] = job['attempts']
+                    job = pending
+                else:
+                    self._jobs[job['key']] = job
+                job['attempts'] += 1
+                delay = self._backoff(job['attempts'])
+                job['not_before'] = time.monotonic() + delay
+                self._push_delayed(job)
+                self.logger.warning(f"⚠️ 同步工作 {job['key']} 失敗（第 {job['attempts']} 次）：{error}，{delay:.1f} 秒後重試")
+        self.logger.info("同步排程器已停止")
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """佇列深度、最後成功時間等統計"""
+        with self._cond:
+            now = time.monotonic()
+            retry_times = [job['not_before'] - now for job in self._jobs.values() if job['not_before'] > now]
+            return dict(
+                self.stats,
+                queue_depth=len(self._jobs),
+                running=self._current,
+                next_retry_in=max(min(retry_times), 0) if retry_times else None,
+                abandoned_jobs={key: dict(record) for key, record in self._abandoned.items()},
+            )
+
+
+# 測試程式
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    scheduler = SyncScheduler(backoff_base=0.5, backoff_max=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        return len(attempts) >= 3
+
+    scheduler.submit('backlog', lambda: print("📦 同步累積記錄") or True, PRIORITY_BACKLOG)
+    scheduler.submit('latest', flaky, PRIORITY_LATEST)
+    scheduler.start()
+    while scheduler.get_stats()['queue_depth'] or scheduler.get_stats()['running']:
+        time.sleep(0.1)
+    scheduler.stop()
+    print(f"📊 {scheduler.get_stats()}")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試本機靜態資源鏡像：資源網址加上版本號、長期快取與 ETag 重新驗證、不提供隱藏文件、
+/api/* 轉發與 /api/config 先返回上次成功的內容
+"""
+
+import tempfile
+import threading
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from asset_mirror import AssetMirror, IMMUTABLE
+
+class _Response:
+    def __init__(self, status_code, content, content_type):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'Content-Type': content_type}
+
+class _RecordingSession:
+    """記錄轉發的請求；/api/config 返回目前的 config 內容"""
+
+    def __init__(self):
+        self.requests = []
+        self.config = b'window.firebaseConfig = {"projectId": "v1"};'
+        self.fetched = threading.Event()
+
+    def request(self, method, url, data=None, headers=None, timeout=None):
+        self.requests.append((method, url, data, dict(headers or {})))
+        if url.endswith('/api/config'):
+            self.fetched.set()
+            return _Response(200, self.config, 'application/javascript')
+        return _Response(201, b'{"success": true}', 'application/json')
+
+def _fetch(url, etag=None, data=None):
+    request = Request(url, data=data, headers={'If-None-Match': etag} if etag else {})
+    try:
+        response = urlopen(request, timeout=5)
+        return response.status, response.headers, response.read()
+    except HTTPError as e:
+        return e.code, e.headers, e.read()
+
+def test_versioned_static_assets():
+    """測試頁面中的資源帶版本號、帶版本號的請求可長期快取、文件改變時版本號改變"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        (root / 'pi.html').write_text('<link href="pi-style.css"><script src="pi-script.js"></script>'
+                                      '<script src="/api/config"></script><script src="https://cdn/x.js"></script>')
+        (root / 'pi-script.js').write_text('console.log(1);')
+        (root / 'pi-style.css').write_text('body {}')
+        (root / '.env').write_text('OPENAI_API_KEY=secret')
+        mirror = AssetMirror(root=str(root), port=0, cache_dir=str(root / 'cache'), http=_RecordingSession)
+        assert mirror.start()
+        try:
+            status, headers, page = _fetch(mirror.page_url())
+            page = page.decode('utf-8')
+            version = mirror.version(root / 'pi-script.js')
+            assert status == 200 and headers['Cache-Control'] == 'no-cache'
+            assert f'src="pi-script.js?v={version}"' in page and 'href="pi-style.css?v=' in page
+            assert 'src="/api/config"' in page and 'src="https://cdn/x.js"' in page
+
+            status, headers, body = _fetch(f"{mirror.page_url('pi-script.js')}?v={version}")
+            assert status == 200 and body == b'console.log(1);' and headers['Cache-Control'] == IMMUTABLE
+            status, _, _ = _fetch(mirror.page_url('pi-script.js'), etag=headers['ETag'])
+            assert status == 304
+
+            (root / 'pi-script.js').write_text('console.log(2);')
+            assert f'pi-script.js?v={mirror.version(root / "pi-script.js")}' in _fetch(mirror.page_url())[2].decode()
+            assert mirror.version(root / 'pi-script.js') != version
+
+            for name in ('.env', '..%2F.env', 'missing.js', 'pi.py'):
+                assert _fetch(mirror.page_url(name))[0] == 404, name
+        finally:
+            mirror.stop()
+
+def test_api_forwarding_and_cached_config():
+    """測試 /api/* 轉發（保留瀏覽器的標頭），/api/config 有保存的內容時立即返回並在背景更新"""
+    session = _RecordingSession()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        mirror = AssetMirror(root=temp_dir, api_base='https://api.example', port=0, cache_dir=temp_dir,
+                             http=lambda: session)
+        assert mirror.start()
+        try:
+            status, _, body = _fetch(f"http://127.0.0.1:{mirror.port}/api/save-record", data=b'{"a": 1}')
+            assert status == 201 and body == b'{"success": true}'
+            method, url, data, headers = session.requests[-1]
+            assert (method, url, data) == ('POST', 'https://api.example/api/save-record', b'{"a": 1}')
+            assert 'User-Agent' in headers
+
+            config_url = f"http://127.0.0.1:{mirror.port}/api/config"
+            assert _fetch(config_url)[2] == session.config  # 沒有保存的內容：同步轉發
+            session.fetched.clear()
+            old_config, session.config = session.config, b'window.firebaseConfig = {"projectId": "v2"};'
+            assert _fetch(config_url)[2] == old_config      # 先返回上次的內容
+            assert session.fetched.wait(5)
+            for _ in range(50):
+                if _fetch(config_url)[2] == session.config:
+                    break
+            else:
+                assert False, "背景更新後應返回新的 config"
+            assert mirror.get_stats()['config_cached'] >= 2
+        finally:
+            mirror.stop()
+
+if __name__ == "__main__":
+    print("🔧 測試本機靜態資源鏡像...")
+    test_versioned_static_assets()
+    print("✅ 資源版本號與快取標頭正確")
+    test_api_forwarding_and_cached_config()
+    print("✅ /api 轉發與 config 快取正確")
+    print("\n🎉 本機靜態資源鏡像測試完成！")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試常駐音頻引擎（外部播放器模式）：依序完成、PCM 串流、取消、新的按鈕中斷上一次的播放、
+播放器卡住時等待逾時
+"""
+
+import sys
+import time
+import wave
+import threading
+import tempfile
+from pathlib import Path
+
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from audio_engine import AudioEngine, estimate_duration
+from wakeup_pipeline import PipelineRunner, Stage
+
+# 以 Python 模擬播放器：讀完標準輸入，'slow' 格式播放 5 秒
+COMMANDS = {
+    'wav': [sys.executable, '-c', 'import sys; sys.stdin.buffer.read()'],
+    'pcm': [sys.executable, '-c', 'import sys; sys.stdin.buffer.read()'],
+    'slow': [sys.executable, '-c', 'import time; time.sleep(5)'],
+}
+
+def test_clips_complete_in_order():
+    """測試文件、記憶體內容與 PCM 串流依序完成，沒有播放器的格式返回 False"""
+    engine = AudioEngine(backend='subprocess', commands=COMMANDS)
+    engine.start()
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            audio_file = Path(temp_dir) / 'clip.wav'
+            audio_file.write_bytes(b'RIFF')
+            finished = []
+            futures = [
+                engine.play(audio_file),
+                engine.play(b'RIFF', audio_format='wav'),
+                engine.play(iter([b'\x00\x01'] * 100)),
+                engine.play(b'ID3', audio_format='mp3'),
+            ]
+            for i, future in enumerate(futures):
+                future.add_done_callback(lambda _, i=i: finished.append(i))
+            assert [future.result(timeout=10) for future in futures] == [True, True, True, False]
+            assert finished == [0, 1, 2, 3]
+        stats = engine.get_stats()
+        assert stats['completed'] == 3 and stats['failed'] == 1 and stats['dispatched'] == 3
+    finally:
+        engine.stop()
+
+def test_cancel_playing_clip():
+    """測試取消正在播放的片段會立即停止，並繼續播放下一段"""
+    engine = AudioEngine(backend='subprocess', commands=COMMANDS)
+    engine.start()
+    try:
+        slow = engine.play(b'', audio_format='slow')
+        following = engine.play(b'RIFF', audio_format='wav')
+        time.sleep(0.3)
+        start_time = time.time()
+        engine.cancel(slow)
+        assert following.result(timeout=5) is True
+        assert slow.cancelled() and time.time() - start_time < 3
+        assert engine.get_stats()['cancelled'] == 1
+    finally:
+        engine.stop()
+
+def test_second_press_interrupts_first():
+    """測試新的按鈕取消上一次的工作階段：播放中的故事立即停止，之後才排入的句子不再播放"""
+    engine = AudioEngine(backend='subprocess', commands=COMMANDS)
+    engine.start()
+    runner = PipelineRunner(max_workers=2, name='test-press')
+    try:
+        first = engine.session()
+        story = []
+        playing = threading.Event()
+
+        def play_story(results):
+            # 和 _play_chunked 一樣在管線的執行緒中逐句排入
+            story.append(engine.play(b'', audio_format='slow'))
+            playing.set()
+            time.sleep(0.3)
+            story.append(engine.play(b'RIFF', audio_format='wav'))
+            return True
+
+        with first.activate():
+            runner.run('wakeup', [Stage('play', play_story)])
+        assert playing.wait(5)
+        time.sleep(0.1)
+
+        # 第二次按鈕
+        start_time = time.time()
+        first.cancel()
+        second = engine.session()
+        with second.activate():
+            greeting = engine.play(b'RIFF', audio_format='wav')
+        assert greeting.result(timeout=5) is True and time.time() - start_time < 3
+        time.sleep(0.4)
+        assert len(story) == 2 and all(future.cancelled() for future in story)
+        assert not second.cancelled
+    finally:
+        runner.stop()
+        engine.stop()
+
+def test_wait_times_out():
+    """測試播放器卡住時等待在片段長度加上餘裕後逾時，片段被取消並停止，之後的片段照常播放"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        audio_file = Path(temp_dir) / 'clip.wav'
+        with wave.open(str(audio_file), 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(b'\x00\x00' * 4000)
+        assert abs(estimate_duration(audio_file) - 0.5) < 0.01
+        assert estimate_duration(Path(temp_dir) / 'missing.mp3') == 0.0
+
+    engine = AudioEngine(backend='subprocess', commands=COMMANDS)
+    engine.start()
+    try:
+        slow = engine.play(b'', audio_format='slow')
+        start_time = time.time()
+        try:
+            engine.wait([slow], 0.2, margin=0.3)
+            assert False, "應該逾時"
+        except FutureTimeoutError:
+            pass
+        assert slow.cancelled() and time.time() - start_time < 2
+        following = engine.play(b'RIFF', audio_format='wav')
+        assert engine.wait([following], 0.0, margin=5) is True
+    finally:
+        engine.stop()
+
+if __name__ == "__main__":
+    print("🔧 測試常駐音頻引擎...")
+    test_clips_complete_in_order()
+    print("✅ 片段依序完成")
+    test_cancel_playing_clip()
+    print("✅ 取消播放正確")
+    test_second_press_interrupts_first()
+    print("✅ 新的按鈕中斷上一次的播放")
+    test_wait_times_out()
+    print("✅ 播放器卡住時等待逾時")
+    print("\n🎉 音頻引擎測試完成！")
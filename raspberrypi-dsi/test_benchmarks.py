@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試基準測試工具：模擬後端的回應與音頻串流、錯誤率、百分位數與基準比較
+"""
+
+import json
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from benchmarks.fake_servers import FakeBackend, PCM_SAMPLE_RATE, SPEECH_CHARS_PER_SECOND
+from benchmarks.run_benchmarks import percentile, summarize, compare
+
+def post(url, data):
+    request = Request(url, data=json.dumps(data).encode('utf-8'), headers={'Content-Type': 'application/json'})
+    return urlopen(request, timeout=5)
+
+def test_fake_backend():
+    """測試模擬後端的 API 回應、PCM 串流長度與錯誤率"""
+    backend = FakeBackend(latency=0, jitter=0, stream_interval=0).start()
+    try:
+        story = json.loads(post(f"{backend.base_url}/api/generatePiStory", {'city': 'Tokyo'}).read())
+        assert story['languageCode'] and 'Tokyo' in story['story']
+        text = 'x' * 60
+        audio = post(f"{backend.base_url}/v1/audio/speech", {'input': text, 'response_format': 'pcm'}).read()
+        assert len(audio) == 2 * PCM_SAMPLE_RATE * len(text) // SPEECH_CHARS_PER_SECOND
+        saved = json.loads(post(f"{backend.base_url}/api/save-record",
+                                {'records': [{'idempotencyKey': 'k1'}, {'idempotencyKey': 'k2'}]}).read())
+        assert [r['idempotencyKey'] for r in saved['results']] == ['k1', 'k2']
+
+        backend.error_rate = 1.0
+        try:
+            post(f"{backend.base_url}/api/find-city-geonames", {})
+            assert False, "應返回 500"
+        except HTTPError as e:
+            assert e.code == 500
+        stats = backend.get_stats()
+        assert stats['errors'] == {'find_city': 1} and stats['saved_records'] == 2
+    finally:
+        backend.stop()
+
+def test_percentiles_and_compare():
+    """測試百分位數、吞吐量與基準比較的退步判斷"""
+    assert percentile([1, 2, 3, 4, 5], 50) == 3
+    assert percentile([10, 20], 95) == 19.5
+    stats = summarize([0.1, 0.1, 0.2, 0.2], errors=1, items=10)
+    assert stats['p50_ms'] == 150 and stats['errors'] == 1
+    assert round(stats['throughput_per_s']) == 67
+
+    baseline = {'stages': {'story_api': {'p50_ms': 100, 'p95_ms': 200}, 'tts_pcm': {'skipped': '缺少 openai'}}}
+    report = {'stages': {'story_api': {'p50_ms': 110, 'p95_ms': 260}, 'tts_pcm': {'p50_ms': 1, 'p95_ms': 1}}}
+    rows = compare(report, baseline, threshold=0.2)
+    assert len(rows) == 1 and rows[0]['regressed']
+    assert abs(rows[0]['p50_change'] - 0.1) < 1e-9
+    assert not compare(report, baseline, threshold=0.5)[0]['regressed']
+
+if __name__ == "__main__":
+    print("🔧 測試基準測試工具...")
+    test_fake_backend()
+    print("✅ 模擬後端回應正確")
+    test_percentiles_and_compare()
+    print("✅ 百分位數與基準比較正確")
+    print("\n🎉 基準測試工具測試完成！")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試冷啟動：並行啟動與按鈕就緒里程碑、延後載入的模組記錄在啟動追蹤中、主程式載入時不載入重量級模組
+"""
+
+import sys
+import time
+
+from boot import BootSequence, lazy_import, measure_imports, deferred_violations
+from tracing import Tracer
+from wakeup_pipeline import PipelineRunner, Stage
+
+def test_button_ready_before_browser():
+    """測試按鈕里程碑不必等較慢的瀏覽器，啟動追蹤包含各子系統區段、模組載入與里程碑"""
+    sys.modules.pop('colorsys', None)
+    tracer = Tracer(ring_size=2, jsonl_file='')
+    runner = PipelineRunner(max_workers=4, name='test-boot')
+    boot = BootSequence(runner, tracer, budgets={})
+    try:
+        run = boot.start([
+            Stage('button', lambda results: lazy_import('colorsys') and 'button'),
+            Stage('browser', lambda results: time.sleep(0.4)),
+            Stage('page', lambda results: time.sleep(0.1), deps=['browser']),
+        ], milestones={'button': 'button_ready', 'page': 'web_ready'})
+
+        assert boot.wait('button_ready', timeout=5)
+        assert not boot.reached('web_ready')
+        assert run.result(timeout=5)['button'] == 'button'
+        assert boot.wait('ready', timeout=5)
+        assert boot.milestones['button_ready'] < boot.milestones['web_ready'] <= boot.milestones['ready']
+    finally:
+        runner.stop()
+
+    trace = tracer.recent()[-1]
+    assert trace['name'] == 'boot' and trace['args']['success']
+    spans = {record['name']: record for record in trace['spans']}
+    for name in ('boot.interpreter', 'boot.button', 'boot.browser', 'boot.page', 'import.colorsys'):
+        assert name in spans, name
+    assert spans['import.colorsys']['parent'] == spans['boot.button']['id']
+    assert spans['boot.page']['start'] >= spans['boot.browser']['end']
+    assert [e['name'] for e in trace['events']] == ['boot.button_ready', 'boot.web_ready', 'boot.ready']
+
+def test_main_defers_heavy_imports():
+    """測試以 -X importtime 載入主程式時，沒有載入 selenium、openai、pygame、pigpio 等模組"""
+    records = measure_imports('main_web_dsi')
+    modules = {record['module'] for record in records}
+    assert 'boot' in modules and 'wakeup_pipeline' in modules
+    assert deferred_violations(records) == []
+    assert deferred_violations(records + [{'module': 'selenium.webdriver', 'self_us': 1,
+                                           'cumulative_us': 1, 'depth': 0}]) == ['selenium']
+
+if __name__ == "__main__":
+    print("🔧 測試冷啟動...")
+    test_button_ready_before_browser()
+    print("✅ 按鈕就緒不必等瀏覽器，啟動追蹤完整")
+    test_main_defers_heavy_imports()
+    print("✅ 主程式載入時沒有載入重量級模組")
+    print("\n🎉 冷啟動測試完成！")
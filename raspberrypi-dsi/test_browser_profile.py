@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試持久的 Chrome 設定檔：清除異常關機留下的鎖定文件、標記正常關閉、超過上限時只清除快取
+"""
+
+import os
+import json
+import tempfile
+from pathlib import Path
+
+from browser_profile import ChromeProfile
+
+def test_prepare_after_unclean_shutdown():
+    """測試斷電後的設定檔：刪除過期鎖定、避免還原分頁提示、超過上限時保留登入資料只清快取"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / 'profile'
+        default = path / 'Default'
+        (default / 'Cache' / 'Cache_Data').mkdir(parents=True)
+        (default / 'Cache' / 'Cache_Data' / 'data_1').write_bytes(b'\0' * 4096)
+        (default / 'Local Storage').mkdir()
+        (default / 'Local Storage' / 'leveldb').write_bytes(b'login')
+        (default / 'Preferences').write_text(json.dumps({'profile': {'exit_type': 'Crashed', 'name': 'kiosk'}}))
+        os.symlink('raspberrypi-99999999', path / 'SingletonLock')
+        os.symlink('/tmp/missing-socket', path / 'SingletonSocket')
+
+        profile = ChromeProfile(str(path), max_bytes=10 ** 9, disk_cache_size=1024)
+        assert f'--user-data-dir={path}' in profile.chrome_arguments()
+        assert '--disk-cache-size=1024' in profile.chrome_arguments()
+        result = profile.prepare()
+        assert result['warm'] and result['cleared_bytes'] == 0
+        assert not os.path.lexists(path / 'SingletonLock') and not os.path.lexists(path / 'SingletonSocket')
+        preferences = json.loads((default / 'Preferences').read_text())
+        assert preferences['profile'] == {'exit_type': 'Normal', 'name': 'kiosk', 'exited_cleanly': True}
+
+        os.symlink(f'raspberrypi-{os.getpid()}', path / 'SingletonLock')
+        result = ChromeProfile(str(path), max_bytes=1024).prepare()
+        assert os.path.lexists(path / 'SingletonLock')  # 行程仍在執行：設定檔使用中
+        assert result['cleared_bytes'] == 4096 and not result['warm']
+        assert (default / 'Local Storage' / 'leveldb').read_bytes() == b'login'
+
+if __name__ == "__main__":
+    print("🔧 測試 Chrome 設定檔...")
+    test_prepare_after_unclean_shutdown()
+    print("✅ 異常關機後的設定檔整理正確")
+    print("\n🎉 Chrome 設定檔測試完成！")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試本機城市索引與伺服器 find-city-geonames 的一致性
+
+test_city_index_recorded.json 由 api/find-city-geonames/index.js 的
+searchCities、searchCitiesByLocation 與 handler（Math.random 固定為 0）錄製
+"""
+
+import calendar
+import json
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from city_index import CityIndex, NUMPY_AVAILABLE, target_latitude_from_minutes
+from city_table import build_city_table, CityTable
+from config import CITY_INDEX_CONFIG
+
+RECORDED_FILE = Path(__file__).parent / 'test_city_index_recorded.json'
+
+_index = None
+
+def _get_index():
+    global _index
+    if _index is None:
+        _index = CityIndex.from_json()
+    return _index
+
+def _load_recorded():
+    with open(RECORDED_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _summary(cities):
+    return [[city['city'], city['latitude'], city['longitude']] for city in cities]
+
+def test_search_cities_parity():
+    """測試漸進式搜尋候選城市與伺服器錄製結果一致"""
+    index = _get_index()
+    for row in _load_recorded()['searchCities']:
+        query = row['query']
+        result = index.search_cities(query['targetUTCOffset'], query['targetLatitude'], query['latitudePreference'])
+        assert _summary(result) == row['candidates'], f"候選城市不一致: {query}"
+
+def test_search_by_location_parity():
+    """測試用戶位置模式與伺服器錄製結果一致"""
+    index = _get_index()
+    for row in _load_recorded()['searchCitiesByLocation']:
+        query = row['query']
+        result = index.search_cities_by_location(query['userLatitude'], query['userLongitude'])[:len(row['candidates'])]
+        assert _summary(result) == row['candidates'], f"附近城市不一致: {query}"
+
+def test_find_city_response_parity():
+    """測試完整回應格式與伺服器一致（除了資料來源欄位）"""
+    index = _get_index()
+    rng = random.Random()
+    rng.random = lambda: 0
+    for row in _load_recorded()['handler']:
+        request = row['request']
+        response = index.find_city(
+            target_offset=request['targetUTCOffset'],
+            target_latitude=request['targetLatitude'],
+            rng=rng
+        )
+        expected = row['response']
+        assert response['city'].pop('source') == 'local_index'
+        expected['city'].pop('source')
+        assert response == expected, f"回應不一致: {request}"
+
+def test_search_latency():
+    """測試每次搜尋在毫秒以內"""
+    index = _get_index()
+    queries = [(offset, 70 - (minute * 140 / 59)) for offset in range(-12, 15, 2) for minute in range(60)]
+    start = time.perf_counter()
+    for offset, latitude in queries:
+        index.search_city_indices(offset, latitude)
+    average_ms = (time.perf_counter() - start) / len(queries) * 1000
+    print(f"✅ 平均搜尋時間: {average_ms:.3f}ms")
+    assert average_ms < 5
+
+def test_city_table_round_trip():
+    """測試二進位資料表可無損還原所有城市資料"""
+    with open(CITY_INDEX_CONFIG['data_file'], 'r', encoding='utf-8') as f:
+        cities = json.load(f)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        table_file = build_city_table(table_file=Path(temp_dir) / 'cities_data.bin')
+        table = CityTable(table_file)
+        try:
+            assert len(table) == len(cities)
+            for i, city in enumerate(cities):
+                assert table[i] == city, f"第 {i} 列不一致: {city['city']}"
+            assert table[-1] == cities[-1]
+
+            # 以資料表建立的索引也必須與伺服器一致
+            index = CityIndex(table, latitudes=table.latitudes(), longitudes=table.longitudes())
+            for row in _load_recorded()['searchCities']:
+                query = row['query']
+                result = index.search_cities(query['targetUTCOffset'], query['targetLatitude'], query['latitudePreference'])
+                assert _summary(result) == row['candidates'], f"資料表索引候選城市不一致: {query}"
+        finally:
+            table.close()
+
+def test_find_cities_batch_full_day():
+    """測試整天 1440 分鐘的批次搜尋與逐次搜尋結果一致"""
+    index = _get_index()
+    day_start = datetime(2025, 1, 1)
+    times = [day_start + timedelta(minutes=minute) for minute in range(1440)]
+    for utc_offset in (-10, 0, 5.5, 8, 14):
+        start = time.perf_counter()
+        batch = index.find_city_indices_batch(times, utc_offset=utc_offset)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"✅ UTC{utc_offset:+} 批次搜尋 1440 分鐘: {elapsed_ms:.1f}ms (NumPy: {NUMPY_AVAILABLE})")
+        for moment, indices in zip(times, batch):
+            if (moment.hour, moment.minute) >= (7, 50) and (moment.hour, moment.minute) <= (8, 10):
+                assert indices is None
+                continue
+            expected = index.search_city_indices(utc_offset, target_latitude_from_minutes(moment.minute))
+            assert indices == expected, f"批次結果不一致: {moment:%H:%M} UTC{utc_offset:+}"
+
+    # Unix 秒數輸入以 utc_offset 換算當地時間（UTC+8 的 07:55 與 06:30）
+    special = calendar.timegm((2025, 1, 1, 7, 55, 0)) - 8 * 3600
+    regular = calendar.timegm((2025, 1, 1, 6, 30, 0)) - 8 * 3600
+    batch = index.find_cities_batch([special, regular], utc_offset=8)
+    assert batch[0] is None
+    assert batch[1] == index.search_cities(8, target_latitude_from_minutes(30))
+
+if __name__ == "__main__":
+    print("🔧 測試本機城市索引...")
+    test_search_cities_parity()
+    print("✅ 漸進式搜尋一致")
+    test_search_by_location_parity()
+    print("✅ 用戶位置搜尋一致")
+    test_find_city_response_parity()
+    print("✅ 回應格式一致")
+    test_search_latency()
+    test_city_table_round_trip()
+    print("✅ 二進位資料表無損還原")
+    test_find_cities_batch_full_day()
+    print("✅ 批次搜尋一致")
+    print("\n🎉 本機城市索引測試完成！")
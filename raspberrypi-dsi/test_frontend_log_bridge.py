@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試前端日誌橋接：批次取回不遺漏、保留原始時間與級別、緩衝溢出與頁面重新載入
+"""
+
+import logging
+
+from frontend_log_bridge import FrontendLogBridge
+
+class FakePage:
+    """與 pi-script.js 的 window.piDrainLogs 行為相同的日誌緩衝"""
+
+    def __init__(self, capacity=500):
+        self.capacity = capacity
+        self.id = 1
+        self.seq = 0
+        self.entries = []
+
+    def log(self, level, message, time_ms=1700000000123):
+        self.seq += 1
+        self.entries.append({'seq': self.seq, 'time': time_ms, 'level': level, 'message': message, 'data': None})
+        del self.entries[:-self.capacity]
+
+    def reload(self):
+        self.id += 1
+        self.seq = 0
+        self.entries = []
+
+    def execute_script(self, script, after, limit):
+        entries = [e for e in self.entries if e['seq'] > after][:limit]
+        oldest = self.entries[0]['seq'] if self.entries else self.seq + 1
+        return {'id': self.id, 'seq': self.seq, 'oldest': oldest, 'entries': entries}
+
+class Collector(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def make_bridge(page, batch_size=3):
+    collector = Collector()
+    frontend_logger = logging.getLogger('test-frontend')
+    frontend_logger.handlers = [collector]
+    frontend_logger.setLevel(logging.DEBUG)
+    frontend_logger.propagate = False
+    return FrontendLogBridge(lambda: page, logger_name='test-frontend', batch_size=batch_size), collector
+
+def test_drain_batches():
+    """測試分批取回所有日誌，並保留前端的時間與級別"""
+    page = FakePage()
+    bridge, collector = make_bridge(page)
+    for i in range(7):
+        page.log('WARN' if i == 3 else 'INFO', f"訊息 {i}")
+    assert [bridge.drain(), bridge.drain(), bridge.drain(), bridge.drain()] == [3, 3, 1, 0]
+    assert [r.getMessage() for r in collector.records] == [f"[前端] 訊息 {i}" for i in range(7)]
+    assert collector.records[3].levelno == logging.WARNING
+    assert collector.records[0].created == 1700000000.123
+
+def test_overflow_and_reload():
+    """測試緩衝溢出時回報遺失筆數，頁面重新載入後從頭取回"""
+    page = FakePage(capacity=2)
+    bridge, collector = make_bridge(page, batch_size=10)
+    for i in range(5):
+        page.log('INFO', f"訊息 {i}")
+    assert bridge.drain() == 2
+    assert bridge.get_stats()['dropped'] == 3
+    assert collector.records[0].levelno == logging.WARNING
+
+    page.reload()
+    page.log('ERROR', "重新載入後")
+    assert bridge.drain() == 1
+    assert collector.records[-1].getMessage() == "[前端] 重新載入後"
+    assert bridge.get_stats()['dropped'] == 3
+
+if __name__ == "__main__":
+    print("🔧 測試前端日誌橋接...")
+    test_drain_batches()
+    print("✅ 分批取回與時間、級別正確")
+    test_overflow_and_reload()
+    print("✅ 緩衝溢出與頁面重新載入正確")
+    print("\n🎉 前端日誌橋接測試完成！")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試離線問候語：預先合成、清單檢查、固定項目不被淘汰
+"""
+
+import wave
+import tempfile
+
+from config import TTS_CONFIG, MORNING_GREETINGS
+from tts_cache import TTSCache, make_cache_key
+from greeting_corpus import GreetingCorpus, NOTIFICATION_TONES
+
+class RecordingAudioManager:
+    """記錄合成請求並把文字直接寫入快取的音頻管理器"""
+
+    def __init__(self, tts_cache):
+        self.tts_cache = tts_cache
+        self.calls = []
+
+    def _find_openai_cache(self, text, voice):
+        return self.tts_cache.get(self._key(text, voice))
+
+    def _generate_audio_openai_direct(self, text, language_code, voice=None):
+        self.calls.append(language_code)
+        return self.tts_cache.put_bytes(self._key(text, voice), text.encode('utf-8'), 'wav')
+
+    def _key(self, text, voice):
+        return make_cache_key(text, voice, TTS_CONFIG['openai_model'], TTS_CONFIG['openai_speed'], 'wav')
+
+def test_warm_and_verify():
+    """測試 warm-cache 後重新開啟可離線取得所有問候語與音效，第二次不再合成"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = TTSCache(temp_dir, max_bytes=10 ** 7)
+        audio_manager = RecordingAudioManager(cache)
+        total = len(MORNING_GREETINGS) + len(NOTIFICATION_TONES)
+        unique_texts = len(set(MORNING_GREETINGS.values()))  # default 與 en 相同，只合成一次
+        result = GreetingCorpus(cache).warm(audio_manager)
+        assert not result['failed']
+        assert len(audio_manager.calls) == unique_texts
+        assert result['rendered'] + result['cached'] == total
+
+        assert GreetingCorpus(cache).warm(audio_manager)['cached'] == total
+        assert len(audio_manager.calls) == unique_texts
+        cache.close()
+
+        reopened = TTSCache(temp_dir, max_bytes=10 ** 7)
+        corpus = GreetingCorpus(reopened)
+        assert corpus.verify() == {'available': total, 'missing': 0}
+        assert corpus.greeting_audio('fr').read_text('utf-8') == MORNING_GREETINGS['fr']
+        assert corpus.greeting_audio('xx') == corpus.greeting_audio('default')
+        with wave.open(str(corpus.tone_audio('error'))) as tone:
+            assert tone.getnframes() == int(NOTIFICATION_TONES['error'][1] * tone.getframerate())
+
+        # 快取容量不足時也不淘汰語料；文件損毀時檢查會發現
+        reopened.put_bytes('f' * 64, b'x' * 100, 'mp3')
+        assert reopened.evict(max_bytes=0) == 1
+        corpus.greeting_audio('ja').write_bytes(b'')
+        assert corpus.verify() == {'available': total - 1, 'missing': 1}
+        reopened.close()
+
+if __name__ == "__main__":
+    print("🔧 測試離線問候語...")
+    test_warm_and_verify()
+    print("✅ 預先合成與清單檢查正確")
+    print("\n🎉 離線問候語測試完成！")
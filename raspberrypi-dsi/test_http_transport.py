@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試共用 HTTP 連線：DNS 快取與逾時設定
+"""
+
+import socket
+
+from config import HTTP_CONFIG, API_CONFIG
+from http_transport import DNSCache, normalize_timeout
+
+def test_dns_cache():
+    """測試查詢結果在 TTL 內重用，查詢失敗時沿用過期結果，沒有快取時照常拋出例外"""
+    calls = []
+    failing = []
+
+    def resolver(host, port, family=0, type=0, proto=0, flags=0):
+        calls.append(host)
+        if failing:
+            raise socket.gaierror('Temporary failure in name resolution')
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.1', port))]
+
+    cache = DNSCache(resolver, ttl=60)
+    first = cache('example.org', 443)
+    assert cache('example.org', 443) == first and calls == ['example.org']
+
+    # 過期後 DNS 失敗：沿用舊結果
+    failing.append(True)
+    key = ('example.org', 443, 0, 0, 0, 0)
+    cache._entries[key] = (0, cache._entries[key][1])
+    assert cache('example.org', 443) == first
+    try:
+        cache('example.net', 443)
+        assert False, "沒有快取時查詢失敗應拋出例外"
+    except socket.gaierror:
+        pass
+    assert cache.stats == {'hits': 1, 'misses': 3, 'stale': 1}
+
+def test_normalize_timeout():
+    """測試單一數字視為讀取逾時，連線逾時統一使用 HTTP_CONFIG"""
+    assert normalize_timeout(None) == (HTTP_CONFIG['connect_timeout'], API_CONFIG['timeout'])
+    assert normalize_timeout(30) == (HTTP_CONFIG['connect_timeout'], 30)
+    assert normalize_timeout(2) == (2, 2)
+    assert normalize_timeout((1, 9)) == (1, 9)
+
+if __name__ == "__main__":
+    print("🔧 測試共用 HTTP 連線...")
+    test_dns_cache()
+    print("✅ DNS 快取正確")
+    test_normalize_timeout()
+    print("✅ 逾時設定正確")
+    print("\n🎉 HTTP 連線測試完成！")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試執行時指標：Prometheus 文字格式、直方圖累積分桶、回調指標與 /metrics 伺服器
+"""
+
+import os
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from metrics import MetricsRegistry, MetricsServer, process_tree_rss
+
+def test_exposition_format():
+    """測試計數器、直方圖與回調指標的輸出格式"""
+    registry = MetricsRegistry(namespace='test')
+    presses = registry.counter('presses_total', "短按次數", ['outcome'])
+    presses.inc(outcome='accepted')
+    presses.inc(2, outcome='accepted')
+    presses.inc(outcome='ignored')
+    latency = registry.histogram('stage_seconds', "階段耗時", ['stage'], buckets=(0.5, 1))
+    for value in (0.2, 0.7, 3):
+        latency.observe(value, stage='story')
+    cache = {'hits': 3, 'misses': 1}
+    registry.counter('lookups_total', "快取查詢", ['result'],
+                     func=lambda: {('hit',): cache['hits'], ('miss',): cache['misses']})
+    registry.gauge('browser_rss_bytes', "瀏覽器記憶體", func=lambda: None)
+
+    assert registry.counter('presses_total', "短按次數", ['outcome']) is presses
+    lines = registry.render().splitlines()
+    assert '# TYPE test_presses_total counter' in lines
+    assert 'test_presses_total{outcome="accepted"} 3' in lines
+    assert 'test_presses_total{outcome="ignored"} 1' in lines
+    assert 'test_stage_seconds_bucket{stage="story",le="0.5"} 1' in lines
+    assert 'test_stage_seconds_bucket{stage="story",le="1"} 2' in lines
+    assert 'test_stage_seconds_bucket{stage="story",le="+Inf"} 3' in lines
+    assert 'test_stage_seconds_count{stage="story"} 3' in lines
+    assert 'test_stage_seconds_sum{stage="story"} 3.9' in lines
+    assert 'test_lookups_total{result="hit"} 3' in lines
+    assert not [line for line in lines if line.startswith('test_browser_rss_bytes')]
+
+def test_metrics_server():
+    """測試 /metrics 以 Prometheus 文字格式回應，其他路徑返回 404"""
+    registry = MetricsRegistry(namespace='test')
+    registry.gauge('self_rss_bytes', "本行程記憶體", func=lambda: process_tree_rss(os.getpid()))
+    server = MetricsServer(registry, host='127.0.0.1', port=0)
+    assert server.start()
+    try:
+        response = urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5)
+        assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        body = response.read().decode('utf-8')
+        rss = int(next(line for line in body.splitlines() if line.startswith('test_self_rss_bytes')).split()[1])
+        assert rss > 1024 * 1024
+        try:
+            urlopen(f"http://127.0.0.1:{server.port}/other", timeout=5)
+            assert False, "應返回 404"
+        except HTTPError as e:
+            assert e.code == 404
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    print("🔧 測試執行時指標...")
+    test_exposition_format()
+    print("✅ Prometheus 文字格式正確")
+    test_metrics_server()
+    print("✅ 指標伺服器回應正確")
+    print("\n🎉 執行時指標測試完成！")
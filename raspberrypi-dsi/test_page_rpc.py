@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試網頁批次呼叫：安裝一次輔助程式、批次操作只算一次往返、失敗的操作不影響其他操作
+"""
+
+from page_rpc import PageRPC, PAGE_RPC_SOURCE
+
+class FakeDriver:
+    """模擬頁面：安裝腳本執行過後 window.piRpc 才存在"""
+
+    def __init__(self):
+        self.installed = False
+        self.calls = 0
+        self.script_timeout = None
+
+    def _run(self, script, ops):
+        self.calls += 1
+        if script.startswith(PAGE_RPC_SOURCE):
+            self.installed = True
+        if not self.installed:
+            return {'missing': True}
+        handlers = {'signalSeq': lambda: 3, 'text': lambda element_id: f"#{element_id}"}
+        results = []
+        for name, *args in ops:
+            if name in handlers:
+                results.append({'ok': True, 'value': handlers[name](*args)})
+            else:
+                results.append({'ok': False, 'error': f"未知的操作: {name}"})
+        return results
+
+    def execute_script(self, script, ops):
+        results = self._run(script, ops)
+        return results if isinstance(results, dict) else {'results': results}
+
+    def set_script_timeout(self, timeout):
+        self.script_timeout = timeout
+
+    def execute_async_script(self, script, ops, names, after, timeout_ms, then):
+        results = self._run(script, ops)
+        if isinstance(results, dict):
+            return results
+        signal = {'name': names[0], 'seq': 4, 'detail': {}}
+        return {'results': results, 'signal': signal, 'then': self._run(script, then)}
+
+def test_install_once_and_count():
+    """測試第一次呼叫時安裝輔助程式，之後每個批次只有一次往返"""
+    driver = FakeDriver()
+    rpc = PageRPC(lambda: driver)
+    assert rpc.query('signalSeq') == 3
+    assert rpc.get_stats()['installs'] == 1 and rpc.round_trips == 2
+
+    assert rpc.batch(('signalSeq',), ('unknown',), ('text', 'cityName')) == [3, None, '#cityName']
+    assert rpc.round_trips == 3
+    assert rpc.get_stats()['operations'] == 4
+
+def test_run_and_wait():
+    """測試執行操作、等待信號與後續查詢合併成一次往返"""
+    driver = FakeDriver()
+    driver.installed = True
+    rpc = PageRPC(lambda: driver)
+    values, signal, then = rpc.run_and_wait([('signalSeq',)], ['cityResolved'], 2, then=[('text', 'cityName')])
+    assert values == [3] and signal['name'] == 'cityResolved' and then == ['#cityName']
+    assert rpc.round_trips == 1 and driver.script_timeout > 2
+
+if __name__ == "__main__":
+    print("🔧 測試網頁批次呼叫...")
+    test_install_once_and_count()
+    print("✅ 安裝與往返計數正確")
+    test_run_and_wait()
+    print("✅ 執行並等待信號正確")
+    print("\n🎉 網頁批次呼叫測試完成！")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試甦醒預取：搜尋參數與網頁 startTheDay 一致、命中與城市不符的處理、已取走的分鐘不重新預取
+"""
+
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from city_index import CityIndex
+from tts_cache import TTSCache
+from prefetcher import WakeupPrefetcher, minute_key, page_search_params
+
+_index = None
+
+def _get_index():
+    global _index
+    if _index is None:
+        _index = CityIndex.from_json()
+    return _index
+
+class RecordingAudioManager:
+    """記錄呼叫並將音頻存入暫存目錄中 TTS 快取的音頻管理器"""
+
+    def __init__(self, directory):
+        self.tts_cache = TTSCache(cache_dir=directory)
+        self.calls = []
+
+    def build_greeting_audio_with_content(self, country_code, city_name, country_name, city_data):
+        self.calls.append(city_name)
+        audio_file = self.tts_cache.put_bytes(f"prefetch{len(self.calls):04d}", b'RIFF', 'wav')
+        return audio_file, {'city': city_name, 'country': country_name, 'story': '故事'}
+
+def test_page_search_params():
+    """測試目標偏移與緯度和網頁 startTheDay 的計算相同"""
+    tz = timezone(timedelta(hours=8))
+    # UTC 23:30 -> 8 - 23.5 = -15.5 -> +24 = 8.5
+    params = page_search_params(datetime(2025, 1, 2, 7, 30, tzinfo=tz))
+    assert params == {'targetUTCOffset': 8.5, 'targetLatitude': 70 - 30 * 140 / 59}
+    # 特例時間段使用赤道附近
+    params = page_search_params(datetime(2025, 1, 2, 8, 5, tzinfo=tz))
+    assert params['targetLatitude'] == 0
+    assert params['targetUTCOffset'] == 8 - (0 + 5 / 60)
+
+def test_prefetch_hit_and_stale():
+    """測試同一分鐘命中預取，以及網頁城市不同時放棄預取"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        audio_manager = RecordingAudioManager(temp_dir)
+        prefetcher = WakeupPrefetcher(audio_manager, _get_index())
+        now = datetime(2025, 1, 2, 6, 15, 20).astimezone()
+
+        prefetcher._tick(now)
+        assert len(audio_manager.calls) == 2  # 目前與下一分鐘
+
+        entry = prefetcher.claim(now)
+        assert entry['minute_key'] == minute_key(now)
+        audio_file, story = prefetcher.wait_for_audio(entry, dict(entry['city_data']))
+        assert audio_file.exists() and story['city'] == entry['city_data']['city']
+        assert prefetcher.stats['hits'] == 1
+
+        # 下一分鐘的預取，但網頁顯示了另一個城市
+        later = now + timedelta(minutes=1)
+        entry = prefetcher.claim(later)
+        page_city = dict(entry['city_data'], city='Elsewhere')
+        assert prefetcher.wait_for_audio(entry, page_city) == (None, None)
+        assert prefetcher.stats['stale'] == 1
+        assert not entry['audio_file'].exists()
+        assert audio_manager.tts_cache.total_bytes == 4  # 索引與容量統計一併移除
+
+        # 已取走的分鐘不再重新預取；分鐘已過的預取會被丟棄
+        prefetcher._tick(later)
+        assert len(audio_manager.calls) == 3
+        prefetcher._tick(later + timedelta(minutes=5))
+        assert prefetcher.stats['expired'] == 1
+        assert prefetcher.claim(later) is None
+        assert prefetcher.stats['misses'] == 1
+
+def test_build_after_release_is_discarded():
+    """測試取走後因城市不符而放棄、之後才完成的預取音頻會被清除"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        audio_manager = RecordingAudioManager(temp_dir)
+        prefetcher = WakeupPrefetcher(audio_manager, _get_index())
+        now = datetime(2025, 1, 2, 6, 15, 20).astimezone()
+
+        entry = prefetcher._select_city(now)
+        prefetcher._entries[entry['minute_key']] = entry
+        assert prefetcher.claim(now) is entry
+        assert prefetcher.wait_for_audio(entry, dict(entry['city_data'], city='Elsewhere')) == (None, None)
+
+        prefetcher._build(entry)  # 生成在放棄之後才完成
+        assert not entry['audio_file'].exists()
+        assert audio_manager.tts_cache.total_bytes == 0
+
+if __name__ == "__main__":
+    print("🔧 測試甦醒預取...")
+    test_page_search_params()
+    print("✅ 搜尋參數與網頁一致")
+    test_prefetch_hit_and_stale()
+    print("✅ 預取命中與過期處理正確")
+    test_build_after_release_is_discarded()
+    print("✅ 放棄後完成的預取已清除")
+    print("\n🎉 甦醒預取測試完成！")
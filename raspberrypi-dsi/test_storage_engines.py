@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試本地儲存引擎：日誌追加與重播、斷電截斷、背景壓縮、舊版 JSON 匯入、SQLite 查詢、
+LocalStorage 記憶體快取（自己的寫入不觸發重新載入）、引擎介面
+"""
+
+import json
+import tempfile
+import threading
+from pathlib import Path
+
+from storage_engines import StorageEngine, JournalEngine, JsonFileEngine, SqliteEngine
+from local_storage import LocalStorage
+
+def test_journal_append_and_reopen():
+    """測試記錄與計數器在重新開啟後保留，LocalStorage 各引擎行為一致"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for engine in ('journal', 'sqlite', 'json'):
+            storage = LocalStorage(Path(temp_dir) / engine, engine=engine)
+            for city in ('Oslo', 'Lima', 'Hanoi'):
+                storage.increment_day_counter()
+                assert storage.save_wakeup_record({'city': city})
+            storage.close()
+
+            reopened = LocalStorage(Path(temp_dir) / engine, engine=engine)
+            assert [r['city'] for r in reopened.get_all_records()] == ['Oslo', 'Lima', 'Hanoi']
+            assert reopened.get_records_count() == 3
+            assert reopened.get_latest_record()['day'] == 3
+            assert reopened.get_next_day_number() == 4
+            assert reopened.clear_all_data() and reopened.get_records_count() == 0
+            reopened.close()
+
+def test_journal_truncates_torn_write():
+    """測試最後一行寫到一半時被截斷，之後的追加接在完整記錄後"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = JournalEngine(temp_dir)
+        engine.append_record({'city': 'Oslo'})
+        engine.append_record({'city': 'Lima'})
+        journal = engine._journal_path()
+        engine.close()
+        with open(journal, 'ab') as f:
+            f.write(b'{"city":"Ha')
+
+        engine = JournalEngine(temp_dir)
+        assert engine.count_records() == 2
+        assert engine.latest_record() == {'city': 'Lima'}
+        engine.append_record({'city': 'Hanoi'})
+        assert [r['city'] for r in engine.load_records()] == ['Oslo', 'Lima', 'Hanoi']
+        engine.close()
+
+def test_journal_compaction():
+    """測試壓縮後順序不變、舊一代檔案移除，並在重新開啟後一致"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = JournalEngine(temp_dir, compact_bytes=200)
+        for day in range(50):
+            engine.append_record({'day': day})
+        engine.compact(wait=True)
+        engine.append_record({'day': 50})
+        assert engine._state['generation'] > 0
+        assert len(list(Path(temp_dir).glob('records.*.jsonl'))) == 2
+        engine.close()
+
+        engine = JournalEngine(temp_dir, compact_bytes=10 ** 6)
+        assert [r['day'] for r in engine.load_records()] == list(range(51))
+        assert engine.count_records() == 51 and engine.latest_record() == {'day': 50}
+        engine.close()
+
+def test_journal_clear_during_compaction():
+    """測試壓縮進行中呼叫 clear 不會互相等待"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = JournalEngine(temp_dir, compact_bytes=10 ** 6)
+        for day in range(2000):
+            engine.append_record({'day': day})
+        engine.compact()
+        cleared = []
+        thread = threading.Thread(target=lambda: cleared.append(engine.clear()), daemon=True)
+        thread.start()
+        thread.join(10)
+        assert cleared == [True], "clear 與壓縮執行緒互相等待"
+        assert engine.count_records() == 0 and engine.load_records() == []
+        engine.append_record({'day': 0})
+        engine.close()
+
+        engine = JournalEngine(temp_dir)
+        assert engine.load_records() == [{'day': 0}]
+        engine.close()
+
+def test_journal_migrates_legacy_json():
+    """測試第一次使用日誌時匯入舊版 wakeup_records.json 與 day_counter.json"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        legacy = JsonFileEngine(temp_dir)
+        legacy.append_record({'city': 'Oslo', 'day': 1})
+        legacy.save_counters({'current_day': 1, 'last_updated': None, 'total_records': 1})
+
+        engine = JournalEngine(temp_dir)
+        assert engine.load_records() == [{'city': 'Oslo', 'day': 1}]
+        assert engine.load_counters()['current_day'] == 1
+        engine.close()
+        assert json.loads((Path(temp_dir) / 'wakeup_records.json').read_text('utf-8'))
+
+def test_sqlite_queries():
+    """測試 SQLite 引擎的日期、國家、城市查詢與 JSON 引擎的結果相同"""
+    records = [
+        {'city': 'Osaka', 'country': 'Japan', 'countryCode': 'JP', 'day': 1, 'timestamp': '2025-01-01T08:00:00'},
+        {'city': 'Lima', 'country': 'Peru', 'countryCode': 'PE', 'day': 2, 'timestamp': '2025-01-15T08:00:00'},
+        {'city': 'Osaka', 'country': 'Japan', 'countryCode': 'jp', 'day': 3, 'timestamp': '2025-02-01T08:00:00'},
+        {'city': 'Sapporo', 'country': 'Japan', 'countryCode': 'JP', 'day': 4, 'timestamp': '2025-02-10T08:00:00'},
+    ]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engines = [SqliteEngine(Path(temp_dir) / 'sqlite'), JsonFileEngine(Path(temp_dir) / 'json')]
+        for engine in engines:
+            for record in records:
+                engine.append_record(record)
+        for engine in engines:
+            assert engine.count_records() == 4
+            assert [r['day'] for r in engine.latest_records(2)] == [4, 3]
+            assert [r['day'] for r in engine.records_between('2025-01-10', '2025-02-01')] == [2]
+            assert [r['day'] for r in engine.records_by_country('jp')] == [1, 3, 4]
+            assert [(c['city'], c['visits'], c['first_day']) for c in engine.visited_cities()] == \
+                [('Osaka', 2, 1), ('Lima', 1, 2), ('Sapporo', 1, 4)]
+        assert engines[0].clear() and engines[0].count_records() == 0
+        engines[0].close()
+
+def test_local_storage_cache():
+    """測試讀取由記憶體提供、偵測外部修改，並在多執行緒寫入時不遺失計數"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        storage = LocalStorage(temp_dir, engine='json')
+        storage.increment_day_counter()
+        storage.save_wakeup_record({'city': 'Oslo'})
+        assert storage.get_storage_stats()['total_records'] == 1
+
+        loads = []
+        original_load = storage.engine.load_records
+        storage.engine.load_records = lambda: loads.append(1) or original_load()
+        for _ in range(5):
+            storage.get_all_records()
+            storage.get_current_day_number()
+        assert len(loads) == 1
+
+        # 外部程式改寫檔案後重新載入
+        records_file = Path(temp_dir) / 'wakeup_records.json'
+        records_file.write_text(json.dumps([{'city': 'Oslo'}, {'city': 'Lima'}]), encoding='utf-8')
+        assert storage.get_records_count() == 2 and storage.get_latest_record() == {'city': 'Lima'}
+
+        def wake_up():
+            for _ in range(10):
+                storage.increment_day_counter()
+                storage.save_wakeup_record({'city': 'Hanoi'})
+        threads = [threading.Thread(target=wake_up) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert storage.get_current_day_number() == 41 and storage.get_records_count() == 42
+        assert LocalStorage(temp_dir, engine='json').get_records_count() == 42
+
+def test_local_storage_ignores_own_writes():
+    """測試本行程的背景壓縮與 SQLite 寫入不會讓快取重新載入，外部修改仍會"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for engine in ('journal', 'sqlite'):
+            storage = LocalStorage(Path(temp_dir) / engine, engine=engine)
+            storage.engine.compact_bytes = 200
+            reloads = []
+            original_reload = storage.engine.reload
+            storage.engine.reload = lambda: reloads.append(1) or original_reload()
+            for day in range(30):
+                storage.increment_day_counter()
+                storage.save_wakeup_record({'city': f'City{day}'})
+                assert storage.get_records_count() == day + 1
+            if engine == 'journal':
+                storage.engine.compact(wait=True)
+                assert storage.engine._state['generation'] > 0
+            assert storage.get_current_day_number() == 30 and len(storage.get_all_records()) == 30
+            assert reloads == []
+
+            # 另一個行程寫入同一份資料
+            other = LocalStorage(Path(temp_dir) / engine, engine=engine)
+            other.save_wakeup_record({'city': 'Elsewhere'})
+            other.close()
+            assert storage.get_records_count() == 31 and reloads == [1]
+            storage.close()
+
+def test_engines_implement_interface():
+    """測試每個引擎都實作了抽象方法，缺少實作的子類別無法建立"""
+    for engine_class in (JsonFileEngine, JournalEngine, SqliteEngine):
+        assert not engine_class.__abstractmethods__, engine_class.__abstractmethods__
+    assert StorageEngine.__abstractmethods__ == {'append_record', 'load_records', 'load_counters',
+                                                 'save_counters', 'clear'}
+
+    class PartialEngine(StorageEngine):
+        def append_record(self, record):
+            return True
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            PartialEngine(temp_dir)
+            assert False, "缺少實作的引擎不應該能建立"
+        except TypeError:
+            pass
+
+if __name__ == "__main__":
+    print("🔧 測試本地儲存引擎...")
+    test_journal_append_and_reopen()
+    print("✅ 追加與重新開啟正確")
+    test_journal_truncates_torn_write()
+    print("✅ 不完整寫入已截斷")
+    test_journal_compaction()
+    print("✅ 背景壓縮正確")
+    test_journal_clear_during_compaction()
+    print("✅ 壓縮中清除不會卡住")
+    test_journal_migrates_legacy_json()
+    print("✅ 舊版 JSON 匯入正確")
+    test_sqlite_queries()
+    print("✅ SQLite 查詢正確")
+    test_local_storage_cache()
+    print("✅ 記憶體快取正確")
+    test_local_storage_ignores_own_writes()
+    print("✅ 自己的寫入與壓縮不會重新載入")
+    test_engines_implement_interface()
+    print("✅ 引擎實作完整介面")
+    print("\n🎉 本地儲存引擎測試完成！")
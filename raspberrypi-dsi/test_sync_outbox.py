@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試同步佇列：冪等鍵穩定、游標推進與持久化、失敗重送、伺服器拒絕的記錄不再重送、批次 API 不可用時逐筆上傳、伺服器錯誤時整批重試、
+清除本地資料後同步進度重新開始
+"""
+
+import json
+import tempfile
+from pathlib import Path
+
+from sync_outbox import SyncOutbox, SYNC_SYNCED, SYNC_FAILED, SYNC_PENDING, SYNC_DEAD, is_permanent_failure
+
+RECORDS = [{'day': day, 'city': f'City{day}', 'timestamp': f'2025-01-{day:02d}T08:00:00'} for day in range(1, 11)]
+
+def test_cursor_and_resume():
+    """測試批次完成順序不定時游標只推進到連續完成的位置，重新開啟後繼續"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        state_file = Path(temp_dir) / 'sync_outbox.json'
+        outbox = SyncOutbox(state_file, 'tester')
+        pending = outbox.pending(RECORDS)
+        assert [index for index, _, _ in pending] == list(range(10))
+        keys = [key for _, key, _ in pending]
+        assert keys == [SyncOutbox(state_file, 'tester').key_for(record) for record in RECORDS]
+
+        # 第二批先完成，第一批有一筆失敗
+        outbox.mark_synced(RECORDS, keys[5:])
+        assert outbox.get_stats(10)['cursor'] == 0
+        outbox.mark_synced(RECORDS, keys[:2] + keys[3:5])
+        outbox.mark_failed([keys[2]], 'HTTP 500')
+        stats = outbox.get_stats(10)
+        assert (stats['synced'], stats['pending'], stats['failed'], stats['cursor']) == (9, 1, 1, 2)
+        assert outbox.state_of(2, RECORDS[2]) == SYNC_FAILED
+
+        reopened = SyncOutbox(state_file, 'tester')
+        assert [index for index, _, _ in reopened.pending(RECORDS + [{'day': 11}])] == [2, 10]
+        reopened.mark_synced(RECORDS, [keys[2]])
+        assert reopened.get_stats(10)['cursor'] == 10 and reopened.get_stats(10)['failed'] == 0
+        assert reopened.state_of(9, RECORDS[9]) == SYNC_SYNCED
+
+        reopened.reset()
+        assert len(reopened.pending(RECORDS)) == 10
+        assert reopened.state_of(0, RECORDS[0]) == SYNC_PENDING
+
+def test_dead_letter():
+    """測試 4xx 或失敗次數達上限的記錄不再重送，游標越過它們"""
+    assert is_permanent_failure(400) and not is_permanent_failure(429) and not is_permanent_failure(500)
+    assert not is_permanent_failure(None)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        state_file = Path(temp_dir) / 'sync_outbox.json'
+        outbox = SyncOutbox(state_file, 'tester', max_attempts=2)
+        keys = [key for _, key, _ in outbox.pending(RECORDS)]
+
+        assert outbox.mark_failed([keys[1]], 'HTTP 400: 缺少必要欄位', permanent=True) == [keys[1]]
+        assert outbox.mark_failed([keys[3]], 'HTTP 500') == []
+        assert outbox.state_of(3, RECORDS[3]) == SYNC_FAILED
+        assert outbox.mark_failed([keys[3]], 'HTTP 500') == [keys[3]]
+        assert outbox.state_of(1, RECORDS[1]) == SYNC_DEAD
+        assert [index for index, _, _ in outbox.pending(RECORDS)] == [0, 2] + list(range(4, 10))
+
+        outbox.mark_synced(RECORDS, [key for i, key in enumerate(keys) if i not in (1, 3)])
+        stats = outbox.get_stats(10)
+        assert (stats['synced'], stats['pending'], stats['failed'], stats['dead'], stats['cursor']) == (8, 0, 0, 2, 10)
+
+        reopened = SyncOutbox(state_file, 'tester', max_attempts=2)
+        assert reopened.pending(RECORDS) == [] and reopened.state_of(3, RECORDS[3]) == SYNC_DEAD
+        reopened.reset()
+        assert len(reopened.pending(RECORDS)) == 10
+
+def test_clear_then_append():
+    """測試清除本地資料後新追加的記錄不會因舊游標被當成已同步"""
+    from local_storage import LocalStorage
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        storage = LocalStorage(Path(temp_dir) / 'data', engine='journal')
+        state_file = Path(temp_dir) / 'sync_outbox.json'
+        outbox = SyncOutbox(state_file, 'tester', max_attempts=1)
+        for city in ('Oslo', 'Lima', 'Hanoi'):
+            storage.save_wakeup_record({'city': city})
+        records = storage.get_all_records()
+        keys = [key for _, key, _ in outbox.pending(records)]
+        assert outbox.mark_failed([keys[1]], 'HTTP 400', permanent=True) == [keys[1]]
+        outbox.mark_synced(records, [keys[0], keys[2]])
+        assert outbox.get_stats(3)['cursor'] == 3 and outbox.pending(records) == []
+
+        assert storage.clear_all_data()
+        storage.save_wakeup_record({'city': 'Cairo'})
+        records = storage.get_all_records()
+        reopened = SyncOutbox(state_file, 'tester')
+        assert [record['city'] for _, _, record in reopened.pending(records)] == ['Cairo']
+        stats = reopened.get_stats(1)
+        assert (stats['synced'], stats['pending'], stats['dead'], stats['cursor']) == (0, 1, 0, 0)
+
+        # 清除後追加到比原本更多筆：以 anchor 判斷游標前的記錄已不是同一批
+        for city in ('Quito', 'Perth', 'Tunis'):
+            storage.save_wakeup_record({'city': city})
+        outbox.reconcile(storage.get_all_records())
+        assert outbox.state_of(0, storage.get_all_records()[0]) == SYNC_PENDING
+        assert len(outbox.pending(storage.get_all_records())) == 4
+        storage.close()
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.text = json.dumps(body)
+
+    def json(self):
+        return self.body
+
+class LegacySaveRecordSession:
+    """舊版 save-record：不支援批次（把 {records: [...]} 當成缺少欄位的單筆記錄），缺少城市時返回 400"""
+
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append(json)
+        if not json.get('city'):
+            return FakeResponse(400, {'success': False, 'error': '缺少必要欄位：userDisplayName, city, country'})
+        return FakeResponse(200, {'success': True, 'id': json['idempotencyKey']})
+
+def test_batch_falls_back_to_single_records():
+    """測試批次 API 不可用時逐筆上傳，伺服器拒絕的記錄不再重送，補傳工作視為完成"""
+    try:
+        from firebase_sync import FirebaseSync
+    except ImportError as e:  # 缺少 requests
+        import pytest
+        pytest.skip(f"無法載入 firebase_sync: {e}")
+    from local_storage import LocalStorage
+    from sync_scheduler import TokenBucket
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        storage = LocalStorage(temp_dir)
+        for city in ('Tokyo', '', 'Lima'):
+            storage.save_wakeup_record({'city': city, 'country': 'X'})
+        sync = FirebaseSync(storage)
+        sync.session = LegacySaveRecordSession()
+        sync.rate_limiter = TokenBucket(1000, 1000)
+        try:
+            result = sync.sync_all_records()
+            assert (result['synced'], result['failed'], result['dead'], result['requests']) == (2, 0, 1, 1)
+            assert 'records' in sync.session.posts[0] and len(sync.session.posts) == 4
+            assert sync.outbox.get_stats(3)['dead'] == 1
+            assert sync._sync_backlog() and len(sync.session.posts) == 4
+        finally:
+            sync.stop()
+            storage.close()
+
+class OutageSession:
+    """伺服器暫時無法使用：所有請求返回 503"""
+
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append(json)
+        return FakeResponse(503, {'success': False, 'error': 'Service Unavailable'})
+
+def test_batch_fails_whole_on_server_error():
+    """測試伺服器錯誤時整批失敗等待重試，不改為逐筆上傳"""
+    try:
+        from firebase_sync import FirebaseSync
+    except ImportError as e:  # 缺少 requests
+        import pytest
+        pytest.skip(f"無法載入 firebase_sync: {e}")
+    from local_storage import LocalStorage
+    from sync_scheduler import TokenBucket
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        storage = LocalStorage(temp_dir)
+        for city in ('Tokyo', 'Osaka', 'Lima'):
+            storage.save_wakeup_record({'city': city, 'country': 'X'})
+        sync = FirebaseSync(storage)
+        sync.session = OutageSession()
+        sync.rate_limiter = TokenBucket(1000, 1000)
+        try:
+            result = sync.sync_all_records()
+            assert (result['synced'], result['failed'], result['dead']) == (0, 3, 0)
+            assert len(sync.session.posts) == 1
+            assert not sync._sync_backlog() and len(sync.session.posts) == 2
+            assert sync.outbox.get_stats(3)['pending'] == 3
+        finally:
+            sync.stop()
+            storage.close()
+
+if __name__ == "__main__":
+    print("🔧 測試同步佇列...")
+    test_cursor_and_resume()
+    print("✅ 游標推進與續傳正確")
+    test_dead_letter()
+    print("✅ 伺服器拒絕的記錄不再重送")
+    test_clear_then_append()
+    print("✅ 清除本地資料後同步進度重新開始")
+    test_batch_falls_back_to_single_records()
+    print("✅ 批次 API 不可用時逐筆上傳")
+    test_batch_fails_whole_on_server_error()
+    print("✅ 伺服器錯誤時整批等待重試")
+    print("\n🎉 同步佇列測試完成！")
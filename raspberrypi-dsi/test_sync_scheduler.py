@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試背景同步排程器：優先順序、合併重複工作、退避重試、重試上限、權杖桶限速
+"""
+
+import time
+import threading
+
+from sync_scheduler import SyncScheduler, TokenBucket, PRIORITY_LATEST, PRIORITY_BACKLOG
+
+def wait_idle(scheduler, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = scheduler.get_stats()
+        if not stats['queue_depth'] and not stats['running']:
+            return stats
+        time.sleep(0.02)
+    raise AssertionError(f"排程器未在時間內完成: {scheduler.get_stats()}")
+
+def test_priority_and_coalescing():
+    """測試最新記錄先於累積記錄執行，重複送入的工作只執行一次"""
+    scheduler = SyncScheduler(backoff_base=0.05, backoff_max=0.1)
+    order = []
+    scheduler.submit('backlog', lambda: order.append('backlog') or True, PRIORITY_BACKLOG)
+    assert not scheduler.submit('backlog', lambda: order.append('backlog') or True, PRIORITY_BACKLOG)
+    scheduler.submit('latest', lambda: order.append('latest') or True, PRIORITY_LATEST)
+    scheduler.start()
+    try:
+        stats = wait_idle(scheduler)
+        assert order == ['latest', 'backlog']
+        assert stats['coalesced'] == 1 and stats['succeeded'] == 2 and stats['last_success']
+    finally:
+        scheduler.stop()
+
+def test_backoff_retry():
+    """測試失敗與例外會退避後重試，期間不擋住其他工作"""
+    scheduler = SyncScheduler(backoff_base=0.1, backoff_max=0.2)
+    attempts = []
+    done = threading.Event()
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise TimeoutError('timeout')
+        return len(attempts) >= 3
+
+    scheduler.start()
+    try:
+        scheduler.submit('latest', flaky, PRIORITY_LATEST)
+        time.sleep(0.02)
+        scheduler.submit('other', lambda: done.set() or True, PRIORITY_BACKLOG)
+        assert done.wait(1) and len(attempts) == 1
+        stats = wait_idle(scheduler)
+        assert len(attempts) == 3 and stats['retries'] == 2 and stats['last_error'] == '同步失敗'
+        assert attempts[1] - attempts[0] >= 0.05 and attempts[2] - attempts[1] >= 0.1
+    finally:
+        scheduler.stop()
+
+def test_give_up_after_max_attempts():
+    """測試連續失敗達上限的工作放棄並回報，再次送入時重新開始"""
+    scheduler = SyncScheduler(backoff_base=0.01, backoff_max=0.02, max_attempts=3)
+    attempts = []
+    scheduler.submit('backlog', lambda: attempts.append(1) and False, PRIORITY_BACKLOG)
+    scheduler.start()
+    try:
+        stats = wait_idle(scheduler)
+        assert len(attempts) == 3 and stats['retries'] == 2 and stats['abandoned'] == 1
+        assert stats['abandoned_jobs']['backlog']['attempts'] == 3
+        assert stats['abandoned_jobs']['backlog']['error'] == '同步失敗'
+
+        scheduler.submit('backlog', lambda: True, PRIORITY_BACKLOG)
+        stats = wait_idle(scheduler)
+        assert stats['succeeded'] == 1 and stats['abandoned_jobs'] == {}
+    finally:
+        scheduler.stop()
+
+def test_token_bucket():
+    """測試權杖用完後依速率補充"""
+    bucket = TokenBucket(rate=20, burst=2)
+    start_time = time.monotonic()
+    for _ in range(4):
+        assert bucket.acquire()
+    assert 0.08 <= time.monotonic() - start_time < 0.5
+    assert not bucket.acquire(timeout=0)
+
+if __name__ == "__main__":
+    print("🔧 測試背景同步排程器...")
+    test_priority_and_coalescing()
+    print("✅ 優先順序與合併正確")
+    test_backoff_retry()
+    print("✅ 退避重試正確")
+    test_give_up_after_max_attempts()
+    print("✅ 重試上限正確")
+    test_token_bucket()
+    print("✅ 權杖桶限速正確")
+    print("\n🎉 同步排程器測試完成！")
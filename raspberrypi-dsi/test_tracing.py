@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試按鈕延遲追蹤：巢狀區段、跨執行緒與管線階段的追蹤傳遞、環形緩衝與 JSONL 保存、Chrome trace-event 匯出
+"""
+
+import json
+import tempfile
+import threading
+from pathlib import Path
+
+from tracing import Tracer, span, event, bind, traced
+from wakeup_pipeline import PipelineRunner, Stage
+
+def test_nested_spans_across_threads():
+    """測試區段巢狀關係，以及經由 bind 與管線階段傳到其他執行緒"""
+    tracer = Tracer(ring_size=2, jsonl_file='')
+    trace = tracer.start_trace('button_press')
+
+    @traced('story.api')
+    def fetch_story():
+        return 'story'
+
+    with trace.activate():
+        with span('web.start_day'):
+            pass
+        with span('stage.audio'):
+            thread = threading.Thread(target=bind(fetch_story))
+            thread.start()
+            thread.join()
+            event('audio.first_sample', once=True)
+            event('audio.first_sample', once=True)
+
+        runner = PipelineRunner(max_workers=2, name='test-tracing')
+        try:
+            run = runner.run('wakeup', [Stage('city', traced('stage.city')(lambda results: 'city'))])
+            run.result(timeout=5)
+        finally:
+            runner.stop()
+    assert tracer.current_trace() is None
+
+    tracer.finish(trace)
+    data = tracer.get(trace.trace_id)
+    spans = {record['name']: record for record in data['spans']}
+    assert set(spans) == {'web.start_day', 'stage.audio', 'story.api', 'stage.city'}
+    assert spans['story.api']['parent'] == spans['stage.audio']['id']
+    assert spans['stage.city']['parent'] is None
+    assert spans['stage.city']['thread'].startswith('test-tracing-worker')
+    assert [e['name'] for e in data['events']] == ['audio.first_sample']
+
+def test_jsonl_and_chrome_export():
+    """測試完成的追蹤寫入 JSONL、環形緩衝只保留最近幾次，並可匯出為 Chrome trace-event"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        jsonl_file = str(Path(temp_dir) / 'traces.jsonl')
+        tracer = Tracer(ring_size=2, jsonl_file=jsonl_file)
+        for i in range(3):
+            trace = tracer.start_trace('button_press', press=i)
+            trace.add_span('button.edge_to_callback', trace.start, trace.start + 0.002)
+            with trace.activate(), span('stage.city'):
+                event('audio.first_sample')
+            tracer.finish(trace, success=True)
+
+        assert [t['args']['press'] for t in tracer.recent()] == [1, 2]
+        lines = Path(jsonl_file).read_text(encoding='utf-8').splitlines()
+        assert len(lines) == 3 and json.loads(lines[0])['args'] == {'press': 0, 'success': True}
+
+        output = str(Path(temp_dir) / 'trace.json')
+        assert tracer.export_chrome_trace(output) == 2
+        events = json.loads(Path(output).read_text(encoding='utf-8'))['traceEvents']
+        complete = [e for e in events if e['ph'] == 'X']
+        assert len(complete) == 4 and {e['pid'] for e in events} == {1, 2}
+        edge = next(e for e in complete if e['name'] == 'button.edge_to_callback')
+        assert abs(edge['dur'] - 2000) < 1
+        assert sum(1 for e in events if e['ph'] == 'i') == 2
+
+if __name__ == "__main__":
+    print("🔧 測試按鈕延遲追蹤...")
+    test_nested_spans_across_threads()
+    print("✅ 巢狀區段與跨執行緒傳遞正確")
+    test_jsonl_and_chrome_export()
+    print("✅ JSONL 保存與 Chrome trace-event 匯出正確")
+    print("\n🎉 按鈕延遲追蹤測試完成！")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試 TTS 音頻快取：鍵的組成、LRU 淘汰、寫入中斷、索引持久化
+"""
+
+import time
+import tempfile
+
+from tts_cache import TTSCache, make_cache_key
+
+def test_cache_key():
+    """測試任何合成參數不同都會得到不同的鍵"""
+    base = make_cache_key("早安", 'nova', 'tts-1', 1.0, 'mp3')
+    assert base == make_cache_key("早安", 'nova', 'tts-1', 1, 'mp3')
+    for variant in [("早安！", 'nova', 'tts-1', 1.0, 'mp3'), ("早安", 'alloy', 'tts-1', 1.0, 'mp3'),
+                    ("早安", 'nova', 'tts-1-hd', 1.0, 'mp3'), ("早安", 'nova', 'tts-1', 0.9, 'mp3'),
+                    ("早安", 'nova', 'tts-1', 1.0, 'wav')]:
+        assert make_cache_key(*variant) != base
+
+def test_lru_eviction_under_budget():
+    """測試超過容量時淘汰最久未使用的項目，剛寫入的項目保留"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = TTSCache(temp_dir, max_bytes=250)
+        for name in ('a', 'b'):
+            cache.put_bytes(name * 64, b'x' * 100, 'mp3')
+            time.sleep(0.01)
+        assert cache.get('a' * 64)  # a 變成最近使用
+
+        cache.put_bytes('c' * 64, b'x' * 100, 'mp3')
+        assert cache.get('b' * 64) is None
+        assert cache.get('a' * 64) and cache.get('c' * 64)
+        assert cache.stats()['bytes'] == 200
+
+        # 單一項目超過容量時仍保留剛寫入的項目
+        cache.put_bytes('d' * 64, b'x' * 300, 'mp3')
+        assert cache.get('d' * 64) and cache.stats()['entries'] == 1
+        cache.close()
+
+def test_writer_and_persistence():
+    """測試寫入中斷時不留下快取，以及重新開啟後索引仍在"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = TTSCache(temp_dir, max_bytes=10000)
+        key = make_cache_key("早安", 'nova', 'tts-1', 1.0, 'mp3')
+        try:
+            with cache.writer(key, 'mp3') as f:
+                f.write(b'partial')
+                raise ConnectionError('串流中斷')
+        except ConnectionError:
+            pass
+        assert cache.get(key) is None
+        assert not list(cache.temp_dir.iterdir())
+
+        with cache.writer(key, 'mp3', 'nova', "早安") as f:
+            f.write(b'complete')
+        cache.close()
+
+        reopened = TTSCache(temp_dir, max_bytes=10000)
+        audio_file = reopened.get(key)
+        assert audio_file and audio_file.read_bytes() == b'complete'
+        assert reopened.stats()['bytes'] == len(b'complete')
+
+        # 文件被外部刪除時自動移除索引
+        audio_file.unlink()
+        assert reopened.get(key) is None and reopened.stats()['entries'] == 0
+        reopened.close()
+
+if __name__ == "__main__":
+    print("🔧 測試 TTS 音頻快取...")
+    test_cache_key()
+    print("✅ 快取鍵包含所有合成參數")
+    test_lru_eviction_under_budget()
+    print("✅ LRU 淘汰正確")
+    test_writer_and_persistence()
+    print("✅ 寫入中斷與索引持久化正確")
+    print("\n🎉 TTS 快取測試完成！")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試分句並行 TTS 管線：中英文分句、依序輸出
+"""
+
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from tts_pipeline import split_sentences, TTSPipeline
+
+def test_split_sentences():
+    """測試中日文與英文標點分句，小數點與縮寫不切開"""
+    text = "Bonjour ! Il est 8.30 à Paris. 早安！今天你在巴黎醒來。塞納河上的薄霧慢慢散去？"
+    assert split_sentences(text, min_chars=0) == [
+        'Bonjour !', 'Il est 8.30 à Paris.', '早安！', '今天你在巴黎醒來。', '塞納河上的薄霧慢慢散去？'
+    ]
+    # 過短的句子併入下一句，但第一句保持獨立
+    assert split_sentences("早安！好。今天你在巴黎醒來。", min_chars=5) == ['早安！', '好。今天你在巴黎醒來。']
+    # 過長的句子以逗號切分
+    long_sentence = "，".join(["塞納河上的薄霧慢慢散去"] * 6) + "。"
+    chunks = split_sentences(long_sentence, min_chars=0, max_chars=30)
+    assert len(chunks) > 1 and all(len(chunk) <= 30 for chunk in chunks)
+    assert "".join(chunks) == long_sentence
+
+def test_pipeline_keeps_order():
+    """測試並行合成完成順序不同時，輸出仍依原文順序"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        def synthesize(chunk):
+            time.sleep(random.uniform(0, 0.05))
+            chunk_file = Path(temp_dir) / f"{abs(hash(chunk))}.mp3"
+            chunk_file.write_bytes(chunk.encode('utf-8'))
+            return chunk_file
+
+        text = "早安！今天你在巴黎醒來。塞納河上的薄霧慢慢散去。麵包店飄出剛出爐的可頌香氣。"
+        played = []
+        output_file = Path(temp_dir) / 'full.mp3'
+        result = TTSPipeline(synthesize, max_workers=3).play(
+            text, play_file=lambda chunk_file: played.append(chunk_file.read_text('utf-8')) is None,
+            output_file=output_file
+        )
+        assert result['success'] and result['first_audio'] <= result['total']
+        assert "".join(played) == text.replace(' ', '')
+        assert output_file.read_text('utf-8') == "".join(played)
+
+if __name__ == "__main__":
+    print("🔧 測試分句並行 TTS 管線...")
+    test_split_sentences()
+    print("✅ 分句正確")
+    test_pipeline_keeps_order()
+    print("✅ 並行合成依序播放")
+    print("\n🎉 TTS 管線測試完成！")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試甦醒流程管線：相依順序、並行、失敗略過與備援階段、取消、關鍵路徑
+"""
+
+import time
+import threading
+import concurrent.futures
+
+from wakeup_pipeline import PipelineRunner, Stage, STAGE_DONE, STAGE_FAILED, STAGE_SKIPPED
+
+def sleeper(seconds, value=None):
+    def run(results):
+        time.sleep(seconds)
+        return value
+    return run
+
+def test_dependencies_and_concurrency():
+    """測試階段依相依順序執行、獨立階段並行，並找出關鍵路徑"""
+    runner = PipelineRunner(max_workers=4)
+    try:
+        run = runner.run('test', [
+            Stage('city', sleeper(0.05, 'Tokyo')),
+            Stage('upload', sleeper(0.1), deps=['city']),
+            Stage('audio', sleeper(0.3, 'audio.mp3'), deps=['city']),
+            Stage('play', lambda results: (results['city'], results['audio']), deps=['city', 'upload', 'audio']),
+        ])
+        results = run.result(timeout=5)
+        trace = run.trace()
+        assert results['play'] == ('Tokyo', 'audio.mp3')
+        # upload 與 audio 並行：總時間接近 city + audio，而不是三者相加
+        assert trace['total_ms'] < 420
+        stages = trace['stages']
+        assert stages['upload']['start'] < stages['audio']['end']
+        assert stages['play']['start'] >= stages['audio']['end']
+        assert trace['critical_path'] == ['city', 'audio', 'play']
+    finally:
+        runner.stop()
+
+def test_failure_skips_dependents():
+    """測試失敗階段的後續階段被略過，always 階段仍執行"""
+    runner = PipelineRunner(max_workers=2)
+
+    def fail(results):
+        raise RuntimeError('API 失敗')
+
+    try:
+        run = runner.run('test', [
+            Stage('story', fail),
+            Stage('inject', sleeper(0), deps=['story']),
+            Stage('play', lambda results: sorted(results), deps=['story', 'inject'], always=True),
+        ])
+        results = run.result(timeout=5)
+        stages = run.trace()['stages']
+        assert stages['story']['status'] == STAGE_FAILED and 'API' in stages['story']['error']
+        assert stages['inject']['status'] == STAGE_SKIPPED
+        assert stages['play']['status'] == STAGE_DONE
+        assert results == {'play': []}
+    finally:
+        runner.stop()
+
+def test_cancel():
+    """測試取消後尚未開始的階段不會執行"""
+    runner = PipelineRunner(max_workers=2)
+    started = threading.Event()
+    played = []
+    try:
+        run = runner.run('test', [
+            Stage('city', lambda results: started.set() or time.sleep(0.2)),
+            Stage('play', lambda results: played.append(True), deps=['city']),
+        ])
+        assert started.wait(2)
+        assert run.cancel()
+        try:
+            run.result(timeout=2)
+            assert False, "應該被取消"
+        except concurrent.futures.CancelledError:
+            pass
+        time.sleep(0.3)
+        assert not played
+    finally:
+        runner.stop()
+
+if __name__ == "__main__":
+    print("🔧 測試甦醒流程管線...")
+    test_dependencies_and_concurrency()
+    print("✅ 相依順序、並行與關鍵路徑正確")
+    test_failure_skips_dependents()
+    print("✅ 失敗略過與備援階段正確")
+    test_cancel()
+    print("✅ 取消正確")
+    print("\n🎉 甦醒流程管線測試完成！")
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+按鈕延遲追蹤
+每次按鈕一個追蹤（trace ID），以巢狀區段記錄各步驟耗時；完成的追蹤保存在記憶體環形緩衝並追加到 JSONL 文件，
+可匯出為 Chrome trace-event 格式（chrome://tracing 或 Perfetto 開啟），找出按鈕到出聲之間最慢的步驟
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Any, List, Optional
+
+from config import TRACING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 目前執行緒（或 asyncio 任務）所在的 (追蹤, 區段 ID)
+_current = contextvars.ContextVar('wakeup_trace', default=None)
+
+# 以單調時鐘推算的牆上時間，不受 NTP 校時跳動影響，各執行緒的時間可以直接比較
+_WALL0 = time.time()
+_PERF0 = time.perf_counter()
+
+
+def now() -> float:
+    """目前時間（秒，Unix 時間）"""
+    return _WALL0 + (time.perf_counter() - _PERF0)
+
+
+class Trace:
+    """一次按鈕的追蹤（可跨執行緒記錄區段）"""
+
+    def __init__(self, name: str, start: float = None, trace_id: str = None, **args):
+        """
+        Args:
+            name: 追蹤名稱
+            start: 開始時間（例如按鈕邊緣的時間），預設為現在
+            trace_id: 追蹤 ID，預設自動產生
+            args: 附加資訊
+        """
+        self.trace_id = trace_id or uuid.uuid4().hex[:12]
+        self.name = name
+        self.start = start if start is not None else now()
+        self.end = None
+        self.args = args
+        self.spans: List[Dict[str, Any]] = []
+        self.events: List[Dict[str, Any]] = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _new_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    @contextmanager
+    def activate(self):
+        """讓之後的 span()/event() 記錄到這個追蹤（離開時恢復原本的追蹤）"""
+        token = _current.set((self, None))
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """記錄一個區段，區段內開始的區段成為子區段"""
+        current = _current.get()
+        parent = current[1] if current and current[0] is self else None
+        span_id = self._new_id()
+        record = {'id': span_id, 'parent': parent, 'name': name, 'start': now(), 'end': None,
+                  'thread': threading.current_thread().name, 'args': args}
+        token = _current.set((self, span_id))
+        try:
+            yield record
+        except BaseException as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            record['end'] = now()
+            with self._lock:
+                self.spans.append(record)
+
+    def add_span(self, name: str, start: float, end: float, **args) -> Dict[str, Any]:
+        """加入已量好起訖時間的區段（例如按鈕邊緣到回調）"""
+        record = {'id': self._new_id(), 'parent': None, 'name': name, 'start': start, 'end': end,
+                  'thread': threading.current_thread().name, 'args': args}
+        with self._lock:
+            self.spans.append(record)
+        return record
+
+    def event(self, name: str, once: bool = False, **args) -> bool:
+        """
+        記錄瞬間事件（例如第一個音頻樣本送出）
+
+        Args:
+            once: 同名事件只記錄第一次
+
+        Returns:
+            bool: 是否已記錄
+        """
+        record = {'name': name, 'time': now(), 'thread': threading.current_thread().name, 'args': args}
+        with self._lock:
+            if once and any(e['name'] == name for e in self.events):
+                return False
+            self.events.append(record)
+        return True
+
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else now()
+        return (end - self.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'trace_id': self.trace_id,
+                'name': self.name,
+                'start': self.start,
+                'end': self.end,
+                'duration_ms': self.duration_ms(),
+                'args': dict(self.args),
+                'spans': sorted((dict(s) for s in self.spans), key=lambda s: s['start']),
+                'events': [dict(e) for e in self.events],
+            }
+
+
+class Tracer:
+    """追蹤的建立、環形緩衝與 JSONL 保存"""
+
+    def __init__(self, ring_size: int = None, jsonl_file: str = None, enabled: bool = None):
+        """
+        Args:
+            ring_size: 記憶體中保留的追蹤數
+            jsonl_file: 完成的追蹤追加寫入的文件，空值表示不寫入
+            enabled: 停用時 start_trace 仍返回追蹤，但不保存
+        """
+        self.logger = logging.getLogger(__name__)
+        self.enabled = TRACING_CONFIG['enabled'] if enabled is None else enabled
+        self.jsonl_file = TRACING_CONFIG['jsonl_file'] if jsonl_file is None else jsonl_file
+        self.traces = deque(maxlen=ring_size or TRACING_CONFIG['ring_size'])
+        self._lock = threading.Lock()
+
+    def start_trace(self, name: str, start: float = None, **args) -> Trace:
+        """建立追蹤（需以 trace.activate() 設為目前的追蹤）"""
+        return Trace(name, start=start, **args)
+
+    def current_trace(self) -> Optional[Trace]:
+        current = _current.get()
+        return current[0] if current else None
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """在目前的追蹤中記錄區段；沒有追蹤時不記錄"""
+        trace = self.current_trace()
+        if trace is None:
+            yield None
+            return
+        with trace.span(name, **args) as record:
+            yield record
+
+    def event(self, name: str, once: bool = False, **args) -> bool:
+        """在目前的追蹤中記錄瞬間事件"""
+        trace = self.current_trace()
+        return trace.event(name, once=once, **args) if trace else False
+
+    def finish(self, trace: Trace, **args):
+        """結束追蹤：記錄結束時間、放入環形緩衝、追加到 JSONL 並記錄摘要"""
+        if trace.end is not None:
+            return
+        trace.end = now()
+        trace.args.update(args)
+        if not self.enabled:
+            return
+        data = trace.to_dict()
+        with self._lock:
+            self.traces.append(data)
+            if self.jsonl_file:
+                try:
+                    os.makedirs(os.path.dirname(self.jsonl_file) or '.', exist_ok=True)
+                    with open(self.jsonl_file, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(data, ensure_ascii=False) + '\n')
+                except OSError as e:
+                    self.logger.warning(f"⚠️ 追蹤寫入失敗: {e}")
+        self.logger.info(format_summary(data))
+
+    def recent(self, count: int = None) -> List[Dict[str, Any]]:
+        """最近完成的追蹤（舊到新）"""
+        with self._lock:
+            traces = list(self.traces)
+        return traces[-count:] if count else traces
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((t for t in self.traces if t['trace_id'] == trace_id), None)
+
+    def export_chrome_trace(self, path: str, count: int = None) -> int:
+        """
+        將最近的追蹤匯出為 Chrome trace-event JSON
+
+        Returns:
+            int: 匯出的追蹤數
+        """
+        traces = self.recent(count)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(to_chrome_trace(traces), f, ensure_ascii=False)
+        return len(traces)
+
+
+def span(name: str, **args):
+    """在目前的追蹤中記錄區段（get_tracer().span 的簡寫）"""
+    return get_tracer().span(name, **args)
+
+
+def event(name: str, once: bool = False, **args) -> bool:
+    """在目前的追蹤中記錄瞬間事件"""
+    return get_tracer().event(name, once=once, **args)
+
+
+def current_trace() -> Optional[Trace]:
+    current = _current.get()
+    return current[0] if current else None
+
+
+def traced(name: str) -> Callable:
+    """裝飾器：以區段記錄函數的執行"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def bind(func: Callable) -> Callable:
+    """
+    綁定目前的追蹤與區段，交給其他執行緒（例如執行緒池）執行時區段仍掛在原本的位置
+
+    每次呼叫各自設定 context，可在多個執行緒同時呼叫。
+    """
+    captured = _current.get()
+    if captured is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current.set(captured)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+
+def format_summary(trace: Dict[str, Any]) -> str:
+    """追蹤轉為日誌文字（依開始時間列出區段，縮排表示巢狀）"""
+    lines = [f"🧭 追蹤 {trace['name']} [{trace['trace_id']}] 總耗時 {trace['duration_ms']:.0f} ms"]
+    depth = {}
+    for record in trace['spans']:
+        depth[record['id']] = depth.get(record['parent'], -1) + 1 if record['parent'] else 0
+        offset = (record['start'] - trace['start']) * 1000
+        duration = (record['end'] - record['start']) * 1000
+        error = ' ❌' if record.get('error') else ''
+        lines.append(f"   {'  ' * depth[record['id']]}{record['name']:<28} +{offset:>7.0f} ms {duration:>7.0f} ms{error}")
+    for record in trace['events']:
+        lines.append(f"   ◆ {record['name']:<28} +{(record['time'] - trace['start']) * 1000:>7.0f} ms")
+    return '\n'.join(lines)
+
+
+def to_chrome_trace(traces: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    轉為 Chrome trace-event 格式：每個追蹤一個 process，執行緒各自一列，
+    區段為完整事件（ph X），瞬間事件為 ph i；時間單位為微秒
+    """
+    events = []
+    for pid, trace in enumerate(traces, start=1):
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                       'args': {'name': f"{trace['name']} {trace['trace_id']}"}})
+        threads = {}
+
+        def tid_for(thread_name):
+            if thread_name not in threads:
+                threads[thread_name] = len(threads) + 1
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': threads[thread_name],
+                               'args': {'name': thread_name}})
+            return threads[thread_name]
+
+        for record in trace['spans']:
+            args = dict(record.get('args') or {})
+            if record.get('error'):
+                args['error'] = record['error']
+            events.append({'name': record['name'], 'cat': trace['name'], 'ph': 'X', 'pid': pid,
+                           'tid': tid_for(record['thread']), 'ts': record['start'] * 1e6,
+                           'dur': (record['end'] - record['start']) * 1e6, 'args': args})
+        for record in trace['events']:
+            events.append({'name': record['name'], 'cat': trace['name'], 'ph': 'i', 's': 'p', 'pid': pid,
+                           'tid': tid_for(record['thread']), 'ts': record['time'] * 1e6,
+                           'args': record.get('args') or {}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def load_traces(jsonl_file: str, count: int = None) -> List[Dict[str, Any]]:
+    """讀取 JSONL 文件中的追蹤（略過損壞的行）"""
+    traces = []
+    try:
+        with open(jsonl_file, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    traces.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        return []
+    return traces[-count:] if count else traces
+
+
+# 全域追蹤器實例
+tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer() -> Tracer:
+    """獲取追蹤器實例"""
+    global tracer
+    with _tracer_lock:
+        if tracer is None:
+            tracer = Tracer()
+        return tracer
+
+
+# 匯出工具：python3 tracing.py [輸出文件] [最近幾次]
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+
+    output = sys.argv[1] if len(sys.argv) > 1 else 'wakeup-trace.json'
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    traces = load_traces(TRACING_CONFIG['jsonl_file'], count)
+    if not traces:
+        print(f"沒有追蹤記錄: {TRACING_CONFIG['jsonl_file']}")
+        raise SystemExit(1)
+
+    for trace in traces:
+        print(format_summary(trace))
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(to_chrome_trace(traces), f, ensure_ascii=False)
+    print(f"\n📊 已匯出 {len(traces)} 次按鈕到 {output}（以 chrome://tracing 或 ui.perfetto.dev 開啟）")
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - TTS 音頻快取
+以 (文字, 語音, 模型, 語速, 格式) 為鍵的內容定址快取，
+SQLite 索引記錄大小與最後使用時間，超過容量時依 LRU 淘汰
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Iterator
+
+from config import TTS_CONFIG, AUDIO_FILES
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.sqlite3'
+
+# 舊版快取的檔名格式，建立新索引時一併清除
+LEGACY_PATTERNS = ['greeting_*', 'openai_direct_*', 'nova_*', 'tts_chunk_*']
+
+
+def make_cache_key(text: str, voice: str, model: str, speed: float, audio_format: str) -> str:
+    """由合成參數計算快取鍵"""
+    payload = json.dumps([text, voice, model, float(speed), audio_format], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TTSCache:
+    """內容定址的 TTS 音頻快取"""
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        """
+        Args:
+            cache_dir: 快取目錄
+            max_bytes: 快取容量上限（位元組）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = Path(cache_dir or TTS_CONFIG['cache_dir'])
+        self.max_bytes = max_bytes if max_bytes is not None else TTS_CONFIG['cache_max_bytes']
+        self.objects_dir = self.cache_dir / 'objects'
+        self.hits = 0
+        self.misses = 0
+        self.temp_dir = self.cache_dir / 'tmp'
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+
+        index_file = self.cache_dir / INDEX_FILE
+        is_new_index = not index_file.exists()
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(index_file), check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                format TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                voice TEXT,
+                preview TEXT,
+                pinned INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(entries)')]
+        if 'pinned' not in columns:
+            self._db.execute('ALTER TABLE entries ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0')
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self.total_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+        if is_new_index:
+            self._remove_legacy_files()
+        self._clear_temp_files()
+
+    def path_for(self, key: str, audio_format: str) -> Path:
+        """快取文件位置（以鍵的前兩碼分目錄）"""
+        return self.objects_dir / key[:2] / f"{key}.{audio_format}"
+
+    def get(self, key: str) -> Optional[Path]:
+        """取得快取文件並更新使用時間；文件已不存在時移除索引"""
+        with self._lock:
+            row = self._db.execute('SELECT format FROM entries WHERE key = ?', (key,)).fetchone()
+            if not row:
+                self.misses += 1
+                return None
+            path = self.path_for(key, row[0])
+            if not path.exists():
+                self._delete_locked(key, row[0])
+                self.misses += 1
+                return None
+            self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+            self.hits += 1
+            return path
+
+    def temp_path(self, suffix: str = '') -> Path:
+        """在快取所在的檔案系統建立暫存檔路徑（之後以 put_file 原子搬入）"""
+        fd, name = tempfile.mkstemp(dir=str(self.temp_dir), suffix=suffix)
+        os.close(fd)
+        return Path(name)
+
+    def put_file(self, key: str, source: Path, audio_format: str, voice: str = None, text: str = None,
+                 pinned: bool = False) -> Path:
+        """
+        將已完成的文件原子搬入快取
+
+        Args:
+            key: 快取鍵
+            source: 來源文件（應與快取在同一個檔案系統，例如 temp_path()）
+            audio_format: 音頻格式（mp3 / wav）
+            voice: 語音（記錄用）
+            text: 原始文字（只保存開頭，方便檢查）
+            pinned: 固定在快取中，不會被淘汰（覆寫已固定的項目時保持固定）
+
+        Returns:
+            Path: 快取中的文件
+        """
+        path = self.path_for(key, audio_format)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        size = Path(source).stat().st_size
+        now = time.time()
+
+        with self._lock:
+            old = self._db.execute('SELECT size, pinned FROM entries WHERE key = ?', (key,)).fetchone()
+            os.replace(str(source), str(path))
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries (key, format, size, created, accessed, voice, preview, pinned) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, audio_format, size, now, now, voice, (text or '')[:40], int(pinned or bool(old and old[1])))
+            )
+            self.total_bytes += size - (old[0] if old else 0)
+            self._evict_locked(keep=key)
+        return path
+
+    def put_bytes(self, key: str, data: bytes, audio_format: str, voice: str = None, text: str = None) -> Path:
+        """寫入位元組資料到快取"""
+        with self.writer(key, audio_format, voice, text) as f:
+            f.write(data)
+        return self.path_for(key, audio_format)
+
+    @contextmanager
+    def writer(self, key: str, audio_format: str, voice: str = None, text: str = None) -> Iterator:
+        """
+        逐段寫入快取（例如串流下載），正常結束才加入快取，發生例外時丟棄
+
+        用法:
+            with cache.writer(key, 'mp3') as f:
+                for chunk in response.iter_bytes():
+                    f.write(chunk)
+        """
+        temp_file = self.temp_path(f'.{audio_format}')
+        try:
+            with open(temp_file, 'wb') as f:
+                yield f
+            if temp_file.stat().st_size == 0:
+                raise ValueError('快取內容為空')
+            self.put_file(key, temp_file, audio_format, voice, text)
+        except BaseException:
+            temp_file.unlink(missing_ok=True)
+            raise
+
+    def pin(self, key: str, pinned: bool = True) -> bool:
+        """固定或取消固定快取項目，項目不存在時返回 False"""
+        with self._lock:
+            cursor = self._db.execute('UPDATE entries SET pinned = ? WHERE key = ?', (int(pinned), key))
+            return cursor.rowcount > 0
+
+    def discard(self, key: str):
+        """移除單一快取項目"""
+        with self._lock:
+            row = self._db.execute('SELECT format FROM entries WHERE key = ?', (key,)).fetchone()
+            if row:
+                self._delete_locked(key, row[0])
+
+    def evict(self, max_bytes: int = None) -> int:
+        """依 LRU 淘汰到容量以內，返回淘汰的項目數"""
+        with self._lock:
+            return self._evict_locked(max_bytes)
+
+    def purge_expired(self, max_age: float = None) -> int:
+        """移除超過 max_age 秒未使用且未固定的項目（只查索引，不逐一 stat 文件）"""
+        max_age = AUDIO_FILES['cache_timeout'] if max_age is None else max_age
+        with self._lock:
+            rows = self._db.execute('SELECT key, format FROM entries WHERE accessed < ? AND pinned = 0',
+                                    (time.time() - max_age,)).fetchall()
+            for key, audio_format in rows:
+                self._delete_locked(key, audio_format)
+        if rows:
+            self.logger.info(f"🧹 移除 {len(rows)} 個過期的 TTS 快取")
+        return len(rows)
+
+    def verify(self) -> Dict[str, int]:
+        """比對索引與實際文件：移除遺失文件的索引與不在索引中的文件"""
+        missing = orphans = 0
+        with self._lock:
+            known = set()
+            for key, audio_format in self._db.execute('SELECT key, format FROM entries').fetchall():
+                if self.path_for(key, audio_format).exists():
+                    known.add(f"{key}.{audio_format}")
+                else:
+                    self._delete_locked(key, audio_format)
+                    missing += 1
+            for path in self.objects_dir.glob('*/*'):
+                if path.name not in known:
+                    path.unlink(missing_ok=True)
+                    orphans += 1
+            self.total_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        return {'missing': missing, 'orphans': orphans}
+
+    def stats(self) -> Dict[str, Any]:
+        """快取統計"""
+        with self._lock:
+            count = self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return {'entries': count, 'bytes': self.total_bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _evict_locked(self, max_bytes: int = None, keep: str = None) -> int:
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        evicted = 0
+        while self.total_bytes > max_bytes:
+            # 剛寫入與固定的項目不淘汰
+            row = self._db.execute('SELECT key, format FROM entries WHERE key != ? AND pinned = 0 '
+                                   'ORDER BY accessed LIMIT 1', (keep or '',)).fetchone()
+            if not row:
+                break
+            self._delete_locked(*row)
+            evicted += 1
+        if evicted:
+            self.logger.info(f"🧹 TTS 快取超過容量，淘汰 {evicted} 個最久未使用的項目")
+        return evicted
+
+    def _delete_locked(self, key: str, audio_format: str):
+        row = self._db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+        if row:
+            self.total_bytes -= row[0]
+        self.path_for(key, audio_format).unlink(missing_ok=True)
+
+    def _remove_legacy_files(self):
+        removed = 0
+        for pattern in LEGACY_PATTERNS:
+            for path in self.cache_dir.glob(pattern):
+                path.unlink(missing_ok=True)
+                removed += 1
+        if removed:
+            self.logger.info(f"🧹 已清除 {removed} 個舊版快取文件")
+
+    def _clear_temp_files(self):
+        """清除上次中斷時留下的暫存檔（保留一小時內的，可能屬於其他程序）"""
+        cutoff = time.time() - 3600
+        for path in self.temp_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+
+# 全域快取實例
+tts_cache = None
+_tts_cache_lock = threading.Lock()
+
+def get_tts_cache() -> TTSCache:
+    """獲取 TTS 快取實例"""
+    global tts_cache
+    if tts_cache is None:
+        with _tts_cache_lock:
+            if tts_cache is None:
+                tts_cache = TTSCache()
+    return tts_cache
+
+
+# 測試程式
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    cache = get_tts_cache()
+    if command == 'verify':
+        print(f"✓ 檢查完成: {cache.verify()}")
+    elif command == 'evict':
+        print(f"✓ 過期 {cache.purge_expired()} 個，淘汰 {cache.evict()} 個")
+    stats = cache.stats()
+    print(f"TTS 快取: {stats['entries']} 個項目, {stats['bytes'] / 1024 / 1024:.1f} MB / "
+          f"{stats['max_bytes'] / 1024 / 1024:.0f} MB ({cache.cache_dir})")
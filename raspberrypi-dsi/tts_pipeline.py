@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 分句並行 TTS 管線
+將「問候語。故事」依句子切開，以有限的執行緒並行合成，
+第一句完成就開始播放，後續句子依序送進同一個播放器，句子之間不中斷
+"""
+
+import re
+import sys
+import time
+import logging
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Dict, Any, List, Callable
+
+from config import TTS_PIPELINE_CONFIG
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# 句子結尾：中日文標點直接切開；英文標點需後接空白（避免切開 3.5 或 U.S.A）
+SENTENCE_BOUNDARY = re.compile(r'(?<=[。！？；…])|(?<=[.!?;])(?=\s)|\n+')
+# 過長句子的次要切分點（逗號、頓號）
+CLAUSE_BOUNDARY = re.compile(r'(?<=[，、,：:])')
+
+
+def split_sentences(text: str, min_chars: int = None, max_chars: int = None) -> List[str]:
+    """
+    依句子切分文字
+
+    Args:
+        text: 要切分的文字
+        min_chars: 短於此長度的句子併入下一句（減少請求數）
+        max_chars: 長於此長度的句子再以逗號切分
+
+    Returns:
+        List[str]: 依原始順序的句子
+    """
+    min_chars = TTS_PIPELINE_CONFIG['min_chars'] if min_chars is None else min_chars
+    max_chars = TTS_PIPELINE_CONFIG['max_chars'] if max_chars is None else max_chars
+
+    pieces = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+
+        # 過長句子以逗號切分，再把片段合併到不超過 max_chars
+        current = ''
+        for clause in CLAUSE_BOUNDARY.split(sentence):
+            if current and len(current) + len(clause) > max_chars:
+                pieces.append(current.strip())
+                current = ''
+            current += clause
+        if current.strip():
+            pieces.append(current.strip())
+
+    # 合併過短的句子（第一句除外：越短越快開始播放）
+    chunks = []
+    for piece in pieces:
+        if len(chunks) > 1 and len(chunks[-1]) < min_chars:
+            chunks[-1] = f"{chunks[-1]} {piece}" if chunks[-1][-1].isascii() else chunks[-1] + piece
+        else:
+            chunks.append(piece)
+    if len(chunks) > 2 and len(chunks[-1]) < min_chars:
+        tail = chunks.pop()
+        chunks[-1] = f"{chunks[-1]} {tail}" if chunks[-1][-1].isascii() else chunks[-1] + tail
+    return chunks
+
+
+class TTSPipeline:
+    """分句並行合成，依序播放"""
+
+    def __init__(self, synthesize: Callable[[str], Optional[Path]], max_workers: int = None):
+        """
+        Args:
+            synthesize: 合成單一句子並返回 MP3 文件的函數（應自行處理快取）
+            max_workers: 同時進行的合成請求數
+        """
+        self.synthesize = synthesize
+        self.max_workers = max_workers or TTS_PIPELINE_CONFIG['max_workers']
+        self.logger = logging.getLogger(__name__)
+
+    def submit(self, executor: ThreadPoolExecutor, text: str) -> List[Future]:
+        """切分文字並依序提交合成工作"""
+        chunks = split_sentences(text)
+        self.logger.info(f"✂️ 分句合成: {len(chunks)} 段 (並行 {self.max_workers})")
+        return [executor.submit(self.synthesize, chunk) for chunk in chunks]
+
+    def render(self, text: str, output_file: Path) -> Optional[Path]:
+        """並行合成所有句子並合併為單一 MP3 文件（不播放）"""
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='tts') as executor:
+            futures = self.submit(executor, text)
+            chunk_files = [future.result() for future in futures]
+
+        if not all(chunk_files):
+            self.logger.error("部分句子合成失敗")
+            return None
+        self._concatenate(chunk_files, output_file)
+        return output_file
+
+    def play(self, text: str, player_cmd: Optional[List[str]] = None,
+             play_file: Optional[Callable[[Path], bool]] = None,
+             output_file: Optional[Path] = None) -> Dict[str, Any]:
+        """
+        並行合成並依序播放
+
+        Args:
+            text: 要播放的文字
+            player_cmd: 從標準輸入讀取 MP3 的播放器指令（所有句子送進同一個播放器，無間隙）
+            play_file: 沒有串流播放器時逐檔播放的函數
+            output_file: 全部完成後合併保存的 MP3 文件（可選）
+
+        Returns:
+            Dict: success, first_audio（秒）, total（秒）, chunks
+        """
+        start_time = time.time()
+        result = {'success': False, 'first_audio': None, 'total': None, 'chunks': 0}
+        player = None
+        chunk_files = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='tts') as executor:
+            futures = self.submit(executor, text)
+            result['chunks'] = len(futures)
+            try:
+                if player_cmd:
+                    player = subprocess.Popen(player_cmd, stdin=subprocess.PIPE,
+                                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+                for i, future in enumerate(futures):
+                    chunk_file = future.result()
+                    if not chunk_file:
+                        self.logger.error(f"第 {i + 1} 段合成失敗，停止播放")
+                        for pending in futures[i + 1:]:
+                            pending.cancel()
+                        break
+                    chunk_files.append(chunk_file)
+
+                    if result['first_audio'] is None:
+                        result['first_audio'] = time.time() - start_time
+                        self.logger.info(f"⏱️ 第一段音頻就緒: {result['first_audio'] * 1000:.0f}ms")
+
+                    if player:
+                        player.stdin.write(chunk_file.read_bytes())
+                        player.stdin.flush()
+                    elif play_file and not play_file(chunk_file):
+                        break
+
+                if player:
+                    player.stdin.close()
+                    result['success'] = player.wait() == 0 and len(chunk_files) == len(futures)
+                else:
+                    result['success'] = len(chunk_files) == len(futures)
+
+            except Exception as e:
+                self.logger.error(f"分句播放失敗: {e}")
+                if player:
+                    player.kill()
+                    player.wait()
+
+        result['total'] = time.time() - start_time
+        if output_file and len(chunk_files) == result['chunks']:
+            self._concatenate(chunk_files, output_file)
+        self.logger.info(f"✅ 分句播放完成: {len(chunk_files)}/{result['chunks']} 段 (總耗時: {result['total']:.1f}秒)")
+        return result
+
+    def _concatenate(self, chunk_files: List[Path], output_file: Path):
+        """MP3 可直接串接；先寫入暫存檔再替換"""
+        temp_file = output_file.with_suffix('.part')
+        with span('audio.transcode', tool='concat', chunks=len(chunk_files)):
+            with open(temp_file, 'wb') as f:
+                for chunk_file in chunk_files:
+                    f.write(chunk_file.read_bytes())
+            temp_file.replace(output_file)
+
+
+def run_benchmark(text: str, rounds: int = 1, simulate: bool = False) -> List[Dict[str, Any]]:
+    """
+    比較單次合成與分句並行合成的首段音頻時間與總時間
+
+    Args:
+        text: 測試文字
+        rounds: 執行次數
+        simulate: 以固定延遲模型代替 OpenAI（每次請求 0.4 秒 + 每字 15ms），不需要 API 金鑰
+    """
+    import tempfile
+
+    created_files = []
+    if simulate:
+        def synthesize(chunk: str) -> Path:
+            time.sleep(0.4 + 0.015 * len(chunk))
+            fd, name = tempfile.mkstemp(suffix='.mp3')
+            with open(fd, 'wb') as f:
+                f.write(chunk.encode('utf-8'))
+            created_files.append(Path(name))
+            return Path(name)
+    else:
+        from audio_manager import get_audio_manager
+        audio_manager = get_audio_manager()
+
+        def synthesize(chunk: str) -> Optional[Path]:
+            # 不使用快取，量測實際合成時間
+            chunk_file = audio_manager._synthesize_chunk(chunk, 'nova', use_cache=False)
+            if chunk_file:
+                created_files.append(chunk_file)
+            return chunk_file
+
+    results = []
+    for _ in range(rounds):
+        start_time = time.time()
+        single_file = synthesize(text)
+        single_total = time.time() - start_time
+
+        pipeline = TTSPipeline(synthesize)
+        chunked = pipeline.play(text)
+        results.append({
+            'single_first_audio': single_total,  # 單次合成要等整段完成才能播放
+            'single_total': single_total,
+            'chunked_first_audio': chunked['first_audio'],
+            'chunked_total': chunked['total'],
+            'chunks': chunked['chunks'],
+            'success': bool(single_file) and chunked['success']
+        })
+
+    for created_file in created_files:
+        created_file.unlink(missing_ok=True)
+    return results
+
+
+# 測試程式
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    sample = ("Bonjour, bonne journée ! Il est huit heures du matin à Paris. "
+              "早安！今天你在巴黎醒來。塞納河上的薄霧慢慢散去，麵包店飄出剛出爐的可頌香氣。"
+              "街角的咖啡館開始擺出露天座位，送報的腳踏車鈴聲穿過石板路。"
+              "這座城市正在醒來，而你也準備好開始新的一天。")
+
+    args = sys.argv[1:]
+    simulate = '--simulate' in args
+    text = next((arg for arg in args if not arg.startswith('--')), sample)
+
+    print("分句並行 TTS 基準測試" + ("（模擬延遲）" if simulate else "（OpenAI TTS）"))
+    for i, chunk in enumerate(split_sentences(text), 1):
+        print(f"  {i}. {chunk}")
+
+    print(f"{'模式':<12}{'首段音頻 (秒)':>14}{'總時間 (秒)':>14}")
+    for result in run_benchmark(text, simulate=simulate):
+        print(f"{'單次合成':<12}{result['single_first_audio']:>14.2f}{result['single_total']:>14.2f}")
+        print(f"{'分句並行':<12}{result['chunked_first_audio']:>14.2f}{result['chunked_total']:>14.2f}")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+甦醒流程管線
+以 asyncio 事件迴圈依相依關係執行各階段，互不相依的階段並行，阻塞工作交給執行緒池
+"""
+
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Any, List, Optional, Iterable
+
+from config import PIPELINE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+STAGE_PENDING = 'pending'
+STAGE_RUNNING = 'running'
+STAGE_DONE = 'done'
+STAGE_FAILED = 'failed'
+STAGE_SKIPPED = 'skipped'
+STAGE_CANCELLED = 'cancelled'
+
+
+class Stage:
+    """管線階段"""
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any], deps: Iterable[str] = (),
+                 always: bool = False):
+        """
+        Args:
+            name: 階段名稱
+            func: 以相依階段的結果 {名稱: 結果} 呼叫；一般函數在執行緒池執行，async 函數直接在事件迴圈執行
+            deps: 相依的階段名稱
+            always: 相依階段失敗時仍執行（結果中缺少失敗的階段），用於備援與收尾
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.always = always
+        self.blocking = not asyncio.iscoroutinefunction(func)
+
+
+class PipelineRun:
+    """一次管線執行（例如一次按鈕）的狀態與時間記錄"""
+
+    def __init__(self, name: str, stages: List[Stage], executor: ThreadPoolExecutor):
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        self.executor = executor
+        self.future: Optional[Future] = None
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.records = {stage.name: {'status': STAGE_PENDING, 'start': None, 'end': None, 'error': None}
+                        for stage in stages}
+        self._validate()
+
+    def _validate(self):
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"階段 {stage.name} 相依未知的階段 {dep}")
+        # 檢查循環相依
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"管線有循環相依: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    async def execute(self) -> Dict[str, Any]:
+        tasks = {}
+        for name, stage in self.stages.items():
+            tasks[name] = asyncio.ensure_future(self._run_stage(stage, tasks))
+        try:
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        except asyncio.CancelledError:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            logger.info(format_trace(self.trace()))
+        return {name: task.result() for name, task in tasks.items()
+                if task.done() and not task.cancelled() and task.exception() is None}
+
+    async def _run_stage(self, stage: Stage, tasks: Dict[str, asyncio.Task]):
+        record = self.records[stage.name]
+        try:
+            deps = [tasks[dep] for dep in stage.deps]
+            if deps:
+                await asyncio.wait(deps)
+            results = {}
+            for dep, task in zip(stage.deps, deps):
+                if not task.cancelled() and task.exception() is None:
+                    results[dep] = task.result()
+            if len(results) < len(deps) and not stage.always:
+                record['status'] = STAGE_SKIPPED
+                raise RuntimeError(f"相依階段未完成: {', '.join(d for d in stage.deps if d not in results)}")
+
+            record['status'] = STAGE_RUNNING
+            record['start'] = self._now_ms()
+            if stage.blocking:
+                # 帶著目前的 context（例如按鈕追蹤）進入執行緒池
+                context = contextvars.copy_context()
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, context.run,
+                                                                          stage.func, results)
+            else:
+                result = await stage.func(results)
+            record['status'] = STAGE_DONE
+            return result
+        except asyncio.CancelledError:
+            record['status'] = STAGE_CANCELLED
+            raise
+        except Exception as e:
+            if record['status'] != STAGE_SKIPPED:
+                record['status'] = STAGE_FAILED
+                record['error'] = str(e)
+                logger.error(f"❌ 階段 {stage.name} 失敗: {e}")
+            raise
+        finally:
+            if record['start'] is not None:
+                record['end'] = self._now_ms()
+
+    def cancel(self) -> bool:
+        """取消尚未完成的階段（已在執行緒池中執行的工作會跑完，但後續階段不會開始）"""
+        return bool(self.future and self.future.cancel())
+
+    def done(self) -> bool:
+        return bool(self.future and self.future.done())
+
+    def result(self, timeout: float = None) -> Dict[str, Any]:
+        """等待完成並返回各階段結果（失敗、略過的階段不在結果中）"""
+        return self.future.result(timeout)
+
+    def critical_path(self) -> List[str]:
+        """決定總耗時的階段鏈：從最晚結束的階段往回找最晚結束的相依階段"""
+        finished = {name: record for name, record in self.records.items() if record['end'] is not None}
+        if not finished:
+            return []
+        name = max(finished, key=lambda n: finished[n]['end'])
+        path = [name]
+        while True:
+            deps = [dep for dep in self.stages[name].deps if dep in finished]
+            if not deps:
+                break
+            name = max(deps, key=lambda n: finished[n]['end'])
+            path.append(name)
+        return path[::-1]
+
+    def trace(self) -> Dict[str, Any]:
+        ends = [record['end'] for record in self.records.values() if record['end'] is not None]
+        return {
+            'name': self.name,
+            'started': self.started,
+            'total_ms': max(ends) if ends else 0,
+            'stages': {name: dict(record) for name, record in self.records.items()},
+            'critical_path': self.critical_path(),
+        }
+
+
+def format_trace(trace: Dict[str, Any]) -> str:
+    """時間記錄轉為日誌文字（每個階段一行，含時間軸）"""
+    lines = [f"⏱️ 管線 {trace['name']} 總耗時 {trace['total_ms']:.0f} ms，關鍵路徑: {' → '.join(trace['critical_path'])}"]
+    scale = 40 / trace['total_ms'] if trace['total_ms'] else 0
+    for name, record in trace['stages'].items():
+        if record['start'] is None:
+            lines.append(f"   {name:<10} {record['status']}")
+            continue
+        bar = ' ' * int(record['start'] * scale) + '█' * max(1, int((record['end'] - record['start']) * scale))
+        mark = '*' if name in trace['critical_path'] else ' '
+        lines.append(f" {mark} {name:<10} {record['start']:>7.0f} → {record['end']:>7.0f} ms  {record['status']:<9} {bar}")
+    return '\n'.join(lines)
+
+
+class PipelineRunner:
+    """常駐事件迴圈與執行緒池，負責執行管線"""
+
+    def __init__(self, max_workers: int = None, name: str = 'wakeup-pipeline'):
+        self.logger = logging.getLogger(__name__)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or PIPELINE_CONFIG['max_workers'],
+                                           thread_name_prefix=f'{name}-worker')
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+        self.last_run: Optional[PipelineRun] = None
+
+    def run(self, name: str, stages: List[Stage]) -> PipelineRun:
+        """
+        開始執行管線（不阻塞）
+
+        Returns:
+            PipelineRun: 可用 result() 等待、cancel() 取消、trace() 取得時間記錄
+        """
+        run = PipelineRun(name, stages, self.executor)
+        run.future = asyncio.run_coroutine_threadsafe(run.execute(), self.loop)
+        self.last_run = run
+        return run
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self.executor.shutdown(wait=False)
+
+
+# 測試程式
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    def work(seconds):
+        return lambda results: time.sleep(seconds) or seconds
+
+    runner = PipelineRunner()
+    run = runner.run('demo', [
+        Stage('city', work(0.2)),
+        Stage('story', work(0.5), deps=['city']),
+        Stage('upload', work(0.3), deps=['story']),
+        Stage('audio', work(0.8), deps=['story']),
+        Stage('inject', work(0.1), deps=['story', 'upload']),
+        Stage('play', work(0.2), deps=['audio', 'inject'], always=True),
+    ])
+    run.result()
+    runner.stop()
@@ -36,6 +36,14 @@ from selenium.common.exceptions import (
 )
 import subprocess
 import platform
+from urllib.parse import urlparse
+
+from page_rpc import PageRPC, PageRPCError
+from browser_profile import ChromeProfile
+from asset_mirror import AssetMirror
+from config import BROWSER_CONFIG
+from tracing import span
+from metrics import get_registry, process_tree_rss
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +51,36 @@ logger = logging.getLogger(__name__)
 WEBSITE_URL = os.getenv('WEBSITE_URL', "https://morgan-orcin.vercel.app/pi.html")
 USER_NAME = os.getenv('USER_NAME', 'unknown')  # 從環境變數設定，預設為 unknown
 WAIT_TIMEOUT = 30
-LOAD_DELAY = 2
+
+# 等待頁面信號（pi-script.js 的 window.piSignal）的逾時預算（秒）
+SIGNAL_TIMEOUTS = {
+    'user_loaded': 5,     # 點擊載入資料後
+    'app_ready': 20,      # Firebase 認證與使用者資料載入完成
+    'city': 15,           # startTheDay 到城市決定
+    'story': 10,          # 故事送出到頁面切換為結果畫面
+}
+
+class StepTimer:
+    """記錄一個流程各步驟的耗時，結束時輸出報告"""
+
+    def __init__(self, name):
+        self.name = name
+        self.steps = []
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, step, ok=True):
+        """記錄從上一步到現在的耗時"""
+        now = time.perf_counter()
+        self.steps.append({'step': step, 'ms': (now - self._last) * 1000, 'ok': ok})
+        self._last = now
+
+    def total_ms(self):
+        return (self._last - self._start) * 1000
+
+    def report(self):
+        parts = [f"{s['step']} {s['ms']:.0f} ms" + ('' if s['ok'] else ' ⚠️') for s in self.steps]
+        return f"⏱️ {self.name} 共 {self.total_ms():.0f} ms：" + ' | '.join(parts)
+
 
 def get_chromedriver_path():
     """自動偵測 ChromeDriver 路徑"""
@@ -74,6 +111,17 @@ class WebControllerDSI:
         self.website_url = WEBSITE_URL
         self.wait = None
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.timings = {}  # 流程名稱 -> 最近一次的 StepTimer
+        self.rpc = PageRPC(lambda: self.driver)  # 每次按鈕的頁面操作合併成批次呼叫
+        self.profile = ChromeProfile()  # 持久的設定檔，重開機後保留 HTTP 快取
+        self.mirror = None              # 本機靜態資源鏡像（啟動瀏覽器時開啟）
+        
+        # WebDriver 往返次數與瀏覽器記憶體（抓取指標時才讀取）
+        registry = get_registry()
+        registry.counter('webdriver_round_trips_total', "WebDriver 往返次數", func=lambda: self.rpc.round_trips)
+        registry.gauge('browser_rss_bytes', "瀏覽器（chromedriver 與 Chrome 行程）常駐記憶體", func=self.browser_rss)
+        self.interactive_latency = registry.histogram('page_interactive_seconds', "頁面開始載入到可互動（domInteractive）",
+                                                      ['source'])
         
         self.logger.info("甦醒地圖網頁控制器初始化")
 
@@ -106,8 +154,9 @@ class WebControllerDSI:
       #  options.add_argument('--disable-infobars')
       #  options.add_argument('--hide-scrollbars')
         
-        # 用戶資料目錄
-        options.add_argument('--user-data-dir=/tmp/chrome-data')
+        # 用戶資料目錄（持久保存，並限制 HTTP 快取大小）
+        for argument in self.profile.chrome_arguments():
+            options.add_argument(argument)
         
         # 自動播放政策
         options.add_argument('--autoplay-policy=no-user-gesture-required')
@@ -119,6 +168,10 @@ class WebControllerDSI:
         try:
             self.logger.info("正在啟動瀏覽器...")
             
+            # 準備設定檔並改由本機鏡像提供頁面
+            self.profile.prepare()
+            self._start_asset_mirror()
+            
             # 設定 Chrome 選項
             options = self._setup_chrome_options()
             
@@ -143,21 +196,110 @@ class WebControllerDSI:
             self.logger.error(f"瀏覽器啟動失敗：{e}")
             return False
 
+    def _start_asset_mirror(self):
+        """啟動本機鏡像並改用鏡像的頁面網址；無法使用時沿用遠端網址"""
+        if not BROWSER_CONFIG['local_mirror'] or self.mirror:
+            return
+        page = os.path.basename(urlparse(WEBSITE_URL).path) or 'pi.html'
+        mirror = AssetMirror()
+        if not mirror.available(page):
+            self.logger.warning(f"本機找不到 {page}，從 {WEBSITE_URL} 載入")
+            return
+        if mirror.start():
+            self.mirror = mirror
+            self.website_url = mirror.page_url(page)
+            get_registry().counter('asset_mirror_requests_total', "本機鏡像處理的請求數", ['kind'],
+                                   func=lambda: {(kind,): count for kind, count in mirror.get_stats().items()})
+
+    def page_timing(self):
+        """
+        目前頁面的載入時間與資源快取情況（Navigation / Resource Timing）
+
+        跨網域資源沒有 Timing-Allow-Origin 時無法得知是否命中快取，不計入 cached。
+
+        Returns:
+            dict: {'interactive_ms', 'load_ms', 'resources', 'cached', 'transferred_bytes'}；無法取得時返回 None
+        """
+        try:
+            return self.driver.execute_script("""
+                const nav = performance.getEntriesByType('navigation')[0];
+                const resources = performance.getEntriesByType('resource');
+                return {
+                    interactive_ms: nav ? nav.domInteractive : null,
+                    load_ms: nav ? nav.loadEventEnd : null,
+                    resources: resources.length,
+                    cached: resources.filter(r => r.transferSize === 0 && r.decodedBodySize > 0).length,
+                    transferred_bytes: resources.reduce((sum, r) => sum + (r.transferSize || 0),
+                                                        nav ? nav.transferSize : 0),
+                };
+            """)
+        except WebDriverException as e:
+            self.logger.debug(f"無法取得頁面載入時間：{e}")
+            return None
+
+    def _record_page_timing(self):
+        timing = self.page_timing()
+        if not timing or timing.get('interactive_ms') is None:
+            return
+        source = 'mirror' if self.mirror else 'remote'
+        self.interactive_latency.observe(timing['interactive_ms'] / 1000, source=source)
+        self.logger.info(f"📄 頁面可互動 {timing['interactive_ms']:.0f} ms，載入完成 {timing['load_ms'] or 0:.0f} ms"
+                         f"（{source}；資源 {timing['resources']} 個，快取命中 {timing['cached']} 個，"
+                         f"下載 {timing['transferred_bytes'] / 1024:.0f} KB）")
+
+    def signal_seq(self):
+        """目前的頁面信號序號；之後只接受序號更大的信號"""
+        try:
+            return self.rpc.query('signalSeq') or 0
+        except PageRPCError:
+            return 0
+
+    def wait_for_signal(self, names, after=0, timeout=WAIT_TIMEOUT):
+        """
+        等待頁面信號（事件觸發即返回，不輪詢）
+
+        Args:
+            names: 信號名稱或名稱列表，任一出現即返回
+            after: 只接受序號大於此值的信號（按鈕前的 signal_seq()）
+            timeout: 逾時秒數
+
+        Returns:
+            dict: 信號 {name, seq, time, detail}；逾時或頁面不支援時返回 None
+        """
+        if isinstance(names, str):
+            names = [names]
+        try:
+            return self.rpc.run_and_wait([], names, timeout, after=after)[1]
+        except PageRPCError as e:
+            self.logger.warning(f"等待頁面信號 {names} 失敗：{e}")
+            return None
+
+    def _finish_timing(self, timer):
+        self.timings[timer.name] = timer
+        self.logger.info(timer.report())
+
+    def get_timing_report(self):
+        """各流程最近一次的耗時報告"""
+        return '\n'.join(timer.report() for timer in self.timings.values())
+
     def load_website(self):
         """載入網站並自動設定"""
         try:
             self.logger.info("正在載入甦醒地圖...")
+            timer = StepTimer('load_website')
             
-            # 開啟網站
+            # 開啟網站（driver.get 會等到 load 事件）
             self.driver.get(self.website_url)
-            time.sleep(LOAD_DELAY)
+            timer.mark('page_load')
+            self._record_page_timing()
             
             # 自動填入使用者名稱
             self._fill_username()
             
             # 自動點擊載入資料按鈕
-            self._click_load_data_button()
+            self._click_load_data_button(timer)
             
+            self._finish_timing(timer)
             self.logger.info("網站載入和設定完成")
             return True
             
@@ -185,8 +327,9 @@ class WebControllerDSI:
             self.logger.error(f"使用者名稱設定失敗：{e}")
             return False
 
-    def _click_load_data_button(self):
-        """點擊載入資料按鈕"""
+    def _click_load_data_button(self, timer=None):
+        """點擊載入資料按鈕（等待頁面的 userLoaded、appReady 信號）"""
+        timer = timer or StepTimer('load_data')
         try:
             self.logger.info("正在載入用戶資料...")
             
@@ -203,6 +346,7 @@ class WebControllerDSI:
             """)
             
             # 等待載入資料按鈕出現並可點擊
+            seq = self.signal_seq()
             try:
                 load_button = self.wait.until(
                     EC.element_to_be_clickable((By.ID, "setUserNameButton"))
@@ -211,9 +355,11 @@ class WebControllerDSI:
                 self.logger.info("已點擊載入資料按鈕")
             except Exception as e:
                 self.logger.warning(f"無法點擊載入按鈕：{e}")
+            timer.mark('load_button')
             
-            # 等待 Firebase 初始化完成
-            time.sleep(3)
+            # 等待使用者資料載入完成
+            loaded = self.wait_for_signal(['userLoaded', 'appReady'], seq, SIGNAL_TIMEOUTS['user_loaded'])
+            timer.mark('user_loaded', bool(loaded))
             
             # 強制設置用戶資料和啟用按鈕
             force_setup_js = f"""
@@ -246,8 +392,13 @@ class WebControllerDSI:
             self.driver.execute_script(force_setup_js)
             self.logger.info("✅ 用戶資料強制設置完成")
             
-            # 等待 Firebase 初始化完成
-            time.sleep(2)
+            # 等待 Firebase 認證完成、startTheDay 可以呼叫（頁面載入後只發生一次，不限序號）
+            ready = self.wait_for_signal(['appReady', 'appFailed'], 0, SIGNAL_TIMEOUTS['app_ready'])
+            timer.mark('app_ready', bool(ready) and ready['name'] == 'appReady')
+            if not ready:
+                self.logger.warning("⚠️ 等待 Firebase 初始化逾時")
+            elif ready['name'] == 'appFailed':
+                self.logger.warning(f"⚠️ 頁面初始化失敗：{ready['detail']}")
             
             # 觸發強制故事顯示
             story_trigger_js = """
@@ -261,6 +412,7 @@ class WebControllerDSI:
             
             self.driver.execute_script(story_trigger_js)
             self.logger.info("✅ 已觸發強制故事顯示")
+            timer.mark('story_trigger')
             
             return True
             
@@ -268,63 +420,63 @@ class WebControllerDSI:
             self.logger.error(f"載入用戶資料失敗：{e}")
             return False
 
-    def click_start_button(self):
-        """點擊開始這一天按鈕"""
+    def click_start_button(self, preselect=None):
+        """
+        點擊開始這一天按鈕（等到頁面決定城市或失敗即返回）
+
+        Args:
+            preselect: (minute_key, city) 預取的城市，與觸發合併在同一次呼叫
+
+        Returns:
+            dict: success、message；成功時附上 city_data（頁面的城市資料）與 preselected
+        """
         try:
             self.logger.info("正在開始這一天...")
+            timer = StepTimer('click_start_button')
             
             # 檢查是否為新的狀態管理介面
             try:
-                # 直接調用 JavaScript 函數來觸發甦醒流程
+                # 一次呼叫：指定預取城市、記下目前城市、觸發甦醒流程、等待城市決定並取回城市資料
                 self.logger.info("使用 JavaScript 直接觸發甦醒流程...")
-                result = self.driver.execute_script("""
-                    try {
-                        window.debugStartTheDay = 'NOT_STARTED';
-                        if (typeof startTheDay === 'function') {
-                            startTheDay();
-                            return 'JavaScript 函數已執行';
-                        } else {
-                            return 'startTheDay 函數未找到';
-                        }
-                    } catch (error) {
-                        window.debugStartTheDay = 'ERROR: ' + error.message;
-                        return 'JavaScript 錯誤: ' + error.message;
-                    }
-                """)
-                self.logger.info(f"JavaScript 執行結果：{result}")
-                
-                # 檢查調試狀態
-                debug_status = self.driver.execute_script("return window.debugStartTheDay || 'UNKNOWN';")
-                self.logger.info(f"調試狀態：{debug_status}")
+                ops = [('markCityData',), ('startTheDay',)]
+                if preselect:
+                    ops.insert(0, ('preselectCity',) + tuple(preselect))
+                with span('web.start_day', preselected=bool(preselect)) as record:
+                    values, signal, then = self.rpc.run_and_wait(
+                        ops, ['cityResolved', 'dayFailed'], SIGNAL_TIMEOUTS['city'], then=[('cityData',)])
+                    if record is not None:
+                        record['args']['signal'] = signal['name'] if signal else None
+                self.logger.info(f"JavaScript 執行結果：{values[-1]}")
+                timer.mark('trigger_and_city', bool(signal) and signal['name'] == 'cityResolved')
                 
-                # 等待處理完成
-                time.sleep(8)
+                if signal and signal['name'] == 'cityResolved':
+                    city_name = signal['detail'].get('city', '')
+                    self.logger.info(f"甦醒城市：{city_name}")
+                    self._finish_timing(timer)
+                    return {'success': True, 'message': '甦醒成功', 'result': f'甦醒城市: {city_name}',
+                            'city_data': then[0], 'preselected': bool(signal['detail'].get('preselected'))}
                 
-                # 再次檢查調試狀態
-                final_debug_status = self.driver.execute_script("return window.debugStartTheDay || 'UNKNOWN';")
-                self.logger.info(f"最終調試狀態：{final_debug_status}")
+                if signal and signal['name'] == 'dayFailed':
+                    error_msg = signal['detail'].get('error', '')
+                    self.logger.warning(f"檢測到錯誤：{error_msg}")
+                    self._finish_timing(timer)
+                    return {'success': False, 'error': error_msg}
                 
-                # 檢查最終狀態
-                final_state = self.driver.execute_script("return window.currentState || 'unknown';")
-                self.logger.info(f"最終狀態：{final_state}")
+                # 逾時：一次取回調試狀態與畫面
+                self._finish_timing(timer)
+                final_debug_status, final_state, city_name, error_msg = self.rpc.batch(
+                    ('debugStatus',), ('state',), ('text', 'cityName'), ('text', 'errorMessage'))
+                self.logger.warning(f"等待城市信號逾時，調試狀態：{final_debug_status}，狀態：{final_state}")
                 
                 # 檢查是否有結果顯示
-                try:
-                    city_name = self.driver.execute_script("return document.getElementById('cityName') ? document.getElementById('cityName').textContent : '';")
-                    if city_name:
-                        self.logger.info(f"甦醒城市：{city_name}")
-                        return {'success': True, 'message': '甦醒成功', 'result': f'甦醒城市: {city_name}'}
-                except Exception:
-                    pass
+                if city_name:
+                    self.logger.info(f"甦醒城市：{city_name}")
+                    return {'success': True, 'message': '甦醒成功', 'result': f'甦醒城市: {city_name}'}
                 
                 # 檢查是否有錯誤
-                try:
-                    error_msg = self.driver.execute_script("return document.getElementById('errorMessage') ? document.getElementById('errorMessage').textContent : '';")
-                    if error_msg:
-                        self.logger.warning(f"檢測到錯誤：{error_msg}")
-                        return {'success': False, 'error': error_msg}
-                except Exception:
-                    pass
+                if error_msg:
+                    self.logger.warning(f"檢測到錯誤：{error_msg}")
+                    return {'success': False, 'error': error_msg}
                 
                 return {'success': True, 'message': 'JavaScript 觸發完成'}
                 
@@ -345,11 +497,12 @@ class WebControllerDSI:
                 )
                 
                 # 點擊開始按鈕
+                seq = self.signal_seq()
                 start_button.click()
                 self.logger.info("開始按鈕已點擊")
                 
                 # 等待結果處理
-                time.sleep(5)
+                self.wait_for_signal(['cityResolved', 'dayFailed'], seq, SIGNAL_TIMEOUTS['city'])
                 
                 # 檢查是否有結果顯示
                 try:
@@ -372,12 +525,15 @@ class WebControllerDSI:
         try:
             self.logger.info("正在重新載入網站...")
             
-            # 重新載入頁面
+            # 重新載入頁面（refresh 會等到 load 事件）
+            timer = StepTimer('reload_website')
             self.driver.refresh()
-            time.sleep(LOAD_DELAY)
+            timer.mark('page_load')
+            self._record_page_timing()
             
             # 重新設定使用者資料
-            if self._fill_username() and self._click_load_data_button():
+            if self._fill_username() and self._click_load_data_button(timer):
+                self._finish_timing(timer)
                 self.logger.info("網站重新載入成功")
                 return {'success': True, 'message': '網站重新載入成功'}
             else:
@@ -387,6 +543,14 @@ class WebControllerDSI:
             self.logger.error(f"重新載入網站失敗：{e}")
             return {'success': False, 'error': str(e)}
 
+    def browser_rss(self):
+        """chromedriver 及其啟動的 Chrome 行程的常駐記憶體總和（位元組）；瀏覽器未啟動時返回 None"""
+        try:
+            process = self.driver.service.process if self.driver else None
+        except AttributeError:
+            return None
+        return process_tree_rss(process.pid) if process else None
+
     def stop(self):
         """停止並清理瀏覽器"""
         try:
@@ -397,6 +561,10 @@ class WebControllerDSI:
                 
         except Exception as e:
             self.logger.error(f"關閉瀏覽器時發生錯誤：{e}")
+        
+        if self.mirror:
+            self.mirror.stop()
+            self.mirror = None
 
     def get_page_title(self):
         """取得頁面標題"""
@@ -547,6 +715,7 @@ if __name__ == "__main__":
                 input("按 Enter 鍵測試開始按鈕...")
                 result = controller.click_start_button()
                 print(f"開始按鈕結果：{result}")
+                print(controller.get_timing_report())
                 
             time.sleep(5)  # 等待觀察
         else: